@@ -0,0 +1,47 @@
+from rest_framework import serializers
+
+from apps.ai.ml.resource_opt.simulator import DEFAULT_REPLICATIONS, MAX_REPLICATIONS, Scenario
+from apps.ai.ml.resource_opt.staffing import MAX_SERVERS, TARGET_WAIT_MINUTES
+
+
+class StaffingChangeSerializer(serializers.Serializer):
+    at = serializers.TimeField(help_text="Heure du changement (HH:MM)")
+    delta = serializers.IntegerField(min_value=-MAX_SERVERS, max_value=MAX_SERVERS)
+
+    def validate_delta(self, value):
+        if value == 0:
+            raise serializers.ValidationError("Le changement d'effectif ne peut pas être nul")
+        return value
+
+
+class SimulationScenarioSerializer(serializers.Serializer):
+    date = serializers.DateField(required=False)
+    start_hour = serializers.IntegerField(min_value=0, max_value=23, default=8)
+    end_hour = serializers.IntegerField(min_value=1, max_value=24, default=18)
+    servers = serializers.IntegerField(min_value=0, max_value=MAX_SERVERS, required=False)
+    changes = StaffingChangeSerializer(many=True, required=False, default=list)
+    arrival_scale = serializers.FloatField(min_value=0, max_value=10, default=1.0)
+    replications = serializers.IntegerField(min_value=1, max_value=MAX_REPLICATIONS, default=DEFAULT_REPLICATIONS)
+    target_wait = serializers.FloatField(min_value=0, default=TARGET_WAIT_MINUTES)
+    seed = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, data):
+        if data['end_hour'] <= data['start_hour']:
+            raise serializers.ValidationError("end_hour doit être postérieure à start_hour")
+        return data
+
+    def to_scenario(self) -> Scenario:
+        data = self.validated_data
+        return Scenario(
+            start_hour=data['start_hour'],
+            end_hour=data['end_hour'],
+            servers=data.get('servers'),
+            changes=[
+                (change['at'].hour * 60 + change['at'].minute, change['delta'])
+                for change in data['changes']
+            ],
+            arrival_scale=data['arrival_scale'],
+            replications=data['replications'],
+            target_wait=data['target_wait'],
+            seed=data.get('seed'),
+        )
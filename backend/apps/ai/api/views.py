@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 
+from apps.core.models import OrganizationBranch
 from apps.queues.models import Queue, ServicePoint
 from apps.ai.models import (
     WaitTimePrediction,
@@ -12,9 +13,35 @@ from apps.ai.models import (
     QueueAnomaly
 )
 from apps.ai.ml.wait_time.predictor import WaitTimePredictor
-from apps.ai.ml.resource_opt.optimizer import ResourceOptimizer
+from apps.ai.ml.resource_opt.optimizer import ResourceOptimizer, optimize_branch
+from apps.ai.ml.resource_opt.simulator import QueueSimulator
 from apps.ai.ml.anomaly.detector import AnomalyDetector
-from apps.ai.ml.chatbot.assistant import AIAssistant
+try:
+    from apps.ai.ml.chatbot.assistant import AIAssistant
+except ImportError:
+    # Assistant conversationnel non livré : les routes de chat répondent 503
+    AIAssistant = None
+from apps.ai.api.serializers import SimulationScenarioSerializer
+
+# Nombre maximal de files par prédiction groupée
+MAX_BATCH_QUEUES = 100
+
+
+def assistant_unavailable():
+    return Response(
+        {'error': 'Assistant conversationnel indisponible'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
+def get_anomaly(request, queue_id, anomaly_id):
+    """Anomalie de la file, limitée à l'organisation de l'utilisateur"""
+    return get_object_or_404(
+        QueueAnomaly.objects.select_related('queue'),
+        pk=anomaly_id,
+        queue_id=queue_id,
+        queue__queue_type__organization=request.user.organization
+    )
 
 
 class AIViewSet(viewsets.ViewSet):
@@ -23,22 +50,111 @@ class AIViewSet(viewsets.ViewSet):
     @action(detail=True, methods=['get'], url_path='wait-time')
     def predict_wait_time(self, request, pk=None):
         """Prédit le temps d'attente pour une file donnée"""
-        queue = get_object_or_404(Queue, pk=pk)
+        queue = get_object_or_404(
+            Queue,
+            pk=pk,
+            queue_type__organization=request.user.organization
+        )
         predictor = WaitTimePredictor(queue.id)
         prediction = predictor.predict(queue)
         return Response(prediction)
 
+    @action(detail=False, methods=['get'], url_path='wait-time/batch')
+    def predict_wait_time_batch(self, request):
+        """
+        Prédit le temps d'attente de toutes les files d'une succursale
+        (?branch=<id>) ou d'une liste de files (?queues=1,2,3) en un appel
+        """
+        queues = Queue.objects.filter(
+            queue_type__organization=request.user.organization
+        ).select_related('queue_type')
+        branch_id = request.query_params.get('branch')
+        queue_ids = [
+            value for param in request.query_params.getlist('queues')
+            for value in param.split(',') if value
+        ]
+        if not branch_id and not queue_ids:
+            return Response(
+                {'error': "Paramètre 'branch' ou 'queues' requis"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            if branch_id:
+                queues = queues.filter(queue_type__branch_id=int(branch_id))
+            if queue_ids:
+                queues = queues.filter(pk__in=[int(value) for value in queue_ids])
+        except ValueError:
+            return Response(
+                {'error': 'Identifiants invalides'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queues = list(queues.order_by('id')[:MAX_BATCH_QUEUES + 1])
+        if len(queues) > MAX_BATCH_QUEUES:
+            return Response(
+                {'error': f'Au plus {MAX_BATCH_QUEUES} files par appel'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        predictions = WaitTimePredictor().predict_batch(queues)
+        return Response({
+            'count': len(predictions),
+            'results': list(predictions.values())
+        })
+
     @action(detail=True, methods=['get'], url_path='resource-optimization')
     def optimize_resources(self, request, pk=None):
         """Génère des suggestions d'optimisation des ressources"""
-        service_point = get_object_or_404(ServicePoint, pk=pk)
+        service_point = get_object_or_404(
+            ServicePoint,
+            pk=pk,
+            branch__organization=request.user.organization
+        )
         optimizer = ResourceOptimizer(service_point.id)
         suggestions = optimizer.generate_suggestions()
         return Response(suggestions)
 
+    @action(detail=False, methods=['get'], url_path='resource-optimization/branch')
+    def optimize_branch_resources(self, request):
+        """Optimise ensemble les effectifs de tous les points de service d'une succursale (?branch=<id>)"""
+        branch_id = request.query_params.get('branch')
+        if not branch_id:
+            return Response(
+                {'error': "Paramètre 'branch' requis"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        branch = get_object_or_404(
+            OrganizationBranch,
+            pk=branch_id,
+            organization=request.user.organization
+        )
+        results = optimize_branch(branch.id)
+        return Response({
+            'count': len(results),
+            'results': results
+        })
+
+    @action(detail=True, methods=['post'], url_path='simulation')
+    def simulate_staffing(self, request, pk=None):
+        """
+        Simule une journée de la file avec et sans les changements d'effectif
+        demandés (ex. {"changes": [{"at": "10:00", "delta": 2}]})
+        """
+        queue = get_object_or_404(
+            Queue,
+            pk=pk,
+            queue_type__organization=request.user.organization
+        )
+        serializer = SimulationScenarioSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        simulator = QueueSimulator(queue, day=serializer.validated_data.get('date'))
+        return Response(simulator.what_if(serializer.to_scenario()))
+
     @action(detail=False, methods=['post'], url_path='chat/session')
     def create_chat_session(self, request):
         """Crée une nouvelle session de chat"""
+        if AIAssistant is None:
+            return assistant_unavailable()
         assistant = AIAssistant()
         session = assistant.create_session(
             user_id=request.user.id,
@@ -49,7 +165,9 @@ class AIViewSet(viewsets.ViewSet):
     @action(detail=True, methods=['post'], url_path='chat/message')
     def send_chat_message(self, request, pk=None):
         """Envoie un message dans une session de chat existante"""
-        session = get_object_or_404(ChatSession, pk=pk)
+        if AIAssistant is None:
+            return assistant_unavailable()
+        session = get_object_or_404(ChatSession, pk=pk, user_id=str(request.user.id))
         assistant = AIAssistant()
         response = assistant.process_message(
             session_id=session.id,
@@ -60,7 +178,11 @@ class AIViewSet(viewsets.ViewSet):
     @action(detail=True, methods=['get'], url_path='anomalies')
     def detect_anomalies(self, request, pk=None):
         """Détecte les anomalies dans une file d'attente"""
-        queue = get_object_or_404(Queue, pk=pk)
+        queue = get_object_or_404(
+            Queue,
+            pk=pk,
+            queue_type__organization=request.user.organization
+        )
         detector = AnomalyDetector(queue.id)
         anomalies = detector.detect()
         return Response(anomalies)
@@ -68,7 +190,7 @@ class AIViewSet(viewsets.ViewSet):
     @action(detail=True, methods=['post'], url_path='anomalies/(?P<anomaly_id>[^/.]+)/investigate')
     def investigate_anomaly(self, request, pk=None, anomaly_id=None):
         """Lance une investigation sur une anomalie détectée"""
-        anomaly = get_object_or_404(QueueAnomaly, pk=anomaly_id)
+        anomaly = get_anomaly(request, pk, anomaly_id)
         detector = AnomalyDetector(anomaly.queue.id)
         investigation = detector.investigate(anomaly)
         return Response(investigation)
@@ -76,7 +198,7 @@ class AIViewSet(viewsets.ViewSet):
     @action(detail=True, methods=['post'], url_path='anomalies/(?P<anomaly_id>[^/.]+)/resolve')
     def resolve_anomaly(self, request, pk=None, anomaly_id=None):
         """Marque une anomalie comme résolue"""
-        anomaly = get_object_or_404(QueueAnomaly, pk=anomaly_id)
+        anomaly = get_anomaly(request, pk, anomaly_id)
         detector = AnomalyDetector(anomaly.queue.id)
         resolution = detector.resolve(
             anomaly,
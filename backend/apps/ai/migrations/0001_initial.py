@@ -0,0 +1,126 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:11
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('queues', '0005_ticket_servicepoint_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('session_id', models.CharField(max_length=100, unique=True)),
+                ('user_id', models.CharField(max_length=100)),
+                ('context', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('resolved', 'Résolue'), ('escalated', 'Escaladée')], default='active', max_length=20)),
+                ('metadata', models.JSONField(default=dict)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MLModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('name', models.CharField(max_length=100)),
+                ('version', models.CharField(max_length=20)),
+                ('type', models.CharField(choices=[('wait_time', "Prédiction temps d'attente"), ('resource_opt', 'Optimisation des ressources'), ('anomaly', "Détection d'anomalies"), ('nlp', 'Traitement du langage naturel')], max_length=20)),
+                ('status', models.CharField(choices=[('training', 'En entraînement'), ('active', 'Actif'), ('inactive', 'Inactif'), ('failed', 'Échec')], default='inactive', max_length=20)),
+                ('metrics', models.JSONField(default=dict)),
+                ('parameters', models.JSONField(default=dict)),
+                ('file_path', models.CharField(max_length=255)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChatMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('role', models.CharField(choices=[('user', 'Utilisateur'), ('assistant', 'Assistant'), ('system', 'Système')], max_length=20)),
+                ('content', models.TextField()),
+                ('intent', models.CharField(max_length=100, null=True)),
+                ('confidence', models.FloatField(null=True)),
+                ('metadata', models.JSONField(default=dict)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ai.chatsession')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='QueueAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('type', models.CharField(choices=[('wait_time', "Temps d'attente"), ('abandonment', 'Abandon'), ('service_time', 'Temps de service'), ('pattern', 'Motif inhabituel')], max_length=20)),
+                ('severity', models.CharField(choices=[('critical', 'Critique'), ('high', 'Haute'), ('medium', 'Moyenne'), ('low', 'Basse')], max_length=20)),
+                ('metrics', models.JSONField()),
+                ('description', models.TextField()),
+                ('status', models.CharField(choices=[('detected', 'Détectée'), ('investigating', 'En investigation'), ('resolved', 'Résolue'), ('false_positive', 'Faux positif')], default='detected', max_length=20)),
+                ('resolution', models.JSONField(null=True)),
+                ('model', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='ai.mlmodel')),
+                ('queue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='queues.queue')),
+            ],
+            options={
+                'verbose_name_plural': 'Queue anomalies',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResourceOptimization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('current_load', models.FloatField()),
+                ('suggested_action', models.CharField(choices=[('add', 'Ajouter des ressources'), ('remove', 'Retirer des ressources'), ('reassign', 'Réassigner')], max_length=20)),
+                ('priority', models.CharField(choices=[('high', 'Haute'), ('medium', 'Moyenne'), ('low', 'Basse')], max_length=20)),
+                ('expected_impact', models.JSONField()),
+                ('was_applied', models.BooleanField(default=False)),
+                ('actual_impact', models.JSONField(null=True)),
+                ('model', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='ai.mlmodel')),
+                ('service_point', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='queues.servicepoint')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WaitTimePrediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('predicted_wait_time', models.IntegerField()),
+                ('actual_wait_time', models.IntegerField(null=True)),
+                ('confidence', models.FloatField()),
+                ('features_used', models.JSONField()),
+                ('prediction_factors', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=100), default=list, size=None)),
+                ('is_accurate', models.BooleanField(null=True)),
+                ('model', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='ai.mlmodel')),
+                ('queue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='queues.queue')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
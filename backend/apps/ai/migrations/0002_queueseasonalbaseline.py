@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:11
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queues', '0005_ticket_servicepoint_version'),
+        ('ai', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueueSeasonalBaseline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('arrivals_mean', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=168)),
+                ('arrivals_std', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=168)),
+                ('wait_mean', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=168)),
+                ('wait_std', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=168)),
+                ('service_mean', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=168)),
+                ('service_std', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=168)),
+                ('weeks', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+                ('queue', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='seasonal_baseline', to='queues.queue')),
+            ],
+            options={
+                'verbose_name': 'Seasonal baseline',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:11
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queues', '0005_ticket_servicepoint_version'),
+        ('ai', '0002_queueseasonalbaseline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueueArrivalForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('method', models.CharField(choices=[('seasonal_naive', 'Saisonnier naïf'), ('smoothing', 'Lissage exponentiel saisonnier'), ('prophet', 'Prophet')], max_length=20)),
+                ('origin', models.DateTimeField()),
+                ('values', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=168)),
+                ('parameters', models.JSONField(default=dict)),
+                ('mae', models.FloatField(null=True)),
+                ('fitted_at', models.DateTimeField()),
+                ('queue', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='arrival_forecast', to='queues.queue')),
+            ],
+            options={
+                'verbose_name': 'Arrival forecast',
+            },
+        ),
+    ]
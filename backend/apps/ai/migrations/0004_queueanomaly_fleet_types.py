@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0003_queuearrivalforecast'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='queueanomaly',
+            name='type',
+            field=models.CharField(choices=[('wait_time', "Temps d'attente"), ('abandonment', 'Abandon'), ('service_time', 'Temps de service'), ('pattern', 'Motif inhabituel'), ('fleet_wait_time', "Temps d'attente (flotte)"), ('fleet_abandonment', 'Abandon (flotte)'), ('fleet_service_time', 'Temps de service (flotte)'), ('fleet_pattern', 'Motif inhabituel (flotte)')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:40
+
+from django.db import migrations, models
+from django.utils import timezone
+
+OPEN_STATUSES = ('detected', 'investigating')
+
+
+def resolve_duplicate_open_anomalies(apps, schema_editor):
+    """Une seule anomalie ouverte par (file, type) : la plus récente est gardée"""
+    QueueAnomaly = apps.get_model('ai', 'QueueAnomaly')
+    kept, duplicates = set(), []
+    for anomaly_id, queue_id, anomaly_type in QueueAnomaly.objects.filter(
+        status__in=OPEN_STATUSES
+    ).order_by('-created_at', '-id').values_list('id', 'queue_id', 'type'):
+        if (queue_id, anomaly_type) in kept:
+            duplicates.append(anomaly_id)
+        else:
+            kept.add((queue_id, anomaly_type))
+    QueueAnomaly.objects.filter(pk__in=duplicates).update(
+        status='resolved',
+        resolution={
+            'resolution_time': timezone.now().isoformat(),
+            'resolution_type': 'auto',
+            'actions_taken': [],
+            'effectiveness': None,
+            'notes': "Doublon d'une anomalie ouverte plus récente",
+        },
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0004_queueanomaly_fleet_types'),
+        ('queues', '0006_queuenotification_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(resolve_duplicate_open_anomalies, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='queueanomaly',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('detected', 'investigating'))), fields=('queue', 'type'), name='queueanomaly_one_open_per_type'),
+        ),
+    ]
@@ -0,0 +1,304 @@
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from django.db.models import Q
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from apps.ai.ml.wait_time.features import masked_slopes
+from apps.queues.models import Ticket
+from apps.queues.services.store import get_redis, make_key
+
+logger = logging.getLogger(__name__)
+
+# Ring buffer de 24h en seaux de 5 minutes
+BUCKET_SECONDS = 300
+WINDOW_SECONDS = 24 * 3600
+SLOTS = WINDOW_SECONDS // BUCKET_SECONDS
+
+# Mesures accumulées : valeurs en minutes (wait, service) ou événements (1)
+METRICS = ('arrival', 'dequeue', 'wait', 'service', 'abandon')
+
+# Chaque seau est un champ "horodatage:n:somme:somme_carrés" ; un seau
+# portant un ancien horodatage (tour précédent de l'anneau) est réinitialisé
+RECORD_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+local n, s, q = 0, 0, 0
+if current then
+    local stamp, cn, cs, cq = string.match(current, '^([^:]+):([^:]+):([^:]+):([^:]+)$')
+    if stamp == ARGV[2] then
+        n, s, q = tonumber(cn), tonumber(cs), tonumber(cq)
+    end
+end
+n = n + tonumber(ARGV[3])
+s = s + tonumber(ARGV[4])
+q = q + tonumber(ARGV[5])
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2] .. ':' .. n .. ':' .. s .. ':' .. q)
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+return n
+"""
+
+
+@dataclass
+class WindowStats:
+    """Agrégats d'une mesure sur une fenêtre glissante"""
+    count: int
+    total: float
+    sum_squares: float
+    trend: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def variance(self) -> float:
+        if self.count < 2:
+            return 0.0
+        return max(self.sum_squares / self.count - self.mean ** 2, 0.0)
+
+    @property
+    def std(self) -> float:
+        return self.variance ** 0.5
+
+
+class QueueWindows:
+    """
+    Seaux d'une file, alignés du plus ancien au plus récent :
+    tableaux (len(METRICS), SLOTS) de comptes, sommes et sommes des carrés.
+    """
+
+    def __init__(self, counts: np.ndarray, sums: np.ndarray, squares: np.ndarray):
+        self.counts = counts
+        self.sums = sums
+        self.squares = squares
+
+    @classmethod
+    def empty(cls) -> 'QueueWindows':
+        shape = (len(METRICS), SLOTS)
+        return cls(np.zeros(shape), np.zeros(shape), np.zeros(shape))
+
+    def stats(self, metric: str, minutes: int, trend_minutes: int = 60) -> WindowStats:
+        """Somme, moyenne, variance et pente (par tranche de trend_minutes) sur les N dernières minutes"""
+        row = METRICS.index(metric)
+        buckets = max(1, min(SLOTS, minutes * 60 // BUCKET_SECONDS))
+        counts = self.counts[row, -buckets:]
+        sums = self.sums[row, -buckets:]
+        stats = WindowStats(
+            count=int(counts.sum()),
+            total=float(sums.sum()),
+            sum_squares=float(self.squares[row, -buckets:].sum())
+        )
+
+        group = max(1, trend_minutes * 60 // BUCKET_SECONDS)
+        if buckets >= 2 * group:
+            usable = buckets - buckets % group
+            grouped_counts = counts[-usable:].reshape(-1, group).sum(axis=1)
+            grouped_sums = sums[-usable:].reshape(-1, group).sum(axis=1)
+            if metric in ('wait', 'service'):
+                # Tendance de la moyenne par tranche (tranches vides ignorées)
+                series = np.divide(
+                    grouped_sums, grouped_counts,
+                    out=np.full(grouped_sums.shape, np.nan),
+                    where=grouped_counts > 0
+                )
+            else:
+                series = grouped_counts
+            stats.trend = float(masked_slopes(series[None, :])[0])
+        return stats
+
+    def rate(self, numerator: str, denominator: str, minutes: int) -> float:
+        """Rapport des événements de deux mesures sur la fenêtre (ex. abandons / arrivées)"""
+        total = self.stats(denominator, minutes).count
+        return self.stats(numerator, minutes).count / total if total else 0.0
+
+    def length_trend(self, minutes: int = 24 * 60, trend_minutes: int = 60) -> float:
+        """Pente de la longueur de file reconstituée (cumul arrivées - sorties d'attente)"""
+        group = max(1, trend_minutes * 60 // BUCKET_SECONDS)
+        buckets = min(SLOTS, minutes * 60 // BUCKET_SECONDS)
+        usable = buckets - buckets % group
+        if usable < 2 * group:
+            return 0.0
+        net = (
+            self.counts[METRICS.index('arrival'), -usable:]
+            - self.counts[METRICS.index('dequeue'), -usable:]
+        )
+        lengths = np.cumsum(net)[group - 1::group]
+        return float(masked_slopes(lengths[None, :].astype(float))[0])
+
+
+class MetricAccumulator:
+    """
+    Accumulateur glissant des métriques de files, alimenté par les
+    transitions de tickets. Les fenêtres 1h / 24h se lisent en O(seaux)
+    sans parcourir les tickets ; sans Redis, les mêmes seaux sont
+    reconstruits depuis Postgres.
+    """
+
+    def __init__(self, connection=None):
+        self._connection = connection
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = get_redis()
+        return self._connection
+
+    @staticmethod
+    def key(queue_id, metric: str) -> str:
+        return make_key('metrics', queue_id, metric)
+
+    @staticmethod
+    def bucket(at: Optional[datetime] = None) -> int:
+        seconds = at.timestamp() if at else time.time()
+        return int(seconds // BUCKET_SECONDS)
+
+    # ------------------------------------------------------------------
+    # Écriture
+    # ------------------------------------------------------------------
+
+    def record(self, queue_id, metric: str, value: float = 1.0, at: Optional[datetime] = None) -> None:
+        self.record_many(queue_id, [(metric, value)], at)
+
+    def record_many(self, queue_id, observations: Iterable, at: Optional[datetime] = None) -> None:
+        """Enregistre plusieurs (mesure, valeur) d'une file en un aller-retour"""
+        self._write({
+            (queue_id, metric): (1, float(value), float(value) ** 2)
+            for metric, value in observations
+        }, at)
+
+    def _write(self, increments: Dict, at: Optional[datetime] = None) -> None:
+        """Ajoute {(file, mesure): (n, somme, somme des carrés)} au seau courant"""
+        conn = self.connection
+        if conn is None or not increments:
+            return
+        bucket = self.bucket(at)
+        try:
+            pipe = conn.pipeline(transaction=False)
+            for (queue_id, metric), (count, total, squares) in increments.items():
+                pipe.eval(
+                    RECORD_SCRIPT, 1, self.key(queue_id, metric),
+                    bucket % SLOTS, bucket, count, total, squares,
+                    WINDOW_SECONDS + BUCKET_SECONDS
+                )
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Métriques non accumulées : {e}")
+
+    def record_transition(self, ticket: Ticket, old_status, new_status) -> None:
+        """Traduit une transition de ticket en observations"""
+        observations = []
+        if old_status is None:
+            observations.append(('arrival', 1))
+        if old_status == Ticket.Status.WAITING and new_status != Ticket.Status.WAITING:
+            observations.append(('dequeue', 1))
+            left_at = ticket.called_time or ticket.service_start_time
+            if left_at:
+                observations.append(('wait', (left_at - ticket.check_in_time).total_seconds() / 60))
+        if (
+            new_status == Ticket.Status.COMPLETED
+            and ticket.service_start_time and ticket.service_end_time
+        ):
+            observations.append((
+                'service',
+                (ticket.service_end_time - ticket.service_start_time).total_seconds() / 60
+            ))
+        if new_status in (Ticket.Status.CANCELLED, Ticket.Status.NO_SHOW):
+            observations.append(('abandon', 1))
+        if observations:
+            self.record_many(ticket.queue_id, observations)
+
+    def record_counts(self, counts: Dict, metric: str) -> None:
+        """Ajoute des événements groupés par file (transitions de masse)"""
+        # n événements de valeur 1 : n, somme n, somme des carrés n
+        self._write({
+            (queue_id, metric): (count, float(count), float(count))
+            for queue_id, count in counts.items() if count
+        })
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def windows(self, queue_ids: Iterable, now: Optional[datetime] = None) -> Dict:
+        """Seaux des files demandées, en un pipeline Redis (ou une requête en repli)"""
+        queue_ids = list(queue_ids)
+        conn = self.connection
+        if conn is not None:
+            try:
+                return self._read_redis(conn, queue_ids, now)
+            except RedisError as e:
+                logger.warning(f"Lecture des métriques accumulées impossible : {e}")
+        return self.from_database(queue_ids, now)
+
+    def _read_redis(self, conn, queue_ids, now) -> Dict:
+        current = self.bucket(now)
+        oldest = current - SLOTS + 1
+        pipe = conn.pipeline(transaction=False)
+        for queue_id in queue_ids:
+            for metric in METRICS:
+                pipe.hgetall(self.key(queue_id, metric))
+        replies = iter(pipe.execute())
+
+        result = {}
+        for queue_id in queue_ids:
+            windows = QueueWindows.empty()
+            for row in range(len(METRICS)):
+                for raw in next(replies).values():
+                    stamp, n, s, q = raw.decode().split(':')
+                    stamp = int(stamp)
+                    if oldest <= stamp <= current:
+                        column = stamp - oldest
+                        windows.counts[row, column] = float(n)
+                        windows.sums[row, column] = float(s)
+                        windows.squares[row, column] = float(q)
+            result[queue_id] = windows
+        return result
+
+    def from_database(self, queue_ids, now: Optional[datetime] = None) -> Dict:
+        """Reconstruit les seaux depuis les tickets des dernières 24h (une requête)"""
+        now = now or timezone.now()
+        since = now - timedelta(seconds=WINDOW_SECONDS)
+        current = self.bucket(now)
+        oldest = current - SLOTS + 1
+        result = {queue_id: QueueWindows.empty() for queue_id in queue_ids}
+
+        def add(queue_id, metric, at, value=1.0):
+            if at is None:
+                return
+            column = self.bucket(at) - oldest
+            if 0 <= column < SLOTS:
+                windows = result[queue_id]
+                row = METRICS.index(metric)
+                windows.counts[row, column] += 1
+                windows.sums[row, column] += value
+                windows.squares[row, column] += value * value
+
+        tickets = Ticket.objects.filter(
+            Q(check_in_time__gte=since) | Q(service_end_time__gte=since),
+            queue_id__in=queue_ids
+        ).values_list(
+            'queue_id', 'status', 'check_in_time', 'called_time',
+            'service_start_time', 'service_end_time'
+        )
+        for queue_id, status, check_in, called, started, ended in tickets.iterator():
+            add(queue_id, 'arrival', check_in)
+            left_at = called or started
+            if left_at:
+                add(queue_id, 'dequeue', left_at)
+                add(queue_id, 'wait', left_at, (left_at - check_in).total_seconds() / 60)
+            if status == Ticket.Status.COMPLETED and started and ended:
+                add(queue_id, 'service', ended, (ended - started).total_seconds() / 60)
+            elif status == Ticket.Status.CANCELLED and not left_at:
+                # Annulé pendant l'attente (sinon déjà sorti de la file à l'appel)
+                add(queue_id, 'dequeue', ended)
+            if status in (Ticket.Status.CANCELLED, Ticket.Status.NO_SHOW):
+                add(queue_id, 'abandon', ended)
+        return result
+
+
+metric_accumulator = MetricAccumulator()
@@ -0,0 +1,202 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from django.db.models import Avg, Count, F, FloatField, Func, StdDev
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, TruncWeek
+from django.utils import timezone
+
+from apps.ai.models import QueueSeasonalBaseline
+from apps.queues.models import Queue, TicketHistory
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_WEEK = QueueSeasonalBaseline.HOURS_PER_WEEK
+
+# Profondeur d'historique utilisée pour les profils
+DEFAULT_WEEKS = 8
+
+# Écart-type minimal des arrivées : bruit de Poisson, jamais sous 1 arrivée
+MIN_ARRIVALS_STD = 1.0
+
+
+class EpochMinutes(Func):
+    """Durée (intervalle Postgres) convertie en minutes"""
+    template = 'EXTRACT(EPOCH FROM %(expressions)s) / 60.0'
+    output_field = FloatField()
+
+
+def hour_of_week(at: datetime) -> int:
+    """Créneau horaire de la semaine dans le fuseau courant (lundi 0h = 0)"""
+    local = timezone.localtime(at)
+    return local.weekday() * 24 + local.hour
+
+
+def trailing_hour_slot(now: datetime) -> int:
+    """
+    Créneau auquel comparer des métriques sur l'heure glissante
+    ]now - 1h, now] : celui de son milieu, qui couvre l'essentiel de la
+    fenêtre (le créneau de now n'en contient parfois que quelques minutes).
+    """
+    return hour_of_week(now - timedelta(minutes=30))
+
+
+def baseline_window(now: datetime, weeks: int) -> Tuple[datetime, datetime]:
+    """
+    Les `weeks` semaines calendaires complètes précédant now : du lundi 0h
+    local, `weeks` semaines plus tôt, au lundi 0h de la semaine en cours
+    (exclue, elle est incomplète).
+    """
+    local = timezone.localtime(now)
+    until = (local - timedelta(days=local.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    return until - timedelta(weeks=weeks), until
+
+
+@dataclass
+class SeasonalProfile:
+    """Profil d'une file, comparé en O(1) au créneau courant"""
+    arrivals_mean: np.ndarray
+    arrivals_std: np.ndarray
+    wait_mean: np.ndarray
+    wait_std: np.ndarray
+    service_mean: np.ndarray
+    service_std: np.ndarray
+
+    @classmethod
+    def from_baseline(cls, baseline: QueueSeasonalBaseline) -> 'SeasonalProfile':
+        return cls(**{
+            field: np.asarray(getattr(baseline, field), dtype=float)
+            for field in cls.__dataclass_fields__
+        })
+
+    def is_peak(self, slot: int) -> bool:
+        """Créneau dans le quart le plus chargé des heures ouvertes de la file"""
+        open_hours = self.arrivals_mean[self.arrivals_mean > 0]
+        if not len(open_hours):
+            return False
+        return bool(self.arrivals_mean[slot] > np.percentile(open_hours, 75))
+
+    def deviations(self, slot: int, arrivals: float, wait: Optional[float], service: Optional[float]) -> Dict:
+        """z-scores des valeurs observées par rapport au créneau attendu"""
+        result = {}
+        arrivals_std = max(
+            self.arrivals_std[slot],
+            np.sqrt(self.arrivals_mean[slot]),
+            MIN_ARRIVALS_STD
+        )
+        result['arrivals'] = {
+            'observed': arrivals,
+            'expected': float(self.arrivals_mean[slot]),
+            'z': float((arrivals - self.arrivals_mean[slot]) / arrivals_std),
+        }
+        for name, observed, mean, std in (
+            ('wait_time', wait, self.wait_mean, self.wait_std),
+            ('service_time', service, self.service_mean, self.service_std),
+        ):
+            if observed is None or std[slot] <= 0:
+                continue
+            result[name] = {
+                'observed': observed,
+                'expected': float(mean[slot]),
+                'z': float((observed - mean[slot]) / std[slot]),
+            }
+        return result
+
+
+def compute_baselines(queue_ids: Optional[Iterable] = None, weeks: int = DEFAULT_WEEKS, now: Optional[datetime] = None) -> int:
+    """
+    Recalcule les profils saisonniers en deux requêtes groupées
+    (arrivées par semaine et créneau ; attente et service par créneau)
+    et les enregistre par upsert. Retourne le nombre de files traitées.
+    """
+    now = now or timezone.now()
+    since, until = baseline_window(now, weeks)
+    if queue_ids is None:
+        queue_ids = Queue.objects.values_list('id', flat=True)
+    queue_ids = list(queue_ids)
+    if not queue_ids:
+        return 0
+    row = {queue_id: index for index, queue_id in enumerate(queue_ids)}
+    # Historique complet : les tickets de plus de 30 jours sont archivés
+    tickets = TicketHistory.objects.filter(
+        queue_id__in=queue_ids,
+        check_in_time__gte=since,
+        check_in_time__lt=until
+    ).annotate(
+        weekday=ExtractIsoWeekDay('check_in_time'),
+        hour=ExtractHour('check_in_time'),
+    )
+
+    # Arrivées par (file, créneau, semaine de la fenêtre)
+    weekly = np.zeros((len(queue_ids), HOURS_PER_WEEK, weeks))
+    for values in tickets.annotate(week=TruncWeek('check_in_time')).values(
+        'queue_id', 'weekday', 'hour', 'week'
+    ).annotate(count=Count('id')).order_by():
+        week = round((values['week'] - since) / timedelta(weeks=1))
+        if not 0 <= week < weeks:
+            continue
+        slot = (values['weekday'] - 1) * 24 + values['hour']
+        weekly[row[values['queue_id']], slot, week] = values['count']
+    # Semaines observées par file : depuis sa première semaine avec arrivées
+    # (une file récente n'est pas diluée par les semaines d'avant son ouverture),
+    # les semaines suivantes sans arrivée comptant pour 0
+    active = weekly.sum(axis=1) > 0
+    first_week = np.where(active.any(axis=1), active.argmax(axis=1), weeks)
+    observed_weeks = weeks - first_week
+    observed = np.arange(weeks)[None, None, :] >= first_week[:, None, None]
+
+    # Attente et service moyens par (file, créneau)
+    shape = (len(queue_ids), HOURS_PER_WEEK)
+    wait_mean, wait_std = np.zeros(shape), np.zeros(shape)
+    service_mean, service_std = np.zeros(shape), np.zeros(shape)
+    wait = EpochMinutes(F('called_time') - F('check_in_time'))
+    service = EpochMinutes(F('service_end_time') - F('service_start_time'))
+    for values in tickets.values('queue_id', 'weekday', 'hour').annotate(
+        wait_avg=Avg(wait),
+        wait_sd=StdDev(wait),
+        service_avg=Avg(service),
+        service_sd=StdDev(service),
+    ).order_by():
+        index = (row[values['queue_id']], (values['weekday'] - 1) * 24 + values['hour'])
+        wait_mean[index] = values['wait_avg'] or 0.0
+        wait_std[index] = values['wait_sd'] or 0.0
+        service_mean[index] = values['service_avg'] or 0.0
+        service_std[index] = values['service_sd'] or 0.0
+
+    divisor = np.maximum(observed_weeks, 1)[:, None]
+    arrivals_mean = weekly.sum(axis=2) / divisor
+    arrivals_std = np.sqrt(
+        np.where(observed, (weekly - arrivals_mean[:, :, None]) ** 2, 0.0).sum(axis=2) / divisor
+    )
+    QueueSeasonalBaseline.objects.bulk_create(
+        [
+            QueueSeasonalBaseline(
+                queue_id=queue_id,
+                arrivals_mean=arrivals_mean[index].tolist(),
+                arrivals_std=arrivals_std[index].tolist(),
+                wait_mean=wait_mean[index].tolist(),
+                wait_std=wait_std[index].tolist(),
+                service_mean=service_mean[index].tolist(),
+                service_std=service_std[index].tolist(),
+                weeks=int(observed_weeks[index]),
+                computed_at=now,
+            )
+            for queue_id, index in row.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['queue'],
+        update_fields=[
+            'arrivals_mean', 'arrivals_std', 'wait_mean', 'wait_std',
+            'service_mean', 'service_std', 'weeks', 'computed_at',
+        ],
+        batch_size=500,
+    )
+    logger.info(f"Profils saisonniers recalculés pour {len(queue_ids)} file(s)")
+    return len(queue_ids)
+
+
+def load_profile(queue_id) -> Optional[SeasonalProfile]:
+    baseline = QueueSeasonalBaseline.objects.filter(queue_id=queue_id).first()
+    return SeasonalProfile.from_baseline(baseline) if baseline else None
@@ -2,12 +2,34 @@ import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 
+from django.utils import timezone
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 import pandas as pd
 
-from apps.ai.models import MLModel, QueueAnomaly
-from apps.queues.models import Queue
+from apps.ai.models import QueueAnomaly
+from apps.ai.ml.registry import model_registry
+from apps.ai.ml.anomaly.accumulator import (
+    BUCKET_SECONDS, METRICS, QueueWindows, metric_accumulator
+)
+from apps.ai.ml.anomaly.baselines import SeasonalProfile, hour_of_week, load_profile, trailing_hour_slot
+from apps.ai.ml.anomaly.lifecycle import Finding, anomaly_lifecycle
+from apps.ai.ml.wait_time.features import masked_slopes
+from apps.queues.models import Queue, Ticket
+
+# Fenêtre des valeurs « actuelles » (attente, service)
+CURRENT_WINDOW_MINUTES = 15
+
+# Types évalués à chaque passe de detect()
+DETECTOR_TYPES = ('wait_time', 'abandonment', 'service_time', 'pattern')
+
+# Écart au profil saisonnier à partir duquel un créneau est anormal
+PATTERN_Z_THRESHOLDS = (
+    ('critical', 4.0),
+    ('high', 3.5),
+    ('medium', 3.0),
+    ('low', 2.5),
+)
 
 
 class AnomalyDetector:
@@ -16,25 +38,27 @@ class AnomalyDetector:
     def __init__(self, queue_id: str):
         self.queue_id = queue_id
         self.isolation_forest = None
+        self.isolation_forest_estimator = None
         self.scaler = StandardScaler()
+        self._profile = None
+        self._profile_loaded = False
         self.load_models()
 
     def load_models(self):
-        """Charge ou crée les modèles de détection"""
-        try:
-            self.isolation_forest = MLModel.objects.get(
-                type='anomaly',
-                name='isolation_forest',
-                status='active'
-            )
-        except MLModel.DoesNotExist:
-            # Le modèle sera créé lors du premier entraînement
-            pass
+        """Récupère le modèle de détection actif depuis le registre du processus"""
+        loaded = model_registry.get('anomaly', 'isolation_forest')
+        if loaded is not None:
+            self.isolation_forest = loaded.record
+            self.isolation_forest_estimator = loaded.estimator
+        # Sinon, le modèle sera créé lors du premier entraînement
 
-    def detect(self) -> List[Dict]:
-        """Détecte les anomalies dans la file d'attente"""
+    def detect(self, windows: Optional[QueueWindows] = None) -> List[Dict]:
+        """
+        Détecte les anomalies dans la file d'attente ; chaque constat crée,
+        met à jour ou laisse inchangée l'anomalie ouverte correspondante
+        """
         queue = Queue.objects.get(id=self.queue_id)
-        current_metrics = self._get_current_metrics(queue)
+        current_metrics = self._get_current_metrics(queue, windows)
         
         # Détection des anomalies
         anomalies = []
@@ -67,39 +91,44 @@ class AnomalyDetector:
         )
         anomalies.extend(pattern_anomalies)
         
-        return anomalies
+        # Une anomalie ouverte par (file, type), mise à jour sur place
+        return anomaly_lifecycle.sync([queue.id], anomalies, DETECTOR_TYPES)
+
+    def _get_current_metrics(self, queue: Queue, windows: Optional[QueueWindows] = None) -> Dict:
+        """
+        Récupère les métriques actuelles de la file depuis l'accumulateur
+        glissant (lecture en O(seaux), sans parcourir les tickets)
+        """
+        now = timezone.localtime()
+        if windows is None:
+            windows = metric_accumulator.windows([queue.id])[queue.id]
+
+        wait_1h = windows.stats('wait', 60)
+        wait_24h = windows.stats('wait', 24 * 60)
+        service_1h = windows.stats('service', 60)
+        service_24h = windows.stats('service', 24 * 60)
 
-    def _get_current_metrics(self, queue: Queue) -> Dict:
-        """Récupère les métriques actuelles de la file"""
-        now = datetime.now()
-        
         metrics = {
             # Métriques de base
-            'current_length': queue.get_current_length(),
-            'current_wait_time': queue.get_current_wait_time(),
-            'current_service_time': queue.get_current_service_time(),
+            'current_length': Ticket.objects.filter(
+                queue=queue,
+                status=Ticket.Status.WAITING
+            ).count(),
+            'current_wait_time': windows.stats('wait', CURRENT_WINDOW_MINUTES).mean,
+            'current_service_time': windows.stats('service', CURRENT_WINDOW_MINUTES).mean,
             
             # Métriques sur la dernière heure
-            'avg_wait_time_1h': queue.get_average_wait_time(
-                time_window=timedelta(hours=1)
-            ),
-            'avg_service_time_1h': queue.get_average_service_time(
-                time_window=timedelta(hours=1)
-            ),
-            'abandonment_rate_1h': queue.get_abandonment_rate(
-                time_window=timedelta(hours=1)
-            ),
+            'avg_wait_time_1h': wait_1h.mean,
+            'avg_service_time_1h': service_1h.mean,
+            'abandonment_rate_1h': windows.rate('abandon', 'arrival', 60),
+            'arrivals_1h': windows.stats('arrival', 60).count,
             
             # Métriques sur les dernières 24h
-            'avg_wait_time_24h': queue.get_average_wait_time(
-                time_window=timedelta(hours=24)
-            ),
-            'avg_service_time_24h': queue.get_average_service_time(
-                time_window=timedelta(hours=24)
-            ),
-            'abandonment_rate_24h': queue.get_abandonment_rate(
-                time_window=timedelta(hours=24)
-            ),
+            'avg_wait_time_24h': wait_24h.mean,
+            'std_wait_time_24h': wait_24h.std,
+            'avg_service_time_24h': service_24h.mean,
+            'std_service_time_24h': service_24h.std,
+            'abandonment_rate_24h': windows.rate('abandon', 'arrival', 24 * 60),
             
             # Contexte temporel
             'hour': now.hour,
@@ -108,38 +137,35 @@ class AnomalyDetector:
         }
         
         # Tendances
-        metrics.update(self._calculate_trends(queue))
+        metrics.update(self._calculate_trends(queue, windows))
         
         return metrics
 
-    def _calculate_trends(self, queue: Queue) -> Dict:
-        """Calcule les tendances des différentes métriques"""
-        # Récupère les données historiques
-        historical_data = queue.get_historical_metrics(
-            time_window=timedelta(hours=24)
+    def _calculate_trends(self, queue: Queue, windows: QueueWindows) -> Dict:
+        """Calcule les tendances horaires des différentes métriques sur 24h"""
+        day = 24 * 60
+        arrivals = windows.counts[METRICS.index('arrival')]
+        abandons = windows.counts[METRICS.index('abandon')]
+        group = 3600 // BUCKET_SECONDS
+        hourly_arrivals = arrivals.reshape(-1, group).sum(axis=1)
+        hourly_rates = np.divide(
+            abandons.reshape(-1, group).sum(axis=1),
+            hourly_arrivals,
+            out=np.full(hourly_arrivals.shape, np.nan),
+            where=hourly_arrivals > 0
         )
-        
-        trends = {}
-        metrics = [
-            'wait_times',
-            'service_times',
-            'queue_lengths',
-            'abandonment_rates'
-        ]
-        
-        for metric in metrics:
-            if metric in historical_data:
-                trends[f'{metric}_trend'] = self._calculate_trend(
-                    historical_data[metric]
-                )
-        
-        return trends
+        return {
+            'wait_times_trend': windows.stats('wait', day).trend,
+            'service_times_trend': windows.stats('service', day).trend,
+            'queue_lengths_trend': windows.length_trend(day),
+            'abandonment_rates_trend': float(masked_slopes(hourly_rates[None, :])[0]),
+        }
 
     def _detect_wait_time_anomalies(
         self,
         queue: Queue,
         current_metrics: Dict
-    ) -> List[Dict]:
+    ) -> List[Finding]:
         """Détecte les anomalies liées aux temps d'attente"""
         anomalies = []
         
@@ -165,9 +191,8 @@ class AnomalyDetector:
                     severity = level
                     break
             
-            # Crée l'anomalie
-            anomaly = QueueAnomaly.objects.create(
-                queue=queue,
+            anomalies.append(Finding(
+                queue_id=queue.id,
                 model=self.isolation_forest,
                 type='wait_time',
                 severity=severity,
@@ -183,15 +208,7 @@ class AnomalyDetector:
                     f"Moyenne: {current_metrics['avg_wait_time_24h']:.1f}min "
                     f"(+{(wait_time_ratio-1)*100:.1f}%)"
                 )
-            )
-            
-            anomalies.append({
-                'id': anomaly.id,
-                'type': 'wait_time',
-                'severity': severity,
-                'metrics': anomaly.metrics,
-                'description': anomaly.description
-            })
+            ))
         
         return anomalies
 
@@ -199,7 +216,7 @@ class AnomalyDetector:
         self,
         queue: Queue,
         current_metrics: Dict
-    ) -> List[Dict]:
+    ) -> List[Finding]:
         """Détecte les anomalies liées aux taux d'abandon"""
         anomalies = []
         
@@ -225,9 +242,8 @@ class AnomalyDetector:
                     severity = level
                     break
             
-            # Crée l'anomalie
-            anomaly = QueueAnomaly.objects.create(
-                queue=queue,
+            anomalies.append(Finding(
+                queue_id=queue.id,
                 model=self.isolation_forest,
                 type='abandonment',
                 severity=severity,
@@ -243,15 +259,7 @@ class AnomalyDetector:
                     f"Moyenne: {current_metrics['abandonment_rate_24h']:.1%} "
                     f"(+{(abandonment_ratio-1)*100:.1f}%)"
                 )
-            )
-            
-            anomalies.append({
-                'id': anomaly.id,
-                'type': 'abandonment',
-                'severity': severity,
-                'metrics': anomaly.metrics,
-                'description': anomaly.description
-            })
+            ))
         
         return anomalies
 
@@ -259,7 +267,7 @@ class AnomalyDetector:
         self,
         queue: Queue,
         current_metrics: Dict
-    ) -> List[Dict]:
+    ) -> List[Finding]:
         """Détecte les anomalies liées aux temps de service"""
         anomalies = []
         
@@ -285,9 +293,8 @@ class AnomalyDetector:
                     severity = level
                     break
             
-            # Crée l'anomalie
-            anomaly = QueueAnomaly.objects.create(
-                queue=queue,
+            anomalies.append(Finding(
+                queue_id=queue.id,
                 model=self.isolation_forest,
                 type='service_time',
                 severity=severity,
@@ -303,15 +310,7 @@ class AnomalyDetector:
                     f"Moyenne: {current_metrics['avg_service_time_24h']:.1f}min "
                     f"(+{(service_time_ratio-1)*100:.1f}%)"
                 )
-            )
-            
-            anomalies.append({
-                'id': anomaly.id,
-                'type': 'service_time',
-                'severity': severity,
-                'metrics': anomaly.metrics,
-                'description': anomaly.description
-            })
+            ))
         
         return anomalies
 
@@ -319,10 +318,56 @@ class AnomalyDetector:
         self,
         queue: Queue,
         current_metrics: Dict
-    ) -> List[Dict]:
-        """Détecte les anomalies liées aux motifs"""
-        # TODO: Implémenter la détection des anomalies de motifs
-        return []
+    ) -> List[Finding]:
+        """
+        Détecte les écarts au profil saisonnier de la file : arrivées,
+        attente et service de la dernière heure comparés à la moyenne du
+        même créneau (jour de semaine, heure) des semaines précédentes.
+        """
+        profile = self._seasonal_profile()
+        if profile is None:
+            return []
+
+        slot = trailing_hour_slot(timezone.now())
+        deviations = profile.deviations(
+            slot,
+            arrivals=current_metrics['arrivals_1h'],
+            wait=current_metrics['avg_wait_time_1h'] or None,
+            service=current_metrics['avg_service_time_1h'] or None
+        )
+        deviating = {
+            name: values for name, values in deviations.items()
+            if abs(values['z']) >= PATTERN_Z_THRESHOLDS[-1][1]
+        }
+        if not deviating:
+            return []
+
+        score = max(abs(values['z']) for values in deviating.values())
+        severity = next(level for level, threshold in PATTERN_Z_THRESHOLDS if score >= threshold)
+        return [Finding(
+            queue_id=queue.id,
+            model=self.isolation_forest,
+            type='pattern',
+            severity=severity,
+            metrics={
+                'hour_of_week': slot,
+                'score': score,
+                'deviations': deviating,
+            },
+            description=(
+                "Écart au profil habituel du créneau : " + ", ".join(
+                    f"{name} {values['observed']:.1f} (attendu {values['expected']:.1f}, z={values['z']:+.1f})"
+                    for name, values in deviating.items()
+                )
+            )
+        )]
+
+    def _seasonal_profile(self) -> Optional[SeasonalProfile]:
+        """Profil saisonnier de la file, lu une fois par détecteur"""
+        if not self._profile_loaded:
+            self._profile = load_profile(self.queue_id)
+            self._profile_loaded = True
+        return self._profile
 
     def investigate(self, anomaly: QueueAnomaly) -> Dict:
         """Lance une investigation approfondie sur une anomalie"""
@@ -331,6 +376,7 @@ class AnomalyDetector:
         # Met à jour le statut
         anomaly.status = 'investigating'
         anomaly.save()
+        anomaly_lifecycle.forget(anomaly.queue_id)
         
         # Récupère le contexte étendu
         context = self._gather_investigation_context(queue, anomaly)
@@ -412,13 +458,13 @@ class AnomalyDetector:
         """Analyse les causes potentielles de l'anomalie"""
         causes = []
         
-        if anomaly.type == 'wait_time':
+        if anomaly.base_type == 'wait_time':
             causes.extend(self._analyze_wait_time_causes(anomaly, context))
-        elif anomaly.type == 'abandonment':
+        elif anomaly.base_type == 'abandonment':
             causes.extend(self._analyze_abandonment_causes(anomaly, context))
-        elif anomaly.type == 'service_time':
+        elif anomaly.base_type == 'service_time':
             causes.extend(self._analyze_service_time_causes(anomaly, context))
-        elif anomaly.type == 'pattern':
+        elif anomaly.base_type == 'pattern':
             causes.extend(self._analyze_pattern_causes(anomaly, context))
         
         return sorted(
@@ -668,6 +714,7 @@ class AnomalyDetector:
         }
         
         anomaly.save()
+        anomaly_lifecycle.forget(anomaly.queue_id)
         
         return {
             'anomaly_id': anomaly.id,
@@ -676,7 +723,13 @@ class AnomalyDetector:
         }
 
     def _is_peak_time(self, time: datetime) -> bool:
-        """Détermine si c'est une période de pointe"""
+        """
+        Détermine si c'est une période de pointe : créneau parmi les plus
+        chargés du profil saisonnier de la file, sinon plages par défaut
+        """
+        profile = self._seasonal_profile()
+        if profile is not None:
+            return profile.is_peak(hour_of_week(time))
         hour = time.hour
         return (
             (9 <= hour <= 11) or  # Pic du matin
@@ -0,0 +1,319 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from apps.ai.models import MLModel, QueueAnomaly
+from apps.queues.services.store import get_redis, make_key
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = QueueAnomaly.OPEN_STATUSES
+
+SEVERITY_RANK = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+
+# Intervalle minimal entre deux réécritures d'une anomalie ouverte (hors escalade)
+REFRESH_SECONDS = 5 * 60
+
+# Passes consécutives sans la condition avant clôture automatique
+CLEAR_AFTER_PASSES = 3
+
+# Durée de vie du cache des anomalies ouvertes, relu ensuite depuis la base
+CACHE_TTL = 3600
+
+# Champ marquant un cache complet (une file sans anomalie ouverte est aussi mise en cache)
+LOADED = '_loaded'
+
+
+@dataclass
+class Finding:
+    """Condition anormale constatée lors d'une passe de détection"""
+    queue_id: object
+    type: str
+    severity: str
+    metrics: Dict
+    description: str
+    model: Optional[MLModel] = None
+
+
+@dataclass
+class OpenAnomaly:
+    """Entrée du cache : anomalie ouverte d'un couple (file, type)"""
+    id: int
+    severity: str
+    status: str
+    written_at: float
+    misses: int = 0
+
+    def dump(self) -> str:
+        return f"{self.id}|{self.severity}|{self.status}|{self.written_at}|{self.misses}"
+
+    @classmethod
+    def parse(cls, raw) -> 'OpenAnomaly':
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        anomaly_id, severity, status, written_at, misses = raw.split('|')
+        return cls(int(anomaly_id), severity, status, float(written_at), int(misses))
+
+
+class AnomalyLifecycle:
+    """
+    Cycle de vie des anomalies : une seule anomalie ouverte par
+    (file, type), mise à jour sur place. Une sévérité plus haute est
+    écrite immédiatement, les autres constats au plus une fois par
+    REFRESH_SECONDS ; une condition absente CLEAR_AFTER_PASSES passes
+    de suite clôt l'anomalie. Les anomalies ouvertes sont mises en
+    cache dans Redis (en processus sans Redis) pour que les passes
+    sans changement n'écrivent rien.
+    """
+
+    def __init__(self, connection=None):
+        self._connection = connection
+        self._local: Dict = {}
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = get_redis()
+        return self._connection
+
+    @staticmethod
+    def key(queue_id) -> str:
+        return make_key('anomalies', queue_id)
+
+    # ------------------------------------------------------------------
+    # Cache des anomalies ouvertes
+    # ------------------------------------------------------------------
+
+    def open_anomalies(self, queue_ids: Iterable) -> Dict:
+        """{file: {type: OpenAnomaly}} des files demandées ; les absentes du cache sont lues en une requête"""
+        queue_ids = list(queue_ids)
+        result = {}
+        conn = self.connection
+        if conn is not None:
+            try:
+                pipe = conn.pipeline(transaction=False)
+                for queue_id in queue_ids:
+                    pipe.hgetall(self.key(queue_id))
+                for queue_id, fields in zip(queue_ids, pipe.execute()):
+                    fields = {
+                        (name.decode() if isinstance(name, bytes) else name): raw
+                        for name, raw in fields.items()
+                    }
+                    if LOADED in fields:
+                        result[queue_id] = {
+                            name: OpenAnomaly.parse(raw)
+                            for name, raw in fields.items() if name != LOADED
+                        }
+            except RedisError as e:
+                logger.warning(f"Cache des anomalies indisponible : {e}")
+        else:
+            deadline = time.monotonic() - CACHE_TTL
+            for queue_id in queue_ids:
+                cached = self._local.get(queue_id)
+                if cached and cached[0] > deadline:
+                    result[queue_id] = cached[1]
+
+        missing = [queue_id for queue_id in queue_ids if queue_id not in result]
+        if missing:
+            loaded = self._load(missing)
+            self._cache(loaded)
+            result.update(loaded)
+        return result
+
+    @staticmethod
+    def _load(queue_ids: List) -> Dict:
+        result = {queue_id: {} for queue_id in queue_ids}
+        rows = QueueAnomaly.objects.filter(
+            queue_id__in=queue_ids,
+            status__in=OPEN_STATUSES
+        ).order_by('created_at').values_list('id', 'queue_id', 'type', 'severity', 'status', 'updated_at')
+        # En cas de doublons hérités, la plus récente fait foi
+        for anomaly_id, queue_id, anomaly_type, severity, status, updated_at in rows:
+            result[queue_id][anomaly_type] = OpenAnomaly(
+                anomaly_id, severity, status, updated_at.timestamp()
+            )
+        return result
+
+    def _cache(self, state: Dict) -> None:
+        """Remplace l'entrée de cache des files fournies"""
+        conn = self.connection
+        if conn is None:
+            now = time.monotonic()
+            for queue_id, entries in state.items():
+                self._local[queue_id] = (now, entries)
+            return
+        try:
+            pipe = conn.pipeline(transaction=False)
+            for queue_id, entries in state.items():
+                key = self.key(queue_id)
+                pipe.delete(key)
+                pipe.hset(key, mapping={
+                    LOADED: 1,
+                    **{anomaly_type: entry.dump() for anomaly_type, entry in entries.items()}
+                })
+                pipe.expire(key, CACHE_TTL)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Cache des anomalies non mis à jour : {e}")
+
+    def forget(self, queue_id) -> None:
+        """Invalide le cache d'une file (changement de statut hors du moteur)"""
+        self._local.pop(queue_id, None)
+        conn = self.connection
+        if conn is not None:
+            try:
+                conn.delete(self.key(queue_id))
+            except RedisError as e:
+                logger.warning(f"Cache des anomalies non invalidé : {e}")
+
+    # ------------------------------------------------------------------
+    # Passe de détection
+    # ------------------------------------------------------------------
+
+    def sync(self, queue_ids: Iterable, findings: Iterable[Finding], types: Iterable[str]) -> List[Dict]:
+        """
+        Applique le résultat d'une passe de détection sur queue_ids.
+        `types` liste les types évalués par la passe : pour ces types,
+        une anomalie ouverte sans constat correspondant compte une passe
+        sans la condition. Retourne un résumé par constat.
+        """
+        queue_ids = list(queue_ids)
+        types = set(types)
+        now = time.time()
+        state = self.open_anomalies(queue_ids)
+
+        to_create, to_update, results = [], [], []
+        seen = set()
+        for finding in findings:
+            if (finding.queue_id, finding.type) in seen:
+                # Un seul constat par (file, type) et par passe
+                continue
+            seen.add((finding.queue_id, finding.type))
+            current = state.setdefault(finding.queue_id, {}).get(finding.type)
+            if current is None:
+                to_create.append(finding)
+                continue
+            current.misses = 0
+            if SEVERITY_RANK[finding.severity] > SEVERITY_RANK[current.severity]:
+                to_update.append((finding, current, 'escalated'))
+            elif now - current.written_at >= REFRESH_SECONDS:
+                to_update.append((finding, current, 'updated'))
+            else:
+                results.append(self._summary(current.id, finding, current.severity, 'unchanged'))
+
+        to_close = []
+        for queue_id in queue_ids:
+            for anomaly_type, current in list(state[queue_id].items()):
+                if anomaly_type not in types or (queue_id, anomaly_type) in seen:
+                    continue
+                current.misses += 1
+                # Une anomalie en investigation n'est close que manuellement
+                if current.misses >= CLEAR_AFTER_PASSES and current.status == 'detected':
+                    to_close.append((queue_id, current))
+                    del state[queue_id][anomaly_type]
+
+        with transaction.atomic():
+            for finding, current, action in to_update:
+                # La sévérité ne redescend pas tant que l'anomalie est ouverte
+                severity = finding.severity if action == 'escalated' else current.severity
+                updated = QueueAnomaly.objects.filter(
+                    pk=current.id,
+                    status__in=OPEN_STATUSES
+                ).update(
+                    severity=severity,
+                    metrics=finding.metrics,
+                    description=finding.description,
+                    updated_at=timezone.now()
+                )
+                if not updated:
+                    # Close entre-temps hors du moteur : nouvelle occurrence
+                    to_create.append(finding)
+                    continue
+                current.severity = severity
+                current.written_at = now
+                results.append(self._summary(current.id, finding, severity, action))
+
+            for finding, current, created in self._create(to_create, now):
+                state[finding.queue_id][finding.type] = current
+                action = 'created' if created else 'unchanged'
+                results.append(self._summary(current.id, finding, current.severity, action))
+
+            closed = 0
+            if to_close:
+                closed = QueueAnomaly.objects.filter(
+                    pk__in=[current.id for _, current in to_close],
+                    status='detected'
+                ).update(
+                    status='resolved',
+                    resolution={
+                        'resolution_time': timezone.now().isoformat(),
+                        'resolution_type': 'auto',
+                        'actions_taken': [],
+                        'effectiveness': None,
+                        'notes': f"Condition absente depuis {CLEAR_AFTER_PASSES} passes"
+                    },
+                    updated_at=timezone.now()
+                )
+
+        # Les compteurs de passes sont conservés même sans écriture en base ;
+        # une clôture refusée (statut changé entre-temps) force une relecture
+        stale = {queue_id for queue_id, _ in to_close} if closed < len(to_close) else set()
+        transaction.on_commit(lambda: self._cache({
+            queue_id: state[queue_id] for queue_id in queue_ids if queue_id not in stale
+        }))
+        for queue_id in stale:
+            transaction.on_commit(lambda queue_id=queue_id: self.forget(queue_id))
+        return results
+
+    def _create(self, findings: List[Finding], now: float) -> List:
+        """
+        Crée les anomalies des constats ; un couple (file, type) ouvert
+        entre-temps par une passe concurrente (contrainte d'unicité) est
+        relu et conservé tel quel. Retourne [(constat, OpenAnomaly, créée)].
+        """
+        if not findings:
+            return []
+        try:
+            with transaction.atomic():
+                created = QueueAnomaly.objects.bulk_create([
+                    QueueAnomaly(
+                        queue_id=finding.queue_id,
+                        model=finding.model,
+                        type=finding.type,
+                        severity=finding.severity,
+                        metrics=finding.metrics,
+                        description=finding.description
+                    )
+                    for finding in findings
+                ], batch_size=1000)
+        except IntegrityError:
+            existing = self._load(list({finding.queue_id for finding in findings}))
+            fresh = [finding for finding in findings if finding.type not in existing[finding.queue_id]]
+            opened = [
+                (finding, existing[finding.queue_id][finding.type], False)
+                for finding in findings if finding.type in existing[finding.queue_id]
+            ]
+            return opened + self._create(fresh, now)
+        return [
+            (finding, OpenAnomaly(anomaly.pk, finding.severity, 'detected', now), True)
+            for finding, anomaly in zip(findings, created)
+        ]
+
+    @staticmethod
+    def _summary(anomaly_id, finding: Finding, severity: str, action: str) -> Dict:
+        return {
+            'id': anomaly_id,
+            'type': finding.type,
+            'severity': severity,
+            'metrics': finding.metrics,
+            'description': finding.description,
+            'action': action,
+        }
+
+
+anomaly_lifecycle = AnomalyLifecycle()
@@ -0,0 +1,216 @@
+import logging
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from django.db.models import Count
+
+from apps.ai.ml.anomaly.accumulator import BUCKET_SECONDS, METRICS, metric_accumulator
+from apps.ai.ml.anomaly.lifecycle import Finding, anomaly_lifecycle
+from apps.ai.models import QueueAnomaly
+from apps.queues.models import Queue, Ticket
+
+logger = logging.getLogger(__name__)
+
+# Files lues par pipeline Redis
+CHUNK_SIZE = 500
+
+# Colonnes de la matrice de métriques
+SCAN_FEATURES = [
+    'current_wait_time',
+    'avg_wait_time_24h',
+    'std_wait_time_24h',
+    'current_service_time',
+    'avg_service_time_24h',
+    'std_service_time_24h',
+    'abandonment_rate_1h',
+    'abandonment_rate_24h',
+    'arrivals_1h',
+    'current_length',
+]
+
+CURRENT_BUCKETS = max(1, 15 * 60 // BUCKET_SECONDS)
+HOUR_BUCKETS = 3600 // BUCKET_SECONDS
+
+# Observations minimales sur 24h pour qu'un z-score ait un sens
+MIN_SAMPLES = 20
+
+# Seuils de z-score par sévérité (du plus grave au moins grave)
+Z_THRESHOLDS = (
+    ('critical', 4.0),
+    ('high', 3.0),
+    ('medium', 2.5),
+    ('low', 2.0),
+)
+
+
+def severity_for(scores: np.ndarray) -> np.ndarray:
+    """Sévérité de chaque score ('' sous le seuil le plus bas)"""
+    severities = np.full(scores.shape, '', dtype=object)
+    for level, threshold in reversed(Z_THRESHOLDS):
+        severities[scores >= threshold] = level
+    return severities
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(
+        numerator, denominator,
+        out=np.zeros(np.broadcast(numerator, denominator).shape),
+        where=denominator > 0
+    )
+
+
+class FleetAnomalyScanner:
+    """
+    Analyse périodique de toutes les files actives : les métriques sont
+    lues en bloc depuis l'accumulateur, évaluées ensemble (z-scores
+    vectorisés) puis confiées au cycle de vie des anomalies
+    (création, mise à jour sur place, clôture).
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    def metric_matrix(self, queue_ids: List) -> Dict[str, np.ndarray]:
+        """Matrices (n,) de chaque métrique, plus comptes et sommes des carrés nécessaires aux z-scores"""
+        columns = {name: [] for name in SCAN_FEATURES + ['wait_count_24h', 'service_count_24h', 'arrivals_24h']}
+        wait, service = METRICS.index('wait'), METRICS.index('service')
+        arrival, abandon = METRICS.index('arrival'), METRICS.index('abandon')
+
+        for start in range(0, len(queue_ids), self.chunk_size):
+            chunk = queue_ids[start:start + self.chunk_size]
+            windows = metric_accumulator.windows(chunk)
+            counts = np.stack([windows[queue_id].counts for queue_id in chunk])
+            sums = np.stack([windows[queue_id].sums for queue_id in chunk])
+            squares = np.stack([windows[queue_id].squares for queue_id in chunk])
+
+            day_counts = counts.sum(axis=2)
+            day_sums = sums.sum(axis=2)
+            day_squares = squares.sum(axis=2)
+            day_means = _safe_divide(day_sums, day_counts)
+            day_std = np.sqrt(np.maximum(_safe_divide(day_squares, day_counts) - day_means ** 2, 0))
+            current_means = _safe_divide(
+                sums[:, :, -CURRENT_BUCKETS:].sum(axis=2),
+                counts[:, :, -CURRENT_BUCKETS:].sum(axis=2)
+            )
+            hour_counts = counts[:, :, -HOUR_BUCKETS:].sum(axis=2)
+
+            columns['current_wait_time'].append(current_means[:, wait])
+            columns['avg_wait_time_24h'].append(day_means[:, wait])
+            columns['std_wait_time_24h'].append(day_std[:, wait])
+            columns['current_service_time'].append(current_means[:, service])
+            columns['avg_service_time_24h'].append(day_means[:, service])
+            columns['std_service_time_24h'].append(day_std[:, service])
+            columns['abandonment_rate_1h'].append(_safe_divide(hour_counts[:, abandon], hour_counts[:, arrival]))
+            columns['abandonment_rate_24h'].append(_safe_divide(day_counts[:, abandon], day_counts[:, arrival]))
+            columns['arrivals_1h'].append(hour_counts[:, arrival])
+            columns['wait_count_24h'].append(day_counts[:, wait])
+            columns['service_count_24h'].append(day_counts[:, service])
+            columns['arrivals_24h'].append(day_counts[:, arrival])
+
+        matrix = {name: np.concatenate(values) if values else np.zeros(0) for name, values in columns.items()}
+
+        lengths = dict(
+            Ticket.objects.filter(
+                queue_id__in=queue_ids,
+                status=Ticket.Status.WAITING
+            ).values_list('queue_id').annotate(count=Count('id')).order_by()
+        )
+        matrix['current_length'] = np.array([lengths.get(queue_id, 0) for queue_id in queue_ids], dtype=float)
+        return matrix
+
+    def score(self, matrix: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """z-scores vectorisés par type d'anomalie (0 si données insuffisantes)"""
+        scores = {
+            'wait_time': np.where(
+                matrix['wait_count_24h'] >= MIN_SAMPLES,
+                _safe_divide(matrix['current_wait_time'] - matrix['avg_wait_time_24h'], matrix['std_wait_time_24h']),
+                0.0
+            ),
+            'service_time': np.where(
+                matrix['service_count_24h'] >= MIN_SAMPLES,
+                _safe_divide(
+                    matrix['current_service_time'] - matrix['avg_service_time_24h'],
+                    matrix['std_service_time_24h']
+                ),
+                0.0
+            ),
+        }
+        # Abandons : écart de proportion sur l'heure, écart-type binomial
+        rate = matrix['abandonment_rate_24h']
+        binomial_std = np.sqrt(_safe_divide(rate * (1 - rate), matrix['arrivals_1h']))
+        scores['abandonment'] = np.where(
+            matrix['arrivals_24h'] >= MIN_SAMPLES,
+            _safe_divide(matrix['abandonment_rate_1h'] - rate, binomial_std),
+            0.0
+        )
+        return scores
+
+    def scan(self, queue_ids: Optional[Iterable] = None) -> Dict:
+        started = time.monotonic()
+        if queue_ids is None:
+            queue_ids = Queue.objects.filter(status=Queue.Status.ACTIVE).values_list('id', flat=True)
+        queue_ids = list(queue_ids)
+        if not queue_ids:
+            return {'queues': 0, 'created': 0, 'duration': 0.0}
+
+        matrix = self.metric_matrix(queue_ids)
+        scores = self.score(matrix)
+
+        candidates = []
+        for anomaly_type, values in scores.items():
+            severities = severity_for(values)
+            for index in np.flatnonzero(severities != ''):
+                candidates.append((queue_ids[index], anomaly_type, severities[index], float(values[index]), index))
+
+        # Types propres au scanner : ses passes ne closent pas les anomalies du détecteur
+        types = [QueueAnomaly.FLEET_PREFIX + anomaly_type for anomaly_type in scores]
+        written = self._store(queue_ids, candidates, matrix, types)
+        return {
+            'queues': len(queue_ids),
+            'flagged': len(candidates),
+            **written,
+            'duration': round(time.monotonic() - started, 3),
+        }
+
+    def _store(self, queue_ids: List, candidates: List, matrix: Dict[str, np.ndarray], types) -> Dict:
+        findings = []
+        for queue_id, anomaly_type, severity, score, index in candidates:
+            metrics = {name: float(matrix[name][index]) for name in SCAN_FEATURES}
+            metrics['score'] = score
+            findings.append(Finding(
+                queue_id=queue_id,
+                type=QueueAnomaly.FLEET_PREFIX + anomaly_type,
+                severity=severity,
+                metrics=metrics,
+                description=self._describe(anomaly_type, metrics)
+            ))
+        # Une seule anomalie ouverte par (file, type), close quand la condition disparaît
+        results = anomaly_lifecycle.sync(queue_ids, findings, types)
+        return {
+            action: sum(1 for result in results if result['action'] == action)
+            for action in ('created', 'escalated', 'updated')
+        }
+
+    @staticmethod
+    def _describe(anomaly_type: str, metrics: Dict) -> str:
+        if anomaly_type == 'wait_time':
+            return (
+                f"Temps d'attente anormal détecté. "
+                f"Actuel: {metrics['current_wait_time']:.1f}min, "
+                f"Moyenne: {metrics['avg_wait_time_24h']:.1f}min (z={metrics['score']:.1f})"
+            )
+        if anomaly_type == 'service_time':
+            return (
+                f"Temps de service anormal détecté. "
+                f"Actuel: {metrics['current_service_time']:.1f}min, "
+                f"Moyenne: {metrics['avg_service_time_24h']:.1f}min (z={metrics['score']:.1f})"
+            )
+        return (
+            f"Taux d'abandon anormal détecté. "
+            f"Actuel: {metrics['abandonment_rate_1h']:.1%}, "
+            f"Moyenne: {metrics['abandonment_rate_24h']:.1%} (z={metrics['score']:.1f})"
+        )
+
+
+fleet_scanner = FleetAnomalyScanner()
@@ -0,0 +1,225 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from apps.ai.models import QueueArrivalForecast
+from apps.queues.models import Queue, TicketHistory
+
+logger = logging.getLogger(__name__)
+
+# Saisonnalité hebdomadaire en heures, et horizon stocké par file
+SEASON = 168
+HORIZON = QueueArrivalForecast.HORIZON_HOURS
+
+# Historique d'ajustement (la dernière semaine sert à l'évaluation)
+HISTORY_WEEKS = 8
+
+# Files ajustées ensemble (mémoire : CHUNK_SIZE x 20 séries de 8 semaines)
+CHUNK_SIZE = 200
+
+# Grille de paramètres du lissage, évaluée en une seule passe vectorisée
+ALPHAS = (0.05, 0.1, 0.2, 0.3, 0.5)
+GAMMAS = (0.05, 0.1, 0.2, 0.3)
+
+# Prophet n'est importé que si explicitement activé (import lent, dépendance lourde)
+PROPHET_ENABLED = getattr(settings, 'AI_FORECAST_PROPHET', False)
+
+CACHE_SECONDS = 3600
+GENERATION_KEY = 'ai:forecast:generation'
+
+HOUR = timedelta(hours=1)
+
+
+def floor_hour(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def hourly_series(queue_ids: Sequence, until: datetime, weeks: int = HISTORY_WEEKS) -> np.ndarray:
+    """
+    Arrivées par heure (len(queue_ids), weeks * 168) se terminant à `until`
+    exclu ; une requête sur l'historique (tickets vifs et archivés)
+    """
+    length = weeks * SEASON
+    start = until - length * HOUR
+    row = {queue_id: index for index, queue_id in enumerate(queue_ids)}
+    series = np.zeros((len(queue_ids), length))
+    counts = TicketHistory.objects.filter(
+        queue_id__in=queue_ids,
+        check_in_time__gte=start,
+        check_in_time__lt=until
+    ).annotate(hour=TruncHour('check_in_time')).values_list('queue_id', 'hour').annotate(
+        count=Count('id')
+    ).order_by()
+    for queue_id, hour, count in counts:
+        column = int((hour - start).total_seconds() // 3600)
+        if 0 <= column < length:
+            series[row[queue_id], column] = count
+    return series
+
+
+def seasonal_smoothing(series: np.ndarray, alphas: np.ndarray, gammas: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lissage exponentiel saisonnier additif (niveau + saison hebdomadaire)
+    de chaque ligne de series (R, T), T multiple de 168, avec ses propres
+    alpha/gamma. Retourne niveau (R,) et saison (R, 168) en fin de série :
+    la prévision à h heures vaut niveau + saison[h % 168].
+    """
+    first_week = series[:, :SEASON]
+    level = first_week.mean(axis=1)
+    season = first_week - level[:, None]
+    for t in range(SEASON, series.shape[1]):
+        index = t % SEASON
+        observed = series[:, t]
+        new_level = alphas * (observed - season[:, index]) + (1 - alphas) * level
+        season[:, index] = gammas * (observed - new_level) + (1 - gammas) * season[:, index]
+        level = new_level
+    return level, season
+
+
+def _week_ahead(level: np.ndarray, season: np.ndarray) -> np.ndarray:
+    return np.maximum(level[:, None] + season, 0.0)
+
+
+def _prophet_week_ahead(values: np.ndarray, until: datetime) -> Optional[np.ndarray]:
+    """Prévision Prophet sur la semaine suivant `until` (import différé)"""
+    try:
+        import pandas as pd
+        from prophet import Prophet
+    except ImportError:
+        logger.warning("Prophet activé mais non installé")
+        return None
+    hours = pd.date_range(end=until - HOUR, periods=len(values), freq='h')
+    model = Prophet(weekly_seasonality=True, daily_seasonality=True, yearly_seasonality=False)
+    model.fit(pd.DataFrame({'ds': hours.tz_localize(None), 'y': values}))
+    future = model.make_future_dataframe(periods=SEASON, freq='h', include_history=False)
+    return np.maximum(model.predict(future)['yhat'].to_numpy(), 0.0)
+
+
+def _select(series: np.ndarray, grid: np.ndarray):
+    """
+    Pour chaque ligne : erreur du saisonnier naïf et du meilleur lissage
+    sur la dernière semaine, et prévision lissée réajustée sur tout l'historique
+    """
+    training, holdout = series[:, :-SEASON], series[:, -SEASON:]
+    n = len(series)
+    naive_mae = np.abs(training[:, -SEASON:] - holdout).mean(axis=1)
+
+    stacked = np.repeat(training, len(grid), axis=0)
+    forecasts = _week_ahead(*seasonal_smoothing(stacked, np.tile(grid[:, 0], n), np.tile(grid[:, 1], n)))
+    smoothing_mae = np.abs(forecasts - np.repeat(holdout, len(grid), axis=0)).mean(axis=1).reshape(n, len(grid))
+    best = smoothing_mae.argmin(axis=1)
+    best_mae = smoothing_mae[np.arange(n), best]
+
+    final = _week_ahead(*seasonal_smoothing(series, grid[best, 0], grid[best, 1]))
+    return naive_mae, best, best_mae, final
+
+
+def fit_forecasts(queue_ids: Optional[Sequence] = None, now: Optional[datetime] = None) -> Dict:
+    """
+    Ajuste la prévision de toutes les files par lots de CHUNK_SIZE : une
+    requête d'historique par lot, le lissage de toutes les (files x
+    paramètres) en une passe, puis pour chaque file la méthode
+    (saisonnier naïf ou lissage) la plus juste sur la dernière semaine.
+    """
+    origin = floor_hour(now or timezone.now())
+    if queue_ids is None:
+        queue_ids = Queue.objects.exclude(status=Queue.Status.CLOSED).values_list('id', flat=True)
+    queue_ids = list(queue_ids)
+    grid = np.array([(alpha, gamma) for alpha in ALPHAS for gamma in GAMMAS])
+    fitted_at = timezone.now()
+    methods = {}
+
+    for start in range(0, len(queue_ids), CHUNK_SIZE):
+        chunk = queue_ids[start:start + CHUNK_SIZE]
+        series = hourly_series(chunk, origin)
+        naive_mae, best, best_mae, final = _select(series, grid)
+        records = []
+        for index, queue_id in enumerate(chunk):
+            method, mae = 'seasonal_naive', float(naive_mae[index])
+            values, parameters = series[index, -SEASON:], {}
+            if best_mae[index] < naive_mae[index]:
+                method, mae = 'smoothing', float(best_mae[index])
+                values = final[index]
+                parameters = {'alpha': float(grid[best[index], 0]), 'gamma': float(grid[best[index], 1])}
+            if PROPHET_ENABLED:
+                backtest = _prophet_week_ahead(series[index, :-SEASON], origin - SEASON * HOUR)
+                if backtest is not None:
+                    prophet_mae = float(np.abs(backtest - series[index, -SEASON:]).mean())
+                    if prophet_mae < mae:
+                        method, mae = 'prophet', prophet_mae
+                        values, parameters = _prophet_week_ahead(series[index], origin), {}
+            methods[method] = methods.get(method, 0) + 1
+            records.append(QueueArrivalForecast(
+                queue_id=queue_id,
+                method=method,
+                origin=origin,
+                values=[float(value) for value in values],
+                parameters=parameters,
+                mae=mae,
+                fitted_at=fitted_at
+            ))
+        QueueArrivalForecast.objects.bulk_create(
+            records,
+            update_conflicts=True,
+            unique_fields=['queue'],
+            update_fields=['method', 'origin', 'values', 'parameters', 'mae', 'fitted_at']
+        )
+
+    _invalidate()
+    logger.info(f"Prévisions d'arrivées ajustées pour {len(queue_ids)} file(s) : {methods}")
+    return {'queues': len(queue_ids), 'methods': methods}
+
+
+def _generation() -> int:
+    return cache.get(GENERATION_KEY) or 0
+
+
+def _invalidate() -> None:
+    """Rend obsolètes toutes les prévisions en cache (nouvel ajustement)"""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def _cache_key(generation: int, queue_id, horizon: int, hour: datetime) -> str:
+    return f"ai:forecast:{generation}:{queue_id}:{horizon}:{int(hour.timestamp())}"
+
+
+def forecast_arrivals(queue_ids: Sequence, horizon: int = 1, now: Optional[datetime] = None) -> Dict:
+    """
+    Arrivées prévues pour chacune des `horizon` prochaines heures, par
+    file (absente si la file n'a pas encore de prévision). Mis en cache
+    par file, horizon et heure ; au-delà de la semaine ajustée, la
+    saisonnalité hebdomadaire est reprise.
+    """
+    hour = floor_hour(now or timezone.now())
+    generation = _generation()
+    keys = {queue_id: _cache_key(generation, queue_id, horizon, hour) for queue_id in queue_ids}
+    cached = cache.get_many(list(keys.values()))
+    result = {
+        queue_id: np.asarray(cached[key])
+        for queue_id, key in keys.items() if cached.get(key)
+    }
+    missing = [queue_id for queue_id, key in keys.items() if key not in cached]
+    if not missing:
+        return result
+
+    to_cache = {}
+    for forecast in QueueArrivalForecast.objects.filter(queue_id__in=missing):
+        offset = int((hour - forecast.origin).total_seconds() // 3600)
+        values = np.asarray(forecast.values)[(offset + np.arange(horizon)) % HORIZON]
+        result[forecast.queue_id] = values
+        to_cache[keys[forecast.queue_id]] = values.tolist()
+    # Les files sans prévision sont aussi mises en cache (liste vide)
+    for queue_id in missing:
+        to_cache.setdefault(keys[queue_id], [])
+    cache.set_many(to_cache, CACHE_SECONDS)
+    return result
@@ -0,0 +1,205 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import joblib
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+
+from apps.ai.models import MLModel
+
+logger = logging.getLogger(__name__)
+
+# Intervalle de vérification des nouvelles versions actives (secondes)
+POLL_INTERVAL = getattr(settings, 'AI_MODEL_POLL_INTERVAL', 30)
+
+# Au-delà de cette taille, les tableaux de l'artefact sont mappés en mémoire
+MMAP_MIN_BYTES = getattr(settings, 'AI_MODEL_MMAP_MIN_BYTES', 10 * 1024 * 1024)
+
+# Modèles préchargés au démarrage des processus (workers Celery, serveurs web)
+WARM_MODELS = (
+    ('wait_time', 'gradient_boosting'),
+    ('anomaly', 'isolation_forest'),
+)
+
+ModelKey = Tuple[str, str, str]
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    """Artefact désérialisé et ligne MLModel correspondante"""
+    record: MLModel
+    estimator: Any
+    loaded_at: float = field(default_factory=time.time)
+
+    @property
+    def key(self) -> ModelKey:
+        return (self.record.type, self.record.name, self.record.version)
+
+
+def load_artifact(path: str) -> Any:
+    """Désérialise un artefact joblib, en mmap pour les gros fichiers"""
+    mmap_mode = 'r' if os.path.getsize(path) >= MMAP_MIN_BYTES else None
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+class ModelRegistry:
+    """
+    Registre des modèles actifs, partagé par le processus.
+
+    Chaque artefact est chargé une seule fois par worker et indexé par
+    (type, name, version). Un thread de fond interroge périodiquement
+    MLModel : lorsqu'une nouvelle version devient active, elle est chargée
+    hors requête puis substituée atomiquement à l'ancienne. Seul le tout
+    premier accès à un modèle, s'il n'a pas été préchargé avec warm(),
+    paie le chargement.
+    """
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._models: Dict[ModelKey, LoadedModel] = {}
+        self._active: Dict[Tuple[str, str], ModelKey] = {}
+        self._poller: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _check_fork(self):
+        # Les workers (Celery prefork, gunicorn) héritent d'un état copié sans thread
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def get(self, model_type: str, name: str) -> Optional[LoadedModel]:
+        """Modèle actif pour (type, name), ou None s'il n'y en a pas"""
+        self._check_fork()
+        slot = (model_type, name)
+        if slot not in self._active:
+            self.refresh(model_type, name)
+        self._ensure_poller()
+        key = self._active.get(slot)
+        return self._models.get(key) if key else None
+
+    def warm(self, keys: Iterable[Tuple[str, str]] = WARM_MODELS) -> None:
+        """Précharge les modèles donnés (démarrage du worker)"""
+        self._check_fork()
+        for model_type, name in keys:
+            try:
+                self.refresh(model_type, name)
+            except DatabaseError as e:
+                # Base indisponible ou non migrée : chargement au premier accès
+                logger.warning(f"Préchargement du modèle {(model_type, name)} impossible : {e}")
+                return
+        self._ensure_poller()
+
+    # ------------------------------------------------------------------
+    # Chargement et substitution
+    # ------------------------------------------------------------------
+
+    def refresh(self, model_type: str, name: str) -> bool:
+        """
+        Charge la version active la plus récente si elle diffère de celle
+        en mémoire. Retourne True si une substitution a eu lieu.
+        """
+        record = MLModel.objects.filter(
+            type=model_type,
+            name=name,
+            status='active'
+        ).order_by('-created_at').first()
+        return self._install(model_type, name, record)
+
+    def _install(self, model_type: str, name: str, record: Optional[MLModel]) -> bool:
+        slot = (model_type, name)
+        if record is None:
+            with self._lock:
+                # Plus de version active : on garde un marqueur vide
+                self._active[slot] = None
+                self._evict(slot, keep=None)
+            return False
+
+        key = (record.type, record.name, record.version)
+        if self._active.get(slot) == key:
+            return False
+
+        # Chargement hors verrou : les lectures continuent sur l'ancienne version
+        try:
+            loaded = LoadedModel(record=record, estimator=load_artifact(record.file_path))
+        except Exception as e:
+            logger.error(f"Chargement du modèle {key} impossible : {e}")
+            # Le thread de fond retentera ; les requêtes ne rechargent pas en boucle
+            self._active.setdefault(slot, None)
+            return False
+
+        with self._lock:
+            self._models[key] = loaded
+            self._active[slot] = key
+            self._evict(slot, keep=key)
+        logger.info(f"Modèle {key} actif")
+        return True
+
+    def _evict(self, slot: Tuple[str, str], keep: Optional[ModelKey]):
+        # Les requêtes en cours conservent leur référence à l'ancienne version
+        for key in [key for key in self._models if key[:2] == slot and key != keep]:
+            del self._models[key]
+
+    def poll(self) -> int:
+        """Vérifie en une requête les versions actives des modèles suivis"""
+        slots = list(self._active)
+        if not slots:
+            return 0
+        latest = {}
+        for record in MLModel.objects.filter(
+            status='active',
+            type__in={model_type for model_type, _ in slots},
+            name__in={name for _, name in slots}
+        ).order_by('-created_at'):
+            latest.setdefault((record.type, record.name), record)
+
+        swapped = 0
+        for slot in slots:
+            if self._install(*slot, latest.get(slot)):
+                swapped += 1
+        return swapped
+
+    # ------------------------------------------------------------------
+    # Thread de surveillance
+    # ------------------------------------------------------------------
+
+    def _ensure_poller(self):
+        if self.poll_interval <= 0 or (self._poller and self._poller.is_alive()):
+            return
+        with self._lock:
+            if self._poller and self._poller.is_alive():
+                return
+            self._poller = threading.Thread(
+                target=self._run,
+                name='ml-model-registry',
+                daemon=True
+            )
+            self._poller.start()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning(f"Vérification des modèles impossible : {e}")
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self._stop.set()
+
+
+model_registry = ModelRegistry()
@@ -1,12 +1,20 @@
 import numpy as np
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Tuple
 
-from sklearn.ensemble import RandomForestRegressor
-import optuna
+from django.db.models import Avg, Count, F
+from django.utils import timezone
 
-from apps.ai.models import MLModel, ResourceOptimization
-from apps.queues.models import ServicePoint, Queue
+from apps.ai.models import ResourceOptimization
+from apps.ai.ml.forecasting.arrivals import forecast_arrivals
+from apps.ai.ml.registry import model_registry
+from apps.ai.ml.resource_opt.staffing import (
+    DEFAULT_SERVICE_MINUTES, SERVICE_WINDOW, TARGET_SERVICE_LEVEL, TARGET_WAIT_MINUTES,
+    StaffingPlan, measure_demand, plan_staffing
+)
+from apps.queues.models import ServicePoint, Queue, Ticket
+
+# Horizon (heures) de la demande prévue prise en compte pour l'effectif
+FORECAST_HORIZON = 1
 
 
 class ResourceOptimizer:
@@ -15,354 +23,194 @@ class ResourceOptimizer:
     def __init__(self, service_point_id: str):
         self.service_point_id = service_point_id
         self.model = None
+        self.estimator = None
         self.load_model()
 
     def load_model(self):
-        """Charge ou crée le modèle d'optimisation"""
-        try:
-            self.model = MLModel.objects.get(
-                type='resource_opt',
-                name='random_forest',
-                status='active'
-            )
-        except MLModel.DoesNotExist:
-            # Le modèle sera créé lors du premier entraînement
-            pass
+        """Récupère le modèle d'optimisation actif depuis le registre du processus"""
+        loaded = model_registry.get('resource_opt', 'random_forest')
+        if loaded is not None:
+            self.model = loaded.record
+            self.estimator = loaded.estimator
+        # Sinon, le modèle sera créé lors du premier entraînement
 
     def generate_suggestions(self) -> Dict:
-        """Génère des suggestions d'optimisation des ressources"""
+        """
+        Génère des suggestions d'optimisation des ressources : modèle M/M/c
+        (Erlang C) évalué pour tous les effectifs candidats à la fois,
+        l'optimum est le plus petit effectif qui atteint le niveau de service visé
+        """
         service_point = ServicePoint.objects.get(id=self.service_point_id)
-        current_metrics = self._get_current_metrics(service_point)
-        
-        # Prédiction de la charge future
-        future_load = self._predict_future_load(
-            service_point,
-            current_metrics
-        )
-        
-        # Optimisation des ressources
-        suggestions = self._optimize_resources(
-            service_point,
-            current_metrics,
-            future_load
-        )
-        
+
+        # L'effectif couvre la demande mesurée ou, si elle est plus forte,
+        # la demande prévue sur l'heure à venir
+        rates, service = measure_demand([service_point])
+        arrivals, minutes = self._predict_load(service_point, FORECAST_HORIZON)
+        if arrivals * minutes > rates[0] * service[0]:
+            rates, service = np.array([arrivals]), np.array([minutes])
+        plan = plan_staffing([service_point], demand=(rates, service))[0]
+        suggestion = suggestion_for(plan)
+
         # Enregistrement des suggestions
         optimization = ResourceOptimization.objects.create(
             service_point=service_point,
             model=self.model,
-            current_load=current_metrics['current_load'],
-            suggested_action=suggestions['action'],
-            priority=suggestions['priority'],
-            expected_impact=suggestions['impact']
+            current_load=plan.current['utilization'],
+            suggested_action=suggestion['action'],
+            priority=suggestion['priority'],
+            expected_impact=suggestion['impact']
         )
-        
-        return {
-            'optimization_id': optimization.id,
-            'current_load': current_metrics['current_load'],
-            'suggested_action': suggestions['action'],
-            'priority': suggestions['priority'],
-            'expected_impact': suggestions['impact'],
-            'reasoning': suggestions['reasoning']
-        }
 
-    def _get_current_metrics(self, service_point: ServicePoint) -> Dict:
-        """Récupère les métriques actuelles du point de service"""
-        now = datetime.now()
-        last_hour = now - timedelta(hours=1)
-        
-        metrics = {
-            # Charge actuelle
-            'current_load': service_point.get_current_load(),
-            
-            # Métriques de performance
-            'avg_service_time': service_point.get_average_service_time(
-                time_window=timedelta(hours=1)
-            ),
-            'efficiency_score': service_point.get_efficiency_score(
-                time_window=timedelta(hours=1)
-            ),
-            
-            # Files associées
-            'queue_lengths': [
-                queue.get_current_length()
-                for queue in service_point.queues.all()
-            ],
-            'wait_times': [
-                queue.get_average_wait_time(time_window=timedelta(hours=1))
-                for queue in service_point.queues.all()
-            ],
-            
-            # Contexte temporel
-            'hour': now.hour,
-            'day_of_week': now.weekday(),
-            'is_peak_time': self._is_peak_time(now),
-        }
-        
-        return metrics
-
-    def _predict_future_load(
-        self,
-        service_point: ServicePoint,
-        current_metrics: Dict
-    ) -> Dict:
-        """Prédit la charge future du point de service"""
-        # Utilise RandomForest pour prédire la charge
-        predictions = {
-            'next_hour': self._predict_load(
-                service_point,
-                current_metrics,
-                horizon=1
-            ),
-            'next_4_hours': self._predict_load(
-                service_point,
-                current_metrics,
-                horizon=4
-            ),
-        }
-        
-        # Analyse des tendances
-        trends = {
-            'load_trend': self._calculate_trend(
-                service_point.get_historical_loads(
-                    time_window=timedelta(hours=4)
-                )
-            ),
-            'efficiency_trend': self._calculate_trend(
-                service_point.get_historical_efficiency(
-                    time_window=timedelta(hours=4)
-                )
-            ),
-        }
-        
         return {
-            'predictions': predictions,
-            'trends': trends
+            'optimization_id': optimization.id,
+            'current_load': plan.current['utilization'],
+            'suggested_action': suggestion['action'],
+            'priority': suggestion['priority'],
+            'expected_impact': suggestion['impact'],
+            'reasoning': suggestion['reasoning']
         }
 
-    def _optimize_resources(
-        self,
-        service_point: ServicePoint,
-        current_metrics: Dict,
-        future_load: Dict
-    ) -> Dict:
-        """Optimise l'allocation des ressources"""
-        def objective(trial):
-            # Paramètres à optimiser
-            num_resources = trial.suggest_int(
-                'num_resources',
-                max(1, service_point.min_resources),
-                service_point.max_resources
-            )
-            
-            # Simulation avec ces paramètres
-            metrics = self._simulate_performance(
-                service_point,
-                num_resources,
-                future_load
-            )
-            
-            # Fonction objectif : équilibre entre efficacité et coût
-            score = (
-                0.6 * metrics['efficiency'] +
-                0.3 * metrics['wait_time_reduction'] +
-                0.1 * metrics['cost_efficiency']
-            )
-            
-            return score
-        
-        # Optimisation avec Optuna
-        study = optuna.create_study(direction='maximize')
-        study.optimize(objective, n_trials=50)
-        
-        # Analyse des résultats
-        best_params = study.best_params
-        current_resources = service_point.get_active_resources_count()
-        
-        # Détermination de l'action
-        if best_params['num_resources'] > current_resources:
-            action = 'add'
-            diff = best_params['num_resources'] - current_resources
-        elif best_params['num_resources'] < current_resources:
-            action = 'remove'
-            diff = current_resources - best_params['num_resources']
-        else:
-            action = 'maintain'
-            diff = 0
-        
-        # Calcul de l'impact attendu
-        impact = self._calculate_impact(
-            service_point,
-            best_params['num_resources'],
-            future_load
+    def _predict_load(self, service_point: ServicePoint, horizon: int) -> Tuple[float, float]:
+        """
+        Demande prévue du point de service sur les `horizon` prochaines
+        heures : arrivées prévues des files servies (partagées entre leurs
+        points de service) et temps de service moyen pondéré, mesuré en
+        une requête groupée sur toutes les files
+        """
+        now = timezone.now()
+        queue_ids = list(service_point.assigned_queues.values_list('id', flat=True))
+        links = Queue.service_points.through.objects
+        # Nombre de points servant chaque file (tous, pas seulement celui-ci)
+        sharing = dict(
+            links.filter(queue_id__in=queue_ids)
+            .values_list('queue_id').annotate(count=Count('id')).order_by()
         )
-        
-        # Détermination de la priorité
-        priority = self._determine_priority(
-            current_metrics,
-            future_load,
-            impact
+        forecasts = forecast_arrivals(queue_ids, horizon=horizon, now=now)
+        durations = dict(
+            Ticket.objects.filter(
+                queue_id__in=queue_ids,
+                status=Ticket.Status.COMPLETED,
+                service_start_time__isnull=False,
+                service_end_time__gte=now - SERVICE_WINDOW
+            ).values_list('queue_id').annotate(
+                duration=Avg(F('service_end_time') - F('service_start_time'))
+            ).order_by()
         )
-        
-        return {
-            'action': action,
-            'priority': priority,
-            'impact': impact,
-            'reasoning': self._generate_reasoning(
-                action,
-                diff,
-                impact,
-                future_load
-            )
+        arrivals, work = 0.0, 0.0
+        for queue_id in queue_ids:
+            if queue_id not in forecasts:
+                continue
+            rate = float(np.mean(forecasts[queue_id])) / sharing.get(queue_id, 1)
+            duration = durations.get(queue_id)
+            arrivals += rate
+            work += rate * (duration.total_seconds() / 60 if duration else DEFAULT_SERVICE_MINUTES)
+        service = work / arrivals if arrivals else DEFAULT_SERVICE_MINUTES
+        return arrivals, service
+
+
+def suggestion_for(plan: StaffingPlan) -> Dict:
+    """Action, priorité, impact et explication déduits d'un plan d'effectif"""
+    if plan.difference > 0:
+        action = 'add'
+    elif plan.difference < 0:
+        action = 'remove'
+    else:
+        action = 'maintain'
+    impact = _calculate_impact(plan)
+    return {
+        'action': action,
+        'priority': _determine_priority(plan),
+        'impact': impact,
+        'reasoning': _generate_reasoning(action, abs(plan.difference), plan)
+    }
+
+
+def optimize_branch(branch_id) -> List[Dict]:
+    """
+    Optimise ensemble tous les points de service d'une succursale : une
+    seule évaluation vectorisée, puis enregistrement groupé des
+    suggestions qui demandent un changement d'effectif
+    """
+    service_points = ServicePoint.objects.filter(branch_id=branch_id).order_by('id')
+    plans = plan_staffing(service_points)
+    loaded = model_registry.get('resource_opt', 'random_forest')
+    model = loaded.record if loaded is not None else None
+
+    results, optimizations = [], []
+    for plan in plans:
+        suggestion = suggestion_for(plan)
+        result = {
+            'service_point': plan.service_point.id,
+            'optimization_id': None,
+            'current_load': plan.current['utilization'],
+            'suggested_action': suggestion['action'],
+            'priority': suggestion['priority'],
+            'expected_impact': suggestion['impact'],
+            'reasoning': suggestion['reasoning']
         }
-
-    def _predict_load(
-        self,
-        service_point: ServicePoint,
-        current_metrics: Dict,
-        horizon: int
-    ) -> float:
-        """Prédit la charge pour un horizon donné"""
-        # À implémenter avec le modèle RandomForest
-        return 0.75  # Exemple
-
-    def _calculate_trend(self, data: List[float]) -> float:
-        """Calcule la tendance d'une série de données"""
-        if not data:
-            return 0
-        x = np.arange(len(data))
-        y = np.array(data)
-        z = np.polyfit(x, y, 1)
-        return z[0]
-
-    def _is_peak_time(self, time: datetime) -> bool:
-        """Détermine si c'est une période de pointe"""
-        hour = time.hour
+        if suggestion['action'] != 'maintain':
+            optimizations.append((result, ResourceOptimization(
+                service_point=plan.service_point,
+                model=model,
+                current_load=plan.current['utilization'],
+                suggested_action=suggestion['action'],
+                priority=suggestion['priority'],
+                expected_impact=suggestion['impact']
+            )))
+        results.append(result)
+
+    ResourceOptimization.objects.bulk_create([optimization for _, optimization in optimizations])
+    for result, optimization in optimizations:
+        result['optimization_id'] = optimization.id
+    return results
+
+
+def _calculate_impact(plan: StaffingPlan) -> Dict:
+    """Impact attendu du passage à l'effectif recommandé"""
+    current, optimal = plan.current, plan.optimal
+    return {
+        'servers': {'current': plan.current_servers, 'suggested': plan.optimal_servers},
+        'arrivals_per_hour': plan.arrivals_per_hour,
+        'service_minutes': plan.service_minutes,
+        'avg_wait': {'current': current['avg_wait'], 'suggested': optimal['avg_wait']},
+        'service_level': {'current': current['service_level'], 'suggested': optimal['service_level']},
+        'utilization': {'current': current['utilization'], 'suggested': optimal['utilization']},
+        'service_level_change': optimal['service_level'] - current['service_level'],
+        'utilization_change': optimal['utilization'] - current['utilization'],
+    }
+
+
+def _determine_priority(plan: StaffingPlan) -> str:
+    """Priorité selon l'écart au niveau de service visé"""
+    level = plan.current['service_level']
+    if plan.difference > 0 and level < TARGET_SERVICE_LEVEL / 2:
+        return 'high'
+    if plan.difference > 0:
+        return 'medium'
+    return 'low'
+
+
+def _generate_reasoning(action: str, diff: int, plan: StaffingPlan) -> str:
+    """Génère une explication pour la suggestion"""
+    context = (
+        f"- Demande: {plan.arrivals_per_hour:.1f} arrivées/h, "
+        f"service moyen {plan.service_minutes:.1f} min\n"
+        f"- Objectif: {TARGET_SERVICE_LEVEL:.0%} des clients appelés "
+        f"en moins de {TARGET_WAIT_MINUTES:.0f} min"
+    )
+    current, optimal = plan.current, plan.optimal
+    if action == 'add':
         return (
-            (9 <= hour <= 11) or  # Pic du matin
-            (14 <= hour <= 16)    # Pic de l'après-midi
-        )
-
-    def _simulate_performance(
-        self,
-        service_point: ServicePoint,
-        num_resources: int,
-        future_load: Dict
-    ) -> Dict:
-        """Simule la performance avec un nombre donné de ressources"""
-        # Simulation simplifiée
-        base_efficiency = 0.8
-        base_wait_time = 10  # minutes
-        
-        # Ajustements basés sur le ratio charge/ressources
-        load_ratio = future_load['predictions']['next_hour'] / num_resources
-        
-        efficiency = base_efficiency * (1 / (1 + np.exp(load_ratio - 1)))
-        wait_time = base_wait_time * load_ratio
-        
-        # Coût par ressource
-        cost_per_resource = 100  # unité arbitraire
-        total_cost = num_resources * cost_per_resource
-        
-        return {
-            'efficiency': efficiency,
-            'wait_time_reduction': 1 / (1 + wait_time),
-            'cost_efficiency': 1 / (1 + total_cost/1000)
-        }
-
-    def _calculate_impact(
-        self,
-        service_point: ServicePoint,
-        num_resources: int,
-        future_load: Dict
-    ) -> Dict:
-        """Calcule l'impact attendu des changements de ressources"""
-        current_performance = self._simulate_performance(
-            service_point,
-            service_point.get_active_resources_count(),
-            future_load
+            f"Suggestion d'ajouter {diff} ressource(s) basée sur:\n{context}\n"
+            f"- Niveau de service: {current['service_level']:.1%} -> {optimal['service_level']:.1%}"
         )
-        
-        new_performance = self._simulate_performance(
-            service_point,
-            num_resources,
-            future_load
-        )
-        
-        return {
-            'efficiency_change': (
-                new_performance['efficiency'] -
-                current_performance['efficiency']
-            ),
-            'wait_time_impact': (
-                new_performance['wait_time_reduction'] -
-                current_performance['wait_time_reduction']
-            ),
-            'cost_impact': (
-                new_performance['cost_efficiency'] -
-                current_performance['cost_efficiency']
-            )
-        }
-
-    def _determine_priority(
-        self,
-        current_metrics: Dict,
-        future_load: Dict,
-        impact: Dict
-    ) -> str:
-        """Détermine la priorité de la suggestion"""
-        # Facteurs de priorité
-        factors = {
-            'load_severity': (
-                future_load['predictions']['next_hour'] /
-                current_metrics['current_load']
-            ),
-            'efficiency_impact': abs(impact['efficiency_change']),
-            'wait_time_impact': abs(impact['wait_time_impact']),
-        }
-        
-        # Score composite
-        priority_score = (
-            0.4 * factors['load_severity'] +
-            0.3 * factors['efficiency_impact'] +
-            0.3 * factors['wait_time_impact']
+    if action == 'remove':
+        return (
+            f"Suggestion de retirer {diff} ressource(s) basée sur:\n{context}\n"
+            f"- Occupation: {current['utilization']:.1%} -> {optimal['utilization']:.1%}\n"
+            f"- Niveau de service maintenu: {optimal['service_level']:.1%}"
         )
-        
-        # Seuils de priorité
-        if priority_score > 0.7:
-            return 'high'
-        elif priority_score > 0.4:
-            return 'medium'
-        else:
-            return 'low'
-
-    def _generate_reasoning(
-        self,
-        action: str,
-        diff: int,
-        impact: Dict,
-        future_load: Dict
-    ) -> str:
-        """Génère une explication pour la suggestion"""
-        if action == 'add':
-            reason = (
-                f"Suggestion d'ajouter {diff} ressource(s) basée sur:\n"
-                f"- Charge prévue: {future_load['predictions']['next_hour']:.1%}\n"
-                f"- Impact sur l'efficacité: {impact['efficiency_change']:.1%}\n"
-                f"- Impact sur le temps d'attente: {impact['wait_time_impact']:.1%}"
-            )
-        elif action == 'remove':
-            reason = (
-                f"Suggestion de retirer {diff} ressource(s) basée sur:\n"
-                f"- Baisse de charge prévue: {future_load['predictions']['next_hour']:.1%}\n"
-                f"- Optimisation des coûts: {impact['cost_impact']:.1%}\n"
-                f"- Impact minimal sur le service: {impact['efficiency_change']:.1%}"
-            )
-        else:
-            reason = (
-                "Maintien du niveau actuel des ressources:\n"
-                f"- Charge stable: {future_load['predictions']['next_hour']:.1%}\n"
-                "- Performance optimale avec la configuration actuelle"
-            )
-        
-        return reason
+    return (
+        f"Maintien du niveau actuel des ressources:\n{context}\n"
+        f"- Niveau de service: {current['service_level']:.1%}"
+    )
@@ -0,0 +1,373 @@
+import logging
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, F
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+from django.utils import timezone
+
+from apps.ai.models import QueueSeasonalBaseline
+from apps.ai.ml.resource_opt.staffing import DEFAULT_SERVICE_MINUTES, TARGET_WAIT_MINUTES
+from apps.queues.models import Queue, ServicePoint, Ticket, VehicleCategory
+
+logger = logging.getLogger(__name__)
+
+# Historique utilisé pour ajuster les distributions
+FIT_DAYS = 28
+
+# En deçà, le temps de service suit une loi exponentielle de moyenne par défaut
+MIN_SERVICE_SAMPLES = 30
+
+DEFAULT_REPLICATIONS = 200
+MAX_REPLICATIONS = 5000
+
+# Processus de simulation ; le pool n'est utilisé qu'au-delà de PARALLEL_MIN_REPLICATIONS
+WORKERS = getattr(settings, 'AI_SIMULATION_WORKERS', min(4, os.cpu_count() or 1))
+PARALLEL_MIN_REPLICATIONS = 400
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+@dataclass
+class QueueModel:
+    """Distributions ajustées d'une file pour un jour donné"""
+    hourly_arrivals: np.ndarray
+    service_log_mean: float
+    service_log_std: float
+    multipliers: np.ndarray
+    category_weights: np.ndarray
+    servers: int
+    samples: int = 0
+
+    @property
+    def mean_service_minutes(self) -> float:
+        base = math.exp(self.service_log_mean + self.service_log_std ** 2 / 2)
+        return base * float(self.multipliers @ self.category_weights)
+
+    def as_dict(self) -> Dict:
+        return {
+            'hourly_arrivals': [round(float(rate), 2) for rate in self.hourly_arrivals],
+            'mean_service_minutes': round(self.mean_service_minutes, 2),
+            'service_samples': self.samples,
+            'servers': self.servers,
+        }
+
+
+@dataclass
+class Scenario:
+    """
+    Journée simulée : guichets ouverts sur [start_hour, end_hour) et
+    changements d'effectif (minute de la journée, +n ouvertures / -n fermetures)
+    """
+    start_hour: int = 8
+    end_hour: int = 18
+    servers: Optional[int] = None
+    changes: List[Tuple[float, int]] = field(default_factory=list)
+    arrival_scale: float = 1.0
+    replications: int = DEFAULT_REPLICATIONS
+    target_wait: float = TARGET_WAIT_MINUTES
+    seed: Optional[int] = None
+
+    def server_schedule(self, base: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Ouverture et fermeture (minutes) de chaque guichet"""
+        start = self.start_hour * 60
+        opens, closes = [start] * base, [math.inf] * base
+        for at, delta in sorted(self.changes):
+            at = max(float(at), start)
+            if delta > 0:
+                opens += [at] * delta
+                closes += [math.inf] * delta
+                continue
+            # Fermeture des guichets ouverts le plus récemment
+            for index in reversed(range(len(opens))):
+                if delta == 0:
+                    break
+                if closes[index] == math.inf and opens[index] <= at:
+                    closes[index] = at
+                    delta += 1
+        return np.array(opens, dtype=float), np.array(closes, dtype=float)
+
+
+def simulate(
+    hourly_arrivals: np.ndarray,
+    start_hour: int,
+    end_hour: int,
+    service_log_mean: float,
+    service_log_std: float,
+    multipliers: np.ndarray,
+    category_weights: np.ndarray,
+    opens: np.ndarray,
+    closes: np.ndarray,
+    replications: int,
+    seed
+) -> Dict[str, np.ndarray]:
+    """
+    Réplications indépendantes d'une file FIFO multi-guichets. Les
+    arrivées suivent un processus de Poisson d'intensité constante par
+    heure ; le temps de service est log-normal, multiplié par celui de la
+    catégorie de véhicule tirée. Les réplications avancent ensemble, client
+    par client : chaque client prend le guichet ouvert qui se libère le
+    premier. Attente infinie : client non servi (guichets fermés).
+    """
+    rng = np.random.default_rng(seed)
+    hours = np.arange(start_hour, end_hour)
+    counts = rng.poisson(hourly_arrivals[hours], size=(replications, len(hours)))
+    totals = counts.sum(axis=1)
+    width = int(totals.max()) if replications else 0
+
+    # Arrivées triées par réplication, complétées par +inf
+    replication = np.repeat(np.arange(replications), totals)
+    minutes = np.repeat(np.tile(hours, replications), counts.ravel()) * 60.0
+    minutes += rng.random(len(minutes)) * 60
+    order = np.lexsort((minutes, replication))
+    replication, minutes = replication[order], minutes[order]
+    position = np.arange(len(minutes)) - np.repeat(np.cumsum(totals) - totals, totals)
+    arrivals = np.full((replications, width), np.inf)
+    arrivals[replication, position] = minutes
+
+    service = rng.lognormal(service_log_mean, service_log_std, size=(replications, width))
+    service *= rng.choice(multipliers, p=category_weights, size=(replications, width))
+
+    rows = np.arange(replications)
+    free = np.tile(opens, (replications, 1))
+    waits = np.full((replications, width), np.nan)
+    busy = np.zeros(replications)
+    for index in range(width):
+        arrival = arrivals[:, index]
+        present = np.isfinite(arrival)
+        candidates = np.maximum(free, arrival[:, None])
+        candidates[candidates >= closes] = np.inf
+        server = np.argmin(candidates, axis=1)
+        start = candidates[rows, server]
+        served = present & np.isfinite(start)
+        waits[present, index] = start[present] - arrival[present]
+        free[rows[served], server[served]] = start[served] + service[served, index]
+        busy[served] += service[served, index]
+
+    present = np.isfinite(arrivals)
+    return {
+        'waits': waits[present],
+        'arrivals': arrivals[present],
+        'replication_waits': np.array([
+            row[np.isfinite(row)].mean() if np.isfinite(row).any() else 0.0
+            for row in waits
+        ]),
+        'busy': busy,
+    }
+
+
+def _simulate_chunk(arguments: Dict) -> Dict[str, np.ndarray]:
+    return simulate(**arguments)
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ProcessPoolExecutor:
+    """Pool de simulation du processus (recréé après un fork)"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=WORKERS)
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def run_replications(arguments: Dict, replications: int, seed=None) -> Dict[str, np.ndarray]:
+    """Répartit les réplications entre les processus du pool quand le volume le justifie"""
+    seeds = np.random.SeedSequence(seed)
+    chunks = WORKERS if WORKERS > 1 and replications >= PARALLEL_MIN_REPLICATIONS else 1
+    sizes = [len(part) for part in np.array_split(np.arange(replications), chunks)]
+    jobs = [
+        dict(arguments, replications=size, seed=child)
+        for size, child in zip(sizes, seeds.spawn(chunks)) if size
+    ]
+    if len(jobs) == 1:
+        results = [simulate(**jobs[0])]
+    else:
+        results = list(_pool().map(_simulate_chunk, jobs))
+    return {
+        name: np.concatenate([result[name] for result in results])
+        for name in results[0]
+    }
+
+
+def _hourly_arrivals(queue_id, weekday: int, since, weeks: float) -> np.ndarray:
+    """Arrivées moyennes par heure du jour de semaine demandé (une requête)"""
+    hourly = np.zeros(24)
+    rows = Ticket.objects.filter(
+        queue_id=queue_id,
+        check_in_time__gte=since
+    ).annotate(
+        weekday=ExtractIsoWeekDay('check_in_time'),
+        hour=ExtractHour('check_in_time')
+    ).filter(weekday=weekday + 1).values_list('hour').annotate(count=Count('id')).order_by()
+    for hour, count in rows:
+        hourly[hour] = count / weeks
+    return hourly
+
+
+def fit_queue_model(queue: Queue, day: Optional[date] = None, days: int = FIT_DAYS) -> QueueModel:
+    """
+    Ajuste les distributions d'une file : arrivées horaires du jour de
+    semaine (profil saisonnier s'il existe), temps de service de base
+    log-normal (durées observées divisées par le multiplicateur de la
+    catégorie de véhicule) et répartition des catégories.
+    """
+    day = day or timezone.localdate()
+    weekday = day.weekday()
+    since = timezone.now() - timedelta(days=days)
+
+    baseline = QueueSeasonalBaseline.objects.filter(queue=queue).first()
+    if baseline is not None:
+        hourly = np.asarray(baseline.arrivals_mean[weekday * 24:(weekday + 1) * 24], dtype=float)
+    else:
+        hourly = _hourly_arrivals(queue.id, weekday, since, days / 7)
+
+    multipliers = {
+        str(category_id): multiplier
+        for category_id, multiplier in VehicleCategory.objects.values_list('id', 'service_time_multiplier')
+    }
+    observations = Ticket.objects.filter(
+        queue=queue,
+        status=Ticket.Status.COMPLETED,
+        service_start_time__isnull=False,
+        service_end_time__gte=since
+    ).annotate(
+        duration=F('service_end_time') - F('service_start_time')
+    ).values_list('duration', 'vehicle_info__category')
+
+    base_minutes, categories = [], {}
+    for duration, category in observations.iterator():
+        minutes = duration.total_seconds() / 60
+        if minutes <= 0:
+            continue
+        multiplier = multipliers.get(str(category), 1.0) if category is not None else 1.0
+        base_minutes.append(minutes / max(multiplier, 1e-6))
+        categories[multiplier] = categories.get(multiplier, 0) + 1
+
+    if len(base_minutes) >= MIN_SERVICE_SAMPLES:
+        logs = np.log(base_minutes)
+        log_mean, log_std = float(logs.mean()), float(logs.std())
+    else:
+        # Exponentielle approchée par une log-normale de même moyenne (σ = 1)
+        log_std = 1.0
+        log_mean = math.log(DEFAULT_SERVICE_MINUTES) - log_std ** 2 / 2
+    if not categories:
+        categories = {1.0: 1}
+    values = np.array(list(categories), dtype=float)
+    weights = np.array(list(categories.values()), dtype=float)
+
+    servers = queue.service_points.exclude(status=ServicePoint.Status.OFFLINE).count()
+    return QueueModel(
+        hourly_arrivals=hourly,
+        service_log_mean=log_mean,
+        service_log_std=log_std,
+        multipliers=values,
+        category_weights=weights / weights.sum(),
+        servers=max(1, servers),
+        samples=len(base_minutes),
+    )
+
+
+def summarize(result: Dict[str, np.ndarray], scenario: Scenario, opens: np.ndarray, closes: np.ndarray) -> Dict:
+    """Percentiles d'attente, niveau de service et occupation des réplications"""
+    waits, arrivals = result['waits'], result['arrivals']
+    served = np.isfinite(waits)
+    replications = len(result['busy'])
+    summary = {
+        'replications': replications,
+        'arrivals_per_day': float(len(waits) / replications) if replications else 0.0,
+        'unserved_per_day': float((~served).sum() / replications) if replications else 0.0,
+        'service_level': float((waits <= scenario.target_wait).mean()) if len(waits) else 1.0,
+        'mean_wait': float(waits[served].mean()) if served.any() else None,
+        'mean_wait_ci95': (
+            float(1.96 * np.nanstd(result['replication_waits']) / math.sqrt(replications))
+            if replications > 1 else None
+        ),
+        'percentiles': {
+            f'p{q}': float(value)
+            for q, value in zip(PERCENTILES, np.percentile(waits[served], PERCENTILES))
+        } if served.any() else {},
+    }
+
+    # Capacité ouverte sur la journée, en minutes-guichet
+    start, end = scenario.start_hour * 60, scenario.end_hour * 60
+    capacity = float(np.clip(np.minimum(closes, end) - np.maximum(opens, start), 0, None).sum())
+    summary['utilization'] = float(result['busy'].mean() / capacity) if capacity else None
+
+    hourly = []
+    hours = np.floor(arrivals / 60).astype(int)
+    for hour in range(scenario.start_hour, scenario.end_hour):
+        mask = (hours == hour) & served
+        hourly.append({
+            'hour': hour,
+            'servers': int(((opens <= hour * 60) & (closes > hour * 60)).sum()),
+            'mean_wait': float(waits[mask].mean()) if mask.any() else None,
+            'p90_wait': float(np.percentile(waits[mask], 90)) if mask.any() else None,
+        })
+    summary['hourly'] = hourly
+    return summary
+
+
+class QueueSimulator:
+    """
+    Simulateur à événements discrets d'une file, pour les questions
+    « et si » sur l'effectif (ex. deux guichets de plus à partir de 10h).
+    Les distributions sont ajustées une fois sur l'historique ; chaque
+    scénario rejoue les mêmes graines que la situation de référence
+    (nombres aléatoires communs), de sorte que l'écart mesuré provient
+    du changement et non du bruit.
+    """
+
+    def __init__(self, queue: Queue, day: Optional[date] = None, model: Optional[QueueModel] = None):
+        self.queue = queue
+        self.model = model or fit_queue_model(queue, day)
+
+    def run(self, scenario: Scenario) -> Dict:
+        replications = max(1, min(scenario.replications, MAX_REPLICATIONS))
+        base = scenario.servers if scenario.servers is not None else self.model.servers
+        opens, closes = scenario.server_schedule(base)
+        arguments = {
+            'hourly_arrivals': self.model.hourly_arrivals * scenario.arrival_scale,
+            'start_hour': scenario.start_hour,
+            'end_hour': scenario.end_hour,
+            'service_log_mean': self.model.service_log_mean,
+            'service_log_std': self.model.service_log_std,
+            'multipliers': self.model.multipliers,
+            'category_weights': self.model.category_weights,
+            'opens': opens,
+            'closes': closes,
+        }
+        result = run_replications(arguments, replications, scenario.seed)
+        return summarize(result, scenario, opens, closes)
+
+    def what_if(self, scenario: Scenario) -> Dict:
+        """Compare le scénario à la même journée sans changement d'effectif"""
+        if scenario.seed is None:
+            scenario.seed = int(np.random.SeedSequence().entropy % (2 ** 32))
+        reference = Scenario(**{**scenario.__dict__, 'changes': []})
+        baseline = self.run(reference)
+        result = self.run(scenario)
+        return {
+            'queue': self.queue.id,
+            'model': self.model.as_dict(),
+            'baseline': baseline,
+            'scenario': result,
+            'delta': {
+                'service_level': result['service_level'] - baseline['service_level'],
+                'mean_wait': (
+                    result['mean_wait'] - baseline['mean_wait']
+                    if result['mean_wait'] is not None and baseline['mean_wait'] is not None else None
+                ),
+            },
+        }
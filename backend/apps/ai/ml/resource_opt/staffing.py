@@ -0,0 +1,208 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.db.models import Avg, Count, F
+from django.utils import timezone
+
+from apps.queues.models import Queue, ServicePoint, Ticket
+
+# Objectif de service : TARGET_SERVICE_LEVEL des clients appelés en moins de TARGET_WAIT_MINUTES
+TARGET_WAIT_MINUTES = 5.0
+TARGET_SERVICE_LEVEL = 0.8
+
+# Temps de service retenu pour une file sans historique
+DEFAULT_SERVICE_MINUTES = 10.0
+
+# Effectifs candidats évalués (1..MAX_SERVERS)
+MAX_SERVERS = 50
+
+# Fenêtres de mesure de la demande et du temps de service
+ARRIVAL_WINDOW = timedelta(hours=1)
+SERVICE_WINDOW = timedelta(hours=24)
+
+
+def erlang_c(offered_load, max_servers: int = MAX_SERVERS) -> np.ndarray:
+    """
+    Probabilité d'attente M/M/c (Erlang C) pour c = 1..max_servers et
+    chaque charge offerte a = λ/μ (en Erlangs) : tableau (n, max_servers).
+    Erlang B est obtenu en log (somme cumulée des termes a^k/k!), sans
+    boucle sur c ni dépassement de capacité ; c <= a donne 1.
+    """
+    a = np.maximum(np.asarray(offered_load, dtype=float).reshape(-1, 1), 1e-12)
+    k = np.arange(max_servers + 1)
+    log_factorials = np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, max_servers + 1)))])
+    log_terms = k * np.log(a) - log_factorials
+    erlang_b = np.exp(log_terms - np.logaddexp.accumulate(log_terms, axis=1))[:, 1:]
+
+    servers = k[1:]
+    stable = servers > a
+    denominator = np.where(stable, servers - a * (1 - erlang_b), 1.0)
+    return np.where(stable, np.minimum(servers * erlang_b / denominator, 1.0), 1.0)
+
+
+def staffing_table(
+    arrivals_per_hour,
+    service_minutes,
+    max_servers: int = MAX_SERVERS,
+    target_wait: float = TARGET_WAIT_MINUTES
+) -> Dict[str, np.ndarray]:
+    """
+    Indicateurs M/M/c de chaque effectif candidat, pour n points de
+    service à la fois : tableaux (n, max_servers) d'attente moyenne
+    (minutes), de niveau de service et d'occupation.
+    """
+    arrivals = np.asarray(arrivals_per_hour, dtype=float).reshape(-1, 1) / 60
+    service = np.maximum(np.asarray(service_minutes, dtype=float).reshape(-1, 1), 1e-6)
+    offered = arrivals * service
+    servers = np.arange(1, max_servers + 1)
+
+    p_wait = erlang_c(offered[:, 0], max_servers)
+    # Capacité excédentaire en clients par minute
+    headroom = servers / service - arrivals
+    stable = headroom > 0
+    safe_headroom = np.where(stable, headroom, 1.0)
+    return {
+        'servers': servers,
+        'offered_load': offered[:, 0],
+        'p_wait': p_wait,
+        'avg_wait': np.where(stable, p_wait / safe_headroom, np.inf),
+        'service_level': np.where(stable, 1 - p_wait * np.exp(-safe_headroom * target_wait), 0.0),
+        'utilization': np.minimum(offered / servers, 1.0),
+    }
+
+
+def optimal_servers(
+    table: Dict[str, np.ndarray],
+    min_servers=1,
+    max_servers=MAX_SERVERS,
+    target_level: float = TARGET_SERVICE_LEVEL
+) -> np.ndarray:
+    """Plus petit effectif de [min, max] atteignant le niveau de service (max à défaut)"""
+    servers = table['servers']
+    n = len(table['offered_load'])
+    low = np.broadcast_to(np.asarray(min_servers), (n,)).reshape(-1, 1)
+    high = np.minimum(np.broadcast_to(np.asarray(max_servers), (n,)), servers[-1]).reshape(-1, 1)
+    feasible = (servers >= low) & (servers <= high) & (table['service_level'] >= target_level)
+    return np.where(feasible.any(axis=1), servers[np.argmax(feasible, axis=1)], high[:, 0])
+
+
+@dataclass
+class StaffingPlan:
+    """Effectif actuel et recommandé d'un point de service"""
+    service_point: ServicePoint
+    arrivals_per_hour: float
+    service_minutes: float
+    current_servers: int
+    optimal_servers: int
+    current: Dict
+    optimal: Dict
+
+    @property
+    def difference(self) -> int:
+        return self.optimal_servers - self.current_servers
+
+
+def _bounds(service_point: ServicePoint):
+    """Effectifs minimal, maximal et actuel (1 guichet par défaut)"""
+    low = max(1, getattr(service_point, 'min_resources', 1))
+    high = min(MAX_SERVERS, getattr(service_point, 'max_resources', MAX_SERVERS))
+    count = getattr(service_point, 'get_active_resources_count', None)
+    if count is not None:
+        current = count()
+    else:
+        current = 0 if service_point.status == ServicePoint.Status.OFFLINE else 1
+    return low, max(low, high), current
+
+
+def measure_demand(service_points: Sequence[ServicePoint], now: Optional[datetime] = None):
+    """
+    Arrivées par heure et temps de service moyen de chaque point de
+    service : la demande d'une file est répartie entre les points qui la
+    servent. Trois requêtes groupées, quel que soit le nombre de points.
+    """
+    now = now or timezone.now()
+    ids = [service_point.id for service_point in service_points]
+    links = Queue.service_points.through.objects
+    pairs = list(links.filter(servicepoint_id__in=ids).values_list('servicepoint_id', 'queue_id'))
+    queue_ids = {queue_id for _, queue_id in pairs}
+    sharing = dict(
+        links.filter(queue_id__in=queue_ids)
+        .values_list('queue_id').annotate(count=Count('id')).order_by()
+    )
+    arrivals = dict(
+        Ticket.objects.filter(queue_id__in=queue_ids, check_in_time__gte=now - ARRIVAL_WINDOW)
+        .values_list('queue_id').annotate(count=Count('id')).order_by()
+    )
+    durations = dict(
+        Ticket.objects.filter(
+            queue_id__in=queue_ids,
+            status=Ticket.Status.COMPLETED,
+            service_start_time__isnull=False,
+            service_end_time__gte=now - SERVICE_WINDOW
+        ).values_list('queue_id').annotate(
+            duration=Avg(F('service_end_time') - F('service_start_time'))
+        ).order_by()
+    )
+
+    demand = {service_point_id: 0.0 for service_point_id in ids}
+    weighted_service = {service_point_id: 0.0 for service_point_id in ids}
+    for service_point_id, queue_id in pairs:
+        rate = arrivals.get(queue_id, 0) * 3600 / ARRIVAL_WINDOW.total_seconds() / sharing[queue_id]
+        duration = durations.get(queue_id)
+        minutes = duration.total_seconds() / 60 if duration else DEFAULT_SERVICE_MINUTES
+        demand[service_point_id] += rate
+        weighted_service[service_point_id] += rate * minutes
+
+    rates = np.array([demand[service_point_id] for service_point_id in ids])
+    service = np.array([
+        weighted_service[service_point_id] / demand[service_point_id]
+        if demand[service_point_id] else DEFAULT_SERVICE_MINUTES
+        for service_point_id in ids
+    ])
+    return rates, service
+
+
+def _row(table: Dict[str, np.ndarray], row: int, servers: int) -> Dict:
+    if servers < 1:
+        return {'servers': 0, 'avg_wait': None, 'service_level': 0.0, 'utilization': 1.0}
+    column = min(servers, len(table['servers'])) - 1
+    avg_wait = table['avg_wait'][row, column]
+    return {
+        'servers': int(servers),
+        'avg_wait': None if np.isinf(avg_wait) else float(avg_wait),
+        'service_level': float(table['service_level'][row, column]),
+        'utilization': float(table['utilization'][row, column]),
+    }
+
+
+def plan_staffing(
+    service_points: Sequence[ServicePoint],
+    now: Optional[datetime] = None,
+    demand: Optional[Tuple[np.ndarray, np.ndarray]] = None
+) -> List[StaffingPlan]:
+    """
+    Effectif recommandé de tous les points fournis, en une évaluation
+    vectorisée. La demande (arrivées par heure, temps de service) est
+    mesurée sur la dernière heure, sauf si elle est fournie (prévision).
+    """
+    service_points = list(service_points)
+    if not service_points:
+        return []
+    rates, service = demand if demand is not None else measure_demand(service_points, now)
+    bounds = np.array([_bounds(service_point) for service_point in service_points])
+    table = staffing_table(rates, service)
+    best = optimal_servers(table, bounds[:, 0], bounds[:, 1])
+    return [
+        StaffingPlan(
+            service_point=service_point,
+            arrivals_per_hour=float(rates[row]),
+            service_minutes=float(service[row]),
+            current_servers=int(bounds[row, 2]),
+            optimal_servers=int(best[row]),
+            current=_row(table, row, int(bounds[row, 2])),
+            optimal=_row(table, row, int(best[row])),
+        )
+        for row, service_point in enumerate(service_points)
+    ]
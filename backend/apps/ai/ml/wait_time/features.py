@@ -0,0 +1,167 @@
+import numpy as np
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Sequence
+
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from apps.queues.models import ServicePoint, Ticket
+
+# Ordre des colonnes de la matrice de features (identique à l'entraînement)
+FEATURE_NAMES = [
+    'hour',
+    'day_of_week',
+    'is_weekend',
+    'is_holiday',
+    'current_length',
+    'avg_service_time',
+    'num_service_points',
+    'avg_wait_last_hour',
+    'abandonment_rate',
+    'trend_wait_time',
+    'trend_arrivals',
+]
+
+TREND_HOURS = 24
+
+# Points de service comptés dans num_service_points
+OPEN_SERVICE_POINT_STATUSES = [ServicePoint.Status.AVAILABLE, ServicePoint.Status.BUSY]
+
+
+def _minutes(duration) -> float:
+    return duration.total_seconds() / 60 if duration else 0.0
+
+
+def masked_slopes(values: np.ndarray) -> np.ndarray:
+    """
+    Pente de la régression linéaire de chaque ligne de values (n, T),
+    en ignorant les NaN. Équivaut à np.polyfit(x, y, 1)[0] ligne par ligne.
+    """
+    mask = ~np.isnan(values)
+    x = np.broadcast_to(np.arange(values.shape[1], dtype=float), values.shape)
+    counts = mask.sum(axis=1)
+    safe_counts = np.maximum(counts, 1)
+    y = np.where(mask, values, 0.0)
+    x_mean = np.where(mask, x, 0.0).sum(axis=1) / safe_counts
+    y_mean = y.sum(axis=1) / safe_counts
+    dx = np.where(mask, x - x_mean[:, None], 0.0)
+    dy = np.where(mask, y - y_mean[:, None], 0.0)
+    denominator = (dx * dx).sum(axis=1)
+    slopes = np.divide(
+        (dx * dy).sum(axis=1),
+        denominator,
+        out=np.zeros(values.shape[0]),
+        where=denominator > 0
+    )
+    return np.where(counts >= 2, slopes, 0.0)
+
+
+def service_point_counts(queue_ids: Sequence) -> Dict:
+    """
+    Points de service ouverts par file, en une requête. Seule définition
+    de num_service_points, partagée par l'entraînement et l'inférence.
+    """
+    return dict(
+        ServicePoint.objects.filter(
+            assigned_queues__in=list(queue_ids),
+            status__in=OPEN_SERVICE_POINT_STATUSES
+        ).values_list('assigned_queues').annotate(count=Count('id', distinct=True)).order_by()
+    )
+
+
+def build_feature_matrix(queue_ids: Sequence, now: datetime = None, is_holiday: int = 0) -> np.ndarray:
+    """
+    Construit la matrice de features (len(queue_ids), len(FEATURE_NAMES))
+    à partir de trois requêtes agrégées, quel que soit le nombre de files.
+    """
+    now = now or timezone.now()
+    local_now = timezone.localtime(now)
+    queue_ids = list(queue_ids)
+    row = {queue_id: index for index, queue_id in enumerate(queue_ids)}
+    matrix = np.zeros((len(queue_ids), len(FEATURE_NAMES)))
+    column = {name: index for index, name in enumerate(FEATURE_NAMES)}
+
+    # Features temporelles, communes à toutes les files
+    matrix[:, column['hour']] = local_now.hour
+    matrix[:, column['day_of_week']] = local_now.weekday()
+    matrix[:, column['is_weekend']] = 1 if local_now.weekday() >= 5 else 0
+    matrix[:, column['is_holiday']] = is_holiday
+
+    last_hour = now - timedelta(hours=1)
+    last_day = now - timedelta(days=1)
+    service_duration = ExpressionWrapper(
+        F('service_end_time') - F('service_start_time'),
+        output_field=DurationField()
+    )
+    wait_duration = ExpressionWrapper(
+        F('called_time') - F('check_in_time'),
+        output_field=DurationField()
+    )
+
+    # 1. Longueur, temps de service, attente récente et abandons par file
+    stats = Ticket.objects.filter(
+        Q(status=Ticket.Status.WAITING)
+        | Q(check_in_time__gte=last_day)
+        | Q(service_end_time__gte=last_day)
+        | Q(called_time__gte=last_hour),
+        queue_id__in=queue_ids
+    ).values('queue_id').annotate(
+        current_length=Count('id', filter=Q(status=Ticket.Status.WAITING)),
+        avg_service_time=Avg(
+            service_duration,
+            filter=Q(status=Ticket.Status.COMPLETED, service_end_time__gte=last_day)
+        ),
+        avg_wait_last_hour=Avg(
+            wait_duration,
+            filter=Q(called_time__gte=last_hour)
+        ),
+        day_total=Count('id', filter=Q(check_in_time__gte=last_day)),
+        day_abandoned=Count('id', filter=Q(
+            check_in_time__gte=last_day,
+            status__in=[Ticket.Status.CANCELLED, Ticket.Status.NO_SHOW]
+        )),
+    ).order_by()
+    for values in stats:
+        index = row[values['queue_id']]
+        matrix[index, column['current_length']] = values['current_length']
+        matrix[index, column['avg_service_time']] = _minutes(values['avg_service_time'])
+        matrix[index, column['avg_wait_last_hour']] = _minutes(values['avg_wait_last_hour'])
+        if values['day_total']:
+            matrix[index, column['abandonment_rate']] = values['day_abandoned'] / values['day_total']
+
+    # 2. Points de service ouverts par file
+    for queue_id, count in service_point_counts(queue_ids).items():
+        matrix[row[queue_id], column['num_service_points']] = count
+
+    # 3. Séries horaires sur 24h pour les tendances (pente vectorisée)
+    start = (now - timedelta(hours=TREND_HOURS)).astimezone(dt_timezone.utc).replace(
+        minute=0, second=0, microsecond=0
+    )
+    slots = TREND_HOURS + 1
+    arrivals = np.zeros((len(queue_ids), slots))
+    waits = np.full((len(queue_ids), slots), np.nan)
+    hourly = Ticket.objects.filter(
+        queue_id__in=queue_ids,
+        check_in_time__gte=start
+    ).annotate(
+        hour=TruncHour('check_in_time', tzinfo=dt_timezone.utc)
+    ).values('queue_id', 'hour').annotate(
+        arrivals=Count('id'),
+        wait=Avg(wait_duration)
+    ).order_by()
+    for values in hourly:
+        slot = min(int((values['hour'] - start).total_seconds() // 3600), slots - 1)
+        index = row[values['queue_id']]
+        arrivals[index, slot] = values['arrivals']
+        if values['wait'] is not None:
+            waits[index, slot] = _minutes(values['wait'])
+    matrix[:, column['trend_arrivals']] = masked_slopes(arrivals)
+    matrix[:, column['trend_wait_time']] = masked_slopes(waits)
+
+    return matrix
+
+
+def feature_dicts(matrix: np.ndarray) -> List[dict]:
+    """Lignes de la matrice sous forme de dictionnaires (features_used)"""
+    return [dict(zip(FEATURE_NAMES, values)) for values in matrix.tolist()]
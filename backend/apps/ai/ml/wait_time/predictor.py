@@ -1,132 +1,105 @@
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
-import pandas as pd
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.preprocessing import StandardScaler
-from prophet import Prophet
+from django.utils import timezone
 
-from apps.ai.models import MLModel, WaitTimePrediction
+from apps.ai.models import WaitTimePrediction
+from apps.ai.ml.forecasting.arrivals import forecast_arrivals
+from apps.ai.ml.registry import model_registry
+from apps.ai.ml.resource_opt.staffing import DEFAULT_SERVICE_MINUTES, staffing_table
 from apps.queues.models import Queue
+from apps.ai.ml.wait_time.features import FEATURE_NAMES, build_feature_matrix, feature_dicts
 
 
 class WaitTimePredictor:
     """Prédicteur hybride combinant plusieurs modèles pour une meilleure précision"""
 
-    def __init__(self, queue_id: str):
+    def __init__(self, queue_id: Optional[str] = None):
         self.queue_id = queue_id
         self.gb_model = None
-        self.prophet_model = None
-        self.scaler = StandardScaler()
+        self.gb_estimator = None
         self.feature_importance = {}
         self.load_models()
 
     def load_models(self):
-        """Charge ou crée les modèles nécessaires"""
-        try:
-            self.gb_model = MLModel.objects.get(
-                type='wait_time',
-                name='gradient_boosting',
-                status='active'
-            )
-            self.prophet_model = MLModel.objects.get(
-                type='wait_time',
-                name='prophet',
-                status='active'
-            )
-        except MLModel.DoesNotExist:
-            # Les modèles seront créés lors du premier entraînement
-            pass
+        """Récupère les modèles actifs depuis le registre du processus"""
+        gradient_boosting = model_registry.get('wait_time', 'gradient_boosting')
+        if gradient_boosting is not None:
+            self.gb_model = gradient_boosting.record
+            self.gb_estimator = gradient_boosting.estimator
+        # Les modèles seront créés lors du premier entraînement
 
     def prepare_features(self, queue: Queue) -> Tuple[np.ndarray, List[str]]:
-        """Prépare les features pour la prédiction"""
-        now = datetime.now()
-        
-        # Features temporelles
-        features = {
-            'hour': now.hour,
-            'day_of_week': now.weekday(),
-            'is_weekend': 1 if now.weekday() >= 5 else 0,
-            'is_holiday': self._check_if_holiday(now),
-            
-            # Features de la file
-            'current_length': queue.get_current_length(),
-            'avg_service_time': queue.get_average_service_time(),
-            'num_service_points': queue.service_points.filter(
-                status='active'
-            ).count(),
-            
-            # Métriques historiques
-            'avg_wait_last_hour': queue.get_average_wait_time(
-                time_window=timedelta(hours=1)
-            ),
-            'abandonment_rate': queue.get_abandonment_rate(
-                time_window=timedelta(days=1)
-            ),
-        }
-        
-        # Ajouter les tendances récentes
-        historical_data = queue.get_historical_metrics(
-            time_window=timedelta(hours=24)
+        """Prépare les features pour la prédiction (non normalisées : le pipeline s'en charge)"""
+        matrix = build_feature_matrix(
+            [queue.id],
+            is_holiday=self._check_if_holiday(timezone.localtime())
         )
-        if historical_data:
-            features.update({
-                'trend_wait_time': self._calculate_trend(
-                    historical_data['wait_times']
-                ),
-                'trend_arrivals': self._calculate_trend(
-                    historical_data['arrival_rates']
-                ),
-            })
-        
-        feature_names = list(features.keys())
-        feature_values = np.array([list(features.values())])
-        
-        return self.scaler.fit_transform(feature_values), feature_names
+        return matrix, list(FEATURE_NAMES)
 
     def predict(self, queue: Queue) -> Dict:
         """Génère une prédiction du temps d'attente"""
-        features, feature_names = self.prepare_features(queue)
-        
-        # Prédiction avec GradientBoosting
-        gb_prediction = self.gb_model.predict(features)[0]
-        
-        # Prédiction avec Prophet
-        prophet_prediction = self._get_prophet_prediction(queue)
-        
-        # Combinaison des prédictions avec pondération
-        final_prediction = (0.7 * gb_prediction + 0.3 * prophet_prediction)
-        
-        # Calcul de la confiance
-        confidence = self._calculate_confidence(
-            gb_prediction,
-            prophet_prediction,
-            queue
-        )
-        
-        # Identification des facteurs d'influence
-        factors = self._identify_influence_factors(
-            features,
-            feature_names,
-            final_prediction
-        )
-        
-        # Enregistrement de la prédiction
-        prediction = WaitTimePrediction.objects.create(
-            queue=queue,
-            model=self.gb_model,
-            predicted_wait_time=int(final_prediction),
-            confidence=confidence,
-            features_used=dict(zip(feature_names, features.flatten().tolist())),
-            prediction_factors=factors
+        return self.predict_batch([queue])[queue.id]
+
+    def predict_batch(self, queues: List[Queue]) -> Dict:
+        """
+        Prédit le temps d'attente de plusieurs files en un seul appel :
+        une matrice de features construite par requêtes agrégées, un
+        predict vectorisé et une insertion groupée des prédictions. Sans
+        modèle actif, seule l'estimation théorique est retournée
+        (fallback). Retourne les résultats indexés par identifiant de file.
+        """
+        if not queues:
+            return {}
+        features = build_feature_matrix(
+            [queue.id for queue in queues],
+            is_holiday=self._check_if_holiday(timezone.localtime())
         )
-        
+
+        # Estimation par file d'attente à partir des arrivées prévues
+        forecast_predictions = self._get_forecast_predictions(queues, features)
+
+        if self.gb_estimator is None:
+            # Aucun modèle actif (avant le premier entraînement) : estimation théorique seule
+            gb_predictions = None
+            final_predictions = forecast_predictions
+            factors = []
+        else:
+            # Prédiction avec le pipeline ajusté hors ligne (transform + predict)
+            gb_predictions = np.asarray(self.gb_estimator.predict(features), dtype=float)
+            # Combinaison des prédictions avec pondération
+            final_predictions = 0.7 * gb_predictions + 0.3 * forecast_predictions
+            # Les importances sont globales au modèle : mêmes facteurs pour toutes les files
+            factors = self._identify_influence_factors(features, list(FEATURE_NAMES), 0)
+        factor_names = [factor['factor'] for factor in factors]
+
+        # Calcul de la confiance
+        confidences = self._calculate_confidences(gb_predictions, forecast_predictions, features)
+
+        # Enregistrement groupé des prédictions
+        predictions = WaitTimePrediction.objects.bulk_create([
+            WaitTimePrediction(
+                queue=queue,
+                model=self.gb_model,
+                predicted_wait_time=int(final_predictions[index]),
+                confidence=float(confidences[index]),
+                features_used=features_used,
+                prediction_factors=factor_names
+            )
+            for index, (queue, features_used) in enumerate(zip(queues, feature_dicts(features)))
+        ])
+
         return {
-            'estimated_wait_time': int(final_prediction),
-            'confidence': confidence,
-            'factors': factors,
-            'prediction_id': prediction.id
+            queue.id: {
+                'queue_id': queue.id,
+                'estimated_wait_time': int(final_predictions[index]),
+                'confidence': float(confidences[index]),
+                'factors': factors,
+                'fallback': gb_predictions is None,
+                'prediction_id': predictions[index].id
+            }
+            for index, queue in enumerate(queues)
         }
 
     def _calculate_trend(self, data: List[float]) -> float:
@@ -143,35 +116,54 @@ class WaitTimePredictor:
         # À implémenter avec un calendrier de jours fériés
         return 0
 
-    def _get_prophet_prediction(self, queue: Queue) -> float:
-        """Obtient une prédiction via Prophet"""
-        # À implémenter avec Facebook Prophet
-        return 0
+    def _get_forecast_predictions(self, queues: List[Queue], features: np.ndarray) -> np.ndarray:
+        """
+        Attente estimée par la théorie des files : arrivées prévues sur
+        l'heure à venir, temps de service et guichets des features. Le
+        plus grand de l'écoulement de la file actuelle et de l'attente
+        M/M/c, plus la surcharge éventuelle si la demande dépasse la capacité.
+        """
+        column = {name: index for index, name in enumerate(FEATURE_NAMES)}
+        forecasts = forecast_arrivals([queue.id for queue in queues], horizon=1)
+        arrivals = np.array([
+            forecasts[queue.id][0] if queue.id in forecasts else 0.0 for queue in queues
+        ])
+        service = features[:, column['avg_service_time']]
+        service = np.where(service > 0, service, DEFAULT_SERVICE_MINUTES)
+        servers = np.maximum(features[:, column['num_service_points']], 1).astype(int)
 
-    def _calculate_confidence(
+        table = staffing_table(arrivals, service, max_servers=int(servers.max()))
+        steady_wait = table['avg_wait'][np.arange(len(queues)), servers - 1]
+        backlog = features[:, column['current_length']] * service / servers
+        # Demande excédentaire sur l'heure : attente moyenne de la moitié du surplus
+        overflow = np.maximum(arrivals - 60 * servers / service, 0) * service / servers / 2
+        steady_wait = np.where(np.isfinite(steady_wait), steady_wait, 0.0)
+        return np.maximum(backlog, steady_wait) + overflow
+
+    def _calculate_confidences(
         self,
-        gb_pred: float,
-        prophet_pred: float,
-        queue: Queue
-    ) -> float:
-        """Calcule le niveau de confiance de la prédiction"""
-        # Différence entre les prédictions
-        pred_diff = abs(gb_pred - prophet_pred) / max(gb_pred, prophet_pred)
-        
-        # Qualité des données historiques
-        historical_quality = self._assess_historical_data_quality(queue)
-        
-        # Stabilité récente
-        stability = self._assess_queue_stability(queue)
-        
-        # Combine les facteurs
+        gb_preds: Optional[np.ndarray],
+        forecast_preds: np.ndarray,
+        features: np.ndarray
+    ) -> np.ndarray:
+        """Niveau de confiance de chaque prédiction, calculé sur tout le lot"""
+        if gb_preds is None:
+            # Estimation théorique seule : pas d'accord entre modèles à mesurer
+            agreement = np.zeros_like(forecast_preds)
+        else:
+            scale = np.maximum(gb_preds, forecast_preds)
+            agreement = 1 - np.divide(
+                np.abs(gb_preds - forecast_preds),
+                scale,
+                out=np.zeros_like(scale),
+                where=scale > 0
+            )
         confidence = (
-            0.4 * (1 - pred_diff) +  # accord entre les modèles
-            0.3 * historical_quality +  # qualité des données
-            0.3 * stability  # stabilité de la file
+            0.4 * agreement +  # accord entre les modèles
+            0.3 * self._assess_historical_data_quality(features) +  # qualité des données
+            0.3 * self._assess_queue_stability(features)  # stabilité de la file
         )
-        
-        return max(0.0, min(1.0, confidence))
+        return np.clip(confidence, 0.0, 1.0)
 
     def _identify_influence_factors(
         self,
@@ -183,7 +175,7 @@ class WaitTimePredictor:
         # Utilise SHAP ou une autre méthode d'explicabilité
         # Pour cet exemple, utilise une méthode simplifiée
         factors = []
-        feature_impacts = self.gb_model.feature_importances_
+        feature_impacts = self.gb_estimator.named_steps['model'].feature_importances_
         
         for name, impact in zip(feature_names, feature_impacts):
             if impact > 0.1:  # seuil arbitraire
@@ -194,12 +186,12 @@ class WaitTimePredictor:
         
         return sorted(factors, key=lambda x: abs(x['impact']), reverse=True)[:3]
 
-    def _assess_historical_data_quality(self, queue: Queue) -> float:
-        """Évalue la qualité des données historiques"""
+    def _assess_historical_data_quality(self, features: np.ndarray) -> np.ndarray:
+        """Évalue la qualité des données historiques de chaque file"""
         # À implémenter : vérification de la complétude et cohérence
-        return 0.8
+        return np.full(len(features), 0.8)
 
-    def _assess_queue_stability(self, queue: Queue) -> float:
-        """Évalue la stabilité récente de la file"""
+    def _assess_queue_stability(self, features: np.ndarray) -> np.ndarray:
+        """Évalue la stabilité récente de chaque file"""
         # À implémenter : analyse de la variance récente
-        return 0.7
+        return np.full(len(features), 0.7)
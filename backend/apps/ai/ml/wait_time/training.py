@@ -0,0 +1,256 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.metrics import mean_absolute_error
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from apps.ai.models import MLModel
+from apps.ai.ml.wait_time.features import FEATURE_NAMES, TREND_HOURS, masked_slopes, service_point_counts
+from apps.queues.models import Ticket
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = getattr(settings, 'AI_MODEL_DIR', os.path.join(settings.BASE_DIR, 'ml_models'))
+
+MODEL_TYPE = 'wait_time'
+MODEL_NAME = 'gradient_boosting'
+
+# En deçà, l'entraînement est reporté
+MIN_TRAINING_SAMPLES = 200
+
+# Part la plus récente de l'historique réservée à l'évaluation
+HOLDOUT_FRACTION = 0.2
+
+GB_PARAMETERS = {
+    'n_estimators': 200,
+    'max_depth': 3,
+    'learning_rate': 0.05,
+    'subsample': 0.8,
+    'random_state': 42,
+}
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def build_pipeline() -> Pipeline:
+    """Scaler et régresseur ajustés ensemble, sérialisés en un seul artefact"""
+    return Pipeline([
+        ('scaler', StandardScaler()),
+        ('model', GradientBoostingRegressor(**GB_PARAMETERS)),
+    ])
+
+
+def _epoch(series: pd.Series) -> np.ndarray:
+    """Horodatages en secondes (NaN si absents)"""
+    values = pd.to_datetime(series, utc=True)
+    return (values - pd.Timestamp(0, tz='UTC')).dt.total_seconds().to_numpy(dtype=float)
+
+
+def _window_mean(times: np.ndarray, values: np.ndarray, at: np.ndarray, width: float) -> np.ndarray:
+    """Moyenne de values sur ]at - width, at] (0 si vide), times triés"""
+    cumulative = np.concatenate([[0.0], np.cumsum(values)])
+    high = np.searchsorted(times, at, side='right')
+    low = np.searchsorted(times, at - width, side='right')
+    counts = high - low
+    sums = cumulative[high] - cumulative[low]
+    return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+
+def _window_count(times: np.ndarray, at: np.ndarray, width: float) -> np.ndarray:
+    return np.searchsorted(times, at, side='right') - np.searchsorted(times, at - width, side='right')
+
+
+def _queue_features(frame: pd.DataFrame, service_points: int) -> np.ndarray:
+    """
+    Features de chaque ticket d'une file, à son heure d'arrivée, calculées
+    comme build_feature_matrix les calcule en ligne au même instant.
+    """
+    check_in = _epoch(frame['check_in_time'])
+    called = _epoch(frame['called_time'])
+    started = _epoch(frame['service_start_time'])
+    ended = _epoch(frame['service_end_time'])
+    status = frame['status'].to_numpy()
+    n = len(frame)
+    features = np.zeros((n, len(FEATURE_NAMES)))
+    column = {name: index for index, name in enumerate(FEATURE_NAMES)}
+
+    local = pd.to_datetime(frame['check_in_time'], utc=True).dt.tz_convert(settings.TIME_ZONE)
+    features[:, column['hour']] = local.dt.hour.to_numpy()
+    features[:, column['day_of_week']] = local.dt.weekday.to_numpy()
+    features[:, column['is_weekend']] = (local.dt.weekday >= 5).to_numpy()
+
+    # Longueur de la file : arrivés avant t moins sortis de l'attente avant t
+    order = np.sort(check_in)
+    left = np.where(np.isnan(called), ended, called)
+    left = np.sort(left[~np.isnan(left)])
+    features[:, column['current_length']] = (
+        np.searchsorted(order, check_in, side='left') - np.searchsorted(left, check_in, side='right')
+    )
+
+    # Temps de service moyen des tickets terminés sur 24h
+    completed = (status == Ticket.Status.COMPLETED) & ~np.isnan(started) & ~np.isnan(ended)
+    by_end = np.argsort(ended[completed])
+    features[:, column['avg_service_time']] = _window_mean(
+        ended[completed][by_end],
+        ((ended - started)[completed][by_end]) / 60,
+        check_in, DAY
+    )
+
+    # Attente moyenne des tickets appelés dans l'heure
+    was_called = ~np.isnan(called)
+    by_call = np.argsort(called[was_called])
+    features[:, column['avg_wait_last_hour']] = _window_mean(
+        called[was_called][by_call],
+        ((called - check_in)[was_called][by_call]) / 60,
+        check_in, HOUR
+    )
+
+    # Abandons clos avant t parmi les arrivées des dernières 24h
+    abandoned = np.isin(status, [Ticket.Status.CANCELLED, Ticket.Status.NO_SHOW]) & ~np.isnan(ended)
+    arrivals_day = _window_count(order, check_in, DAY) - 1
+    abandoned_day = _window_count(np.sort(ended[abandoned]), check_in, DAY)
+    features[:, column['abandonment_rate']] = np.divide(
+        abandoned_day, arrivals_day,
+        out=np.zeros(n), where=arrivals_day > 0
+    )
+
+    features[:, column['num_service_points']] = service_points
+
+    # Tendances : même fenêtre horaire de TREND_HOURS + 1 créneaux qu'en ligne
+    # (le créneau courant inclut toute l'heure, approximation acceptée)
+    slot = np.floor(check_in / HOUR).astype(np.int64)
+    first = slot.min() - TREND_HOURS
+    length = slot.max() - first + 1
+    index = slot - first
+    arrivals = np.bincount(index, minlength=length).astype(float)
+    wait_sum = np.bincount(index[was_called], weights=(called - check_in)[was_called] / 60, minlength=length)
+    wait_count = np.bincount(index[was_called], minlength=length)
+    waits = np.divide(wait_sum, wait_count, out=np.full(length, np.nan), where=wait_count > 0)
+    window = TREND_HOURS + 1
+    arrival_windows = np.lib.stride_tricks.sliding_window_view(arrivals, window)
+    wait_windows = np.lib.stride_tricks.sliding_window_view(waits, window)
+    start = index - TREND_HOURS
+    unique_starts, inverse = np.unique(start, return_inverse=True)
+    features[:, column['trend_arrivals']] = masked_slopes(arrival_windows[unique_starts])[inverse]
+    features[:, column['trend_wait_time']] = masked_slopes(wait_windows[unique_starts])[inverse]
+
+    return features
+
+
+def build_training_set(since: datetime, until: Optional[datetime] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Matrice de features, cible (attente en minutes) et horodatage des
+    tickets appelés entre since et until.
+    """
+    until = until or timezone.now()
+    # Une journée d'historique en amont alimente les fenêtres glissantes
+    frame = pd.DataFrame(list(
+        Ticket.objects.filter(
+            check_in_time__gte=since - timedelta(days=1),
+            check_in_time__lt=until
+        ).values(
+            'queue_id', 'status', 'check_in_time', 'called_time',
+            'service_start_time', 'service_end_time'
+        ).order_by('queue_id', 'check_in_time')
+    ))
+    empty = np.empty((0, len(FEATURE_NAMES))), np.empty(0), np.empty(0)
+    if frame.empty:
+        return empty
+
+    # Effectif courant, compté comme en ligne (l'historique des statuts n'est pas conservé)
+    service_points = service_point_counts(frame['queue_id'].unique().tolist())
+
+    matrices, targets, times = [], [], []
+    since_epoch = since.timestamp()
+    for queue_id, group in frame.groupby('queue_id', sort=False):
+        group = group.reset_index(drop=True)
+        features = _queue_features(group, service_points.get(queue_id, 0))
+        check_in = _epoch(group['check_in_time'])
+        called = _epoch(group['called_time'])
+        keep = ~np.isnan(called) & (check_in >= since_epoch)
+        matrices.append(features[keep])
+        targets.append((called[keep] - check_in[keep]) / 60)
+        times.append(check_in[keep])
+
+    if not matrices:
+        return empty
+    return np.vstack(matrices), np.concatenate(targets), np.concatenate(times)
+
+
+def train_wait_time_model(days: int = 90, activate: bool = True) -> Optional[MLModel]:
+    """
+    Entraîne hors ligne le pipeline scaler + GradientBoosting sur l'historique
+    des tickets, l'évalue sur la période la plus récente, le sérialise et
+    l'enregistre comme nouvelle version de MLModel.
+    """
+    now = timezone.now()
+    X, y, times = build_training_set(now - timedelta(days=days), now)
+    if len(y) < MIN_TRAINING_SAMPLES:
+        logger.info(f"Entraînement reporté : {len(y)} échantillon(s) disponibles")
+        return None
+
+    # Évaluation sur la fin de période (pas de mélange temporel)
+    order = np.argsort(times)
+    X, y = X[order], y[order]
+    split = int(len(y) * (1 - HOLDOUT_FRACTION))
+    evaluation = build_pipeline().fit(X[:split], y[:split])
+    mae = float(mean_absolute_error(y[split:], evaluation.predict(X[split:])))
+
+    pipeline = build_pipeline().fit(X, y)
+    latency = benchmark_prediction_latency(pipeline, X[-1:])
+
+    version = now.strftime('%Y%m%d%H%M%S')
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    file_path = os.path.join(MODEL_DIR, f"{MODEL_TYPE}_{MODEL_NAME}_{version}.joblib")
+    # Sans compression, pour permettre le chargement en mmap
+    joblib.dump(pipeline, file_path, compress=0)
+
+    with transaction.atomic():
+        if activate:
+            MLModel.objects.filter(
+                type=MODEL_TYPE,
+                name=MODEL_NAME,
+                status='active'
+            ).update(status='inactive')
+        record = MLModel.objects.create(
+            type=MODEL_TYPE,
+            name=MODEL_NAME,
+            version=version,
+            status='active' if activate else 'inactive',
+            file_path=file_path,
+            parameters={'features': FEATURE_NAMES, **GB_PARAMETERS},
+            metrics={
+                'samples': int(len(y)),
+                'holdout_mae': mae,
+                'predict_latency_ms': latency['median_ms'],
+            }
+        )
+    logger.info(f"Modèle {MODEL_NAME} {version} entraîné (MAE {mae:.2f} min)")
+    return record
+
+
+def benchmark_prediction_latency(estimator, row: np.ndarray, repeats: int = 1000) -> Dict:
+    """Latence d'une prédiction unitaire en processus (transform + predict)"""
+    estimator.predict(row)
+    durations = np.empty(repeats)
+    for index in range(repeats):
+        started = time.perf_counter()
+        estimator.predict(row)
+        durations[index] = time.perf_counter() - started
+    durations *= 1000
+    return {
+        'median_ms': float(np.median(durations)),
+        'p99_ms': float(np.percentile(durations, 99)),
+    }
@@ -124,6 +124,11 @@ class ChatMessage(BaseModel):
 
 class QueueAnomaly(BaseModel):
     """Anomalies détectées dans les files d'attente"""
+    # Types du scanner de flotte (z-scores), distincts de ceux du détecteur par file
+    FLEET_PREFIX = 'fleet_'
+    # Statuts d'une anomalie ouverte : une seule par (file, type)
+    OPEN_STATUSES = ('detected', 'investigating')
+
     queue = models.ForeignKey(Queue, on_delete=models.CASCADE)
     model = models.ForeignKey(MLModel, on_delete=models.SET_NULL, null=True)
     type = models.CharField(
@@ -133,6 +138,10 @@ class QueueAnomaly(BaseModel):
             ('abandonment', 'Abandon'),
             ('service_time', 'Temps de service'),
             ('pattern', 'Motif inhabituel'),
+            ('fleet_wait_time', 'Temps d\'attente (flotte)'),
+            ('fleet_abandonment', 'Abandon (flotte)'),
+            ('fleet_service_time', 'Temps de service (flotte)'),
+            ('fleet_pattern', 'Motif inhabituel (flotte)'),
         ]
     )
     severity = models.CharField(
@@ -161,3 +170,70 @@ class QueueAnomaly(BaseModel):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Queue anomalies'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['queue', 'type'],
+                condition=models.Q(status__in=('detected', 'investigating')),
+                name='queueanomaly_one_open_per_type',
+            ),
+        ]
+
+    @property
+    def base_type(self) -> str:
+        """Type sans l'espace de noms du détecteur (wait_time, abandonment...)"""
+        return self.type.removeprefix(self.FLEET_PREFIX)
+
+
+class QueueSeasonalBaseline(BaseModel):
+    """
+    Profil saisonnier d'une file par heure de la semaine (168 créneaux,
+    lundi 0h = indice 0), recalculé chaque nuit depuis l'historique
+    """
+    HOURS_PER_WEEK = 168
+
+    queue = models.OneToOneField(
+        Queue,
+        on_delete=models.CASCADE,
+        related_name='seasonal_baseline'
+    )
+    arrivals_mean = ArrayField(models.FloatField(), size=HOURS_PER_WEEK)
+    arrivals_std = ArrayField(models.FloatField(), size=HOURS_PER_WEEK)
+    wait_mean = ArrayField(models.FloatField(), size=HOURS_PER_WEEK)  # en minutes
+    wait_std = ArrayField(models.FloatField(), size=HOURS_PER_WEEK)
+    service_mean = ArrayField(models.FloatField(), size=HOURS_PER_WEEK)  # en minutes
+    service_std = ArrayField(models.FloatField(), size=HOURS_PER_WEEK)
+    weeks = models.PositiveIntegerField(default=0)  # profondeur d'historique
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Seasonal baseline'
+
+
+class QueueArrivalForecast(BaseModel):
+    """
+    Prévision horaire des arrivées d'une file sur la semaine suivant
+    `origin` (168 valeurs), ajustée chaque nuit
+    """
+    HORIZON_HOURS = 168
+
+    queue = models.OneToOneField(
+        Queue,
+        on_delete=models.CASCADE,
+        related_name='arrival_forecast'
+    )
+    method = models.CharField(
+        max_length=20,
+        choices=[
+            ('seasonal_naive', 'Saisonnier naïf'),
+            ('smoothing', 'Lissage exponentiel saisonnier'),
+            ('prophet', 'Prophet'),
+        ]
+    )
+    origin = models.DateTimeField()  # début de l'heure de la première valeur
+    values = ArrayField(models.FloatField(), size=HORIZON_HOURS)  # arrivées par heure
+    parameters = models.JSONField(default=dict)
+    mae = models.FloatField(null=True)  # erreur sur la dernière semaine (arrivées/heure)
+    fitted_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Arrival forecast'
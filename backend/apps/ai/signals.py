@@ -0,0 +1,44 @@
+from celery.signals import worker_process_init
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.queues.models import Ticket
+from apps.queues.signals import ticket_status_changed, tickets_bulk_status_changed
+from .models import MLModel
+
+
+@receiver(post_save, sender=MLModel)
+def swap_active_model(sender, instance, **kwargs):
+    """Substitue immédiatement la nouvelle version active dans ce processus"""
+    if instance.status != 'active':
+        return
+    from .ml.registry import model_registry
+    transaction.on_commit(
+        lambda: model_registry.refresh(instance.type, instance.name)
+    )
+
+
+@worker_process_init.connect
+def warm_models(**kwargs):
+    """Précharge les modèles actifs dans chaque processus worker Celery"""
+    from .ml.registry import model_registry
+    model_registry.warm()
+
+
+@receiver(ticket_status_changed, sender=Ticket)
+def accumulate_queue_metrics(sender, ticket, old_status, new_status, **kwargs):
+    """Alimente l'accumulateur glissant utilisé par la détection d'anomalies"""
+    from .ml.anomaly.accumulator import metric_accumulator
+    metric_accumulator.record_transition(ticket, old_status, new_status)
+
+
+@receiver(tickets_bulk_status_changed, sender=Ticket)
+def accumulate_bulk_transitions(sender, queue_counts, new_status, waiting_counts=None, **kwargs):
+    """Comptabilise les sorties d'attente et les abandons des transitions de masse"""
+    from .ml.anomaly.accumulator import metric_accumulator
+    # Comme pour un ticket seul : un ticket annulé en attente sort aussi de la file
+    if waiting_counts:
+        metric_accumulator.record_counts(waiting_counts, 'dequeue')
+    if new_status in (Ticket.Status.CANCELLED, Ticket.Status.NO_SHOW):
+        metric_accumulator.record_counts(queue_counts, 'abandon')
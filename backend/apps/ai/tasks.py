@@ -0,0 +1,30 @@
+from celery import shared_task
+
+
+@shared_task
+def train_wait_time_models(days=90):
+    """Réentraîne le pipeline de prédiction du temps d'attente (quotidien)"""
+    from .ml.wait_time.training import train_wait_time_model
+    record = train_wait_time_model(days=days)
+    return record.version if record else None
+
+
+@shared_task
+def check_for_anomalies():
+    """Analyse groupée de toutes les files actives (toutes les 5 minutes)"""
+    from .ml.anomaly.scanner import fleet_scanner
+    return fleet_scanner.scan()
+
+
+@shared_task
+def compute_seasonal_baselines(weeks=8):
+    """Recalcule les profils saisonniers par créneau de chaque file (quotidien)"""
+    from .ml.anomaly.baselines import compute_baselines
+    return compute_baselines(weeks=weeks)
+
+
+@shared_task
+def fit_arrival_forecasts():
+    """Réajuste la prévision horaire des arrivées de chaque file (quotidien)"""
+    from .ml.forecasting.arrivals import fit_forecasts
+    return fit_forecasts()
@@ -0,0 +1,128 @@
+import unittest
+from unittest import mock
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from apps.core.models import Organization, OrganizationBranch
+from apps.queues.models import QueueType, Queue, Ticket
+from apps.queues.services.transitions import transition_engine
+from ..ml.anomaly.accumulator import BUCKET_SECONDS, METRICS, SLOTS, QueueWindows, metric_accumulator
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401 (scripts Lua de fakeredis)
+except ImportError:
+    fakeredis = None
+
+User = get_user_model()
+
+class QueueWindowsTests(SimpleTestCase):
+    def _windows(self, metric, values_by_bucket):
+        windows = QueueWindows.empty()
+        row = METRICS.index(metric)
+        for offset, values in values_by_bucket.items():
+            column = SLOTS - 1 - offset
+            windows.counts[row, column] = len(values)
+            windows.sums[row, column] = sum(values)
+            windows.squares[row, column] = sum(value * value for value in values)
+        return windows
+
+    def test_window_mean_and_variance_match_raw_values(self):
+        recent = {0: [10.0, 12.0], 5: [8.0]}
+        old = {100: [30.0, 40.0]}
+        windows = self._windows('wait', {**recent, **old})
+
+        last_hour = windows.stats('wait', 60)
+        last_day = windows.stats('wait', 24 * 60)
+
+        self.assertEqual(last_hour.count, 3)
+        self.assertAlmostEqual(last_hour.mean, 10.0)
+        all_values = [10.0, 12.0, 8.0, 30.0, 40.0]
+        self.assertAlmostEqual(last_day.mean, np.mean(all_values))
+        self.assertAlmostEqual(last_day.variance, np.var(all_values))
+
+    def test_trend_of_hourly_means(self):
+        group = 3600 // BUCKET_SECONDS
+        # Attente moyenne croissante de 1 minute par heure sur 6 heures
+        windows = self._windows('wait', {
+            hour * group: [float(10 - hour)] for hour in range(6)
+        })
+
+        self.assertAlmostEqual(windows.stats('wait', 6 * 60).trend, 1.0)
+
+    def test_abandonment_rate(self):
+        windows = self._windows('arrival', {0: [1.0] * 10})
+        windows.counts[METRICS.index('abandon'), -1] = 2
+
+        self.assertAlmostEqual(windows.rate('abandon', 'arrival', 60), 0.2)
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis[lua] requis pour l'accumulateur Redis")
+class TransitionAccumulationTests(TestCase):
+    def setUp(self):
+        organization = Organization.objects.create(name="Test Org")
+        branch = OrganizationBranch.objects.create(name="Test Branch", organization=organization)
+        queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            organization=organization,
+            branch=branch
+        )
+        self.queue = Queue.objects.create(queue_type=queue_type, name="Test Queue")
+        self.user = User.objects.create_user(email='client@example.com', password='clientpass123')
+        patcher = mock.patch.object(metric_accumulator, '_connection', fakeredis.FakeStrictRedis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _ticket(self, number):
+        return Ticket.objects.create(
+            queue=self.queue,
+            user=self.user,
+            number=number,
+            check_in_time=timezone.now()
+        )
+
+    def _counts(self):
+        windows = metric_accumulator.windows([self.queue.id])[self.queue.id]
+        return {metric: int(windows.counts[row].sum()) for row, metric in enumerate(METRICS)}
+
+    def test_ticket_transition_updates_counters(self):
+        ticket = self._ticket('A001')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_engine.transition_ticket(ticket, Ticket.Status.CANCELLED)
+
+        counts = self._counts()
+        self.assertEqual(counts['dequeue'], 1)
+        self.assertEqual(counts['abandon'], 1)
+
+    def test_bulk_cancel_from_waiting_records_dequeues(self):
+        self._ticket('A001')
+        self._ticket('A002')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_engine.bulk_transition_tickets(
+                Ticket.objects.filter(queue=self.queue),
+                Ticket.Status.CANCELLED
+            )
+
+        counts = self._counts()
+        self.assertEqual(counts['dequeue'], 2)
+        self.assertEqual(counts['abandon'], 2)
+
+    def test_called_then_cancelled_ticket_dequeues_once(self):
+        ticket = self._ticket('A001')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_engine.transition_ticket(ticket, Ticket.Status.CALLED)
+            ticket.refresh_from_db()
+            transition_engine.transition_ticket(ticket, Ticket.Status.CANCELLED)
+
+        rebuilt = metric_accumulator.from_database([self.queue.id])[self.queue.id]
+        rebuilt_counts = {metric: int(rebuilt.counts[row].sum()) for row, metric in enumerate(METRICS)}
+        self.assertEqual(rebuilt_counts['dequeue'], 1)
+        self.assertEqual(rebuilt_counts['abandon'], 1)
+        # Mêmes sorties que le chemin Redis alimenté par les transitions
+        live_counts = self._counts()
+        for metric in ('dequeue', 'wait', 'abandon'):
+            self.assertEqual(rebuilt_counts[metric], live_counts[metric])
@@ -0,0 +1,86 @@
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.core.models import Organization, OrganizationBranch
+from apps.queues.models import QueueType, Queue, ServicePoint
+from ..models import QueueAnomaly, ResourceOptimization, WaitTimePrediction
+
+User = get_user_model()
+
+
+class OrganizationScopeTests(TestCase):
+    def setUp(self):
+        own = Organization.objects.create(name="Own Org")
+        other = Organization.objects.create(name="Other Org")
+        self.agent = User.objects.create_user(
+            email='agent@example.com',
+            password='agentpass123',
+            organization=own
+        )
+        self.own_queue = self._queue(own, "Own")
+        self.other_queue = self._queue(other, "Other")
+        self.other_point = ServicePoint.objects.create(
+            name="Counter 1",
+            branch=self.other_queue.queue_type.branch
+        )
+        self.other_point.assigned_queues.add(self.other_queue)
+        self.other_anomaly = self._anomaly(self.other_queue)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.agent)
+
+    def _queue(self, organization, name):
+        branch = OrganizationBranch.objects.create(
+            name=f"{name} Branch",
+            code=name.upper(),
+            organization=organization
+        )
+        queue_type = QueueType.objects.create(
+            name=f"{name} Type",
+            organization=organization,
+            branch=branch
+        )
+        return Queue.objects.create(queue_type=queue_type, name=f"{name} Queue")
+
+    def _anomaly(self, queue):
+        return QueueAnomaly.objects.create(
+            queue=queue,
+            type='wait_time',
+            severity='high',
+            metrics={},
+            description="Temps d'attente anormal"
+        )
+
+    def test_other_organization_objects_are_not_found(self):
+        anomaly_kwargs = {'pk': self.other_queue.pk, 'anomaly_id': self.other_anomaly.pk}
+        responses = [
+            self.client.get(reverse('ai-predict-wait-time', kwargs={'pk': self.other_queue.pk})),
+            self.client.get(reverse('ai-optimize-resources', kwargs={'pk': self.other_point.pk})),
+            self.client.get(reverse('ai-detect-anomalies', kwargs={'pk': self.other_queue.pk})),
+            self.client.post(reverse('ai-investigate-anomaly', kwargs=anomaly_kwargs)),
+            self.client.post(reverse('ai-resolve-anomaly', kwargs=anomaly_kwargs), {}, format='json'),
+        ]
+
+        self.assertEqual([response.status_code for response in responses], [404] * 5)
+        self.assertFalse(WaitTimePrediction.objects.exists())
+        self.assertFalse(ResourceOptimization.objects.exists())
+        self.other_anomaly.refresh_from_db()
+        self.assertEqual(self.other_anomaly.status, 'detected')
+
+    def test_anomaly_must_belong_to_the_requested_queue(self):
+        # File de l'organisation, anomalie d'une autre file
+        url = reverse(
+            'ai-investigate-anomaly',
+            kwargs={'pk': self.own_queue.pk, 'anomaly_id': self.other_anomaly.pk}
+        )
+
+        self.assertEqual(self.client.post(url).status_code, 404)
+
+    def test_own_organization_queue_is_served(self):
+        with mock.patch('apps.ai.api.views.WaitTimePredictor') as predictor:
+            predictor.return_value.predict.return_value = {'estimated_wait_time': 5}
+            response = self.client.get(reverse('ai-predict-wait-time', kwargs={'pk': self.own_queue.pk}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'estimated_wait_time': 5})
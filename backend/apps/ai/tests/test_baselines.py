@@ -0,0 +1,158 @@
+import importlib
+import unittest
+from datetime import datetime, timedelta, timezone as dt_timezone
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from apps.core.models import Organization, OrganizationBranch
+from apps.queues.models import QueueType, Queue, Ticket
+from apps.queues.services.archive import archive_tickets
+from ..models import QueueSeasonalBaseline
+from ..ml.anomaly.baselines import (
+    HOURS_PER_WEEK, SeasonalProfile, baseline_window, compute_baselines, trailing_hour_slot
+)
+
+User = get_user_model()
+
+# Mercredi 10h05 UTC (TIME_ZONE = 'UTC')
+NOW = datetime(2024, 5, 15, 10, 5, tzinfo=dt_timezone.utc)
+
+# Les migrations étant désactivées en test, l'archive et la vue de
+# l'historique des tickets sont créées à partir du SQL des migrations
+archive_migration = importlib.import_module('apps.queues.migrations.0004_ticket_archive')
+notification_archive_migration = importlib.import_module('apps.queues.migrations.0006_queuenotification_archive')
+
+def _profile(arrivals_mean, arrivals_std=None, wait_mean=0.0, wait_std=0.0):
+    zeros = np.zeros(HOURS_PER_WEEK)
+    return SeasonalProfile(
+        arrivals_mean=np.asarray(arrivals_mean, dtype=float),
+        arrivals_std=zeros if arrivals_std is None else np.asarray(arrivals_std, dtype=float),
+        wait_mean=np.full(HOURS_PER_WEEK, wait_mean),
+        wait_std=np.full(HOURS_PER_WEEK, wait_std),
+        service_mean=zeros,
+        service_std=zeros,
+    )
+
+class SeasonalProfileTests(SimpleTestCase):
+    def test_peak_slots_are_the_busiest_open_hours(self):
+        arrivals = np.zeros(HOURS_PER_WEEK)
+        # Lundi 8h-17h ouvert, pointe à 10h et 15h
+        arrivals[8:18] = 10
+        arrivals[10] = arrivals[15] = 40
+        profile = _profile(arrivals)
+
+        self.assertTrue(profile.is_peak(10))
+        self.assertTrue(profile.is_peak(15))
+        self.assertFalse(profile.is_peak(12))
+        self.assertFalse(profile.is_peak(3))
+
+    def test_closed_queue_has_no_peak(self):
+        self.assertFalse(_profile(np.zeros(HOURS_PER_WEEK)).is_peak(10))
+
+    def test_arrival_deviation_uses_poisson_floor(self):
+        arrivals = np.full(HOURS_PER_WEEK, 16.0)
+        profile = _profile(arrivals, arrivals_std=np.full(HOURS_PER_WEEK, 1.0))
+
+        deviations = profile.deviations(10, arrivals=28, wait=None, service=None)
+
+        # écart-type plancher sqrt(16) = 4
+        self.assertAlmostEqual(deviations['arrivals']['z'], 3.0)
+        self.assertNotIn('wait_time', deviations)
+
+    def test_wait_deviation_against_slot_mean(self):
+        profile = _profile(np.full(HOURS_PER_WEEK, 5.0), wait_mean=10.0, wait_std=2.0)
+
+        deviations = profile.deviations(30, arrivals=5, wait=16.0, service=None)
+
+        self.assertAlmostEqual(deviations['wait_time']['z'], 3.0)
+        self.assertAlmostEqual(deviations['wait_time']['expected'], 10.0)
+
+    def test_trailing_hour_compares_against_its_midpoint_slot(self):
+        # ]9h05, 10h05] : essentiellement le créneau de 9h du mercredi
+        self.assertEqual(trailing_hour_slot(NOW), 2 * 24 + 9)
+        self.assertEqual(trailing_hour_slot(NOW.replace(minute=45)), 2 * 24 + 10)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Ticket history view requires PostgreSQL")
+class ComputeBaselinesTests(TestCase):
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute(archive_migration.CREATE_ARCHIVE_SQL)
+            cursor.execute(notification_archive_migration.CREATE_NOTIFICATION_ARCHIVE_SQL)
+        organization = Organization.objects.create(name="Test Org")
+        branch = OrganizationBranch.objects.create(name="Test Branch", organization=organization)
+        queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            organization=organization,
+            branch=branch
+        )
+        self.queue = Queue.objects.create(queue_type=queue_type, name="Test Queue")
+        self.queue_type = queue_type
+        self.user = User.objects.create_user(email='client@example.com', password='clientpass123')
+
+    def _arrivals(self, at, count, queue=None, status=Ticket.Status.WAITING):
+        for number in range(count):
+            ticket = Ticket.objects.create(
+                queue=queue or self.queue,
+                user=self.user,
+                number=f'{at:%m%d}-{number}',
+                status=status
+            )
+            Ticket.objects.filter(pk=ticket.pk).update(check_in_time=at)
+
+    def test_window_is_made_of_complete_weeks(self):
+        since, until = baseline_window(NOW, 2)
+
+        self.assertEqual(until, datetime(2024, 5, 13, tzinfo=dt_timezone.utc))
+        self.assertEqual(since, datetime(2024, 4, 29, tzinfo=dt_timezone.utc))
+
+    def test_current_partial_week_is_excluded(self):
+        monday_ten = datetime(2024, 5, 13, 10, tzinfo=dt_timezone.utc)
+        # Deux semaines complètes, puis la semaine en cours et une semaine hors fenêtre
+        self._arrivals(monday_ten - timedelta(weeks=1), 4)
+        self._arrivals(monday_ten - timedelta(weeks=2), 2)
+        self._arrivals(monday_ten, 30)
+        self._arrivals(monday_ten - timedelta(weeks=3), 30)
+
+        compute_baselines([self.queue.id], weeks=2, now=NOW)
+
+        baseline = QueueSeasonalBaseline.objects.get(queue=self.queue)
+        self.assertEqual(baseline.weeks, 2)
+        self.assertAlmostEqual(baseline.arrivals_mean[10], 3.0)
+        self.assertAlmostEqual(baseline.arrivals_std[10], 1.0)
+        self.assertEqual(sum(baseline.arrivals_mean), 3.0)
+
+    def test_archived_tickets_are_counted(self):
+        monday_ten = datetime(2024, 5, 13, 10, tzinfo=dt_timezone.utc)
+        self._arrivals(monday_ten - timedelta(weeks=1), 4, status=Ticket.Status.COMPLETED)
+        self._arrivals(monday_ten - timedelta(weeks=2), 2, status=Ticket.Status.COMPLETED)
+        archive_tickets(older_than_days=30)
+        self.assertFalse(Ticket.objects.exists())
+
+        compute_baselines([self.queue.id], weeks=2, now=NOW)
+
+        baseline = QueueSeasonalBaseline.objects.get(queue=self.queue)
+        self.assertEqual(baseline.weeks, 2)
+        self.assertAlmostEqual(baseline.arrivals_mean[10], 3.0)
+        self.assertAlmostEqual(baseline.arrivals_std[10], 1.0)
+
+    def test_observed_weeks_are_counted_per_queue(self):
+        monday_ten = datetime(2024, 5, 13, 10, tzinfo=dt_timezone.utc)
+        recent = Queue.objects.create(queue_type=self.queue_type, name="Recent Queue")
+        # File établie : 4 arrivées par semaine sauf une semaine fermée
+        for weeks_ago in (1, 2, 4):
+            self._arrivals(monday_ten - timedelta(weeks=weeks_ago), 4)
+        # File ouverte la semaine dernière
+        self._arrivals(monday_ten - timedelta(weeks=1), 6, queue=recent)
+
+        compute_baselines([self.queue.id, recent.id], weeks=4, now=NOW)
+
+        baseline = QueueSeasonalBaseline.objects.get(queue=self.queue)
+        self.assertEqual(baseline.weeks, 4)
+        self.assertAlmostEqual(baseline.arrivals_mean[10], 3.0)
+        self.assertAlmostEqual(baseline.arrivals_std[10], np.sqrt(3.0))
+        recent_baseline = QueueSeasonalBaseline.objects.get(queue=recent)
+        self.assertEqual(recent_baseline.weeks, 1)
+        self.assertAlmostEqual(recent_baseline.arrivals_mean[10], 6.0)
+        self.assertAlmostEqual(recent_baseline.arrivals_std[10], 0.0)
@@ -0,0 +1,82 @@
+import importlib
+import unittest
+from datetime import datetime, timedelta, timezone as dt_timezone
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from apps.core.models import Organization, OrganizationBranch
+from apps.queues.models import QueueType, Queue, Ticket
+from apps.queues.services.archive import archive_tickets
+from ..ml.forecasting.arrivals import SEASON, _select, _week_ahead, hourly_series, seasonal_smoothing
+
+User = get_user_model()
+
+# Les migrations étant désactivées en test, l'archive et la vue de
+# l'historique des tickets sont créées à partir du SQL des migrations
+archive_migration = importlib.import_module('apps.queues.migrations.0004_ticket_archive')
+notification_archive_migration = importlib.import_module('apps.queues.migrations.0006_queuenotification_archive')
+
+class SeasonalSmoothingTests(SimpleTestCase):
+    def test_repeating_week_is_reproduced(self):
+        week = np.tile(np.r_[np.zeros(8), np.full(10, 12.0), np.zeros(6)], 7)
+        series = np.tile(week, (2, 4))
+
+        level, season = seasonal_smoothing(series, np.array([0.1, 0.5]), np.array([0.2, 0.05]))
+
+        np.testing.assert_allclose(_week_ahead(level, season), np.tile(week, (2, 1)), atol=1e-9)
+
+    def test_rows_use_their_own_parameters(self):
+        series = np.tile(np.arange(SEASON, dtype=float), (2, 3))
+        series[:, -SEASON:] += 10
+
+        level, _ = seasonal_smoothing(series, np.array([0.05, 0.9]), np.array([0.1, 0.1]))
+
+        # Un alpha élevé suit plus vite la hausse de niveau
+        self.assertGreater(level[1], level[0])
+
+    def test_selection_falls_back_to_seasonal_naive_on_exact_repeat(self):
+        week = np.tile(np.r_[np.zeros(12), np.full(12, 5.0)], 7)
+        series = np.tile(week, (1, 4))
+        grid = np.array([(0.1, 0.1), (0.5, 0.3)])
+
+        naive_mae, best, best_mae, final = _select(series, grid)
+
+        self.assertEqual(naive_mae[0], 0.0)
+        self.assertGreaterEqual(best_mae[0], naive_mae[0])
+        self.assertEqual(final.shape, (1, SEASON))
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Ticket history view requires PostgreSQL")
+class HourlySeriesTests(TestCase):
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute(archive_migration.CREATE_ARCHIVE_SQL)
+            cursor.execute(notification_archive_migration.CREATE_NOTIFICATION_ARCHIVE_SQL)
+        organization = Organization.objects.create(name="Test Org")
+        branch = OrganizationBranch.objects.create(name="Test Branch", organization=organization)
+        queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            organization=organization,
+            branch=branch
+        )
+        self.queue = Queue.objects.create(queue_type=queue_type, name="Test Queue")
+        self.user = User.objects.create_user(email='client@example.com', password='clientpass123')
+
+    def _ticket(self, number, check_in_time, status=Ticket.Status.WAITING):
+        ticket = Ticket.objects.create(queue=self.queue, user=self.user, number=number, status=status)
+        Ticket.objects.filter(pk=ticket.pk).update(check_in_time=check_in_time)
+
+    def test_archived_arrivals_are_counted(self):
+        until = datetime(2024, 5, 13, tzinfo=dt_timezone.utc)
+        # Six semaines plus tôt : archivé ; dernière heure : encore vif
+        self._ticket('A001', until - timedelta(weeks=6), status=Ticket.Status.COMPLETED)
+        self._ticket('A002', until - timedelta(minutes=30))
+        archive_tickets(older_than_days=30)
+
+        series = hourly_series([self.queue.id], until, weeks=8)
+
+        self.assertEqual(series.shape, (1, 8 * SEASON))
+        self.assertEqual(series[0, 2 * SEASON], 1)
+        self.assertEqual(series[0, -1], 1)
+        self.assertEqual(series.sum(), 2)
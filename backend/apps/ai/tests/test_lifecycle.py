@@ -0,0 +1,122 @@
+from unittest import mock
+from django.test import TestCase
+from apps.core.models import Organization, OrganizationBranch
+from apps.queues.models import QueueType, Queue
+from ..models import QueueAnomaly
+from ..ml.anomaly.lifecycle import CLEAR_AFTER_PASSES, AnomalyLifecycle, Finding
+from ..ml.anomaly.scanner import SCAN_FEATURES, FleetAnomalyScanner
+
+TYPES = ('wait_time', 'abandonment')
+
+@mock.patch('apps.ai.ml.anomaly.lifecycle.get_redis', return_value=None)
+class AnomalyLifecycleTests(TestCase):
+    def setUp(self):
+        organization = Organization.objects.create(name="Test Org")
+        branch = OrganizationBranch.objects.create(name="Test Branch", organization=organization)
+        queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            organization=organization,
+            branch=branch
+        )
+        self.queue = Queue.objects.create(queue_type=queue_type, name="Test Queue")
+        self.lifecycle = AnomalyLifecycle()
+
+    def _sync(self, *severities):
+        findings = [
+            Finding(
+                queue_id=self.queue.id,
+                type='wait_time',
+                severity=severity,
+                metrics={'ratio': 2.0},
+                description="Temps d'attente anormal détecté."
+            )
+            for severity in severities
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.lifecycle.sync([self.queue.id], findings, TYPES)
+
+    def test_repeated_condition_keeps_one_open_anomaly(self, _):
+        first = self._sync('medium')
+        second = self._sync('medium')
+
+        self.assertEqual(first[0]['action'], 'created')
+        self.assertEqual(second[0]['action'], 'unchanged')
+        self.assertEqual(second[0]['id'], first[0]['id'])
+        self.assertEqual(QueueAnomaly.objects.filter(queue=self.queue).count(), 1)
+
+    def test_higher_severity_escalates_in_place(self, _):
+        self._sync('low')
+        result = self._sync('critical')
+
+        self.assertEqual(result[0]['action'], 'escalated')
+        anomaly = QueueAnomaly.objects.get(queue=self.queue)
+        self.assertEqual(anomaly.severity, 'critical')
+
+        # La sévérité ne redescend pas tant que l'anomalie reste ouverte
+        self.assertEqual(self._sync('low')[0]['severity'], 'critical')
+
+    def test_cleared_condition_closes_after_consecutive_passes(self, _):
+        self._sync('high')
+        for _pass in range(CLEAR_AFTER_PASSES - 1):
+            self._sync()
+            self.assertEqual(QueueAnomaly.objects.get(queue=self.queue).status, 'detected')
+
+        self._sync()
+
+        anomaly = QueueAnomaly.objects.get(queue=self.queue)
+        self.assertEqual(anomaly.status, 'resolved')
+        self.assertEqual(anomaly.resolution['resolution_type'], 'auto')
+        # Une nouvelle occurrence ouvre une nouvelle anomalie
+        self.assertEqual(self._sync('low')[0]['action'], 'created')
+        self.assertEqual(QueueAnomaly.objects.filter(queue=self.queue).count(), 2)
+
+    def test_anomaly_under_investigation_is_not_auto_closed(self, _):
+        self._sync('high')
+        QueueAnomaly.objects.filter(queue=self.queue).update(status='investigating')
+        self.lifecycle.forget(self.queue.id)
+
+        for _pass in range(CLEAR_AFTER_PASSES + 1):
+            self._sync()
+
+        self.assertEqual(QueueAnomaly.objects.get(queue=self.queue).status, 'investigating')
+
+    def test_anomaly_opened_by_a_concurrent_pass_is_reused(self, _):
+        # Cache chargé avant qu'une autre passe n'ouvre la même anomalie
+        self.lifecycle.open_anomalies([self.queue.id])
+        concurrent = QueueAnomaly.objects.create(
+            queue=self.queue,
+            type='wait_time',
+            severity='high',
+            metrics={},
+            description="Temps d'attente anormal détecté."
+        )
+
+        result = self._sync('medium')
+
+        self.assertEqual(result[0]['action'], 'unchanged')
+        self.assertEqual(result[0]['id'], concurrent.pk)
+        self.assertEqual(result[0]['severity'], 'high')
+        self.assertEqual(QueueAnomaly.objects.filter(queue=self.queue).count(), 1)
+        # L'anomalie relue est désormais en cache
+        self.assertEqual(self._sync('critical')[0]['action'], 'escalated')
+
+    def test_fleet_scan_does_not_close_detector_anomalies(self, _):
+        detected = self._sync('medium')[0]
+        scanner = FleetAnomalyScanner()
+        matrix = {name: [0.0] for name in SCAN_FEATURES}
+
+        with mock.patch('apps.ai.ml.anomaly.scanner.anomaly_lifecycle', self.lifecycle):
+            # Le scanner constate la même condition puis ne la voit plus
+            with self.captureOnCommitCallbacks(execute=True):
+                scanner._store(
+                    [self.queue.id], [(self.queue.id, 'wait_time', 'high', 3.0, 0)], matrix,
+                    [QueueAnomaly.FLEET_PREFIX + 'wait_time']
+                )
+            for _ in range(CLEAR_AFTER_PASSES):
+                with self.captureOnCommitCallbacks(execute=True):
+                    scanner._store([self.queue.id], [], matrix, [QueueAnomaly.FLEET_PREFIX + 'wait_time'])
+
+        anomalies = dict(QueueAnomaly.objects.values_list('type', 'status'))
+        self.assertEqual(anomalies, {'wait_time': 'detected', 'fleet_wait_time': 'resolved'})
+        self.assertEqual(QueueAnomaly.objects.get(pk=detected['id']).base_type, 'wait_time')
+        self.assertEqual(QueueAnomaly.objects.get(type='fleet_wait_time').base_type, 'wait_time')
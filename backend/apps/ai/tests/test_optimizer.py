@@ -0,0 +1,139 @@
+from datetime import timedelta
+from unittest import mock
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+from apps.core.models import Organization, OrganizationBranch
+from apps.queues.models import QueueType, Queue, ServicePoint, Ticket
+from ..models import ResourceOptimization
+from ..ml.resource_opt.optimizer import ResourceOptimizer
+from ..ml.resource_opt.staffing import DEFAULT_SERVICE_MINUTES
+
+User = get_user_model()
+
+
+class ResourceOptimizerTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.branch = OrganizationBranch.objects.create(
+            name="Test Branch",
+            organization=self.organization
+        )
+        self.user = User.objects.create_user(
+            email='client@example.com',
+            password='clientpass123'
+        )
+        queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            organization=self.organization,
+            branch=self.branch
+        )
+        self.queue = Queue.objects.create(queue_type=queue_type, name="Busy")
+        self.service_point = ServicePoint.objects.create(
+            name="Counter 1",
+            branch=self.branch,
+            status=ServicePoint.Status.AVAILABLE
+        )
+        self.service_point.assigned_queues.add(self.queue)
+        self.now = timezone.now()
+
+    def _ticket(self, number, check_in_time, status=Ticket.Status.WAITING, **fields):
+        ticket = Ticket.objects.create(
+            queue=self.queue,
+            user=self.user,
+            number=number,
+            status=status,
+            **fields
+        )
+        # check_in_time est renseigné automatiquement à la création
+        Ticket.objects.filter(pk=ticket.pk).update(check_in_time=check_in_time)
+        return ticket
+
+    def _optimizer(self):
+        with mock.patch('apps.ai.ml.resource_opt.optimizer.model_registry') as registry:
+            registry.get.return_value = None
+            return ResourceOptimizer(self.service_point.id)
+
+    def test_overloaded_service_point_gets_more_resources(self):
+        # 30 arrivées/h et 10 min de service : 5 Erlangs pour un seul guichet
+        for number in range(29):
+            self._ticket(f'A{number:03d}', self.now - timedelta(minutes=number * 2))
+        self._ticket(
+            'A100', self.now - timedelta(minutes=40),
+            status=Ticket.Status.COMPLETED,
+            service_start_time=self.now - timedelta(minutes=30),
+            service_end_time=self.now - timedelta(minutes=20)
+        )
+
+        result = self._optimizer().generate_suggestions()
+
+        self.assertEqual(result['suggested_action'], 'add')
+        self.assertEqual(result['priority'], 'high')
+        self.assertEqual(result['current_load'], 1.0)
+        impact = result['expected_impact']
+        self.assertEqual(impact['servers']['current'], 1)
+        self.assertGreater(impact['servers']['suggested'], 5)
+        self.assertAlmostEqual(impact['arrivals_per_hour'], 30.0)
+        self.assertAlmostEqual(impact['service_minutes'], 10.0)
+        optimization = ResourceOptimization.objects.get(pk=result['optimization_id'])
+        self.assertEqual(optimization.service_point, self.service_point)
+        self.assertEqual(optimization.current_load, 1.0)
+        self.assertIsNone(optimization.model)
+
+    def test_idle_service_point_is_maintained(self):
+        result = self._optimizer().generate_suggestions()
+
+        self.assertEqual(result['suggested_action'], 'maintain')
+        self.assertEqual(result['priority'], 'low')
+        self.assertEqual(result['current_load'], 0.0)
+        self.assertEqual(
+            ResourceOptimization.objects.get(pk=result['optimization_id']).current_load,
+            0.0
+        )
+
+    def test_forecast_is_averaged_and_shared_between_service_points(self):
+        second = ServicePoint.objects.create(name="Counter 2", branch=self.branch)
+        second.assigned_queues.add(self.queue)
+        self._ticket(
+            'A001', self.now - timedelta(hours=3),
+            status=Ticket.Status.COMPLETED,
+            service_start_time=self.now - timedelta(hours=2, minutes=12),
+            service_end_time=self.now - timedelta(hours=2)
+        )
+        optimizer = self._optimizer()
+
+        with mock.patch(
+            'apps.ai.ml.resource_opt.optimizer.forecast_arrivals',
+            return_value={self.queue.id: np.array([40.0, 20.0])}
+        ) as forecast:
+            arrivals, minutes = optimizer._predict_load(self.service_point, horizon=2)
+
+        self.assertEqual(forecast.call_args.args[0], [self.queue.id])
+        self.assertEqual(forecast.call_args.kwargs['horizon'], 2)
+        # Moyenne des deux heures, partagée entre les deux points de service
+        self.assertAlmostEqual(arrivals, (40.0 + 20.0) / 2 / 2)
+        self.assertAlmostEqual(minutes, 12.0)
+
+    def test_queue_without_forecast_adds_no_demand(self):
+        optimizer = self._optimizer()
+
+        with mock.patch('apps.ai.ml.resource_opt.optimizer.forecast_arrivals', return_value={}):
+            arrivals, minutes = optimizer._predict_load(self.service_point, horizon=1)
+
+        self.assertEqual(arrivals, 0.0)
+        self.assertEqual(minutes, DEFAULT_SERVICE_MINUTES)
+
+    def test_forecast_peak_drives_the_staffing_plan(self):
+        # Aucune arrivée mesurée, 30 arrivées/h prévues sur l'heure à venir
+        optimizer = self._optimizer()
+
+        with mock.patch(
+            'apps.ai.ml.resource_opt.optimizer.forecast_arrivals',
+            return_value={self.queue.id: np.array([30.0])}
+        ):
+            result = optimizer.generate_suggestions()
+
+        self.assertEqual(result['suggested_action'], 'add')
+        self.assertAlmostEqual(result['expected_impact']['arrivals_per_hour'], 30.0)
+        self.assertAlmostEqual(result['expected_impact']['service_minutes'], DEFAULT_SERVICE_MINUTES)
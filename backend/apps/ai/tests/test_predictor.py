@@ -0,0 +1,151 @@
+from datetime import timedelta
+from unittest import mock
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.core.models import Organization, OrganizationBranch
+from apps.queues.models import QueueType, Queue, ServicePoint, Ticket
+from ..models import WaitTimePrediction
+from ..ml.wait_time.features import FEATURE_NAMES, build_feature_matrix
+from ..ml.wait_time.predictor import WaitTimePredictor
+
+User = get_user_model()
+
+COLUMN = {name: index for index, name in enumerate(FEATURE_NAMES)}
+
+
+class WaitTimePredictorTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.branch = OrganizationBranch.objects.create(
+            name="Test Branch",
+            organization=self.organization
+        )
+        self.user = User.objects.create_user(
+            email='client@example.com',
+            password='clientpass123'
+        )
+        queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            organization=self.organization,
+            branch=self.branch
+        )
+        self.busy = Queue.objects.create(queue_type=queue_type, name="Busy")
+        self.quiet = Queue.objects.create(queue_type=queue_type, name="Quiet")
+        for name, point_status in (
+            ('Counter 1', ServicePoint.Status.AVAILABLE),
+            ('Counter 2', ServicePoint.Status.BUSY),
+            ('Counter 3', ServicePoint.Status.OFFLINE),
+        ):
+            point = ServicePoint.objects.create(name=name, branch=self.branch, status=point_status)
+            point.assigned_queues.add(self.busy)
+        self.now = timezone.now()
+        for number in range(3):
+            self._ticket(self.busy, f'A00{number}', check_in_time=self.now - timedelta(minutes=5))
+        self._ticket(
+            self.busy, 'A010',
+            status=Ticket.Status.COMPLETED,
+            check_in_time=self.now - timedelta(minutes=50),
+            called_time=self.now - timedelta(minutes=30),
+            service_start_time=self.now - timedelta(minutes=30),
+            service_end_time=self.now - timedelta(minutes=20)
+        )
+        self._ticket(
+            self.busy, 'A011',
+            status=Ticket.Status.CANCELLED,
+            check_in_time=self.now - timedelta(minutes=40)
+        )
+
+    def _ticket(self, queue, number, status=Ticket.Status.WAITING, check_in_time=None, **fields):
+        ticket = Ticket.objects.create(
+            queue=queue,
+            user=self.user,
+            number=number,
+            status=status,
+            **fields
+        )
+        if check_in_time is not None:
+            # check_in_time est renseigné automatiquement à la création
+            Ticket.objects.filter(pk=ticket.pk).update(check_in_time=check_in_time)
+        return ticket
+
+    def _predictor(self, estimator=None):
+        with mock.patch('apps.ai.ml.wait_time.predictor.model_registry') as registry:
+            if estimator is None:
+                registry.get.return_value = None
+            else:
+                registry.get.return_value = mock.Mock(record=None, estimator=estimator)
+            return WaitTimePredictor()
+
+    def test_feature_matrix_aggregates_per_queue(self):
+        with self.assertNumQueries(3):
+            matrix = build_feature_matrix([self.busy.id, self.quiet.id], now=self.now)
+
+        busy, quiet = matrix
+        self.assertEqual(busy[COLUMN['current_length']], 3)
+        self.assertEqual(busy[COLUMN['num_service_points']], 2)
+        self.assertAlmostEqual(busy[COLUMN['avg_service_time']], 10.0)
+        self.assertAlmostEqual(busy[COLUMN['avg_wait_last_hour']], 20.0)
+        self.assertAlmostEqual(busy[COLUMN['abandonment_rate']], 1 / 5)
+        self.assertEqual(quiet[COLUMN['current_length']], 0)
+        self.assertEqual(quiet[COLUMN['num_service_points']], 0)
+
+    def test_predict_batch_uses_one_vectorized_call(self):
+        estimator = mock.Mock()
+        estimator.predict.return_value = np.array([10.0, 2.0])
+        estimator.named_steps = {'model': mock.Mock(feature_importances_=np.zeros(len(FEATURE_NAMES)))}
+        predictor = self._predictor(estimator)
+
+        with mock.patch.object(predictor, '_get_forecast_predictions', return_value=np.array([10.0, 4.0])):
+            results = predictor.predict_batch([self.busy, self.quiet])
+
+        estimator.predict.assert_called_once()
+        self.assertEqual(estimator.predict.call_args[0][0].shape, (2, len(FEATURE_NAMES)))
+        self.assertEqual(results[self.busy.id]['estimated_wait_time'], 10)
+        self.assertFalse(results[self.busy.id]['fallback'])
+        # Accord parfait pour la première file, écart de moitié pour la seconde
+        self.assertAlmostEqual(results[self.busy.id]['confidence'], 0.4 + 0.3 * 0.8 + 0.3 * 0.7)
+        self.assertAlmostEqual(results[self.quiet.id]['confidence'], 0.2 + 0.3 * 0.8 + 0.3 * 0.7)
+        self.assertEqual(WaitTimePrediction.objects.count(), 2)
+
+    def test_predict_batch_without_active_model_falls_back(self):
+        predictor = self._predictor()
+
+        with mock.patch.object(predictor, '_get_forecast_predictions', return_value=np.array([9.0, 0.0])):
+            results = predictor.predict_batch([self.busy, self.quiet])
+
+        self.assertEqual(results[self.busy.id]['estimated_wait_time'], 9)
+        self.assertTrue(results[self.busy.id]['fallback'])
+        self.assertEqual(results[self.busy.id]['factors'], [])
+        self.assertAlmostEqual(results[self.busy.id]['confidence'], 0.3 * 0.8 + 0.3 * 0.7)
+        self.assertIsNone(WaitTimePrediction.objects.get(queue=self.busy).model)
+
+    def test_batch_endpoint(self):
+        agent = User.objects.create_user(
+            email='agent@example.com',
+            password='agentpass123',
+            organization=self.organization
+        )
+        client = APIClient()
+        client.force_authenticate(user=agent)
+        url = reverse('ai-predict-wait-time-batch')
+
+        with mock.patch('apps.ai.ml.wait_time.predictor.model_registry') as registry, \
+                mock.patch('apps.ai.ml.wait_time.predictor.forecast_arrivals', return_value={}):
+            registry.get.return_value = None
+            response = client.get(url, {'branch': str(self.branch.id)})
+            missing = client.get(url)
+            invalid = client.get(url, {'queues': 'abc'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            [result['queue_id'] for result in response.data['results']],
+            [self.busy.id, self.quiet.id]
+        )
+        self.assertTrue(all(result['fallback'] for result in response.data['results']))
+        self.assertEqual(missing.status_code, 400)
+        self.assertEqual(invalid.status_code, 400)
@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+from unittest import mock
+import joblib
+from django.db import DatabaseError
+from django.test import TestCase
+from ..models import MLModel
+from ..ml.registry import ModelRegistry
+
+class ModelRegistryTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        # Pas de thread de surveillance : poll() est appelé explicitement
+        self.registry = ModelRegistry(poll_interval=0)
+
+    def _model(self, version, status='active', name='gradient_boosting'):
+        path = f'{self.directory}/{name}-{version}.joblib'
+        joblib.dump({'version': version}, path)
+        return MLModel.objects.create(
+            name=name,
+            version=version,
+            type='wait_time',
+            status=status,
+            file_path=path
+        )
+
+    def test_get_loads_active_model_once(self):
+        record = self._model('1')
+
+        with mock.patch('apps.ai.ml.registry.load_artifact', wraps=joblib.load) as load:
+            first = self.registry.get('wait_time', 'gradient_boosting')
+            second = self.registry.get('wait_time', 'gradient_boosting')
+
+        self.assertEqual(first.record, record)
+        self.assertEqual(first.estimator, {'version': '1'})
+        self.assertIs(second, first)
+        load.assert_called_once()
+
+    def test_get_without_active_model(self):
+        self._model('1', status='inactive')
+
+        self.assertIsNone(self.registry.get('wait_time', 'gradient_boosting'))
+
+    def test_new_active_version_is_swapped_in(self):
+        self._model('1')
+        old = self.registry.get('wait_time', 'gradient_boosting')
+
+        with mock.patch('apps.ai.ml.registry.model_registry', self.registry), \
+                self.captureOnCommitCallbacks(execute=True):
+            self._model('2')
+
+        current = self.registry.get('wait_time', 'gradient_boosting')
+        self.assertEqual(current.record.version, '2')
+        self.assertEqual(list(self.registry._models), [current.key])
+        # Une requête en cours garde sa référence à l'ancienne version
+        self.assertEqual(old.estimator, {'version': '1'})
+
+    def test_deactivated_model_is_evicted_on_poll(self):
+        record = self._model('1')
+        self.registry.get('wait_time', 'gradient_boosting')
+        MLModel.objects.filter(pk=record.pk).update(status='inactive')
+
+        self.assertEqual(self.registry.poll(), 0)
+
+        self.assertIsNone(self.registry.get('wait_time', 'gradient_boosting'))
+        self.assertEqual(self.registry._models, {})
+
+    def test_warm_preloads_models(self):
+        self._model('1')
+
+        self.registry.warm([('wait_time', 'gradient_boosting')])
+
+        with mock.patch('apps.ai.ml.registry.load_artifact') as load:
+            loaded = self.registry.get('wait_time', 'gradient_boosting')
+        self.assertEqual(loaded.record.version, '1')
+        load.assert_not_called()
+
+    def test_warm_tolerates_missing_tables(self):
+        with mock.patch.object(self.registry, 'refresh', side_effect=DatabaseError):
+            self.registry.warm()
+
+        self.assertEqual(self.registry._active, {})
@@ -0,0 +1,37 @@
+import numpy as np
+from django.test import SimpleTestCase
+from ..ml.anomaly.scanner import MIN_SAMPLES, FleetAnomalyScanner, severity_for
+
+class FleetScoringTests(SimpleTestCase):
+    def _matrix(self, **overrides):
+        n = 3
+        matrix = {
+            'current_wait_time': np.array([10.0, 25.0, 40.0]),
+            'avg_wait_time_24h': np.full(n, 10.0),
+            'std_wait_time_24h': np.full(n, 5.0),
+            'current_service_time': np.full(n, 5.0),
+            'avg_service_time_24h': np.full(n, 5.0),
+            'std_service_time_24h': np.full(n, 1.0),
+            'abandonment_rate_1h': np.full(n, 0.1),
+            'abandonment_rate_24h': np.full(n, 0.1),
+            'arrivals_1h': np.full(n, 30.0),
+            'current_length': np.zeros(n),
+            'wait_count_24h': np.full(n, float(MIN_SAMPLES)),
+            'service_count_24h': np.full(n, float(MIN_SAMPLES)),
+            'arrivals_24h': np.full(n, 100.0),
+        }
+        matrix.update(overrides)
+        return matrix
+
+    def test_wait_time_z_scores_are_vectorized(self):
+        scores = FleetAnomalyScanner().score(self._matrix())
+
+        np.testing.assert_allclose(scores['wait_time'], [0.0, 3.0, 6.0])
+        self.assertEqual(list(severity_for(scores['wait_time'])), ['', 'high', 'critical'])
+
+    def test_insufficient_samples_are_not_scored(self):
+        scores = FleetAnomalyScanner().score(self._matrix(
+            wait_count_24h=np.full(3, MIN_SAMPLES - 1.0)
+        ))
+
+        np.testing.assert_array_equal(scores['wait_time'], np.zeros(3))
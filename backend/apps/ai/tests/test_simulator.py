@@ -0,0 +1,62 @@
+import math
+import numpy as np
+from django.test import SimpleTestCase
+from ..ml.resource_opt.simulator import Scenario, simulate, summarize
+
+def _run(servers, rate=60.0, service_minutes=1.0, changes=(), replications=50, seed=7):
+    scenario = Scenario(start_hour=8, end_hour=12, servers=servers, changes=list(changes), replications=replications)
+    opens, closes = scenario.server_schedule(servers)
+    hourly = np.zeros(24)
+    hourly[8:12] = rate
+    result = simulate(
+        hourly_arrivals=hourly,
+        start_hour=8,
+        end_hour=12,
+        service_log_mean=math.log(service_minutes),
+        service_log_std=0.0,
+        multipliers=np.array([1.0]),
+        category_weights=np.array([1.0]),
+        opens=opens,
+        closes=closes,
+        replications=replications,
+        seed=seed
+    )
+    return result, summarize(result, scenario, opens, closes)
+
+class ScenarioScheduleTests(SimpleTestCase):
+    def test_openings_and_closings(self):
+        scenario = Scenario(start_hour=8, changes=[(600, 2), (900, -1)])
+
+        opens, closes = scenario.server_schedule(1)
+
+        np.testing.assert_array_equal(opens, [480, 600, 600])
+        # Le dernier guichet ouvert ferme en premier
+        np.testing.assert_array_equal(closes, [math.inf, math.inf, 900])
+
+class QueueSimulationTests(SimpleTestCase):
+    def test_arrivals_follow_hourly_rates(self):
+        result, summary = _run(servers=3, rate=30.0, replications=200)
+
+        self.assertAlmostEqual(summary['arrivals_per_day'], 120, delta=5)
+        self.assertTrue(np.all((result['arrivals'] >= 480) & (result['arrivals'] < 720)))
+
+    def test_fifo_waits_are_never_negative(self):
+        result, summary = _run(servers=1, rate=50.0)
+
+        self.assertTrue(np.all(result['waits'] >= 0))
+        self.assertEqual(summary['unserved_per_day'], 0)
+        self.assertLessEqual(summary['utilization'], 1.0)
+
+    def test_more_counters_reduce_waits_with_common_random_numbers(self):
+        _, baseline = _run(servers=1, rate=55.0)
+        _, scenario = _run(servers=1, rate=55.0, changes=[(600, 2)])
+
+        self.assertLess(scenario['mean_wait'], baseline['mean_wait'])
+        self.assertGreater(scenario['service_level'], baseline['service_level'])
+        self.assertEqual(scenario['hourly'][2]['servers'], 3)
+
+    def test_closed_counters_leave_customers_unserved(self):
+        _, summary = _run(servers=1, rate=30.0, changes=[(480, -1)])
+
+        self.assertGreater(summary['unserved_per_day'], 0)
+        self.assertEqual(summary['percentiles'], {})
@@ -0,0 +1,42 @@
+import numpy as np
+from django.test import SimpleTestCase
+from ..ml.resource_opt.staffing import erlang_c, optimal_servers, staffing_table
+
+class ErlangCTests(SimpleTestCase):
+    def test_probability_of_waiting_matches_closed_form(self):
+        # a = 2 Erlangs, c = 3 : P(attente) = 4/9
+        p_wait = erlang_c([2.0], max_servers=5)
+
+        self.assertAlmostEqual(p_wait[0, 2], 4 / 9)
+        # Effectifs insuffisants (c <= a) : attente certaine
+        np.testing.assert_array_equal(p_wait[0, :2], [1.0, 1.0])
+        self.assertTrue(np.all(np.diff(p_wait[0, 2:]) < 0))
+
+    def test_large_loads_do_not_overflow(self):
+        p_wait = erlang_c([40.0, 0.0], max_servers=50)
+
+        self.assertTrue(np.all(np.isfinite(p_wait)))
+        self.assertTrue(0 < p_wait[0, -1] < 1)
+        self.assertAlmostEqual(p_wait[1, 0], 0.0)
+
+    def test_average_wait_and_service_level(self):
+        # 120 arrivées/h, 1 min de service : λ = 2/min, μ = 1/min
+        table = staffing_table([120.0], [1.0], max_servers=5, target_wait=1.0)
+
+        self.assertAlmostEqual(table['avg_wait'][0, 2], (4 / 9) / (3 - 2))
+        self.assertAlmostEqual(table['service_level'][0, 2], 1 - (4 / 9) * np.exp(-1.0))
+        self.assertTrue(np.isinf(table['avg_wait'][0, 1]))
+        self.assertAlmostEqual(table['utilization'][0, 3], 0.5)
+
+    def test_optimum_is_smallest_staffing_meeting_target_within_bounds(self):
+        table = staffing_table([120.0, 120.0, 6.0], [5.0, 5.0, 5.0], max_servers=30)
+
+        best = optimal_servers(table, min_servers=[1, 1, 2], max_servers=[30, 8, 30], target_level=0.8)
+
+        levels = table['service_level'][0]
+        self.assertGreaterEqual(levels[best[0] - 1], 0.8)
+        self.assertLess(levels[best[0] - 2], 0.8)
+        # Objectif inatteignable dans les bornes : effectif maximal
+        self.assertEqual(best[1], 8)
+        # Faible demande : le minimum imposé s'applique
+        self.assertEqual(best[2], 2)
@@ -0,0 +1,85 @@
+from datetime import timedelta
+from unittest import mock
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from apps.core.models import Organization, OrganizationBranch
+from apps.queues.models import QueueType, Queue, ServicePoint, Ticket
+from ..ml.wait_time.features import FEATURE_NAMES, build_feature_matrix, masked_slopes
+from ..ml.wait_time.training import benchmark_prediction_latency, build_pipeline, build_training_set
+
+User = get_user_model()
+
+class WaitTimePipelineTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.X = rng.normal(size=(2000, len(FEATURE_NAMES))) * 10 + 50
+        self.y = 2 * self.X[:, FEATURE_NAMES.index('current_length')] + rng.normal(size=2000)
+
+    def test_inference_does_not_refit_scaler(self):
+        pipeline = build_pipeline().fit(self.X, self.y)
+        mean = pipeline.named_steps['scaler'].mean_.copy()
+
+        prediction = pipeline.predict(self.X[:1])
+
+        np.testing.assert_array_equal(pipeline.named_steps['scaler'].mean_, mean)
+        self.assertAlmostEqual(prediction[0], self.y[0], delta=10)
+
+    def test_latency_benchmark_times_single_row_predictions(self):
+        pipeline = build_pipeline().fit(self.X, self.y)
+
+        with mock.patch.object(pipeline, 'predict', wraps=pipeline.predict) as predict:
+            latency = benchmark_prediction_latency(pipeline, self.X[:1], repeats=50)
+
+        # Un appel d'amorçage puis un appel par mesure, une ligne à chaque fois
+        self.assertEqual(predict.call_count, 51)
+        self.assertTrue(all(call.args[0].shape == (1, len(FEATURE_NAMES)) for call in predict.call_args_list))
+        self.assertLessEqual(latency['median_ms'], latency['p99_ms'])
+
+    def test_masked_slopes_matches_polyfit(self):
+        series = np.array([[1.0, np.nan, 3.0, 4.5, np.nan, 7.0]])
+        mask = ~np.isnan(series[0])
+        expected = np.polyfit(np.arange(6)[mask], series[0][mask], 1)[0]
+
+        self.assertAlmostEqual(masked_slopes(series)[0], expected)
+
+
+class TrainingSetTests(TestCase):
+    def setUp(self):
+        organization = Organization.objects.create(name="Test Org")
+        branch = OrganizationBranch.objects.create(name="Test Branch", organization=organization)
+        queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            organization=organization,
+            branch=branch
+        )
+        self.queue = Queue.objects.create(queue_type=queue_type, name="Test Queue")
+        for name, point_status in (
+            ('Counter 1', ServicePoint.Status.AVAILABLE),
+            ('Counter 2', ServicePoint.Status.BUSY),
+            ('Counter 3', ServicePoint.Status.OFFLINE),
+        ):
+            point = ServicePoint.objects.create(name=name, branch=branch, status=point_status)
+            point.assigned_queues.add(self.queue)
+        user = User.objects.create_user(email='client@example.com', password='clientpass123')
+        self.now = timezone.now()
+        for minutes in (50, 40, 30):
+            ticket = Ticket.objects.create(
+                queue=self.queue,
+                user=user,
+                number=f'A{minutes}',
+                status=Ticket.Status.CALLED,
+                called_time=self.now - timedelta(minutes=minutes - 10)
+            )
+            Ticket.objects.filter(pk=ticket.pk).update(check_in_time=self.now - timedelta(minutes=minutes))
+
+    def test_service_points_counted_as_at_inference(self):
+        with self.assertNumQueries(2):
+            X, y, _ = build_training_set(self.now - timedelta(hours=2), self.now)
+        online = build_feature_matrix([self.queue.id], now=self.now)
+
+        column = FEATURE_NAMES.index('num_service_points')
+        np.testing.assert_array_equal(X[:, column], np.full(3, online[0, column]))
+        self.assertEqual(online[0, column], 2)
+        np.testing.assert_allclose(y, [10.0, 10.0, 10.0])
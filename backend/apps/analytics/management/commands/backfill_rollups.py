@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.analytics.services.rollup import rollup_range
+from apps.queues.models import TicketHistory
+
+
+def _rollup_chunk(start: date, end: date):
+    """Un fil par tranche : la connexion du fil est fermée à la fin"""
+    try:
+        return start, end, rollup_range(start, end)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Recalcule les agrégats horaires et journaliers des files sur l'historique des tickets"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=date.fromisoformat,
+            default=None,
+            help="Premier jour (AAAA-MM-JJ) ; par défaut le jour du plus ancien ticket"
+        )
+        parser.add_argument(
+            '--end',
+            type=date.fromisoformat,
+            default=None,
+            help="Dernier jour inclus (AAAA-MM-JJ) ; par défaut aujourd'hui"
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=7,
+            help="Nombre de jours recalculés par tranche (une transaction par tranche)"
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help="Nombre de tranches traitées en parallèle"
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] < 1 or options['workers'] < 1:
+            raise CommandError("--chunk-days et --workers doivent être supérieurs ou égaux à 1.")
+
+        start = options['start']
+        if start is None:
+            oldest = TicketHistory.objects.order_by('check_in_time').values_list(
+                'check_in_time', flat=True
+            ).first()
+            if oldest is None:
+                self.stdout.write("Aucun ticket à agréger.")
+                return
+            start = timezone.localtime(oldest).date()
+        end = (options['end'] or timezone.localdate()) + timedelta(days=1)
+        if start >= end:
+            raise CommandError("--start doit précéder --end.")
+
+        step = timedelta(days=options['chunk_days'])
+        chunks = []
+        while start < end:
+            chunks.append((start, min(start + step, end)))
+            start += step
+
+        hours = days = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [executor.submit(_rollup_chunk, *chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                chunk_start, chunk_end, result = future.result()
+                hours += result.hours
+                days += result.days
+                self.stdout.write(
+                    f"{chunk_start} → {chunk_end - timedelta(days=1)} : "
+                    f"{result.hours} heure(s), {result.days} jour(s)"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(chunks)} tranche(s) recalculée(s) : {hours} heure(s), {days} jour(s) de file."
+        ))
@@ -0,0 +1,45 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.analytics.services.snapshots import snapshot_store
+
+
+class Command(BaseCommand):
+    help = "Écrit les instantanés Parquet des données analytiques (une partition par jour)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=date.fromisoformat,
+            default=None,
+            help="Premier jour exporté (AAAA-MM-JJ) ; par défaut l'export nocturne"
+        )
+        parser.add_argument(
+            '--end',
+            type=date.fromisoformat,
+            default=None,
+            help="Dernier jour exporté (AAAA-MM-JJ) ; par défaut la veille"
+        )
+
+    def handle(self, *args, **options):
+        if not snapshot_store.enabled:
+            raise CommandError(
+                "Instantanés désactivés : ANALYTICS_SNAPSHOTS_ENABLED et pyarrow/duckdb sont requis."
+            )
+
+        if options['start'] is None:
+            totals = snapshot_store.export_recent()
+        else:
+            end = options['end'] or timezone.localdate() - timedelta(days=1)
+            if options['start'] > end:
+                raise CommandError("--start doit précéder --end.")
+            totals = snapshot_store.export_range(options['start'], end)
+
+        coverage = snapshot_store.coverage()
+        summary = ', '.join(f"{name} : {count}" for name, count in totals.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Lignes exportées ({summary}) ; couverture "
+            f"{coverage[0]} → {coverage[1]}." if coverage else f"Lignes exportées ({summary})."
+        ))
@@ -0,0 +1,58 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0002_initial"),
+        ("queues", "0005_ticket_servicepoint_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QueueHourlyMetrics",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("hour", models.DateTimeField()),
+                ("total_tickets", models.IntegerField(default=0)),
+                ("served_tickets", models.IntegerField(default=0)),
+                ("cancelled_tickets", models.IntegerField(default=0)),
+                ("no_shows", models.IntegerField(default=0)),
+                ("wait_count", models.IntegerField(default=0)),
+                ("wait_seconds", models.FloatField(default=0)),
+                ("service_count", models.IntegerField(default=0)),
+                ("service_seconds", models.FloatField(default=0)),
+                ("rating_count", models.IntegerField(default=0)),
+                ("rating_sum", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "queue",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hourly_metrics",
+                        to="queues.queue",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "queue hourly metrics",
+                "verbose_name_plural": "queue hourly metrics",
+                "ordering": ["-hour"],
+                "unique_together": {("queue", "hour")},
+            },
+        ),
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("position", models.DateTimeField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "rollup watermark",
+                "verbose_name_plural": "rollup watermarks",
+            },
+        ),
+    ]
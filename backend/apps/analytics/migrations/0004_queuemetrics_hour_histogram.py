@@ -0,0 +1,23 @@
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0003_rollups"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="queuemetrics",
+            name="hour_histogram",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.IntegerField(),
+                blank=True,
+                help_text="Arrivals per local hour of the day (24 slots)",
+                null=True,
+                size=24,
+            ),
+        ),
+    ]
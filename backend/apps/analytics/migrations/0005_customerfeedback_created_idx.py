@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0004_queuemetrics_hour_histogram"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="customerfeedback",
+            index=models.Index(fields=["-created_at", "-id"], name="feedback_created_idx"),
+        ),
+    ]
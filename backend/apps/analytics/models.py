@@ -10,6 +10,13 @@ class QueueMetrics(models.Model):
     served_customers = models.IntegerField()
     abandoned_customers = models.IntegerField()
     peak_hours = ArrayField(models.TimeField())
+    hour_histogram = ArrayField(
+        models.IntegerField(),
+        size=24,
+        null=True,
+        blank=True,
+        help_text=_('Arrivals per local hour of the day (24 slots)')
+    )
     service_efficiency = models.FloatField(help_text=_('Ratio of served to total customers'))
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -22,6 +29,47 @@ class QueueMetrics(models.Model):
     def __str__(self):
         return f"{self.queue.name} - {self.date}"
 
+class QueueHourlyMetrics(models.Model):
+    """
+    Agrégats horaires par file (heure d'arrivée des tickets), base du
+    calcul incrémental de QueueMetrics et QueueAnalytics
+    """
+    queue = models.ForeignKey('queues.Queue', on_delete=models.CASCADE, related_name='hourly_metrics')
+    hour = models.DateTimeField()
+    total_tickets = models.IntegerField(default=0)
+    served_tickets = models.IntegerField(default=0)
+    cancelled_tickets = models.IntegerField(default=0)
+    no_shows = models.IntegerField(default=0)
+    wait_count = models.IntegerField(default=0)
+    wait_seconds = models.FloatField(default=0)
+    service_count = models.IntegerField(default=0)
+    service_seconds = models.FloatField(default=0)
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('queue hourly metrics')
+        verbose_name_plural = _('queue hourly metrics')
+        unique_together = ['queue', 'hour']
+        ordering = ['-hour']
+
+    def __str__(self):
+        return f"{self.queue_id} - {self.hour:%Y-%m-%d %H:00}"
+
+class RollupWatermark(models.Model):
+    """Position jusqu'à laquelle les changements de tickets ont été agrégés"""
+    name = models.CharField(max_length=50, unique=True)
+    position = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('rollup watermark')
+        verbose_name_plural = _('rollup watermarks')
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
 class AgentPerformance(models.Model):
     agent = models.ForeignKey(
         'core.User',
@@ -66,6 +114,10 @@ class CustomerFeedback(models.Model):
         verbose_name = _('customer feedback')
         verbose_name_plural = _('customer feedback')
         ordering = ['-created_at']
+        indexes = [
+            # Pagination par curseur des commentaires et plages de dates
+            models.Index(fields=['-created_at', '-id'], name='feedback_created_idx'),
+        ]
 
     def __str__(self):
         return f"Feedback for {self.ticket}"
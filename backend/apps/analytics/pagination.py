@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class FeedbackCommentPagination(CursorPagination):
+    """
+    Pagination par curseur (created_at, id) des commentaires : chaque page
+    est une lecture d'index bornée, sans OFFSET, quel que soit le volume
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -81,6 +81,23 @@ class QueueMetricsAggregateSerializer(serializers.Serializer):
             )
         return data
 
+class PeakHoursQuerySerializer(serializers.Serializer):
+    queue = serializers.IntegerField(required=False)
+    branch = serializers.IntegerField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    mode = serializers.ChoiceField(
+        choices=['peaks', 'arrivals'],
+        default='peaks'
+    )
+
+    def validate(self, data):
+        if data.get('date_from') and data.get('date_to') and data['date_from'] > data['date_to']:
+            raise serializers.ValidationError(
+                _('Start date must be before end date.')
+            )
+        return data
+
 class AgentPerformanceAggregateSerializer(serializers.Serializer):
     date_from = serializers.DateField()
     date_to = serializers.DateField()
@@ -111,6 +128,7 @@ class FeedbackAnalysisSerializer(serializers.Serializer):
         default='rating'
     )
     include_comments = serializers.BooleanField(default=False)
+    comments_limit = serializers.IntegerField(default=20, min_value=1, max_value=200)
 
     def validate(self, data):
         if data['date_from'] > data['date_to']:
@@ -118,3 +136,17 @@ class FeedbackAnalysisSerializer(serializers.Serializer):
                 _('Start date must be before end date.')
             )
         return data
+
+class FeedbackCommentsQuerySerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    rating = serializers.IntegerField(required=False, min_value=1, max_value=5)
+    wait_time_satisfaction = serializers.IntegerField(required=False, min_value=1, max_value=5)
+    service_satisfaction = serializers.IntegerField(required=False, min_value=1, max_value=5)
+
+    def validate(self, data):
+        if data.get('date_from') and data.get('date_to') and data['date_from'] > data['date_to']:
+            raise serializers.ValidationError(
+                _('Start date must be before end date.')
+            )
+        return data
@@ -0,0 +1,30 @@
+"""
+Services d'analyse des files d'attente
+"""
+
+from .peak_hours import hourly_arrivals, peak_hour_counts
+from .reporting import (
+    agent_performance_aggregate,
+    feedback_analysis,
+    feedback_summary,
+    queue_metrics_aggregate,
+)
+from .result_cache import ResultCache, result_cache
+from .rollup import RollupResult, rollup_range, run_rollup
+from .snapshots import SnapshotStore, snapshot_store
+
+__all__ = [
+    'hourly_arrivals',
+    'peak_hour_counts',
+    'agent_performance_aggregate',
+    'feedback_analysis',
+    'feedback_summary',
+    'queue_metrics_aggregate',
+    'ResultCache',
+    'result_cache',
+    'RollupResult',
+    'rollup_range',
+    'run_rollup',
+    'SnapshotStore',
+    'snapshot_store',
+]
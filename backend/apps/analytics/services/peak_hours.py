@@ -0,0 +1,47 @@
+"""
+Histogrammes horaires des métriques journalières
+
+Les tableaux de chaque ligne de QueueMetrics (heures de pointe ou
+arrivées par heure) sont dépliés par unnest et agrégés par PostgreSQL
+en une seule requête ; le queryset fourni (droits, filtres) devient une
+sous-requête, aucune ligne n'est chargée en Python.
+"""
+from typing import Dict
+
+from django.db import connection
+
+# Nombre de jours où chaque heure figure parmi les heures de pointe
+PEAK_HOURS_SQL = """
+SELECT to_char(peak.hour, 'HH24:00') AS hour, COUNT(*) AS total
+FROM ({metrics}) AS metrics
+CROSS JOIN LATERAL unnest(metrics.peak_hours) AS peak(hour)
+GROUP BY 1
+ORDER BY 2 DESC, 1
+"""
+
+# Arrivées cumulées par heure locale, depuis l'histogramme précalculé
+HOUR_HISTOGRAM_SQL = """
+SELECT to_char(slot.ordinal - 1, 'FM00') || ':00' AS hour, SUM(slot.arrivals) AS total
+FROM ({metrics}) AS metrics
+CROSS JOIN LATERAL unnest(metrics.hour_histogram) WITH ORDINALITY AS slot(arrivals, ordinal)
+GROUP BY 1
+HAVING SUM(slot.arrivals) > 0
+ORDER BY 2 DESC, 1
+"""
+
+
+def _histogram(sql: str, queryset, column: str) -> Dict[str, int]:
+    inner, params = queryset.order_by().values(column).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(metrics=inner), params)
+        return {hour: int(total) for hour, total in cursor.fetchall()}
+
+
+def peak_hour_counts(queryset) -> Dict[str, int]:
+    """{'HH:00': nombre de jours de pointe}, par fréquence décroissante"""
+    return _histogram(PEAK_HOURS_SQL, queryset, 'peak_hours')
+
+
+def hourly_arrivals(queryset) -> Dict[str, int]:
+    """{'HH:00': arrivées}, par volume décroissant (lignes sans histogramme ignorées)"""
+    return _histogram(HOUR_HISTOGRAM_SQL, queryset, 'hour_histogram')
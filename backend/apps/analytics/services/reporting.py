@@ -0,0 +1,353 @@
+"""
+Agrégats des endpoints analytiques
+
+Chaque agrégat est calculé en sommes partielles (sommes et effectifs,
+jamais de moyennes) sur deux sources : les instantanés Parquet via
+DuckDB pour la plage historique couverte, PostgreSQL pour le reste
+(aujourd'hui, en pratique). Les partiels sont fusionnés par groupe
+puis les moyennes calculées une seule fois, le résultat est identique
+à une requête unique sur PostgreSQL. Les partiels des jours révolus
+sont en outre conservés dans le cache de résultats (voir
+services.result_cache).
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from functools import reduce
+from operator import or_
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.functions import RowNumber, TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from ..models import CustomerFeedback
+
+from .result_cache import result_cache
+from .rollup import day_bounds
+from .snapshots import DateRange, snapshot_store
+
+TRUNCATIONS = {
+    'day': TruncDate,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+FEEDBACK_GROUPS = ('rating', 'wait_time_satisfaction', 'service_satisfaction')
+
+
+def _seconds(duration) -> float:
+    return duration.total_seconds() if duration else 0.0
+
+
+def _ranges(field: str, ranges: Sequence[DateRange]) -> Q:
+    return reduce(or_, (Q(**{f'{field}__range': list(bounds)}) for bounds in ranges))
+
+
+def _merge(partials: Iterable[Tuple[tuple, Dict]]) -> Dict[tuple, Dict]:
+    merged = defaultdict(lambda: defaultdict(float))
+    for key, values in partials:
+        for name, value in values.items():
+            merged[key][name] += value or 0
+    return merged
+
+
+def _scope_sql(organization_id, agent_id=None) -> Tuple[str, List]:
+    if agent_id is not None:
+        return 'agent_id = ?', [agent_id]
+    return 'organization_id = ?', [organization_id]
+
+
+def _average(total: float, count: float) -> Optional[float]:
+    return total / count if count else None
+
+
+def _split_today(date_from: date, date_to: date) -> Tuple[Optional[DateRange], Optional[DateRange]]:
+    """Plage close (jours révolus, mis en cache) et plage ouverte (aujourd'hui et au-delà)"""
+    today = timezone.localdate()
+    closed_to = min(date_to, today - timedelta(days=1))
+    open_from = max(date_from, today)
+    return (
+        (date_from, closed_to) if date_from <= closed_to else None,
+        (open_from, date_to) if open_from <= date_to else None,
+    )
+
+
+# ----------------------------------------------------------------------
+# Métriques de files
+# ----------------------------------------------------------------------
+
+QUEUE_METRICS_SQL = """
+SELECT CAST(date_trunc(?, day) AS DATE), SUM(average_wait_time), COUNT(*),
+       SUM(total_customers), SUM(served_customers), SUM(abandoned_customers),
+       SUM(service_efficiency)
+FROM {queue_metrics}
+WHERE organization_id = ? AND day BETWEEN ? AND ?
+GROUP BY 1
+"""
+
+
+def queue_metrics_partials(queryset, organization_id, date_from: date, date_to: date, aggregate_by: str) -> List:
+    """Sommes partielles par période des QueueMetrics (queryset déjà restreint à l'organisation)"""
+    snapshot, live = snapshot_store.split(date_from, date_to)
+    partials = []
+    if snapshot:
+        for period, wait, rows, total, served, abandoned, efficiency in snapshot_store.query(
+            QUEUE_METRICS_SQL, [aggregate_by, organization_id, *snapshot]
+        ):
+            partials.append(((period,), {
+                'wait': wait, 'rows': rows, 'total': total, 'served': served,
+                'abandoned': abandoned, 'efficiency': efficiency,
+            }))
+    if live:
+        rows = queryset.filter(_ranges('date', live)).annotate(
+            period=TRUNCATIONS[aggregate_by]('date')
+        ).values('period').annotate(
+            wait_total=Sum('average_wait_time'),
+            rows=Count('id'),
+            total=Sum('total_customers'),
+            served=Sum('served_customers'),
+            abandoned=Sum('abandoned_customers'),
+            efficiency=Sum('service_efficiency'),
+        ).order_by()
+        for row in rows:
+            partials.append(((row['period'],), {
+                'wait': _seconds(row['wait_total']), 'rows': row['rows'], 'total': row['total'],
+                'served': row['served'], 'abandoned': row['abandoned'], 'efficiency': row['efficiency'],
+            }))
+    return partials
+
+
+def queue_metrics_aggregate(queryset, organization_id, date_from: date, date_to: date, aggregate_by: str) -> List[Dict]:
+    """
+    Agrégat par période des QueueMetrics : la plage close (jusqu'à la
+    veille) est lue dans le cache de résultats, seul aujourd'hui est recalculé
+    """
+    closed, open_range = _split_today(date_from, date_to)
+    partials = []
+    if closed:
+        partials += result_cache.get_or_compute(
+            'queue_metrics.aggregate',
+            organization_id,
+            {'date_from': closed[0], 'date_to': closed[1], 'aggregate_by': aggregate_by},
+            lambda: queue_metrics_partials(queryset, organization_id, *closed, aggregate_by)
+        )
+    if open_range:
+        partials += queue_metrics_partials(queryset, organization_id, *open_range, aggregate_by)
+
+    return [
+        {
+            'period': period,
+            'avg_wait_time': timedelta(seconds=values['wait'] / values['rows']),
+            'total_customers': int(values['total']),
+            'served_customers': int(values['served']),
+            'abandoned_customers': int(values['abandoned']),
+            'avg_efficiency': values['efficiency'] / values['rows'],
+        }
+        for (period,), values in sorted(_merge(partials).items())
+    ]
+
+
+# ----------------------------------------------------------------------
+# Performances des agents
+# ----------------------------------------------------------------------
+
+AGENT_PERFORMANCE_SQL = """
+SELECT agent_id, CAST(date_trunc(?, day) AS DATE), SUM(customers_served),
+       SUM(average_service_time), COUNT(*), SUM(service_rating), COUNT(service_rating)
+FROM {agent_performance}
+WHERE {scope} AND day BETWEEN ? AND ?
+GROUP BY 1, 2
+"""
+
+
+def agent_performance_aggregate(
+    queryset,
+    organization_id,
+    date_from: date,
+    date_to: date,
+    aggregate_by: str,
+    metrics: Iterable[str],
+    agent_id=None
+) -> List[Dict]:
+    """
+    Agrégat par agent et période ; agent_id restreint aux performances
+    d'un agent (utilisateur sans droit sur toute l'organisation)
+    """
+    snapshot, live = snapshot_store.split(date_from, date_to)
+    partials = []
+    if snapshot:
+        scope, params = _scope_sql(organization_id, agent_id)
+        for agent, period, served, service, rows, rating, rated in snapshot_store.query(
+            AGENT_PERFORMANCE_SQL.replace('{scope}', scope), [aggregate_by, *params, *snapshot]
+        ):
+            partials.append(((agent, period), {
+                'served': served, 'service': service, 'rows': rows, 'rating': rating, 'rated': rated,
+            }))
+    if live:
+        rows = queryset.filter(_ranges('date', live)).annotate(
+            period=TRUNCATIONS[aggregate_by]('date')
+        ).values('agent', 'period').annotate(
+            served=Sum('customers_served'),
+            service_total=Sum('average_service_time'),
+            rows=Count('id'),
+            rating=Sum('service_rating'),
+            rated=Count('service_rating'),
+        ).order_by()
+        for row in rows:
+            partials.append(((row['agent'], row['period']), {
+                'served': row['served'], 'service': _seconds(row['service_total']), 'rows': row['rows'],
+                'rating': row['rating'], 'rated': row['rated'],
+            }))
+
+    metrics = set(metrics)
+    results = []
+    for (agent, period), values in sorted(_merge(partials).items()):
+        result = {'agent': agent, 'period': period}
+        if 'customers_served' in metrics:
+            result['customers_served'] = int(values['served'])
+        if 'average_service_time' in metrics:
+            result['avg_service_time'] = timedelta(seconds=values['service'] / values['rows'])
+        if 'service_rating' in metrics:
+            result['avg_rating'] = _average(values['rating'], values['rated'])
+        results.append(result)
+    return results
+
+
+# ----------------------------------------------------------------------
+# Avis clients
+# ----------------------------------------------------------------------
+
+# Commentaires échantillonnés par groupe (les plus récents)
+DEFAULT_COMMENT_SAMPLES = 20
+
+# Effectif par groupe et, en une passe, les N commentaires les plus récents
+# (numérotés par groupe parmi les commentaires non vides)
+FEEDBACK_SQL = """
+SELECT value, COUNT(*),
+       list(comment ORDER BY created_at DESC) FILTER (WHERE commented AND recency <= ?),
+       list(created_at ORDER BY created_at DESC) FILTER (WHERE commented AND recency <= ?)
+FROM (
+    SELECT {group} AS value, comment, created_at, comment <> '' AS commented,
+           row_number() OVER (PARTITION BY {group}, comment <> '' ORDER BY created_at DESC) AS recency
+    FROM {customer_feedback}
+    WHERE organization_id = ? AND day BETWEEN ? AND ?
+)
+GROUP BY 1
+"""
+
+
+def _live_comment_samples(queryset, group_by: str, limit: int):
+    """
+    Les `limit` commentaires non vides les plus récents de chaque groupe,
+    en une requête : rang par groupe (ROW_NUMBER) puis ArrayAgg des seuls
+    rangs retenus. Retourne {valeur: [(date, commentaire), ...]}.
+    """
+    order = (F('created_at').desc(), F('id').desc())
+    ranked = queryset.exclude(comment='').annotate(
+        rank=Window(RowNumber(), partition_by=[F(group_by)], order_by=order)
+    ).filter(rank__lte=limit).values('pk')
+    rows = CustomerFeedback.objects.filter(pk__in=ranked).values(group_by).annotate(
+        comments=ArrayAgg('comment', ordering=order),
+        times=ArrayAgg('created_at', ordering=order),
+    ).order_by()
+    return {row[group_by]: list(zip(row['times'], row['comments'])) for row in rows}
+
+
+def feedback_analysis(
+    queryset,
+    organization_id,
+    date_from: date,
+    date_to: date,
+    group_by: str,
+    include_comments: bool = False,
+    comments_limit: int = DEFAULT_COMMENT_SAMPLES
+) -> List[Dict]:
+    """
+    Répartition des avis par note (effectif, pourcentage) et, sur
+    demande, les comments_limit commentaires les plus récents de chaque
+    groupe. Deux requêtes au plus par source, quel que soit le volume ;
+    les commentaires complets se lisent page par page (endpoint comments).
+    """
+    if group_by not in FEEDBACK_GROUPS:
+        raise ValueError(f"Regroupement inconnu : {group_by}")
+    limit = comments_limit if include_comments else 0
+    snapshot, live = snapshot_store.split(date_from, date_to)
+    counts = defaultdict(int)
+    samples = defaultdict(list)
+    if snapshot:
+        for value, count, texts, times in snapshot_store.query(
+            FEEDBACK_SQL.replace('{group}', group_by), [limit, limit, organization_id, *snapshot]
+        ):
+            counts[value] += count
+            samples[value].extend(zip(times or [], texts or []))
+    if live:
+        live_queryset = queryset.filter(_ranges('created_at__date', live))
+        for value, count in live_queryset.values_list(group_by).annotate(count=Count('id')).order_by():
+            counts[value] += count
+        if limit:
+            for value, pairs in _live_comment_samples(live_queryset, group_by, limit).items():
+                samples[value].extend(pairs)
+
+    total = sum(counts.values())
+    results = []
+    for value in sorted(counts):
+        result = {group_by: value, 'count': counts[value], 'percentage': counts[value] * 100.0 / total}
+        if include_comments:
+            recent = sorted(samples[value], key=lambda pair: pair[0], reverse=True)[:limit]
+            result['comments'] = [comment for _, comment in recent]
+        results.append(result)
+    return results
+
+
+# ----------------------------------------------------------------------
+# Synthèse des avis
+# ----------------------------------------------------------------------
+
+def feedback_summary_partials(queryset) -> Dict:
+    """Sommes partielles des avis du queryset et répartition des notes, en une requête"""
+    ratings = [choice.value for choice in CustomerFeedback.Rating]
+    totals = queryset.aggregate(
+        count=Count('id'),
+        rating=Sum('rating'),
+        wait_time_satisfaction=Sum('wait_time_satisfaction'),
+        service_satisfaction=Sum('service_satisfaction'),
+        **{f'rating_{rating}': Count('id', filter=Q(rating=rating)) for rating in ratings}
+    )
+    distribution = {rating: totals.pop(f'rating_{rating}') for rating in ratings}
+    totals['distribution'] = {rating: count for rating, count in distribution.items() if count}
+    return totals
+
+
+def feedback_summary(queryset, organization_id) -> Dict:
+    """
+    Synthèse de tous les avis : les avis antérieurs à aujourd'hui sont
+    lus dans le cache de résultats, seuls ceux du jour sont recalculés
+    """
+    midnight = day_bounds(timezone.localdate())[0]
+    closed = result_cache.get_or_compute(
+        'customer_feedback.summary',
+        organization_id,
+        {'before': timezone.localdate()},
+        lambda: feedback_summary_partials(queryset.filter(created_at__lt=midnight))
+    )
+    today = feedback_summary_partials(queryset.filter(created_at__gte=midnight))
+
+    count = closed['count'] + today['count']
+    distribution = defaultdict(int)
+    for partial in (closed, today):
+        for rating, rating_count in partial['distribution'].items():
+            distribution[rating] += rating_count
+
+    def average(field):
+        return _average((closed[field] or 0) + (today[field] or 0), count)
+
+    return {
+        'total_feedback': count,
+        'average_rating': average('rating'),
+        'average_wait_time_satisfaction': average('wait_time_satisfaction'),
+        'average_service_satisfaction': average('service_satisfaction'),
+        'rating_distribution': [
+            {'rating': rating, 'count': distribution[rating]} for rating in sorted(distribution)
+        ],
+    }
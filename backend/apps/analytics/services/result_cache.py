@@ -0,0 +1,90 @@
+"""
+Cache des résultats analytiques
+
+Les résultats partiels des plages closes (jusqu'à la veille) sont mis en
+cache sous une clé formée de l'endpoint, de l'organisation, des
+paramètres normalisés et de la version des données de l'organisation.
+Toute écriture de données analytiques d'un jour révolu (agrégation des
+tickets, avis, métriques modifiées via l'API) incrémente cette version :
+les entrées existantes ne sont plus jamais lues. Les écritures du jour
+courant, de loin les plus fréquentes, ne portent que sur la plage
+ouverte, jamais mise en cache, et laissent la version intacte. La durée
+de vie des entrées ne sert qu'à libérer la mémoire, pas à l'invalidation.
+"""
+import hashlib
+import json
+import logging
+from datetime import date
+from typing import Callable, Iterable
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.queues.models import Queue
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'analytics:version:{organization_id}'
+RESULT_KEY = 'analytics:result:{endpoint}:{organization_id}:{version}:{digest}'
+
+# Éviction des entrées orphelines (versions dépassées, plages anciennes)
+RESULT_TTL = 7 * 24 * 3600
+
+
+def is_closed_day(day: date) -> bool:
+    """Jour révolu : ses résultats peuvent être en cache (aujourd'hui ne l'est jamais)"""
+    return day < timezone.localdate()
+
+
+def normalize(params: dict) -> str:
+    """Empreinte stable des paramètres (ordre des clés et types de dates indifférents)"""
+    payload = json.dumps(params, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class ResultCache:
+    """Résultats versionnés par organisation"""
+
+    def version(self, organization_id) -> int:
+        return cache.get(VERSION_KEY.format(organization_id=organization_id)) or 0
+
+    def bump(self, organization_ids: Iterable) -> None:
+        """Rend obsolètes les résultats en cache des organisations fournies"""
+        for organization_id in set(organization_ids):
+            if organization_id is None:
+                continue
+            key = VERSION_KEY.format(organization_id=organization_id)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, None)
+
+    def key(self, endpoint: str, organization_id, params: dict) -> str:
+        return RESULT_KEY.format(
+            endpoint=endpoint,
+            organization_id=organization_id,
+            version=self.version(organization_id),
+            digest=normalize(params)
+        )
+
+    def get_or_compute(self, endpoint: str, organization_id, params: dict, compute: Callable):
+        """Résultat en cache pour cette version des données, sinon calculé puis mis en cache"""
+        if organization_id is None:
+            return compute()
+        key = self.key(endpoint, organization_id, params)
+        result = cache.get(key)
+        if result is None:
+            result = compute()
+            cache.set(key, result, RESULT_TTL)
+        return result
+
+
+result_cache = ResultCache()
+
+
+def bump_for_queues(queue_ids: Iterable) -> None:
+    """Incrémente la version des organisations propriétaires des files"""
+    organization_ids = Queue.objects.filter(pk__in=list(queue_ids)).values_list(
+        'queue_type__organization_id', flat=True
+    ).distinct()
+    result_cache.bump(organization_ids)
@@ -0,0 +1,340 @@
+"""
+Agrégation continue des tickets
+
+Les changements de tickets sont repérés par leurs horodatages
+(arrivée, appel, début et fin de service ; chaque transition en pose
+un) et par les avis clients, au-delà d'une position (watermark) ; chaque
+passage reprend aussi une fenêtre avant la position, pour les
+transactions validées en retard. Chaque heure d'arrivée touchée est recalculée entièrement depuis l'historique
+des tickets (vifs et archivés) dans QueueHourlyMetrics, puis chaque jour
+touché est recalculé depuis ces heures dans QueueMetrics et
+QueueAnalytics. Toutes les écritures sont des upserts : rejouer une
+plage ou lancer un rattrapage en parallèle ne crée pas de doublon.
+"""
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from apps.queues.models import QueueAnalytics, Ticket, TicketHistory
+from ..models import CustomerFeedback, QueueHourlyMetrics, QueueMetrics, RollupWatermark
+from .result_cache import bump_for_queues, is_closed_day
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = 'queue_rollup'
+
+# Les horodatages sont posés avant le commit : on laisse aux transactions
+# en cours le temps d'aboutir avant d'avancer la position
+SETTLE_DELAY = timedelta(minutes=2)
+
+# Une transaction validée après SETTLE_DELAY porte des horodatages déjà
+# dépassés par la position : chaque passage rebalaie cette fenêtre en deçà
+# (le recalcul est idempotent, seul le coût augmente)
+RESCAN_WINDOW = timedelta(minutes=30)
+
+# Première exécution sans position : l'historique relève du rattrapage
+INITIAL_WINDOW = timedelta(days=1)
+
+# Heures retenues comme heures de pointe d'une journée
+PEAK_HOURS = 3
+
+HOUR = timedelta(hours=1)
+
+Status = Ticket.Status
+
+HOURLY_FIELDS = [
+    'total_tickets', 'served_tickets', 'cancelled_tickets', 'no_shows',
+    'wait_count', 'wait_seconds', 'service_count', 'service_seconds',
+    'rating_count', 'rating_sum',
+]
+
+
+@dataclass
+class RollupResult:
+    hours: int = 0
+    days: int = 0
+    position: Optional[datetime] = None
+
+
+def _seconds(duration) -> float:
+    return duration.total_seconds() if duration else 0.0
+
+
+def day_bounds(day: date) -> Tuple[datetime, datetime]:
+    """Minuit local du jour et du lendemain"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def local_day(at: datetime) -> date:
+    return timezone.localtime(at).date()
+
+
+# ----------------------------------------------------------------------
+# Détection des changements
+# ----------------------------------------------------------------------
+
+def changed_hours(since: datetime, until: datetime) -> Set[Tuple[int, datetime]]:
+    """(file, heure d'arrivée) des tickets et avis modifiés dans [since, until)"""
+    window = Q()
+    for field in ('check_in_time', 'called_time', 'service_start_time', 'service_end_time'):
+        window |= Q(**{f'{field}__gte': since, f'{field}__lt': until})
+    tickets = Ticket.objects.filter(window).annotate(
+        hour=TruncHour('check_in_time')
+    ).values_list('queue_id', 'hour').distinct().order_by()
+    feedback = CustomerFeedback.objects.filter(
+        created_at__gte=since,
+        created_at__lt=until
+    ).annotate(
+        hour=TruncHour('ticket__check_in_time')
+    ).values_list('ticket__queue_id', 'hour').distinct().order_by()
+    return set(tickets) | set(feedback)
+
+
+def _hours_filter(pairs: Iterable[Tuple[int, datetime]], prefix: str = '') -> Q:
+    """Une condition par heure distincte, couvrant toutes ses files"""
+    by_hour = defaultdict(set)
+    for queue_id, hour in pairs:
+        by_hour[hour].add(queue_id)
+    condition = Q()
+    for hour, queue_ids in by_hour.items():
+        condition |= Q(**{
+            f'{prefix}queue_id__in': queue_ids,
+            f'{prefix}check_in_time__gte': hour,
+            f'{prefix}check_in_time__lt': hour + HOUR,
+        })
+    return condition
+
+
+# ----------------------------------------------------------------------
+# Agrégats horaires
+# ----------------------------------------------------------------------
+
+def aggregate_hours(ticket_filter: Q, feedback_filter: Q) -> List[QueueHourlyMetrics]:
+    """Agrégats horaires recalculés : une requête groupée sur l'historique, une sur les avis"""
+    completed = Q(status=Status.COMPLETED, service_start_time__isnull=False)
+    rows = TicketHistory.objects.filter(ticket_filter).annotate(
+        hour=TruncHour('check_in_time')
+    ).values('queue_id', 'hour').annotate(
+        total_tickets=Count('id'),
+        served_tickets=Count('id', filter=Q(status=Status.COMPLETED)),
+        cancelled_tickets=Count('id', filter=Q(status=Status.CANCELLED)),
+        no_shows=Count('id', filter=Q(status=Status.NO_SHOW)),
+        wait_count=Count('called_time'),
+        wait=Sum(ExpressionWrapper(
+            F('called_time') - F('check_in_time'), output_field=DurationField()
+        )),
+        service_count=Count('id', filter=completed),
+        service=Sum(ExpressionWrapper(
+            F('service_end_time') - F('service_start_time'), output_field=DurationField()
+        ), filter=completed),
+    ).order_by()
+    ratings = {
+        (row['ticket__queue_id'], row['hour']): row
+        for row in CustomerFeedback.objects.filter(feedback_filter).annotate(
+            hour=TruncHour('ticket__check_in_time')
+        ).values('ticket__queue_id', 'hour').annotate(
+            rating_count=Count('id'),
+            rating_sum=Sum('rating'),
+        ).order_by()
+    }
+
+    metrics = []
+    for row in rows:
+        rating = ratings.get((row['queue_id'], row['hour']), {})
+        metrics.append(QueueHourlyMetrics(
+            queue_id=row['queue_id'],
+            hour=row['hour'],
+            total_tickets=row['total_tickets'],
+            served_tickets=row['served_tickets'],
+            cancelled_tickets=row['cancelled_tickets'],
+            no_shows=row['no_shows'],
+            wait_count=row['wait_count'],
+            wait_seconds=_seconds(row['wait']),
+            service_count=row['service_count'],
+            service_seconds=_seconds(row['service']),
+            rating_count=rating.get('rating_count', 0),
+            rating_sum=rating.get('rating_sum') or 0,
+        ))
+    return metrics
+
+
+def save_hours(metrics: List[QueueHourlyMetrics]) -> None:
+    QueueHourlyMetrics.objects.bulk_create(
+        metrics,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['queue', 'hour'],
+        update_fields=HOURLY_FIELDS + ['updated_at']
+    )
+
+
+# ----------------------------------------------------------------------
+# Agrégats journaliers
+# ----------------------------------------------------------------------
+
+def summarize_day(hours: List[Dict]) -> Dict:
+    """
+    Résumé d'une journée d'une file à partir de ses agrégats horaires
+    (dictionnaires avec 'hour' et les champs de HOURLY_FIELDS)
+    """
+    totals = {field: sum(hour[field] for hour in hours) for field in HOURLY_FIELDS}
+    arrivals = defaultdict(int)
+    for hour in hours:
+        arrivals[timezone.localtime(hour['hour']).hour] += hour['total_tickets']
+    busiest = sorted(
+        (local_hour for local_hour, count in arrivals.items() if count),
+        key=lambda local_hour: (-arrivals[local_hour], local_hour)
+    )[:PEAK_HOURS]
+    return {
+        **totals,
+        'average_wait_seconds': totals['wait_seconds'] / totals['wait_count'] if totals['wait_count'] else 0.0,
+        'average_service_seconds': (
+            totals['service_seconds'] / totals['service_count'] if totals['service_count'] else 0.0
+        ),
+        'satisfaction': totals['rating_sum'] / totals['rating_count'] if totals['rating_count'] else None,
+        'peak_hours': sorted(busiest),
+        'hour_histogram': [arrivals[local_hour] for local_hour in range(24)],
+        'hourly_arrivals': {
+            f'{local_hour:02d}:00': arrivals[local_hour] for local_hour in sorted(arrivals) if arrivals[local_hour]
+        },
+    }
+
+
+def rollup_days(queue_days: Set[Tuple[int, date]]) -> int:
+    """Recalcule QueueMetrics et QueueAnalytics des (file, jour) fournis depuis les agrégats horaires"""
+    if not queue_days:
+        return 0
+    by_day = defaultdict(set)
+    for queue_id, day in queue_days:
+        by_day[day].add(queue_id)
+    condition = Q()
+    for day, queue_ids in by_day.items():
+        start, end = day_bounds(day)
+        condition |= Q(queue_id__in=queue_ids, hour__gte=start, hour__lt=end)
+
+    hours = defaultdict(list)
+    for row in QueueHourlyMetrics.objects.filter(condition).values('queue_id', 'hour', *HOURLY_FIELDS):
+        hours[(row['queue_id'], local_day(row['hour']))].append(row)
+
+    metrics, analytics = [], []
+    for (queue_id, day), rows in hours.items():
+        summary = summarize_day(rows)
+        abandoned = summary['cancelled_tickets'] + summary['no_shows']
+        total = summary['total_tickets']
+        metrics.append(QueueMetrics(
+            queue_id=queue_id,
+            date=day,
+            average_wait_time=timedelta(seconds=summary['average_wait_seconds']),
+            total_customers=total,
+            served_customers=summary['served_tickets'],
+            abandoned_customers=abandoned,
+            peak_hours=[time(local_hour) for local_hour in summary['peak_hours']],
+            hour_histogram=summary['hour_histogram'],
+            service_efficiency=summary['served_tickets'] / total if total else 0.0,
+        ))
+        analytics.append(QueueAnalytics(
+            queue_id=queue_id,
+            date=day,
+            total_tickets=total,
+            served_tickets=summary['served_tickets'],
+            cancelled_tickets=summary['cancelled_tickets'],
+            no_shows=summary['no_shows'],
+            average_wait_time=round(summary['average_wait_seconds'] / 60),
+            average_service_time=round(summary['average_service_seconds'] / 60),
+            peak_hours=summary['hourly_arrivals'],
+            satisfaction_score=summary['satisfaction'],
+        ))
+
+    QueueMetrics.objects.bulk_create(
+        metrics,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['queue', 'date'],
+        update_fields=[
+            'average_wait_time', 'total_customers', 'served_customers',
+            'abandoned_customers', 'peak_hours', 'hour_histogram', 'service_efficiency',
+        ]
+    )
+    QueueAnalytics.objects.bulk_create(
+        analytics,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['queue', 'date'],
+        update_fields=[
+            'total_tickets', 'served_tickets', 'cancelled_tickets', 'no_shows',
+            'average_wait_time', 'average_service_time', 'peak_hours', 'satisfaction_score',
+        ]
+    )
+    # Les résultats en cache des organisations concernées sont périmés si
+    # un jour révolu a été réécrit (le jour courant n'est jamais en cache)
+    queue_ids = {queue_id for queue_id, day in hours if is_closed_day(day)}
+    if queue_ids:
+        transaction.on_commit(lambda: bump_for_queues(queue_ids))
+    # Les jours révolus déjà exportés en Parquet sont réécrits eux aussi
+    closed_days = {day for _, day in queue_days if is_closed_day(day)}
+    if closed_days:
+        transaction.on_commit(lambda: _refresh_snapshots(closed_days), robust=True)
+    return len(metrics)
+
+
+def _refresh_snapshots(days: Set[date]) -> None:
+    # Import différé : le module des instantanés dépend de celui-ci
+    from .snapshots import snapshot_store
+    snapshot_store.refresh_days(days)
+
+
+# ----------------------------------------------------------------------
+# Points d'entrée
+# ----------------------------------------------------------------------
+
+def run_rollup(now: Optional[datetime] = None) -> RollupResult:
+    """
+    Agrège les changements survenus depuis la dernière position (moins
+    RESCAN_WINDOW) et avance celle-ci, dans une même transaction (la ligne de position est
+    verrouillée : deux exécutions simultanées se succèdent).
+    """
+    until = (now or timezone.now()) - SETTLE_DELAY
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(
+            name=WATERMARK_NAME,
+            defaults={'position': until - INITIAL_WINDOW}
+        )
+        if watermark.position >= until:
+            return RollupResult(position=watermark.position)
+
+        pairs = changed_hours(watermark.position - RESCAN_WINDOW, until)
+        result = RollupResult(hours=len(pairs), position=until)
+        if pairs:
+            metrics = aggregate_hours(_hours_filter(pairs), _hours_filter(pairs, prefix='ticket__'))
+            save_hours(metrics)
+            result.days = rollup_days({(queue_id, local_day(hour)) for queue_id, hour in pairs})
+
+        watermark.position = until
+        watermark.save(update_fields=['position', 'updated_at'])
+
+    logger.info(f"Agrégation des tickets : {result.hours} heure(s), {result.days} jour(s) jusqu'à {until}")
+    return result
+
+
+def rollup_range(start: date, end: date) -> RollupResult:
+    """
+    Recalcule toutes les files sur les jours [start, end) depuis
+    l'historique complet (rattrapage) ; la position n'est pas modifiée.
+    """
+    lower, upper = day_bounds(start)[0], day_bounds(end)[0]
+    with transaction.atomic():
+        metrics = aggregate_hours(
+            Q(check_in_time__gte=lower, check_in_time__lt=upper),
+            Q(ticket__check_in_time__gte=lower, ticket__check_in_time__lt=upper)
+        )
+        save_hours(metrics)
+        days = rollup_days({(metric.queue_id, local_day(metric.hour)) for metric in metrics})
+    return RollupResult(hours=len(metrics), days=days)
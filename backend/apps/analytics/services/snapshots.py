@@ -0,0 +1,324 @@
+"""
+Instantanés analytiques en Parquet
+
+Chaque nuit, les tickets (vifs et archivés), les métriques de files,
+les performances d'agents et les avis clients de la veille sont écrits
+en Parquet, un fichier par jeu de données et par jour local :
+
+    <ANALYTICS_SNAPSHOT_DIR>/<jeu>/day=AAAA-MM-JJ/part-0.parquet
+
+Les derniers jours sont réécrits à chaque export (rattrapage des
+changements tardifs) ; les jours plus anciens recalculés par
+l'agrégation (rattrapage, rebalayage) sont réexportés après commit.
+L'écriture passe par un fichier temporaire renommé, une partition est
+donc toujours complète. Un manifeste
+indique la plage de jours couverte sans trou. Les requêtes de plages
+historiques sont exécutées par DuckDB sur ces fichiers, hors de la base
+transactionnelle (voir services.reporting).
+
+pyarrow et duckdb sont optionnels : sans eux, ou sans
+ANALYTICS_SNAPSHOTS_ENABLED, toutes les requêtes restent sur PostgreSQL.
+"""
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from apps.queues.models import TicketHistory
+from ..models import AgentPerformance, CustomerFeedback, QueueMetrics
+from .rollup import day_bounds
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+PARTITION_KEY = 'day'
+
+# Jours réécrits à chaque export nocturne (métriques recalculées, avis tardifs)
+REFRESH_DAYS = 3
+
+FETCH_CHUNK_SIZE = 5000
+
+DateRange = Tuple[date, date]
+
+
+@dataclass(frozen=True)
+class Dataset(ABC):
+    """Jeu de données exporté : requête du jour et schéma Parquet"""
+    name: str
+    columns: Tuple[Tuple[str, str], ...]
+
+    @abstractmethod
+    def rows(self, day: date, start, end):
+        """Lignes du jour `day` (bornes locales [start, end)) en dictionnaires"""
+
+
+class TicketsDataset(Dataset):
+    def rows(self, day, start, end):
+        return TicketHistory.objects.filter(
+            check_in_time__gte=start, check_in_time__lt=end
+        ).values(
+            'id', 'queue_id', 'status', 'priority_level', 'check_in_time',
+            'called_time', 'service_start_time', 'service_end_time',
+            organization_id=F('queue__queue_type__organization_id'),
+            branch_id=F('queue__queue_type__branch_id'),
+        )
+
+
+class QueueMetricsDataset(Dataset):
+    def rows(self, day, start, end):
+        return QueueMetrics.objects.filter(date=day).values(
+            'queue_id', 'date', 'total_customers', 'served_customers',
+            'abandoned_customers', 'service_efficiency', 'peak_hours',
+            'average_wait_time',
+            organization_id=F('queue__queue_type__organization_id'),
+            branch_id=F('queue__queue_type__branch_id'),
+        )
+
+
+class AgentPerformanceDataset(Dataset):
+    def rows(self, day, start, end):
+        return AgentPerformance.objects.filter(date=day).values(
+            'agent_id', 'date', 'customers_served', 'average_service_time',
+            'service_rating',
+            organization_id=F('agent__organization_id'),
+        )
+
+
+class CustomerFeedbackDataset(Dataset):
+    def rows(self, day, start, end):
+        return CustomerFeedback.objects.filter(
+            created_at__gte=start, created_at__lt=end
+        ).values(
+            'id', 'ticket_id', 'created_at', 'rating', 'wait_time_satisfaction',
+            'service_satisfaction', 'comment',
+            queue_id=F('ticket__queue_id'),
+            organization_id=F('ticket__queue__queue_type__organization_id'),
+        )
+
+
+# Types : int, float, str, date, timestamp, seconds (durée), times (liste d'heures)
+DATASETS = {
+    dataset.name: dataset for dataset in (
+        TicketsDataset('tickets', (
+            ('id', 'int'), ('queue_id', 'int'), ('organization_id', 'int'), ('branch_id', 'int'),
+            ('status', 'str'), ('priority_level', 'int'), ('check_in_time', 'timestamp'),
+            ('called_time', 'timestamp'), ('service_start_time', 'timestamp'),
+            ('service_end_time', 'timestamp'),
+        )),
+        QueueMetricsDataset('queue_metrics', (
+            ('queue_id', 'int'), ('organization_id', 'int'), ('branch_id', 'int'), ('date', 'date'),
+            ('average_wait_time', 'seconds'), ('total_customers', 'int'),
+            ('served_customers', 'int'), ('abandoned_customers', 'int'),
+            ('service_efficiency', 'float'), ('peak_hours', 'times'),
+        )),
+        AgentPerformanceDataset('agent_performance', (
+            ('agent_id', 'int'), ('organization_id', 'int'), ('date', 'date'),
+            ('customers_served', 'int'), ('average_service_time', 'seconds'),
+            ('service_rating', 'float'),
+        )),
+        CustomerFeedbackDataset('customer_feedback', (
+            ('id', 'int'), ('ticket_id', 'int'), ('queue_id', 'int'), ('organization_id', 'int'),
+            ('created_at', 'timestamp'), ('rating', 'int'), ('wait_time_satisfaction', 'int'),
+            ('service_satisfaction', 'int'), ('comment', 'str'),
+        )),
+    )
+}
+
+
+def _arrow_schema(dataset: Dataset):
+    import pyarrow as pa
+    types = {
+        'int': pa.int64(),
+        'float': pa.float64(),
+        'str': pa.string(),
+        'date': pa.date32(),
+        'timestamp': pa.timestamp('us', tz='UTC'),
+        'seconds': pa.float64(),
+        'times': pa.list_(pa.time64('us')),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in dataset.columns])
+
+
+def _arrow_table(dataset: Dataset, rows):
+    """Table Arrow du jour ; les durées sont converties en secondes"""
+    import pyarrow as pa
+    durations = [name for name, kind in dataset.columns if kind == 'seconds']
+    records = []
+    for row in rows.iterator(chunk_size=FETCH_CHUNK_SIZE):
+        for name in durations:
+            row[name] = row[name].total_seconds() if row[name] is not None else None
+        records.append(row)
+    return pa.Table.from_pylist(records, schema=_arrow_schema(dataset))
+
+
+class SnapshotStore:
+    """Écriture des partitions journalières et lecture via DuckDB"""
+
+    def __init__(self, root: Optional[str] = None):
+        self._root = root
+
+    @property
+    def root(self) -> Path:
+        return Path(self._root or settings.ANALYTICS_SNAPSHOT_DIR)
+
+    @property
+    def enabled(self) -> bool:
+        if not getattr(settings, 'ANALYTICS_SNAPSHOTS_ENABLED', False):
+            return False
+        try:
+            import duckdb  # noqa: F401
+            import pyarrow  # noqa: F401
+        except ImportError:
+            logger.warning("Instantanés analytiques activés mais pyarrow/duckdb non installés")
+            return False
+        return True
+
+    def partition_path(self, dataset: str, day: date) -> Path:
+        return self.root / dataset / f'{PARTITION_KEY}={day.isoformat()}' / 'part-0.parquet'
+
+    def files(self, dataset: str) -> str:
+        return str(self.root / dataset / f'{PARTITION_KEY}=*' / '*.parquet')
+
+    # ------------------------------------------------------------------
+    # Manifeste
+    # ------------------------------------------------------------------
+
+    def coverage(self) -> Optional[DateRange]:
+        """Plage de jours [début, fin] entièrement exportée, ou None"""
+        try:
+            with open(self.root / MANIFEST) as manifest:
+                data = json.load(manifest)
+        except (FileNotFoundError, ValueError):
+            return None
+        return date.fromisoformat(data['since']), date.fromisoformat(data['through'])
+
+    def _extend_coverage(self, start: date, end: date) -> None:
+        current = self.coverage()
+        if current is not None:
+            since, through = current
+            if start > through + timedelta(days=1) or end < since - timedelta(days=1):
+                logger.warning(
+                    f"Export {start} → {end} disjoint de la plage couverte "
+                    f"{since} → {through} : manifeste inchangé"
+                )
+                return
+            start, end = min(start, since), max(end, through)
+        temporary = self.root / f'{MANIFEST}.tmp'
+        with open(temporary, 'w') as manifest:
+            json.dump({'since': start.isoformat(), 'through': end.isoformat()}, manifest)
+        os.replace(temporary, self.root / MANIFEST)
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def export_day(self, day: date, datasets: Sequence[str] = tuple(DATASETS)) -> Dict[str, int]:
+        """Réécrit les partitions du jour (jour vide compris : chaque jour couvert a son fichier)"""
+        import pyarrow.parquet as pq
+        start, end = day_bounds(day)
+        counts = {}
+        for name in datasets:
+            dataset = DATASETS[name]
+            table = _arrow_table(dataset, dataset.rows(day, start, end))
+            path = self.partition_path(name, day)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = path.with_suffix('.parquet.tmp')
+            pq.write_table(table, temporary, compression='zstd')
+            os.replace(temporary, path)
+            counts[name] = table.num_rows
+        return counts
+
+    def export_range(self, start: date, end: date) -> Dict[str, int]:
+        """Exporte les jours [start, end] ; le jour courant, incomplet, n'est jamais exporté"""
+        end = min(end, timezone.localdate() - timedelta(days=1))
+        totals = {name: 0 for name in DATASETS}
+        day = start
+        while day <= end:
+            for name, count in self.export_day(day).items():
+                totals[name] += count
+            day += timedelta(days=1)
+        if start <= end:
+            self._extend_coverage(start, end)
+            logger.info(f"Instantanés analytiques exportés du {start} au {end} : {totals}")
+        return totals
+
+    def refresh_days(self, days: Iterable[date]) -> Dict[str, int]:
+        """
+        Réécrit les partitions des jours déjà couverts par le manifeste
+        (jours recalculés après leur export) ; les autres jours relèvent
+        de l'export nocturne.
+        """
+        coverage = self.coverage() if self.enabled else None
+        if coverage is None:
+            return {}
+        since, through = coverage
+        totals = {name: 0 for name in DATASETS}
+        refreshed = sorted(day for day in set(days) if since <= day <= through)
+        for day in refreshed:
+            for name, count in self.export_day(day).items():
+                totals[name] += count
+        if refreshed:
+            logger.info(f"Instantanés analytiques réexportés pour {len(refreshed)} jour(s) recalculé(s)")
+        return totals
+
+    def export_recent(self) -> Dict[str, int]:
+        """Export nocturne : les REFRESH_DAYS derniers jours et les jours manquants depuis le dernier export"""
+        yesterday = timezone.localdate() - timedelta(days=1)
+        start = yesterday - timedelta(days=REFRESH_DAYS - 1)
+        current = self.coverage()
+        if current is not None:
+            start = min(start, current[1] + timedelta(days=1))
+        return self.export_range(start, yesterday)
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def split(self, date_from: date, date_to: date) -> Tuple[Optional[DateRange], List[DateRange]]:
+        """
+        Répartit [date_from, date_to] entre les instantanés et la base :
+        retourne la plage servie par DuckDB (ou None) et les plages à lire
+        dans PostgreSQL (avant et après la couverture, aujourd'hui compris).
+        """
+        coverage = self.coverage() if self.enabled else None
+        if coverage is None:
+            return None, [(date_from, date_to)]
+        since, through = coverage
+        start, end = max(date_from, since), min(date_to, through)
+        if start > end:
+            return None, [(date_from, date_to)]
+        live = []
+        if date_from < start:
+            live.append((date_from, start - timedelta(days=1)))
+        if end < date_to:
+            live.append((end + timedelta(days=1), date_to))
+        return (start, end), live
+
+    def query(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        """
+        Exécute sql dans une base DuckDB en mémoire ; {nom_du_jeu} y est
+        remplacé par la lecture des partitions Parquet du jeu.
+        """
+        import duckdb
+        sources = {
+            name: "read_parquet('{}', hive_partitioning = true, union_by_name = true)".format(
+                self.files(name).replace("'", "''")
+            )
+            for name in DATASETS
+        }
+        connection = duckdb.connect()
+        try:
+            return connection.execute(sql.format(**sources), list(params)).fetchall()
+        finally:
+            connection.close()
+
+
+snapshot_store = SnapshotStore()
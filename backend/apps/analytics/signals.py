@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.queues.models import Ticket
+from .models import CustomerFeedback, QueueMetrics
+from .services.result_cache import bump_for_queues, is_closed_day
+
+
+@receiver(post_save, sender=QueueMetrics)
+@receiver(post_delete, sender=QueueMetrics)
+def invalidate_queue_metrics_results(sender, instance, **kwargs):
+    """Métriques d'un jour révolu modifiées hors agrégation : résultats en cache de l'organisation périmés"""
+    if not is_closed_day(instance.date):
+        return
+    queue_id = instance.queue_id
+    transaction.on_commit(lambda: bump_for_queues([queue_id]))
+
+
+@receiver(post_save, sender=CustomerFeedback)
+@receiver(post_delete, sender=CustomerFeedback)
+def invalidate_feedback_results(sender, instance, **kwargs):
+    """
+    Avis antérieur à aujourd'hui créé, modifié ou supprimé : résultats en
+    cache de l'organisation périmés (les avis du jour ne sont jamais en cache)
+    """
+    if not is_closed_day(timezone.localtime(instance.created_at).date()):
+        return
+    queue_id = Ticket.objects.filter(pk=instance.ticket_id).values_list('queue_id', flat=True).first()
+    if queue_id is not None:
+        transaction.on_commit(lambda: bump_for_queues([queue_id]))
@@ -0,0 +1,18 @@
+from celery import shared_task
+
+
+@shared_task
+def rollup_queue_metrics():
+    """Agrège les changements de tickets récents (voir services.rollup)"""
+    from .services.rollup import run_rollup
+    result = run_rollup()
+    return {'hours': result.hours, 'days': result.days}
+
+
+@shared_task
+def export_analytics_snapshots():
+    """Export nocturne des instantanés Parquet (voir services.snapshots)"""
+    from .services.snapshots import snapshot_store
+    if not snapshot_store.enabled:
+        return None
+    return snapshot_store.export_recent()
@@ -0,0 +1,130 @@
+from datetime import date, timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from apps.core.models import Organization, OrganizationBranch
+from apps.queues.models import QueueType, Queue, Ticket
+from ..models import CustomerFeedback, QueueMetrics
+from ..services.reporting import _split_today
+from ..services.result_cache import ResultCache, is_closed_day, normalize
+
+User = get_user_model()
+
+class ResultCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.results = ResultCache()
+        self.compute = mock.Mock(side_effect=lambda: [self.compute.call_count])
+
+    def test_result_is_computed_once_per_version(self):
+        params = {'date_from': date(2025, 1, 1), 'aggregate_by': 'day'}
+
+        first = self.results.get_or_compute('endpoint', 7, params, self.compute)
+        second = self.results.get_or_compute('endpoint', 7, params, self.compute)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.compute.call_count, 1)
+
+    def test_bump_invalidates_only_its_organization(self):
+        self.results.get_or_compute('endpoint', 7, {}, self.compute)
+        self.results.get_or_compute('endpoint', 8, {}, self.compute)
+
+        self.results.bump([7])
+        self.results.get_or_compute('endpoint', 7, {}, self.compute)
+        self.results.get_or_compute('endpoint', 8, {}, self.compute)
+
+        self.assertEqual(self.compute.call_count, 3)
+
+    def test_without_organization_nothing_is_cached(self):
+        self.results.get_or_compute('endpoint', None, {}, self.compute)
+        self.results.get_or_compute('endpoint', None, {}, self.compute)
+
+        self.assertEqual(self.compute.call_count, 2)
+
+    def test_parameters_are_normalized(self):
+        self.assertEqual(
+            normalize({'a': 1, 'date': date(2025, 1, 1)}),
+            normalize({'date': '2025-01-01', 'a': 1})
+        )
+
+class SplitTodayTests(SimpleTestCase):
+    @mock.patch('apps.analytics.services.reporting.timezone.localdate', return_value=date(2025, 3, 10))
+    def test_closed_days_and_today_are_separated(self, localdate):
+        self.assertEqual(
+            _split_today(date(2025, 3, 1), date(2025, 3, 10)),
+            ((date(2025, 3, 1), date(2025, 3, 9)), (date(2025, 3, 10), date(2025, 3, 10)))
+        )
+        self.assertEqual(_split_today(date(2025, 3, 1), date(2025, 3, 5)), ((date(2025, 3, 1), date(2025, 3, 5)), None))
+        self.assertEqual(_split_today(date(2025, 3, 10), date(2025, 3, 12)), (None, (date(2025, 3, 10), date(2025, 3, 12))))
+
+    @mock.patch('apps.analytics.services.result_cache.timezone.localdate', return_value=date(2025, 3, 10))
+    def test_only_days_before_today_are_closed(self, localdate):
+        self.assertTrue(is_closed_day(date(2025, 3, 9)))
+        self.assertFalse(is_closed_day(date(2025, 3, 10)))
+
+@mock.patch('apps.analytics.signals.bump_for_queues')
+class InvalidationSignalTests(TestCase):
+    def setUp(self):
+        organization = Organization.objects.create(name="Test Org")
+        branch = OrganizationBranch.objects.create(name="Test Branch", organization=organization)
+        queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            organization=organization,
+            branch=branch
+        )
+        self.queue = Queue.objects.create(queue_type=queue_type, name="Test Queue")
+        user = User.objects.create_user(email='client@example.com', password='clientpass123')
+        self.ticket = Ticket.objects.create(queue=self.queue, user=user, number='A001')
+        self.today = timezone.localdate()
+
+    def _feedback(self):
+        return CustomerFeedback.objects.create(
+            ticket=self.ticket,
+            rating=4,
+            wait_time_satisfaction=4,
+            service_satisfaction=4
+        )
+
+    def test_feedback_of_the_day_keeps_the_version(self, bump):
+        with self.captureOnCommitCallbacks(execute=True):
+            feedback = self._feedback()
+            feedback.rating = 5
+            feedback.save()
+
+        bump.assert_not_called()
+
+    def test_older_feedback_changes_bump_the_version(self, bump):
+        feedback = self._feedback()
+        CustomerFeedback.objects.filter(pk=feedback.pk).update(created_at=timezone.now() - timedelta(days=2))
+        feedback.refresh_from_db()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            feedback.rating = 2
+            feedback.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            feedback.delete()
+
+        self.assertEqual(bump.call_args_list, [mock.call([self.queue.id])] * 2)
+
+    def _metrics(self, day):
+        return QueueMetrics.objects.create(
+            queue=self.queue,
+            date=day,
+            average_wait_time=timedelta(minutes=5),
+            total_customers=10,
+            served_customers=8,
+            abandoned_customers=2,
+            peak_hours=[],
+            service_efficiency=0.8
+        )
+
+    def test_only_closed_day_metrics_bump_the_version(self, bump):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._metrics(self.today)
+        bump.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._metrics(self.today - timedelta(days=1))
+        bump.assert_called_once_with([self.queue.id])
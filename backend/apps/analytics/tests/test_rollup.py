@@ -0,0 +1,243 @@
+import importlib
+import unittest
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from apps.core.models import Organization, OrganizationBranch
+from apps.queues.models import QueueAnalytics, QueueType, Queue, Ticket
+from ..models import CustomerFeedback, QueueHourlyMetrics, QueueMetrics, RollupWatermark
+from ..services.rollup import (
+    HOURLY_FIELDS, INITIAL_WINDOW, SETTLE_DELAY, WATERMARK_NAME,
+    changed_hours, day_bounds, run_rollup, summarize_day
+)
+
+User = get_user_model()
+
+NOW = datetime(2025, 3, 4, 12, 0, tzinfo=dt_timezone.utc)
+
+# Les migrations étant désactivées en test, la vue de l'historique des
+# tickets est créée à partir du SQL de la migration
+archive_migration = importlib.import_module('apps.queues.migrations.0004_ticket_archive')
+
+def _hour(at_hour, **values):
+    row = {field: 0 for field in HOURLY_FIELDS}
+    row.update(values)
+    row['hour'] = datetime(2025, 3, 4, at_hour, tzinfo=dt_timezone.utc)
+    return row
+
+class SummarizeDayTests(SimpleTestCase):
+    def test_sums_hours_and_weights_averages_by_count(self):
+        summary = summarize_day([
+            _hour(9, total_tickets=10, served_tickets=8, wait_count=9, wait_seconds=900,
+                  service_count=8, service_seconds=2400, rating_count=2, rating_sum=9),
+            _hour(10, total_tickets=5, served_tickets=3, cancelled_tickets=1, no_shows=1,
+                  wait_count=1, wait_seconds=1200),
+        ])
+
+        self.assertEqual(summary['total_tickets'], 15)
+        self.assertEqual(summary['served_tickets'], 11)
+        # (900 + 1200) / 10 appels, et non la moyenne des moyennes horaires
+        self.assertAlmostEqual(summary['average_wait_seconds'], 210.0)
+        self.assertAlmostEqual(summary['average_service_seconds'], 300.0)
+        self.assertAlmostEqual(summary['satisfaction'], 4.5)
+
+    def test_peak_hours_are_busiest_hours_in_chronological_order(self):
+        summary = summarize_day([
+            _hour(8, total_tickets=2),
+            _hour(11, total_tickets=9),
+            _hour(14, total_tickets=4),
+            _hour(16, total_tickets=9),
+            _hour(17, total_tickets=0),
+        ])
+
+        self.assertEqual(summary['peak_hours'], [11, 14, 16])
+        self.assertEqual(summary['hourly_arrivals'], {'08:00': 2, '11:00': 9, '14:00': 4, '16:00': 9})
+
+    def test_empty_day_has_no_averages(self):
+        summary = summarize_day([_hour(9)])
+
+        self.assertEqual(summary['average_wait_seconds'], 0.0)
+        self.assertIsNone(summary['satisfaction'])
+        self.assertEqual(summary['peak_hours'], [])
+
+    def test_day_bounds_span_one_local_day(self):
+        start, end = day_bounds(date(2025, 3, 4))
+
+        self.assertEqual((end - start).days, 1)
+
+
+class RollupFixtureMixin:
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute(archive_migration.CREATE_ARCHIVE_SQL)
+        organization = Organization.objects.create(name="Test Org")
+        branch = OrganizationBranch.objects.create(name="Test Branch", organization=organization)
+        queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            organization=organization,
+            branch=branch
+        )
+        self.queue = Queue.objects.create(queue_type=queue_type, name="Test Queue")
+        self.user = User.objects.create_user(email='client@example.com', password='clientpass123')
+
+    def _ticket(self, number, check_in_time, status=Ticket.Status.WAITING, **fields):
+        ticket = Ticket.objects.create(
+            queue=self.queue,
+            user=self.user,
+            number=number,
+            status=status,
+            **fields
+        )
+        # check_in_time est renseigné automatiquement à la création
+        Ticket.objects.filter(pk=ticket.pk).update(check_in_time=check_in_time)
+        return ticket
+
+    def _served(self, number, check_in_time, wait_minutes=10, service_minutes=5):
+        called = check_in_time + timedelta(minutes=wait_minutes)
+        return self._ticket(
+            number, check_in_time,
+            status=Ticket.Status.COMPLETED,
+            called_time=called,
+            service_start_time=called,
+            service_end_time=called + timedelta(minutes=service_minutes)
+        )
+
+    def _feedback(self, ticket, rating, created_at):
+        feedback = CustomerFeedback.objects.create(
+            ticket=ticket,
+            rating=rating,
+            wait_time_satisfaction=rating,
+            service_satisfaction=rating
+        )
+        CustomerFeedback.objects.filter(pk=feedback.pk).update(created_at=created_at)
+        return feedback
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Ticket history requires PostgreSQL")
+class ChangedHoursTests(RollupFixtureMixin, TestCase):
+    def test_any_timestamp_in_window_marks_the_arrival_hour(self):
+        # Arrivé à 9h10, appelé à 11h05 : l'heure d'arrivée est à recalculer
+        self._served('A001', NOW.replace(hour=9, minute=10), wait_minutes=115)
+        self._ticket('A002', NOW.replace(hour=10, minute=30))
+        window = (NOW.replace(hour=11), NOW)
+
+        self.assertEqual(changed_hours(*window), {(self.queue.id, NOW.replace(hour=9))})
+
+    def test_feedback_marks_the_arrival_hour_of_its_ticket(self):
+        ticket = self._served('A001', NOW.replace(hour=8, minute=20))
+        self._feedback(ticket, 4, created_at=NOW.replace(hour=11, minute=30))
+
+        self.assertEqual(
+            changed_hours(NOW.replace(hour=11), NOW),
+            {(self.queue.id, NOW.replace(hour=8))}
+        )
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Ticket history requires PostgreSQL")
+class RunRollupTests(RollupFixtureMixin, TestCase):
+    def test_watermark_starts_one_window_back_and_advances(self):
+        self._served('A001', NOW.replace(hour=9, minute=10))
+
+        first = run_rollup(NOW)
+
+        self.assertEqual(first.position, NOW - SETTLE_DELAY)
+        self.assertEqual(first.hours, 1)
+        self.assertEqual(first.days, 1)
+        watermark = RollupWatermark.objects.get(name=WATERMARK_NAME)
+        self.assertEqual(watermark.position, NOW - SETTLE_DELAY)
+
+        # Position déjà atteinte : rien à faire
+        again = run_rollup(NOW)
+        self.assertEqual((again.hours, again.days), (0, 0))
+
+        later = run_rollup(NOW + timedelta(minutes=5))
+        self.assertEqual(later.position, NOW + timedelta(minutes=5) - SETTLE_DELAY)
+        watermark.refresh_from_db()
+        self.assertEqual(watermark.position, later.position)
+
+    def test_first_run_ignores_history_before_initial_window(self):
+        self._served('A001', NOW - INITIAL_WINDOW - timedelta(hours=2))
+
+        self.assertEqual(run_rollup(NOW).hours, 0)
+        self.assertFalse(QueueHourlyMetrics.objects.exists())
+
+    def test_replaying_a_range_upserts(self):
+        check_in = NOW.replace(hour=9, minute=10)
+        ticket = self._served('A001', check_in)
+        self._ticket('A002', check_in + timedelta(minutes=5), status=Ticket.Status.CANCELLED)
+        run_rollup(NOW)
+        self._feedback(ticket, 4, created_at=NOW + timedelta(minutes=1))
+        RollupWatermark.objects.update(position=NOW - timedelta(hours=4))
+
+        run_rollup(NOW + timedelta(minutes=5))
+        run_rollup(NOW + timedelta(minutes=10))
+
+        hour = QueueHourlyMetrics.objects.get()
+        self.assertEqual(hour.hour, NOW.replace(hour=9))
+        self.assertEqual((hour.total_tickets, hour.served_tickets, hour.cancelled_tickets), (2, 1, 1))
+        self.assertEqual((hour.wait_count, hour.wait_seconds), (1, 600.0))
+        self.assertEqual((hour.rating_count, hour.rating_sum), (1, 4))
+        metrics = QueueMetrics.objects.get()
+        self.assertEqual((metrics.date, metrics.total_customers, metrics.abandoned_customers), (NOW.date(), 2, 1))
+        analytics = QueueAnalytics.objects.get()
+        self.assertEqual((analytics.total_tickets, analytics.satisfaction_score), (2, 4.0))
+
+    def test_late_commit_behind_the_watermark_is_rescanned(self):
+        run_rollup(NOW)
+        # Horodatage antérieur à la position, validé après le passage
+        self._served('A001', NOW - timedelta(minutes=20), wait_minutes=5, service_minutes=5)
+
+        result = run_rollup(NOW + timedelta(minutes=5))
+
+        self.assertEqual(result.hours, 1)
+        self.assertEqual(QueueHourlyMetrics.objects.get().served_tickets, 1)
+
+    @mock.patch('apps.analytics.services.rollup.bump_for_queues')
+    @mock.patch('apps.analytics.services.result_cache.timezone.localdate', return_value=NOW.date())
+    def test_only_closed_days_invalidate_cached_results(self, localdate, bump):
+        self._served('A001', NOW.replace(hour=9, minute=10))
+        with self.captureOnCommitCallbacks(execute=True):
+            run_rollup(NOW)
+        bump.assert_not_called()
+
+        # Appel tardif d'un ticket arrivé la veille : le jour clos est réécrit
+        self._served('A002', NOW - timedelta(hours=13), wait_minutes=13 * 60 - 10, service_minutes=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            run_rollup(NOW + timedelta(minutes=5))
+        bump.assert_called_once_with({self.queue.id})
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Ticket history requires PostgreSQL")
+class BackfillRollupsTests(RollupFixtureMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        # Hors transaction de test : la vue est supprimée explicitement
+        self.addCleanup(self._drop_archive)
+
+    def _drop_archive(self):
+        with connection.cursor() as cursor:
+            cursor.execute(archive_migration.DROP_ARCHIVE_SQL)
+
+    def test_backfill_recomputes_each_day_without_moving_the_watermark(self):
+        self._served('A001', datetime(2025, 3, 1, 9, tzinfo=dt_timezone.utc))
+        self._served('A002', datetime(2025, 3, 3, 15, tzinfo=dt_timezone.utc))
+        self._served('A003', datetime(2025, 3, 3, 15, 30, tzinfo=dt_timezone.utc))
+        output = StringIO()
+
+        for _ in range(2):
+            call_command(
+                'backfill_rollups', '--start', '2025-03-01', '--end', '2025-03-04',
+                '--chunk-days', '2', '--workers', '2', stdout=output
+            )
+
+        self.assertIn("2 tranche(s) recalculée(s) : 2 heure(s), 2 jour(s)", output.getvalue())
+        self.assertEqual(
+            dict(QueueMetrics.objects.values_list('date', 'total_customers')),
+            {date(2025, 3, 1): 1, date(2025, 3, 3): 2}
+        )
+        self.assertEqual(QueueHourlyMetrics.objects.count(), 2)
+        self.assertFalse(RollupWatermark.objects.exists())
@@ -0,0 +1,186 @@
+import importlib.util
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from apps.queues.models import Ticket, TicketHistory
+from ..models import AgentPerformance, CustomerFeedback, QueueMetrics
+from ..services.reporting import (
+    _merge, agent_performance_aggregate, feedback_analysis, queue_metrics_partials
+)
+from ..services.rollup import rollup_range
+from ..services.snapshots import DATASETS, Dataset, SnapshotStore
+from .test_rollup import RollupFixtureMixin
+
+User = get_user_model()
+
+DAY = date(2025, 3, 3)
+
+def _installed(*modules):
+    return all(importlib.util.find_spec(module) is not None for module in modules)
+
+class SnapshotSplitTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = SnapshotStore(directory.name)
+        patcher = mock.patch.object(SnapshotStore, 'enabled', new_callable=mock.PropertyMock, return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_without_manifest_everything_is_live(self):
+        snapshot, live = self.store.split(date(2025, 1, 1), date(2025, 1, 31))
+
+        self.assertIsNone(snapshot)
+        self.assertEqual(live, [(date(2025, 1, 1), date(2025, 1, 31))])
+
+    def test_range_is_split_around_coverage(self):
+        self.store._extend_coverage(date(2025, 1, 10), date(2025, 1, 20))
+
+        snapshot, live = self.store.split(date(2025, 1, 1), date(2025, 1, 31))
+
+        self.assertEqual(snapshot, (date(2025, 1, 10), date(2025, 1, 20)))
+        self.assertEqual(live, [
+            (date(2025, 1, 1), date(2025, 1, 9)),
+            (date(2025, 1, 21), date(2025, 1, 31)),
+        ])
+
+    def test_coverage_only_grows_contiguously(self):
+        self.store._extend_coverage(date(2025, 1, 10), date(2025, 1, 20))
+        self.store._extend_coverage(date(2025, 1, 21), date(2025, 1, 22))
+        self.store._extend_coverage(date(2025, 2, 1), date(2025, 2, 2))
+
+        self.assertEqual(self.store.coverage(), (date(2025, 1, 10), date(2025, 1, 22)))
+
+    def test_disabled_store_reads_postgres_only(self):
+        self.store._extend_coverage(date(2025, 1, 10), date(2025, 1, 20))
+
+        with mock.patch.object(SnapshotStore, 'enabled', new_callable=mock.PropertyMock, return_value=False):
+            snapshot, live = self.store.split(date(2025, 1, 12), date(2025, 1, 15))
+
+        self.assertIsNone(snapshot)
+        self.assertEqual(live, [(date(2025, 1, 12), date(2025, 1, 15))])
+
+class DatasetTests(SimpleTestCase):
+    def test_dataset_requires_a_row_query(self):
+        with self.assertRaises(TypeError):
+            Dataset('incomplete', (('id', 'int'),))
+
+    def test_registered_datasets_are_concrete(self):
+        for name, dataset in DATASETS.items():
+            self.assertEqual(dataset.name, name)
+            self.assertIsInstance(dataset, Dataset)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Ticket history requires PostgreSQL")
+@unittest.skipUnless(_installed('duckdb', 'pyarrow'), "Snapshots require duckdb and pyarrow")
+class SnapshotRoundTripTests(RollupFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = SnapshotStore(directory.name)
+        for target in ('reporting', 'snapshots'):
+            patcher = mock.patch(f'apps.analytics.services.{target}.snapshot_store', self.store)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.organization = self.queue.queue_type.organization
+        agent = User.objects.create_user(
+            email='agent@example.com',
+            password='agentpass123',
+            organization=self.organization
+        )
+
+        morning = datetime(2025, 3, 3, 9, tzinfo=dt_timezone.utc)
+        first = self._served('A001', morning, wait_minutes=10, service_minutes=5)
+        second = self._served('A002', morning + timedelta(minutes=30), wait_minutes=20, service_minutes=7)
+        self._ticket('A003', morning + timedelta(hours=2), status=Ticket.Status.CANCELLED)
+        self._feedback(first, 5, created_at=morning + timedelta(hours=1))
+        self._feedback(second, 2, created_at=morning + timedelta(hours=2))
+        CustomerFeedback.objects.filter(pk=second.feedback.pk).update(comment="Trop d'attente")
+        AgentPerformance.objects.create(
+            agent=agent,
+            date=DAY,
+            customers_served=2,
+            average_service_time=timedelta(minutes=6),
+            service_rating=3.5
+        )
+        rollup_range(DAY, DAY + timedelta(days=1))
+
+    def _both(self, compute):
+        """Résultat servi par les instantanés, puis par PostgreSQL seul"""
+        self.store.export_range(DAY, DAY)
+        enabled = mock.patch.object(SnapshotStore, 'enabled', new_callable=mock.PropertyMock)
+        with enabled as snapshots_on:
+            snapshots_on.return_value = True
+            self.assertEqual(self.store.split(DAY, DAY), ((DAY, DAY), []))
+            from_snapshots = compute()
+            snapshots_on.return_value = False
+            from_postgres = compute()
+        return from_snapshots, from_postgres
+
+    def test_queue_metrics_match_postgres(self):
+        queryset = QueueMetrics.objects.filter(queue__queue_type__organization=self.organization)
+
+        from_snapshots, from_postgres = self._both(
+            lambda: _merge(queue_metrics_partials(queryset, self.organization.id, DAY, DAY, 'day'))
+        )
+
+        self.assertEqual(set(from_snapshots), {(DAY,)})
+        self.assertEqual(set(from_snapshots), set(from_postgres))
+        for key, values in from_postgres.items():
+            self.assertEqual(set(from_snapshots[key]), set(values))
+            for name, value in values.items():
+                self.assertAlmostEqual(from_snapshots[key][name], value, msg=name)
+        self.assertEqual(from_postgres[(DAY,)]['total'], 3)
+
+    def test_agent_performance_matches_postgres(self):
+        queryset = AgentPerformance.objects.filter(agent__organization=self.organization)
+        metrics = ['customers_served', 'average_service_time', 'service_rating']
+
+        from_snapshots, from_postgres = self._both(lambda: agent_performance_aggregate(
+            queryset, self.organization.id, DAY, DAY, 'day', metrics
+        ))
+
+        self.assertEqual(len(from_postgres), 1)
+        self.assertEqual(from_snapshots, from_postgres)
+
+    def test_feedback_matches_postgres(self):
+        queryset = CustomerFeedback.objects.filter(ticket__queue__queue_type__organization=self.organization)
+
+        from_snapshots, from_postgres = self._both(lambda: feedback_analysis(
+            queryset, self.organization.id, DAY, DAY, 'rating', include_comments=True
+        ))
+
+        self.assertEqual([row['count'] for row in from_postgres], [1, 1])
+        self.assertEqual(from_snapshots, from_postgres)
+
+    def test_ticket_partition_matches_history(self):
+        self.store.export_range(DAY, DAY)
+
+        rows = self.store.query(
+            "SELECT COUNT(*), COUNT(service_end_time) FROM {tickets} WHERE organization_id = ? AND day = ?",
+            [self.organization.id, DAY]
+        )
+
+        history = TicketHistory.objects.filter(queue=self.queue)
+        self.assertEqual(rows, [(history.count(), history.exclude(service_end_time=None).count())])
+
+    def test_backfill_reexports_covered_days(self):
+        self.store.export_range(DAY, DAY)
+        self._served('A004', datetime(2025, 3, 3, 15, tzinfo=dt_timezone.utc))
+        self._served('A005', datetime(2025, 3, 5, 15, tzinfo=dt_timezone.utc))
+
+        with mock.patch.object(SnapshotStore, 'enabled', new_callable=mock.PropertyMock, return_value=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                rollup_range(DAY, DAY + timedelta(days=3))
+            rows = self.store.query(
+                "SELECT day, SUM(total_customers) FROM {queue_metrics} GROUP BY 1 ORDER BY 1"
+            )
+
+        # Le jour couvert est réécrit ; le jour hors couverture relève de l'export nocturne
+        self.assertEqual(rows, [(DAY, 4)])
+        self.assertFalse(self.store.partition_path('queue_metrics', DAY + timedelta(days=2)).exists())
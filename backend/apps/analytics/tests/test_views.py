@@ -103,6 +103,26 @@ class AnalyticsServiceTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 3)  # 3 peak hours
 
+    def test_queue_metrics_peak_hours_filters(self):
+        self.client.force_authenticate(user=self.admin_user)
+        url = reverse('analytics:queue-metrics-peak-hours-analysis')
+        tomorrow = (timezone.now() + timedelta(days=1)).date().isoformat()
+        response = self.client.get(url, {'date_from': tomorrow})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {})
+
+        response = self.client.get(url, {'queue': self.queue.id, 'mode': 'unknown'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_queue_metrics_hourly_arrivals(self):
+        self.queue_metrics.hour_histogram = [0] * 9 + [12, 3] + [0] * 13
+        self.queue_metrics.save()
+        self.client.force_authenticate(user=self.admin_user)
+        url = reverse('analytics:queue-metrics-peak-hours-analysis')
+        response = self.client.get(url, {'mode': 'arrivals'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data.items()), [('09:00', 12), ('10:00', 3)])
+
     def test_agent_performance_list(self):
         self.client.force_authenticate(user=self.admin_user)
         url = reverse('analytics:agent-performance-list')
@@ -147,6 +167,19 @@ class AnalyticsServiceTests(APITestCase):
         }
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['comments'], ["Good service"])
+        self.assertEqual(response.data[0]['percentage'], 100.0)
+
+    def test_customer_feedback_comments_pages(self):
+        self.client.force_authenticate(user=self.admin_user)
+        url = reverse('analytics:customer-feedback-comments')
+        response = self.client.get(url, {'rating': 4, 'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['comment'] for item in response.data['results']], ["Good service"])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(url, {'rating': 1})
+        self.assertEqual(response.data['results'], [])
 
     def test_customer_feedback_summary(self):
         self.client.force_authenticate(user=self.admin_user)
@@ -155,6 +188,7 @@ class AnalyticsServiceTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue('total_feedback' in response.data)
         self.assertTrue('average_rating' in response.data)
+        self.assertEqual(response.data['rating_distribution'], [{'rating': 4, 'count': 1}])
 
     def test_unauthorized_access(self):
         url = reverse('analytics:queue-metrics-list')
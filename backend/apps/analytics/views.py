@@ -1,5 +1,4 @@
-from django.db.models import Avg, Count, F, Sum, Q
-from django.db.models.functions import TruncDate, TruncWeek, TruncMonth
+from django.db.models import F
 from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
@@ -10,7 +9,14 @@ from .models import QueueMetrics, AgentPerformance, CustomerFeedback
 from .serializers import (
     QueueMetricsSerializer, AgentPerformanceSerializer,
     CustomerFeedbackSerializer, QueueMetricsAggregateSerializer,
-    AgentPerformanceAggregateSerializer, FeedbackAnalysisSerializer
+    AgentPerformanceAggregateSerializer, FeedbackAnalysisSerializer,
+    PeakHoursQuerySerializer, FeedbackCommentsQuerySerializer
+)
+from .pagination import FeedbackCommentPagination
+from .services.peak_hours import hourly_arrivals, peak_hour_counts
+from .services.reporting import (
+    agent_performance_aggregate, feedback_analysis, feedback_summary,
+    queue_metrics_aggregate
 )
 
 class QueueMetricsViewSet(viewsets.ModelViewSet):
@@ -37,59 +43,49 @@ class QueueMetricsViewSet(viewsets.ModelViewSet):
         serializer = QueueMetricsAggregateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        queryset = self.get_queryset().filter(
-            date__range=[
-                serializer.validated_data['date_from'],
-                serializer.validated_data['date_to']
-            ]
+        data = serializer.validated_data
+        # Plage historique sur les instantanés Parquet, le reste sur PostgreSQL
+        metrics = queue_metrics_aggregate(
+            self.get_queryset(),
+            getattr(request.user, 'organization_id', None),
+            data['date_from'],
+            data['date_to'],
+            data['aggregate_by']
         )
-        
-        trunc_func = {
-            'day': TruncDate,
-            'week': TruncWeek,
-            'month': TruncMonth
-        }[serializer.validated_data['aggregate_by']]
-        
-        metrics = queryset.annotate(
-            period=trunc_func('date')
-        ).values('period').annotate(
-            avg_wait_time=Avg('average_wait_time'),
-            total_customers=Sum('total_customers'),
-            served_customers=Sum('served_customers'),
-            abandoned_customers=Sum('abandoned_customers'),
-            avg_efficiency=Avg('service_efficiency')
-        ).order_by('period')
-        
         return Response(metrics)
 
     @action(detail=False, methods=['get'])
     def peak_hours_analysis(self, request):
+        serializer = PeakHoursQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        filters = serializer.validated_data
+
         queryset = self.get_queryset()
-        if 'queue' in request.query_params:
-            queryset = queryset.filter(queue_id=request.query_params['queue'])
-            
-        peak_hours = {}
-        for metric in queryset:
-            for hour in metric.peak_hours:
-                hour_str = hour.strftime('%H:00')
-                peak_hours[hour_str] = peak_hours.get(hour_str, 0) + 1
-                
-        sorted_hours = dict(
-            sorted(
-                peak_hours.items(),
-                key=lambda x: x[1],
-                reverse=True
-            )
-        )
-        return Response(sorted_hours)
+        if 'queue' in filters:
+            queryset = queryset.filter(queue_id=filters['queue'])
+        if 'branch' in filters:
+            queryset = queryset.filter(queue__queue_type__branch_id=filters['branch'])
+        if 'date_from' in filters:
+            queryset = queryset.filter(date__gte=filters['date_from'])
+        if 'date_to' in filters:
+            queryset = queryset.filter(date__lte=filters['date_to'])
+
+        # Agrégation unnest + GROUP BY côté base (voir services.peak_hours)
+        if filters['mode'] == 'arrivals':
+            return Response(hourly_arrivals(queryset))
+        return Response(peak_hour_counts(queryset))
 
 class AgentPerformanceViewSet(viewsets.ModelViewSet):
     serializer_class = AgentPerformanceSerializer
     permission_classes = [IsAuthenticated, IsOrganizationMember]
 
+    @staticmethod
+    def _sees_organization(user):
+        return user.is_staff or user.user_type in ['ADMIN', 'OWNER']
+
     def get_queryset(self):
         user = self.request.user
-        if user.is_staff or user.user_type in ['ADMIN', 'OWNER']:
+        if self._sees_organization(user):
             return AgentPerformance.objects.filter(
                 agent__organization=user.organization
             )
@@ -100,31 +96,17 @@ class AgentPerformanceViewSet(viewsets.ModelViewSet):
         serializer = AgentPerformanceAggregateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        queryset = self.get_queryset().filter(
-            date__range=[
-                serializer.validated_data['date_from'],
-                serializer.validated_data['date_to']
-            ]
+        data = serializer.validated_data
+        user = request.user
+        results = agent_performance_aggregate(
+            self.get_queryset(),
+            user.organization_id,
+            data['date_from'],
+            data['date_to'],
+            data['aggregate_by'],
+            data['metrics'],
+            agent_id=None if self._sees_organization(user) else user.id
         )
-        
-        trunc_func = {
-            'day': TruncDate,
-            'week': TruncWeek,
-            'month': TruncMonth
-        }[serializer.validated_data['aggregate_by']]
-        
-        metrics = {}
-        if 'customers_served' in serializer.validated_data['metrics']:
-            metrics['customers_served'] = Sum('customers_served')
-        if 'average_service_time' in serializer.validated_data['metrics']:
-            metrics['avg_service_time'] = Avg('average_service_time')
-        if 'service_rating' in serializer.validated_data['metrics']:
-            metrics['avg_rating'] = Avg('service_rating')
-            
-        results = queryset.annotate(
-            period=trunc_func('date')
-        ).values('agent', 'period').annotate(**metrics).order_by('agent', 'period')
-        
         return Response(results)
 
     @action(detail=False, methods=['get'])
@@ -179,52 +161,45 @@ class CustomerFeedbackViewSet(viewsets.ModelViewSet):
         serializer = FeedbackAnalysisSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        queryset = self.get_queryset().filter(
-            created_at__date__range=[
-                serializer.validated_data['date_from'],
-                serializer.validated_data['date_to']
-            ]
+        data = serializer.validated_data
+        analysis = feedback_analysis(
+            self.get_queryset(),
+            getattr(request.user, 'organization_id', None),
+            data['date_from'],
+            data['date_to'],
+            data['group_by'],
+            include_comments=data['include_comments'],
+            comments_limit=data['comments_limit']
         )
-        
-        group_field = serializer.validated_data['group_by']
-        analysis = queryset.values(
-            group_field
-        ).annotate(
-            count=Count('id'),
-            percentage=Count('id') * 100.0 / queryset.count()
-        ).order_by(group_field)
-        
-        if serializer.validated_data['include_comments']:
-            for item in analysis:
-                item['comments'] = list(
-                    queryset.filter(
-                        **{group_field: item[group_field]},
-                        comment__isnull=False
-                    ).values_list('comment', flat=True)
-                )
-                
         return Response(analysis)
 
+    @action(detail=False, methods=['get'])
+    def comments(self, request):
+        """Commentaires complets, page par page (curseur), pour l'analyse de gros volumes"""
+        serializer = FeedbackCommentsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        filters = dict(serializer.validated_data)
+
+        queryset = self.get_queryset().exclude(comment='')
+        if 'date_from' in filters:
+            queryset = queryset.filter(created_at__date__gte=filters.pop('date_from'))
+        if 'date_to' in filters:
+            queryset = queryset.filter(created_at__date__lte=filters.pop('date_to'))
+        queryset = queryset.filter(**filters).values(
+            'id', 'ticket_id', 'rating', 'wait_time_satisfaction',
+            'service_satisfaction', 'comment', 'created_at'
+        )
+
+        paginator = FeedbackCommentPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(page)
+
     @action(detail=False, methods=['get'])
     def summary(self, request):
-        queryset = self.get_queryset()
-        
-        summary = {
-            'total_feedback': queryset.count(),
-            'average_rating': queryset.aggregate(
-                Avg('rating')
-            )['rating__avg'],
-            'average_wait_time_satisfaction': queryset.aggregate(
-                Avg('wait_time_satisfaction')
-            )['wait_time_satisfaction__avg'],
-            'average_service_satisfaction': queryset.aggregate(
-                Avg('service_satisfaction')
-            )['service_satisfaction__avg'],
-            'rating_distribution': queryset.values(
-                'rating'
-            ).annotate(
-                count=Count('id')
-            ).order_by('rating')
-        }
+        # Avis des jours révolus en cache (version des données), aujourd'hui recalculé
+        summary = feedback_summary(
+            self.get_queryset(),
+            getattr(request.user, 'organization_id', None)
+        )
         
         return Response(summary)
\ No newline at end of file
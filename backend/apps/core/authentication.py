@@ -51,3 +51,31 @@ class MFAMiddleware:
             if isinstance(device, TOTPDevice):
                 return device
         return None
+
+class JWTAuthMiddleware:
+    """
+    Middleware Channels : authentifie les connexions WebSocket avec le jeton
+    d'accès JWT passé en paramètre `token` de la query string
+    (les navigateurs ne peuvent pas envoyer d'en-tête Authorization).
+    """
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        from urllib.parse import parse_qs
+        from channels.db import database_sync_to_async
+        from django.contrib.auth.models import AnonymousUser
+
+        query = parse_qs(scope.get('query_string', b'').decode())
+        token = (query.get('token') or [None])[0]
+        scope['user'] = AnonymousUser()
+        if token:
+            authenticator = CustomJWTAuthentication()
+            try:
+                validated_token = authenticator.get_validated_token(token)
+                scope['user'] = await database_sync_to_async(authenticator.get_user)(
+                    validated_token
+                )
+            except exceptions.APIException:
+                pass
+        return await self.inner(scope, receive, send)
@@ -2,6 +2,7 @@
 Core app models
 """
 
+from .base import BaseModel
 from .user import User
 from .organization import Organization, OrganizationSettings, OrganizationFeature
 from .data_retention import DataRetentionPolicy
@@ -11,6 +12,7 @@ from .auth import SecurityKey, UserSession
 from .through import CoreUserGroup, CoreUserPermission
 
 __all__ = [
+    'BaseModel',
     'User',
     'Organization',
     'OrganizationSettings',
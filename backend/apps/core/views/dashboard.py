@@ -2,6 +2,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 import logging
+from apps.queues.services.snapshot import dashboard_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -9,19 +10,32 @@ class DashboardStatsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        # Log pour vérifier l'utilisateur authentifié
-        print(f"Utilisateur connecté : {request.user}")
-        
-        try:
-            stats = {
+        organization = getattr(request.user, 'organization', None)
+        if not organization:
+            return Response({
                 'totalQueues': 0,
                 'activeQueues': 0,
                 'totalTickets': 0,
                 'averageWaitTime': 0
-            }
+            })
+
+        branch_id = request.query_params.get('branch')
+        if branch_id:
+            try:
+                branch_id = int(branch_id)
+            except ValueError:
+                return Response({"error": "Identifiant de succursale invalide"}, status=400)
+            if not organization.branches.filter(pk=branch_id).exists():
+                return Response({"error": "Succursale introuvable"}, status=404)
+        else:
+            branch_id = None
+
+        try:
+            # Lecture O(1) de l'instantané maintenu par les transitions de tickets
+            stats = dashboard_snapshot.read(organization.id, branch_id=branch_id)
             return Response(stats)
         except Exception as e:
-            print(f"Erreur lors de la récupération des stats : {e}")
+            logger.error(f"Erreur lors de la récupération des stats : {e}")
             return Response({"error": "Impossible de récupérer les statistiques"}, status=500)
 class OrganizationLocationsView(APIView):
     permission_classes = [IsAuthenticated]
@@ -5,3 +5,6 @@ class QueuesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.queues'
     verbose_name = 'Queues'
+
+    def ready(self):
+        import apps.queues.signals  # noqa
@@ -0,0 +1,84 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from apps.core.models import OrganizationBranch
+from .models import Queue, Ticket
+from .realtime import branch_group, queue_group
+
+
+class QueueStateConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Flux temps réel d'une file (ws/queues/<queue_id>/) ou de toutes les files
+    d'une succursale (ws/branches/<branch_id>/). Le serveur pousse les
+    événements ticket_called, positions_changed et wait_time_updated.
+    Un client (hors organisation) ne reçoit que les positions de ses
+    propres tickets.
+    """
+    # Tickets dont la position est transmise ; None : toutes (personnel)
+    ticket_ids = None
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        kwargs = self.scope['url_route']['kwargs']
+        if 'queue_id' in kwargs:
+            allowed, self.ticket_ids = await self._queue_access(user, kwargs['queue_id'])
+            self.group_name = queue_group(kwargs['queue_id'])
+        else:
+            allowed = await self._can_follow_branch(user, kwargs['branch_id'])
+            self.group_name = branch_group(kwargs['branch_id'])
+
+        if not allowed:
+            await self.close(code=4403)
+            return
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def queue_event(self, event):
+        data = event['data']
+        if event['event'] == 'positions_changed' and self.ticket_ids is not None:
+            data = {
+                'positions': {
+                    pk: position for pk, position in data['positions'].items()
+                    if pk in self.ticket_ids
+                },
+                'removed': [pk for pk in data['removed'] if pk in self.ticket_ids],
+            }
+            if not data['positions'] and not data['removed']:
+                return
+        await self.send_json({
+            'event': event['event'],
+            'queue': event['queue'],
+            'data': data,
+        })
+
+    @database_sync_to_async
+    def _queue_access(self, user, queue_id):
+        """(autorisé, tickets suivis) : membre de l'organisation ou client ayant un ticket dans la file"""
+        if Queue.objects.filter(
+            pk=queue_id,
+            queue_type__organization_id=user.organization_id
+        ).exists():
+            return True, None
+        ticket_ids = {
+            str(pk) for pk in Ticket.objects.filter(
+                queue_id=queue_id,
+                user=user
+            ).values_list('pk', flat=True)
+        }
+        return bool(ticket_ids), ticket_ids
+
+    @database_sync_to_async
+    def _can_follow_branch(self, user, branch_id):
+        return OrganizationBranch.objects.filter(
+            pk=branch_id,
+            organization_id=user.organization_id
+        ).exists()
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.queues.services.archive import (
+    DEFAULT_BATCH_SIZE,
+    ArchiveUnsupported,
+    archivable_tickets,
+    archive_tickets,
+)
+
+
+class Command(BaseCommand):
+    help = "Déplace les tickets clos anciens vers la table d'archive partitionnée"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.TICKET_ARCHIVE_AFTER_DAYS,
+            help="Archiver les tickets clos depuis plus de N jours"
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Nombre de tickets déplacés par transaction"
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help="Arrêter après N lots"
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Compter les tickets archivables sans les déplacer"
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days doit être supérieur ou égal à 1.")
+
+        if options['dry_run']:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+            count = archivable_tickets(cutoff).count()
+            self.stdout.write(f"{count} ticket(s) archivable(s).")
+            return
+
+        try:
+            result = archive_tickets(
+                older_than_days=options['days'],
+                batch_size=options['batch_size'],
+                max_batches=options['max_batches'],
+            )
+        except ArchiveUnsupported as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.archived} ticket(s) archivé(s) en {result.batches} lot(s)."
+        ))
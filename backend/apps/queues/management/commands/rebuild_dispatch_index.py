@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.queues.models import Queue
+from apps.queues.services.dispatch import dispatch_engine
+
+
+class Command(BaseCommand):
+    help = "Reconstruit ou vérifie l'index de dispatch Redis des files d'attente"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue',
+            type=int,
+            action='append',
+            dest='queues',
+            help="Limiter à une file (option répétable)"
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Vérifier la cohérence avec la base sans reconstruire"
+        )
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help="Avec --check, reconstruire les files incohérentes"
+        )
+
+    def handle(self, *args, **options):
+        if dispatch_engine.connection is None:
+            raise CommandError("Redis n'est pas disponible pour l'index de dispatch.")
+
+        queue_ids = options['queues'] or list(Queue.objects.values_list('id', flat=True))
+
+        if not options['check']:
+            count = dispatch_engine.rebuild(queue_ids)
+            self.stdout.write(self.style.SUCCESS(f"{count} file(s) réindexée(s)."))
+            return
+
+        inconsistent = 0
+        for queue_id in queue_ids:
+            report = dispatch_engine.check_consistency(queue_id, repair=options['repair'])
+            if report['consistent']:
+                continue
+            inconsistent += 1
+            self.stdout.write(self.style.WARNING(
+                f"File {queue_id} : {len(report['missing'])} manquant(s), "
+                f"{len(report['stale'])} périmé(s)"
+            ))
+
+        if inconsistent:
+            action = 'réparée(s)' if options['repair'] else 'incohérente(s)'
+            self.stdout.write(f"{inconsistent} file(s) {action}.")
+        else:
+            self.stdout.write(self.style.SUCCESS("Index de dispatch cohérent."))
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("queues", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="queuetype",
+            name="prefix",
+            field=models.CharField(
+                blank=True,
+                help_text="Prefix of ticket numbers (e.g. A for A0042)",
+                max_length=5,
+            ),
+        ),
+        migrations.AddField(
+            model_name="queue",
+            name="current_number_date",
+            field=models.DateField(
+                blank=True,
+                help_text="Day the ticket counter was last reset",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.1 on 2026-10-18 10:00
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Création des index sans verrouiller la table des tickets en écriture
+    atomic = False
+
+    dependencies = [
+        ("queues", "0002_queuetype_prefix_queue_current_number_date"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="ticket",
+            index=models.Index(
+                fields=["queue", "status"], name="ticket_queue_status_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="ticket",
+            index=models.Index(
+                condition=models.Q(("status", "WA")),
+                fields=["queue", "-priority_level", "check_in_time"],
+                name="ticket_waiting_dispatch_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="ticket",
+            index=models.Index(
+                condition=models.Q(("status", "CO")),
+                fields=["queue", "service_end_time"],
+                name="ticket_completed_end_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="ticket",
+            index=models.Index(
+                fields=["queue", "check_in_time"], name="ticket_queue_check_in_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,127 @@
+# Generated by Django 5.0.1 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+TICKET_COLUMNS = """
+    id, queue_id, number, user_id, status, priority_level,
+    estimated_wait_time, check_in_time, called_time, service_start_time,
+    service_end_time, vehicle_info, identification_info, notes, location_id
+"""
+
+CREATE_ARCHIVE_SQL = f"""
+CREATE TABLE queues_ticketarchive (
+    id bigint NOT NULL,
+    queue_id bigint NOT NULL,
+    number varchar(20) NOT NULL,
+    user_id bigint NOT NULL,
+    status varchar(2) NOT NULL,
+    priority_level integer NOT NULL,
+    estimated_wait_time integer NOT NULL,
+    check_in_time timestamp with time zone NOT NULL,
+    called_time timestamp with time zone NULL,
+    service_start_time timestamp with time zone NULL,
+    service_end_time timestamp with time zone NULL,
+    vehicle_info jsonb NULL,
+    identification_info jsonb NULL,
+    notes text NOT NULL,
+    location_id bigint NULL,
+    archived_at timestamp with time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, check_in_time)
+) PARTITION BY RANGE (check_in_time);
+
+CREATE INDEX queues_ticketarchive_queue_check_in_idx
+    ON queues_ticketarchive (queue_id, check_in_time);
+
+CREATE VIEW queues_ticket_history AS
+    SELECT {TICKET_COLUMNS} FROM queues_ticket
+    UNION ALL
+    SELECT {TICKET_COLUMNS} FROM queues_ticketarchive;
+"""
+
+DROP_ARCHIVE_SQL = """
+DROP VIEW IF EXISTS queues_ticket_history;
+DROP TABLE IF EXISTS queues_ticketarchive;
+"""
+
+
+def ticket_record_fields():
+    return [
+        ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+        ("number", models.CharField(max_length=20)),
+        (
+            "status",
+            models.CharField(
+                choices=[
+                    ("WA", "Waiting"),
+                    ("CA", "Called"),
+                    ("SE", "Serving"),
+                    ("CO", "Completed"),
+                    ("CN", "Cancelled"),
+                    ("NS", "No Show"),
+                    ("TR", "Transferred"),
+                ],
+                max_length=2,
+            ),
+        ),
+        ("priority_level", models.IntegerField(default=0)),
+        ("estimated_wait_time", models.IntegerField(default=0)),
+        ("check_in_time", models.DateTimeField()),
+        ("called_time", models.DateTimeField(blank=True, null=True)),
+        ("service_start_time", models.DateTimeField(blank=True, null=True)),
+        ("service_end_time", models.DateTimeField(blank=True, null=True)),
+        ("vehicle_info", models.JSONField(blank=True, null=True)),
+        ("identification_info", models.JSONField(blank=True, null=True)),
+        ("notes", models.TextField(blank=True)),
+        ("location_id", models.BigIntegerField(blank=True, null=True)),
+        (
+            "queue",
+            models.ForeignKey(
+                db_constraint=False,
+                on_delete=models.deletion.DO_NOTHING,
+                related_name="+",
+                to="queues.queue",
+            ),
+        ),
+        (
+            "user",
+            models.ForeignKey(
+                db_constraint=False,
+                on_delete=models.deletion.DO_NOTHING,
+                related_name="+",
+                to="core.user",
+            ),
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0007_alter_usersession_options_and_more"),
+        ("queues", "0003_ticket_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_ARCHIVE_SQL, DROP_ARCHIVE_SQL),
+        migrations.CreateModel(
+            name="TicketArchive",
+            fields=ticket_record_fields() + [
+                ("archived_at", models.DateTimeField()),
+            ],
+            options={
+                "verbose_name": "archived ticket",
+                "verbose_name_plural": "archived tickets",
+                "db_table": "queues_ticketarchive",
+                "managed": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="TicketHistory",
+            fields=ticket_record_fields(),
+            options={
+                "verbose_name": "ticket history",
+                "verbose_name_plural": "ticket history",
+                "db_table": "queues_ticket_history",
+                "managed": False,
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("queues", "0004_ticket_archive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="servicepoint",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Incremented on every status transition (optimistic locking)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ticket",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Incremented on every status transition (optimistic locking)",
+            ),
+        ),
+    ]
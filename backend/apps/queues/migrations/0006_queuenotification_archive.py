@@ -0,0 +1,57 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:35
+
+from django.db import migrations, models
+
+CREATE_NOTIFICATION_ARCHIVE_SQL = """
+CREATE TABLE queues_queuenotificationarchive (
+    id bigint PRIMARY KEY,
+    ticket_id bigint NOT NULL,
+    notification_type varchar(2) NOT NULL,
+    message text NOT NULL,
+    sent_via varchar(10) NOT NULL,
+    sent_at timestamp with time zone NOT NULL,
+    delivered_at timestamp with time zone NULL,
+    read_at timestamp with time zone NULL,
+    error_message text NOT NULL,
+    archived_at timestamp with time zone NOT NULL DEFAULT now()
+);
+
+CREATE INDEX queues_queuenotificationarchive_ticket_idx
+    ON queues_queuenotificationarchive (ticket_id);
+"""
+
+DROP_NOTIFICATION_ARCHIVE_SQL = """
+DROP TABLE IF EXISTS queues_queuenotificationarchive;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queues', '0005_ticket_servicepoint_version'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_NOTIFICATION_ARCHIVE_SQL, DROP_NOTIFICATION_ARCHIVE_SQL),
+        migrations.CreateModel(
+            name='QueueNotificationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('ticket_id', models.BigIntegerField()),
+                ('notification_type', models.CharField(choices=[('TC', 'Ticket Created'), ('QU', 'Queue Update'), ('CA', 'Called to Service'), ('RE', 'Reminder'), ('SC', 'Status Change'), ('EM', 'Emergency')], max_length=2)),
+                ('message', models.TextField()),
+                ('sent_via', models.CharField(max_length=10)),
+                ('sent_at', models.DateTimeField()),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('error_message', models.TextField(blank=True)),
+                ('archived_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'archived queue notification',
+                'verbose_name_plural': 'archived queue notifications',
+                'db_table': 'queues_queuenotificationarchive',
+                'managed': False,
+            },
+        ),
+    ]
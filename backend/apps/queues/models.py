@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
 from django.contrib.gis.db import models as gis_models
 
@@ -9,6 +10,11 @@ class QueueType(models.Model):
         MIXED = 'MI', _('Mixed')
 
     name = models.CharField(max_length=255)
+    prefix = models.CharField(
+        max_length=5,
+        blank=True,
+        help_text=_('Prefix of ticket numbers (e.g. A for A0042)')
+    )
     category = models.CharField(
         max_length=2,
         choices=Category.choices,
@@ -50,6 +56,41 @@ class QueueType(models.Model):
     def __str__(self):
         return f"{self.name} at {self.branch.name}"
 
+class QueueQuerySet(models.QuerySet):
+    def with_listing_stats(self):
+        """
+        Précharge les relations et annote les compteurs utilisés par
+        QueueSerializer, pour un nombre de requêtes constant.
+        """
+        active_tickets = Ticket.objects.filter(
+            queue=models.OuterRef('pk'),
+            status__in=[Ticket.Status.WAITING, Ticket.Status.CALLED]
+        ).order_by().values('queue').annotate(
+            count=models.Count('pk')
+        ).values('count')
+        available_service_points = ServicePoint.objects.filter(
+            assigned_queues=models.OuterRef('pk'),
+            status=ServicePoint.Status.AVAILABLE
+        ).order_by().values('assigned_queues').annotate(
+            count=models.Count('pk')
+        ).values('count')
+
+        return self.select_related('queue_type').prefetch_related(
+            models.Prefetch(
+                'service_points',
+                queryset=ServicePoint.objects.select_related(
+                    'assigned_agent', 'current_ticket'
+                )
+            )
+        ).annotate(
+            active_tickets_count=Coalesce(
+                models.Subquery(active_tickets, output_field=models.IntegerField()), 0
+            ),
+            available_service_points_count=Coalesce(
+                models.Subquery(available_service_points, output_field=models.IntegerField()), 0
+            )
+        )
+
 class Queue(models.Model):
     class Status(models.TextChoices):
         ACTIVE = 'AC', _('Active')
@@ -69,6 +110,11 @@ class Queue(models.Model):
         default=Status.ACTIVE
     )
     current_number = models.IntegerField(default=0)
+    current_number_date = models.DateField(
+        help_text=_('Day the ticket counter was last reset'),
+        null=True,
+        blank=True
+    )
     current_wait_time = models.IntegerField(
         help_text=_('Current wait time in minutes'),
         default=0
@@ -87,6 +133,8 @@ class Queue(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = QueueQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('queue')
         verbose_name_plural = _('queues')
@@ -133,6 +181,10 @@ class ServicePoint(models.Model):
         related_name='service_points'
     )
     is_vehicle_compatible = models.BooleanField(default=False)
+    version = models.PositiveIntegerField(
+        default=0,
+        help_text=_('Incremented on every status transition (optimistic locking)')
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -195,15 +247,96 @@ class Ticket(models.Model):
         null=True,
         related_name='tickets'
     )
+    version = models.PositiveIntegerField(
+        default=0,
+        help_text=_('Incremented on every status transition (optimistic locking)')
+    )
 
     class Meta:
         verbose_name = _('ticket')
         verbose_name_plural = _('tickets')
         ordering = ['priority_level', 'check_in_time']
+        indexes = [
+            # Comptages par statut (tickets actifs, métriques)
+            models.Index(fields=['queue', 'status'], name='ticket_queue_status_idx'),
+            # Dispatch et positions : uniquement les tickets en attente
+            models.Index(
+                fields=['queue', '-priority_level', 'check_in_time'],
+                name='ticket_waiting_dispatch_idx',
+                condition=models.Q(status='WA')
+            ),
+            # Temps de service et d'attente sur les tickets terminés
+            models.Index(
+                fields=['queue', 'service_end_time'],
+                name='ticket_completed_end_idx',
+                condition=models.Q(status='CO')
+            ),
+            # Fenêtres temporelles (arrivées, abandons, analytics)
+            models.Index(fields=['queue', 'check_in_time'], name='ticket_queue_check_in_idx'),
+        ]
 
     def __str__(self):
         return f"Ticket {self.number} - {self.get_status_display()}"
 
+class AbstractTicketRecord(models.Model):
+    """Colonnes communes au ticket archivé et à la vue historique"""
+    id = models.BigIntegerField(primary_key=True)
+    queue = models.ForeignKey(
+        Queue,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    number = models.CharField(max_length=20)
+    user = models.ForeignKey(
+        'core.User',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    status = models.CharField(max_length=2, choices=Ticket.Status.choices)
+    priority_level = models.IntegerField(default=0)
+    estimated_wait_time = models.IntegerField(default=0)
+    check_in_time = models.DateTimeField()
+    called_time = models.DateTimeField(null=True, blank=True)
+    service_start_time = models.DateTimeField(null=True, blank=True)
+    service_end_time = models.DateTimeField(null=True, blank=True)
+    vehicle_info = models.JSONField(null=True, blank=True)
+    identification_info = models.JSONField(null=True, blank=True)
+    notes = models.TextField(blank=True)
+    location_id = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"Ticket {self.number} - {self.get_status_display()}"
+
+class TicketArchive(AbstractTicketRecord):
+    """
+    Tickets terminés archivés hors de la table vive, dans une table
+    partitionnée par mois sur check_in_time (créée par migration SQL).
+    """
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = 'queues_ticketarchive'
+        verbose_name = _('archived ticket')
+        verbose_name_plural = _('archived tickets')
+
+class TicketHistory(AbstractTicketRecord):
+    """
+    Vue en lecture seule réunissant tickets vifs et archivés (UNION ALL),
+    pour les requêtes analytiques portant sur tout l'historique.
+    """
+
+    class Meta:
+        managed = False
+        db_table = 'queues_ticket_history'
+        verbose_name = _('ticket history')
+        verbose_name_plural = _('ticket history')
+
 class VehicleCategory(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -302,3 +435,28 @@ class QueueNotification(models.Model):
 
     def __str__(self):
         return f"{self.get_notification_type_display()} for Ticket {self.ticket.number}"
+
+class QueueNotificationArchive(models.Model):
+    """
+    Notifications des tickets archivés, déplacées avec eux hors de la
+    table vive (table créée par migration SQL)
+    """
+    id = models.BigIntegerField(primary_key=True)
+    ticket_id = models.BigIntegerField()
+    notification_type = models.CharField(
+        max_length=2,
+        choices=QueueNotification.NotificationType.choices
+    )
+    message = models.TextField()
+    sent_via = models.CharField(max_length=10)
+    sent_at = models.DateTimeField()
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+    error_message = models.TextField(blank=True)
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = 'queues_queuenotificationarchive'
+        verbose_name = _('archived queue notification')
+        verbose_name_plural = _('archived queue notifications')
@@ -0,0 +1,128 @@
+"""
+Diffusion temps réel de l'état des files (Channels)
+
+Les appels de ticket sont poussés immédiatement. Les changements de
+positions et de temps d'attente sont regroupés : la première transition
+d'une fenêtre de COALESCE_WINDOW secondes planifie une seule publication,
+qui envoie uniquement les positions ayant changé depuis la précédente.
+Le regroupement s'appuie sur Redis, ou sur le cache Django sans Redis.
+Les positions ne sont transmises qu'au personnel ; un client ne reçoit
+que celles de ses propres tickets (voir consumers).
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+
+from .models import Queue, Ticket
+from .services.positions import position_index
+from .services.store import get_redis, make_key
+
+logger = logging.getLogger(__name__)
+
+COALESCE_WINDOW = 1
+
+# Taille maximale du message de positions
+MAX_POSITIONS = 500
+
+
+def queue_group(queue_id) -> str:
+    return f"queue_{queue_id}"
+
+
+def branch_group(branch_id) -> str:
+    return f"branch_{branch_id}"
+
+
+def _group_send(groups, event):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        for group in groups:
+            async_to_sync(channel_layer.group_send)(group, event)
+    except Exception as e:
+        logger.warning(f"Échec de la diffusion temps réel {event['type']} : {e}")
+
+
+def publish_ticket_called(ticket: Ticket, service_point=None):
+    """Pousse immédiatement l'appel d'un ticket vers les écrans et mobiles"""
+    queue = ticket.queue
+    _group_send(
+        [queue_group(queue.pk), branch_group(queue.queue_type.branch_id)],
+        {
+            'type': 'queue.event',
+            'event': 'ticket_called',
+            'queue': queue.pk,
+            'data': {
+                'ticket': ticket.pk,
+                'number': ticket.number,
+                'service_point': service_point.name if service_point else None,
+            },
+        }
+    )
+
+
+def schedule_queue_state(queue_id):
+    """Planifie une publication regroupée de l'état d'une file"""
+    key = make_key('realtime', queue_id, 'pending')
+    conn = get_redis()
+    try:
+        if conn is not None:
+            first = conn.set(key, 1, nx=True, ex=COALESCE_WINDOW)
+        else:
+            first = cache.add(key, 1, timeout=COALESCE_WINDOW)
+    except Exception as e:
+        logger.warning(f"Regroupement indisponible pour la file {queue_id} : {e}")
+        publish_queue_state(queue_id)
+        return
+    if first:
+        from .tasks import publish_queue_state_task
+        publish_queue_state_task.apply_async(args=(queue_id,), countdown=COALESCE_WINDOW)
+
+
+def publish_queue_state(queue_id):
+    """Publie les positions modifiées et le temps d'attente estimé d'une file"""
+    from .serializers import QueueSerializer
+
+    queue = Queue.objects.with_listing_stats().filter(pk=queue_id).first()
+    if queue is None:
+        return
+
+    waiting = Ticket.objects.filter(
+        queue_id=queue_id,
+        status=Ticket.Status.WAITING
+    ).only('id', 'queue_id', 'status')[:MAX_POSITIONS]
+    positions = {
+        str(pk): position
+        for pk, position in position_index.positions(waiting).items()
+    }
+    cache_key = make_key('realtime', queue_id, 'positions')
+    previous = cache.get(cache_key) or {}
+    changed = {
+        pk: position for pk, position in positions.items()
+        if previous.get(pk) != position
+    }
+    removed = [pk for pk in previous if pk not in positions]
+    cache.set(cache_key, positions, timeout=24 * 3600)
+
+    estimated_wait_time = QueueSerializer().get_estimated_wait_time(queue)
+    groups = [queue_group(queue_id), branch_group(queue.queue_type.branch_id)]
+
+    if changed or removed:
+        _group_send(groups, {
+            'type': 'queue.event',
+            'event': 'positions_changed',
+            'queue': queue_id,
+            'data': {'positions': changed, 'removed': removed},
+        })
+    _group_send(groups, {
+        'type': 'queue.event',
+        'event': 'wait_time_updated',
+        'queue': queue_id,
+        'data': {
+            'active_tickets_count': queue.active_tickets_count,
+            'estimated_wait_time': estimated_wait_time,
+        },
+    })
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from .consumers import QueueStateConsumer
+
+websocket_urlpatterns = [
+    path('ws/queues/<int:queue_id>/', QueueStateConsumer.as_asgi()),
+    path('ws/branches/<int:branch_id>/', QueueStateConsumer.as_asgi()),
+]
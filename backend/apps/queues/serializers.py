@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.utils.translation import gettext_lazy as _
 from .models import QueueType, Queue, ServicePoint, Ticket, VehicleCategory, QueueAnalytics, QueueNotification
+from .services.numbering import MAX_BLOCK_SIZE
+from .services.positions import position_index
 
 class VehicleCategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -19,6 +21,7 @@ class ServicePointSerializer(serializers.ModelSerializer):
     class Meta:
         model = ServicePoint
         fields = '__all__'
+        read_only_fields = ['version']
 
     def get_assigned_agent_name(self, obj):
         return obj.assigned_agent.get_full_name() if obj.assigned_agent else None
@@ -36,6 +39,9 @@ class QueueSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def get_active_tickets_count(self, obj):
+        # Valeur annotée par Queue.objects.with_listing_stats()
+        if hasattr(obj, 'active_tickets_count'):
+            return obj.active_tickets_count
         return obj.tickets.filter(
             status__in=[Ticket.Status.WAITING, Ticket.Status.CALLED]
         ).count()
@@ -43,15 +49,25 @@ class QueueSerializer(serializers.ModelSerializer):
     def get_estimated_wait_time(self, obj):
         active_tickets = self.get_active_tickets_count(obj)
         avg_service_time = obj.queue_type.estimated_service_time
-        active_service_points = obj.service_points.filter(
-            status=ServicePoint.Status.AVAILABLE
-        ).count()
+        if hasattr(obj, 'available_service_points_count'):
+            active_service_points = obj.available_service_points_count
+        else:
+            active_service_points = obj.service_points.filter(
+                status=ServicePoint.Status.AVAILABLE
+            ).count()
         
         if active_service_points == 0:
             return None
             
         return (active_tickets * avg_service_time) // active_service_points
 
+class TicketListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Lecture groupée des positions pour toute la page
+        tickets = list(data.all() if hasattr(data, 'all') else data)
+        self.child.positions = position_index.positions(tickets)
+        return super().to_representation(tickets)
+
 class TicketSerializer(serializers.ModelSerializer):
     position = serializers.SerializerMethodField()
     user_name = serializers.SerializerMethodField()
@@ -61,16 +77,16 @@ class TicketSerializer(serializers.ModelSerializer):
         model = Ticket
         fields = '__all__'
         read_only_fields = ['number', 'check_in_time', 'called_time', 
-                          'service_start_time', 'service_end_time']
+                          'service_start_time', 'service_end_time', 'version']
+        list_serializer_class = TicketListSerializer
 
     def get_position(self, obj):
         if obj.status != Ticket.Status.WAITING:
             return None
-        return obj.queue.tickets.filter(
-            status=Ticket.Status.WAITING,
-            priority_level__gte=obj.priority_level,
-            check_in_time__lt=obj.check_in_time
-        ).count() + 1
+        positions = getattr(self, 'positions', None)
+        if positions is not None and obj.pk in positions:
+            return positions[obj.pk]
+        return position_index.position(obj)
 
     def get_user_name(self, obj):
         return obj.user.get_full_name()
@@ -113,6 +129,16 @@ class QueueStatusUpdateSerializer(serializers.Serializer):
     status = serializers.ChoiceField(choices=Queue.Status.choices)
     reason = serializers.CharField(required=False, allow_blank=True)
 
+class TicketPositionsQuerySerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=500
+    )
+
+class TicketNumberBlockSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1, max_value=MAX_BLOCK_SIZE, default=1)
+
 class TicketStatusUpdateSerializer(serializers.Serializer):
     status = serializers.ChoiceField(choices=Ticket.Status.choices)
     notes = serializers.CharField(required=False, allow_blank=True)
@@ -120,6 +146,11 @@ class TicketStatusUpdateSerializer(serializers.Serializer):
         queryset=ServicePoint.objects.all(),
         required=False
     )
+    version = serializers.IntegerField(
+        required=False,
+        min_value=0,
+        help_text=_('Version read by the client; rejected with 409 if the ticket changed since')
+    )
 
 class ServicePointStatusUpdateSerializer(serializers.Serializer):
     status = serializers.ChoiceField(choices=ServicePoint.Status.choices)
@@ -128,3 +159,8 @@ class ServicePointStatusUpdateSerializer(serializers.Serializer):
         required=False,
         allow_null=True
     )
+    version = serializers.IntegerField(
+        required=False,
+        min_value=0,
+        help_text=_('Version read by the client; rejected with 409 if the service point changed since')
+    )
@@ -0,0 +1,29 @@
+"""
+Services métier des files d'attente
+"""
+
+from .dispatch import DispatchEngine, dispatch_engine
+from .numbering import TicketNumberAllocator, ticket_number_allocator
+from .positions import PositionIndex, position_index
+from .snapshot import DashboardSnapshot, dashboard_snapshot
+from .transitions import (
+    IllegalTransition,
+    StaleTransition,
+    TransitionEngine,
+    transition_engine,
+)
+
+__all__ = [
+    'DispatchEngine',
+    'dispatch_engine',
+    'TicketNumberAllocator',
+    'ticket_number_allocator',
+    'PositionIndex',
+    'position_index',
+    'DashboardSnapshot',
+    'dashboard_snapshot',
+    'TransitionEngine',
+    'transition_engine',
+    'IllegalTransition',
+    'StaleTransition',
+]
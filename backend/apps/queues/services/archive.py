@@ -0,0 +1,182 @@
+"""
+Archivage des tickets terminés
+
+Les tickets clos (terminés, annulés, absents) depuis plus de
+TICKET_ARCHIVE_AFTER_DAYS jours sont déplacés par lots de queues_ticket
+vers queues_ticketarchive, table partitionnée par mois sur check_in_time.
+Chaque lot est une seule instruction (DELETE ... RETURNING alimentant
+l'INSERT), la table chaude reste ainsi limitée aux tickets récents.
+Leurs notifications sont déplacées dans la même instruction vers
+queues_queuenotificationarchive. Les tickets ayant un avis client restent
+en base chaude : les analyses de satisfaction joignent l'avis au ticket
+par clé étrangère.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..models import Ticket
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_TABLE = 'queues_ticketarchive'
+NOTIFICATION_ARCHIVE_TABLE = 'queues_queuenotificationarchive'
+
+ARCHIVABLE_STATUSES = (
+    Ticket.Status.COMPLETED,
+    Ticket.Status.CANCELLED,
+    Ticket.Status.NO_SHOW,
+)
+
+DEFAULT_BATCH_SIZE = 5000
+
+TICKET_COLUMNS = (
+    'id, queue_id, number, user_id, status, priority_level, '
+    'estimated_wait_time, check_in_time, called_time, service_start_time, '
+    'service_end_time, vehicle_info, identification_info, notes, location_id'
+)
+# Colonnes qualifiées : le lot expose lui aussi une colonne id
+MOVED_COLUMNS = ', '.join(f't.{column}' for column in TICKET_COLUMNS.split(', '))
+
+NOTIFICATION_COLUMNS = (
+    'id, ticket_id, notification_type, message, sent_via, sent_at, '
+    'delivered_at, read_at, error_message'
+)
+MOVED_NOTIFICATION_COLUMNS = ', '.join(f'n.{column}' for column in NOTIFICATION_COLUMNS.split(', '))
+
+ARCHIVE_BATCH_SQL = f"""
+WITH batch AS (
+    SELECT t.id
+    FROM queues_ticket t
+    WHERE t.status = ANY(%(statuses)s)
+      AND t.check_in_time < %(cutoff)s
+      AND NOT EXISTS (
+          SELECT 1 FROM analytics_customerfeedback f WHERE f.ticket_id = t.id
+      )
+    ORDER BY t.check_in_time
+    LIMIT %(limit)s
+    FOR UPDATE SKIP LOCKED
+),
+moved_notifications AS (
+    DELETE FROM queues_queuenotification n
+    USING batch WHERE n.ticket_id = batch.id
+    RETURNING {MOVED_NOTIFICATION_COLUMNS}
+),
+archived_notifications AS (
+    INSERT INTO {NOTIFICATION_ARCHIVE_TABLE} ({NOTIFICATION_COLUMNS}, archived_at)
+    SELECT {NOTIFICATION_COLUMNS}, now() FROM moved_notifications
+),
+released_points AS (
+    UPDATE queues_servicepoint sp
+    SET current_ticket_id = NULL, version = sp.version + 1
+    FROM batch WHERE sp.current_ticket_id = batch.id
+),
+moved AS (
+    DELETE FROM queues_ticket t
+    USING batch WHERE t.id = batch.id
+    RETURNING {MOVED_COLUMNS}
+)
+INSERT INTO {ARCHIVE_TABLE} ({TICKET_COLUMNS}, archived_at)
+SELECT {TICKET_COLUMNS}, now() FROM moved
+"""
+
+
+class ArchiveUnsupported(Exception):
+    """La base de données ne permet pas l'archivage partitionné (PostgreSQL requis)"""
+
+
+@dataclass
+class ArchiveResult:
+    archived: int = 0
+    batches: int = 0
+    partitions_created: int = 0
+
+
+def _month_start(value: date) -> date:
+    return value.replace(day=1)
+
+
+def _next_month(value: date) -> date:
+    return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_name(month: date) -> str:
+    return f"{ARCHIVE_TABLE}_y{month.year}m{month.month:02d}"
+
+
+def ensure_partitions(start: datetime, end: datetime) -> int:
+    """Crée les partitions mensuelles couvrant [start, end] ; retourne le nombre de mois traités"""
+    month = _month_start(start.date())
+    last = _month_start(end.date())
+    count = 0
+    with connection.cursor() as cursor:
+        while month <= last:
+            upper = _next_month(month)
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(month)} "
+                f"PARTITION OF {ARCHIVE_TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+            month = upper
+            count += 1
+    return count
+
+
+def archivable_tickets(cutoff: datetime):
+    return Ticket.objects.filter(
+        status__in=ARCHIVABLE_STATUSES,
+        check_in_time__lt=cutoff,
+        feedback__isnull=True
+    )
+
+
+def archive_tickets(
+    older_than_days: Optional[int] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_batches: Optional[int] = None,
+) -> ArchiveResult:
+    """
+    Déplace les tickets clos plus anciens que older_than_days vers l'archive,
+    par lots de batch_size (une transaction courte par lot).
+    """
+    if connection.vendor != 'postgresql':
+        raise ArchiveUnsupported("L'archivage des tickets requiert PostgreSQL")
+
+    if older_than_days is None:
+        older_than_days = settings.TICKET_ARCHIVE_AFTER_DAYS
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    result = ArchiveResult()
+
+    oldest = archivable_tickets(cutoff).order_by('check_in_time').values_list(
+        'check_in_time', flat=True
+    ).first()
+    if oldest is None:
+        return result
+    result.partitions_created = ensure_partitions(oldest, cutoff)
+
+    params = {
+        'statuses': [str(status) for status in ARCHIVABLE_STATUSES],
+        'cutoff': cutoff,
+        'limit': batch_size,
+    }
+    while max_batches is None or result.batches < max_batches:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(ARCHIVE_BATCH_SQL, params)
+            moved = cursor.rowcount
+        if moved <= 0:
+            break
+        result.archived += moved
+        result.batches += 1
+        if moved < batch_size:
+            break
+
+    logger.info(
+        f"{result.archived} ticket(s) archivé(s) en {result.batches} lot(s) "
+        f"(antérieurs au {cutoff:%Y-%m-%d})"
+    )
+    return result
@@ -0,0 +1,336 @@
+"""
+Moteur de dispatch des tickets
+
+Chaque file possède un ensemble trié Redis contenant ses tickets en attente,
+classés par priorité décroissante puis par heure d'arrivée. L'appel du
+prochain ticket retire atomiquement la tête de l'ensemble (script Lua) puis
+répercute la transition dans Postgres. Si Redis est indisponible, ou si
+l'index ne renvoie personne, le moteur se replie sur une requête
+SELECT ... FOR UPDATE SKIP LOCKED.
+
+Pendant un (re)chargement depuis la base, les ajouts et retraits sont
+aussi consignés dans un journal, rejoué lors de la bascule vers le
+nouvel index : un ticket validé après la lecture de la base n'est pas
+perdu.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from ..models import Queue, ServicePoint, Ticket
+from .store import get_redis, make_key
+
+logger = logging.getLogger(__name__)
+
+# Une unité de priorité pèse plus que n'importe quel horodatage en millisecondes
+PRIORITY_WEIGHT = 10 ** 13
+
+# Nombre maximum d'entrées périmées ignorées avant de se replier sur la base
+MAX_STALE_POPS = 10
+
+LOAD_CHUNK_SIZE = 1000
+
+# Durée maximale d'un chargement (verrou et journal), en secondes
+REBUILD_TIMEOUT = 300
+
+# Retire le ticket de plus petit score parmi plusieurs files, de façon atomique
+POP_NEXT_SCRIPT = """
+local best_index, best_member, best_score
+for i, key in ipairs(KEYS) do
+    local head = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    if head[1] then
+        local score = tonumber(head[2])
+        if best_score == nil or score < best_score then
+            best_index, best_member, best_score = i, head[1], score
+        end
+    end
+end
+if best_member then
+    redis.call('ZREM', KEYS[best_index], best_member)
+    return {best_index, best_member, tostring(best_score)}
+end
+return nil
+"""
+
+# N'ajoute le ticket à l'index que s'il a déjà été chargé ; le consigne
+# dans le journal si un chargement est en cours
+# KEYS : index, chargé, chargement en cours, journal, retraits
+ENQUEUE_SCRIPT = """
+local added = -1
+if redis.call('EXISTS', KEYS[3]) == 1 then
+    redis.call('ZADD', KEYS[4], ARGV[1], ARGV[2])
+    redis.call('SREM', KEYS[5], ARGV[2])
+end
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    added = redis.call('ZADD', KEYS[1], ARGV[1], ARGV[2])
+end
+return added
+"""
+
+# KEYS : index, chargement en cours, journal, retraits
+DISCARD_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    redis.call('SADD', KEYS[4], ARGV[1])
+end
+return redis.call('ZREM', KEYS[1], ARGV[1])
+"""
+
+# Bascule atomique : index chargé + ajouts du journal - retraits du journal
+# KEYS : index, index chargé, journal, retraits, chargement en cours, chargé
+SWAP_SCRIPT = """
+redis.call('ZUNIONSTORE', KEYS[1], 2, KEYS[2], KEYS[3], 'AGGREGATE', 'MIN')
+for _, member in ipairs(redis.call('SMEMBERS', KEYS[4])) do
+    redis.call('ZREM', KEYS[1], member)
+end
+redis.call('DEL', KEYS[2], KEYS[3], KEYS[4], KEYS[5])
+redis.call('SET', KEYS[6], 1)
+return redis.call('ZCARD', KEYS[1])
+"""
+
+
+def ticket_score(priority_level: int, check_in_time) -> float:
+    """Calcule le score d'un ticket : plus il est bas, plus le ticket passe tôt"""
+    return -priority_level * PRIORITY_WEIGHT + int(check_in_time.timestamp() * 1000)
+
+
+class DispatchEngine:
+    """Index de dispatch par file, stocké dans Redis"""
+
+    def __init__(self, connection=None):
+        self._connection = connection
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = get_redis()
+        return self._connection
+
+    @staticmethod
+    def queue_key(queue_id) -> str:
+        return make_key('dispatch', queue_id)
+
+    @staticmethod
+    def loaded_key(queue_id) -> str:
+        return make_key('dispatch', queue_id, 'loaded')
+
+    @staticmethod
+    def journal_keys(queue_id) -> List[str]:
+        """Clés du chargement en cours : marqueur, ajouts, retraits"""
+        return [
+            make_key('dispatch', queue_id, 'rebuilding'),
+            make_key('dispatch', queue_id, 'journal'),
+            make_key('dispatch', queue_id, 'removed'),
+        ]
+
+    # ------------------------------------------------------------------
+    # Maintenance de l'index
+    # ------------------------------------------------------------------
+
+    def enqueue(self, ticket: Ticket) -> None:
+        """Ajoute un ticket en attente à l'index de sa file"""
+        conn = self.connection
+        if conn is None:
+            return
+        try:
+            conn.eval(
+                ENQUEUE_SCRIPT, 5,
+                self.queue_key(ticket.queue_id),
+                self.loaded_key(ticket.queue_id),
+                *self.journal_keys(ticket.queue_id),
+                ticket_score(ticket.priority_level, ticket.check_in_time),
+                ticket.pk
+            )
+        except RedisError as e:
+            logger.warning(f"Impossible d'indexer le ticket {ticket.pk} : {e}")
+
+    def discard(self, ticket: Ticket, queue_id=None) -> None:
+        """Retire un ticket de l'index (appel, annulation, transfert)"""
+        conn = self.connection
+        if conn is None:
+            return
+        queue_id = queue_id or ticket.queue_id
+        try:
+            conn.eval(
+                DISCARD_SCRIPT, 4,
+                self.queue_key(queue_id),
+                *self.journal_keys(queue_id),
+                ticket.pk
+            )
+        except RedisError as e:
+            logger.warning(f"Impossible de retirer le ticket {ticket.pk} de l'index : {e}")
+
+    def rebuild(self, queue_ids: Optional[Iterable] = None) -> int:
+        """Reconstruit l'index depuis Postgres pour les files données (toutes par défaut)"""
+        conn = self.connection
+        if conn is None:
+            return 0
+        if queue_ids is None:
+            queue_ids = Queue.objects.values_list('id', flat=True)
+        count = 0
+        for queue_id in queue_ids:
+            with self._lock(conn, queue_id):
+                self._load_queue(conn, queue_id)
+            count += 1
+        return count
+
+    def check_consistency(self, queue_id, repair: bool = False) -> Dict:
+        """Compare l'index Redis d'une file avec les tickets en attente en base"""
+        conn = self.connection
+        if conn is None:
+            return {'queue_id': queue_id, 'consistent': None, 'missing': [], 'stale': []}
+
+        db_ids = {
+            str(pk) for pk in Ticket.objects.filter(
+                queue_id=queue_id,
+                status=Ticket.Status.WAITING
+            ).values_list('pk', flat=True)
+        }
+        indexed_ids = {
+            member.decode() for member in conn.zrange(self.queue_key(queue_id), 0, -1)
+        }
+        missing = sorted(db_ids - indexed_ids, key=int)
+        stale = sorted(indexed_ids - db_ids, key=int)
+
+        if repair and (missing or stale):
+            with self._lock(conn, queue_id):
+                self._load_queue(conn, queue_id)
+
+        return {
+            'queue_id': queue_id,
+            'consistent': not missing and not stale,
+            'missing': missing,
+            'stale': stale,
+        }
+
+    @staticmethod
+    def _lock(conn, queue_id):
+        return conn.lock(make_key('dispatch', queue_id, 'lock'), timeout=REBUILD_TIMEOUT)
+
+    def _load_queue(self, conn, queue_id) -> None:
+        """Recharge l'index d'une file depuis la base (sous le verrou de la file)"""
+        key = self.queue_key(queue_id)
+        tmp_key = f"{key}:rebuild"
+        rebuilding_key, journal_key, removed_key = self.journal_keys(queue_id)
+
+        # Le journal est ouvert avant la lecture de la base : toute transition
+        # validée ensuite y figure, même si la lecture ne la voit pas
+        pipe = conn.pipeline(transaction=True)
+        pipe.delete(tmp_key, journal_key, removed_key)
+        pipe.set(rebuilding_key, 1, ex=REBUILD_TIMEOUT)
+        pipe.execute()
+
+        waiting = Ticket.objects.filter(
+            queue_id=queue_id,
+            status=Ticket.Status.WAITING
+        ).values_list('pk', 'priority_level', 'check_in_time')
+
+        pipe = conn.pipeline(transaction=False)
+        mapping = {}
+        for pk, priority_level, check_in_time in waiting.iterator(chunk_size=LOAD_CHUNK_SIZE):
+            mapping[pk] = ticket_score(priority_level, check_in_time)
+            if len(mapping) >= LOAD_CHUNK_SIZE:
+                pipe.zadd(tmp_key, mapping)
+                mapping = {}
+        if mapping:
+            pipe.zadd(tmp_key, mapping)
+        pipe.execute()
+
+        conn.eval(
+            SWAP_SCRIPT, 6,
+            key, tmp_key, journal_key, removed_key, rebuilding_key,
+            self.loaded_key(queue_id)
+        )
+
+    def ensure_loaded(self, conn, queue_ids: List) -> None:
+        """Charge depuis la base l'index des files qui ne l'ont pas encore"""
+        pipe = conn.pipeline(transaction=False)
+        for queue_id in queue_ids:
+            pipe.exists(self.loaded_key(queue_id))
+        for queue_id, loaded in zip(queue_ids, pipe.execute()):
+            if not loaded:
+                with self._lock(conn, queue_id):
+                    if not conn.exists(self.loaded_key(queue_id)):
+                        self._load_queue(conn, queue_id)
+
+    # ------------------------------------------------------------------
+    # Dispatch
+    # ------------------------------------------------------------------
+
+    def pop_next(self, service_point: ServicePoint) -> Optional[Ticket]:
+        """
+        Retire le prochain ticket en attente des files du point de service
+        et le passe au statut CALLED. Retourne None s'il n'y a personne.
+        """
+        queue_ids = list(service_point.assigned_queues.values_list('id', flat=True))
+        if not queue_ids:
+            return None
+
+        conn = self.connection
+        if conn is not None:
+            try:
+                return self._pop_next_redis(conn, queue_ids)
+            except RedisError as e:
+                logger.warning(f"Dispatch Redis indisponible, repli sur la base : {e}")
+        return self._pop_next_db(queue_ids)
+
+    def _pop_next_redis(self, conn, queue_ids: List) -> Optional[Ticket]:
+        self.ensure_loaded(conn, queue_ids)
+        keys = [self.queue_key(queue_id) for queue_id in queue_ids]
+
+        for _ in range(MAX_STALE_POPS):
+            result = conn.eval(POP_NEXT_SCRIPT, len(keys), *keys)
+            if not result:
+                break
+            index, member, score = result
+            ticket_id = int(member)
+            try:
+                ticket = self._mark_called(ticket_id)
+            except Exception:
+                # Remet le ticket en tête si l'écriture en base échoue
+                conn.zadd(keys[int(index) - 1], {ticket_id: float(score)})
+                raise
+            if ticket is not None:
+                return ticket
+            # Entrée périmée : le ticket n'est plus en attente en base
+
+        # Index vide ou périmé : la base fait foi
+        ticket = self._pop_next_db(queue_ids)
+        if ticket is not None:
+            logger.warning(
+                f"Ticket {ticket.pk} absent de l'index de dispatch de la file "
+                f"{ticket.queue_id} : l'index sera rechargé"
+            )
+            conn.delete(self.loaded_key(ticket.queue_id))
+        return ticket
+
+    def _pop_next_db(self, queue_ids: List) -> Optional[Ticket]:
+        with transaction.atomic():
+            ticket = Ticket.objects.select_for_update(skip_locked=True).filter(
+                queue_id__in=queue_ids,
+                status=Ticket.Status.WAITING
+            ).order_by('-priority_level', 'check_in_time').first()
+            if ticket is None:
+                return None
+            return self._mark_called(ticket.pk)
+
+    def _mark_called(self, ticket_id) -> Optional[Ticket]:
+        now = timezone.now()
+        updated = Ticket.objects.filter(
+            pk=ticket_id,
+            status=Ticket.Status.WAITING
+        ).update(
+            status=Ticket.Status.CALLED,
+            called_time=now,
+            version=F('version') + 1
+        )
+        if not updated:
+            return None
+        return Ticket.objects.select_related('queue', 'user').get(pk=ticket_id)
+
+
+dispatch_engine = DispatchEngine()
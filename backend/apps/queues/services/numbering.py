@@ -0,0 +1,191 @@
+"""
+Attribution des numéros de ticket
+
+Chaque file possède un compteur journalier. Le compteur de référence est
+Queue.current_number (remis à zéro lorsque current_number_date change) ;
+lorsque Redis est disponible, un INCRBY sur une clé datée sert de chemin
+rapide sans accès à la base. Le compteur en base n'est alors qu'un point
+de reprise, avancé par fenêtres de CHECKPOINT_WINDOW numéros avec une
+fenêtre d'avance : il majore toujours les numéros attribués par Redis, le
+réamorçage de la clé (perte de Redis) ou le repli en base ne peuvent donc
+pas réattribuer un numéro. Les numéros sont uniques par file et par
+jour ; un bloc réservé mais non utilisé, ou une fenêtre abandonnée,
+laisse des trous, ce qui est toléré.
+"""
+import logging
+from datetime import date
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from ..models import Queue
+from .store import get_redis, make_key
+
+logger = logging.getLogger(__name__)
+
+MAX_BLOCK_SIZE = 500
+
+# Les clés datées expirent d'elles-mêmes après le changement de jour
+KEY_TTL = 2 * 24 * 3600
+
+# Taille des fenêtres du point de reprise en base
+CHECKPOINT_WINDOW = 100
+
+# Incrémente le compteur, ou retourne -1 s'il doit être amorcé depuis la base
+INCR_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+return redis.call('INCRBY', KEYS[1], ARGV[1])
+"""
+
+# Amorce le compteur (sauf amorçage concurrent), puis incrémente
+SEED_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[3])
+return redis.call('INCRBY', KEYS[1], ARGV[2])
+"""
+
+
+class NumberBlock:
+    """Plage contiguë de numéros réservée pour une file"""
+
+    def __init__(self, queue: Queue, day: date, start: int, end: int):
+        self.queue = queue
+        self.day = day
+        self.start = start
+        self.end = end
+
+    def __iter__(self):
+        return iter(range(self.start, self.end + 1))
+
+    def __len__(self):
+        return self.end - self.start + 1
+
+    def labels(self):
+        return [format_ticket_number(self.queue, number) for number in self]
+
+    def as_dict(self):
+        return {
+            'queue': self.queue.pk,
+            'date': self.day.isoformat(),
+            'start': self.start,
+            'end': self.end,
+            'numbers': self.labels(),
+        }
+
+
+def format_ticket_number(queue: Queue, number: int) -> str:
+    """Formate un numéro avec le préfixe du type de file (ex. A0042)"""
+    return f"{queue.queue_type.prefix}{number:04d}"
+
+
+def checkpoint_for(number: int) -> int:
+    """Point de reprise couvrant la fenêtre de number et la suivante"""
+    return (-(-number // CHECKPOINT_WINDOW) + 1) * CHECKPOINT_WINDOW
+
+
+def queue_local_date(queue: Queue) -> date:
+    """Date du jour dans le fuseau de la succursale de la file"""
+    try:
+        tz = ZoneInfo(queue.queue_type.branch.timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        tz = None
+    return timezone.localdate(timezone=tz)
+
+
+class TicketNumberAllocator:
+    """Compteur atomique de numéros de ticket par file"""
+
+    def __init__(self, connection=None):
+        self._connection = connection
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = get_redis()
+        return self._connection
+
+    @staticmethod
+    def counter_key(queue_id, day: date) -> str:
+        return make_key('ticket_number', queue_id, day.strftime('%Y%m%d'))
+
+    def next_number(self, queue: Queue) -> str:
+        """Attribue le prochain numéro formaté d'une file"""
+        block = self.allocate(queue, 1)
+        return format_ticket_number(queue, block.start)
+
+    def allocate(self, queue: Queue, count: int = 1) -> NumberBlock:
+        """Réserve `count` numéros contigus pour la file (bornes incluses)"""
+        if count < 1 or count > MAX_BLOCK_SIZE:
+            raise ValueError(f"La taille du bloc doit être comprise entre 1 et {MAX_BLOCK_SIZE}.")
+
+        day = queue_local_date(queue)
+        end = None
+        conn = self.connection
+        if conn is not None:
+            end = self._allocate_redis(conn, queue, day, count)
+        if end is None:
+            end = self._allocate_db(queue, day, count)
+            if conn is not None:
+                self._forget(conn, queue, day)
+        return NumberBlock(queue, day, end - count + 1, end)
+
+    def _allocate_redis(self, conn, queue: Queue, day: date, count: int) -> Optional[int]:
+        key = self.counter_key(queue.pk, day)
+        try:
+            end = int(conn.eval(INCR_SCRIPT, 1, key, count))
+            seeded = end < 0
+            if seeded:
+                seed = Queue.objects.filter(
+                    pk=queue.pk,
+                    current_number_date=day
+                ).values_list('current_number', flat=True).first() or 0
+                end = int(conn.eval(SEED_SCRIPT, 1, key, seed, count, KEY_TTL))
+        except RedisError as e:
+            logger.warning(f"Compteur Redis indisponible pour la file {queue.pk} : {e}")
+            return None
+
+        # Un seul UPDATE par fenêtre franchie (et à l'amorçage)
+        if seeded or checkpoint_for(end) != checkpoint_for(end - count):
+            self._checkpoint(queue, day, checkpoint_for(end))
+        return end
+
+    @staticmethod
+    def _checkpoint(queue: Queue, day: date, number: int) -> None:
+        """Avance le point de reprise en base, sans jamais le faire reculer"""
+        Queue.objects.filter(pk=queue.pk).update(
+            current_number=Case(
+                When(current_number_date=day, then=Greatest(F('current_number'), Value(number))),
+                default=Value(number)
+            ),
+            current_number_date=day
+        )
+
+    def _forget(self, conn, queue: Queue, day: date) -> None:
+        # Le compteur en base a avancé sans Redis : la clé sera réamorcée
+        try:
+            conn.delete(self.counter_key(queue.pk, day))
+        except RedisError:
+            pass
+
+    def _allocate_db(self, queue: Queue, day: date, count: int) -> int:
+        with transaction.atomic():
+            # L'UPDATE verrouille la ligne jusqu'au commit : la relecture est cohérente
+            Queue.objects.filter(pk=queue.pk).update(
+                current_number=Case(
+                    When(current_number_date=day, then=F('current_number') + count),
+                    default=Value(count)
+                ),
+                current_number_date=day
+            )
+            return Queue.objects.filter(pk=queue.pk).values_list(
+                'current_number', flat=True
+            ).get()
+
+
+ticket_number_allocator = TicketNumberAllocator()
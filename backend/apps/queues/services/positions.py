@@ -0,0 +1,85 @@
+"""
+Positions des tickets dans leur file
+
+La position d'un ticket en attente est son rang dans l'index de dispatch
+(ZRANK, O(log n)). Les positions de nombreux tickets sont lues en un seul
+aller-retour Redis ; sans Redis, une seule requête avec ROW_NUMBER() par
+file remplace le COUNT(*) par ticket.
+"""
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from redis.exceptions import RedisError
+
+from ..models import Ticket
+from .dispatch import DispatchEngine, dispatch_engine
+
+logger = logging.getLogger(__name__)
+
+
+class PositionIndex:
+    """Lecture groupée des positions à partir de l'index de dispatch"""
+
+    def __init__(self, engine: DispatchEngine = dispatch_engine):
+        self.engine = engine
+
+    def position(self, ticket: Ticket) -> Optional[int]:
+        return self.positions([ticket]).get(ticket.pk)
+
+    def positions(self, tickets: Iterable[Ticket]) -> Dict[int, Optional[int]]:
+        """
+        Retourne {ticket_id: position} (1 = prochain appelé) ;
+        la position vaut None pour les tickets qui ne sont pas en attente.
+        """
+        tickets = list(tickets)
+        result = {ticket.pk: None for ticket in tickets}
+        by_queue = defaultdict(list)
+        for ticket in tickets:
+            if ticket.status == Ticket.Status.WAITING:
+                by_queue[ticket.queue_id].append(ticket.pk)
+        if not by_queue:
+            return result
+
+        conn = self.engine.connection
+        if conn is not None:
+            try:
+                result.update(self._positions_redis(conn, by_queue))
+                return result
+            except RedisError as e:
+                logger.warning(f"Index de positions indisponible, repli sur la base : {e}")
+        result.update(self._positions_db(by_queue))
+        return result
+
+    def _positions_redis(self, conn, by_queue) -> Dict[int, Optional[int]]:
+        self.engine.ensure_loaded(conn, list(by_queue))
+        pipe = conn.pipeline(transaction=False)
+        ordered_ids = []
+        for queue_id, ticket_ids in by_queue.items():
+            key = self.engine.queue_key(queue_id)
+            for ticket_id in ticket_ids:
+                pipe.zrank(key, ticket_id)
+                ordered_ids.append(ticket_id)
+        return {
+            ticket_id: rank + 1 if rank is not None else None
+            for ticket_id, rank in zip(ordered_ids, pipe.execute())
+        }
+
+    def _positions_db(self, by_queue) -> Dict[int, Optional[int]]:
+        wanted = {ticket_id for ticket_ids in by_queue.values() for ticket_id in ticket_ids}
+        ranked = Ticket.objects.filter(
+            queue_id__in=list(by_queue),
+            status=Ticket.Status.WAITING
+        ).annotate(
+            position=Window(
+                expression=RowNumber(),
+                partition_by=[F('queue_id')],
+                order_by=[F('priority_level').desc(), F('check_in_time').asc()]
+            )
+        ).values_list('pk', 'position')
+        return {pk: position for pk, position in ranked if pk in wanted}
+
+
+position_index = PositionIndex()
@@ -0,0 +1,232 @@
+"""
+Instantané des statistiques du tableau de bord
+
+Un hash Redis par organisation et par succursale, pour le jour courant,
+est mis à jour de façon incrémentale à chaque transition de ticket
+(HINCRBY / HINCRBYFLOAT). Les compteurs de files sont recalculés à chaque
+modification de file, et une tâche périodique réaligne le tout sur Postgres.
+La lecture du tableau de bord est alors un simple HGETALL.
+"""
+import logging
+from datetime import date
+from typing import Dict, Iterable, Optional
+
+from django.db.models import Count, DurationField, F, Q, Sum
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from ..models import Queue, Ticket
+from .store import get_redis, make_key
+
+logger = logging.getLogger(__name__)
+
+# Les hash datés expirent d'eux-mêmes après le changement de jour
+KEY_TTL = 2 * 24 * 3600
+
+# N'incrémente que les instantanés déjà initialisés : un hash absent sera
+# calculé entièrement en base à la prochaine lecture
+INCREMENT_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        if tonumber(ARGV[1]) > 0 then
+            redis.call('HINCRBY', key, 'total_tickets', ARGV[1])
+        end
+        if tonumber(ARGV[3]) > 0 then
+            redis.call('HINCRBYFLOAT', key, 'wait_sum', ARGV[2])
+            redis.call('HINCRBY', key, 'wait_count', ARGV[3])
+        end
+    end
+end
+return 1
+"""
+
+
+class DashboardSnapshot:
+    """Compteurs du tableau de bord maintenus dans Redis"""
+
+    def __init__(self, connection=None):
+        self._connection = connection
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = get_redis()
+        return self._connection
+
+    @staticmethod
+    def organization_key(organization_id, day: date) -> str:
+        return make_key('snapshot', 'org', organization_id, day.isoformat())
+
+    @staticmethod
+    def branch_key(branch_id, day: date) -> str:
+        return make_key('snapshot', 'branch', branch_id, day.isoformat())
+
+    def _scope_keys(self, organization_id, branch_id, day: date):
+        return [self.organization_key(organization_id, day), self.branch_key(branch_id, day)]
+
+    # ------------------------------------------------------------------
+    # Mises à jour incrémentales
+    # ------------------------------------------------------------------
+
+    def record_transition(self, ticket: Ticket, old_status, new_status) -> None:
+        """Répercute une transition de ticket dans les compteurs du jour"""
+        conn = self.connection
+        if conn is None:
+            return
+        scope = Queue.objects.filter(pk=ticket.queue_id).values_list(
+            'queue_type__organization_id', 'queue_type__branch_id'
+        ).first()
+        if scope is None:
+            return
+
+        wait_minutes = None
+        if (
+            old_status == Ticket.Status.WAITING
+            and new_status == Ticket.Status.CALLED
+            and ticket.called_time
+        ):
+            wait_minutes = (ticket.called_time - ticket.check_in_time).total_seconds() / 60
+        if old_status is not None and wait_minutes is None:
+            return
+
+        try:
+            keys = self._scope_keys(*scope, timezone.localdate())
+            conn.eval(
+                INCREMENT_SCRIPT, len(keys), *keys,
+                1 if old_status is None else 0,
+                wait_minutes or 0,
+                1 if wait_minutes is not None else 0
+            )
+        except RedisError as e:
+            logger.warning(f"Instantané non mis à jour pour le ticket {ticket.pk} : {e}")
+
+    def refresh_queue_counts(self, organization_id, branch_id) -> None:
+        """Recalcule le nombre de files (total et actives) d'une succursale et de son organisation"""
+        conn = self.connection
+        if conn is None:
+            return
+        day = timezone.localdate()
+        try:
+            for key, scope in (
+                (self.organization_key(organization_id, day), Q(queue_type__organization_id=organization_id)),
+                (self.branch_key(branch_id, day), Q(queue_type__branch_id=branch_id)),
+            ):
+                if not conn.exists(key):
+                    continue
+                counts = Queue.objects.filter(scope).aggregate(
+                    total=Count('id'),
+                    active=Count('id', filter=Q(status=Queue.Status.ACTIVE))
+                )
+                conn.hset(key, mapping={
+                    'total_queues': counts['total'],
+                    'active_queues': counts['active'],
+                })
+        except RedisError as e:
+            logger.warning(f"Compteurs de files non mis à jour pour l'organisation {organization_id} : {e}")
+
+    # ------------------------------------------------------------------
+    # Réconciliation et lecture
+    # ------------------------------------------------------------------
+
+    def compute(self, organization_ids: Optional[Iterable] = None, day: Optional[date] = None) -> Dict:
+        """
+        Calcule depuis Postgres les compteurs du jour, indexés par
+        ('org', id) et ('branch', id), en deux requêtes groupées.
+        """
+        day = day or timezone.localdate()
+        queues = Queue.objects.all()
+        tickets = Ticket.objects.filter(check_in_time__date=day)
+        if organization_ids is not None:
+            organization_ids = list(organization_ids)
+            queues = queues.filter(queue_type__organization_id__in=organization_ids)
+            tickets = tickets.filter(queue__queue_type__organization_id__in=organization_ids)
+
+        snapshots = {}
+
+        def add(scope, values):
+            current = snapshots.setdefault(scope, {
+                'total_queues': 0, 'active_queues': 0,
+                'total_tickets': 0, 'wait_sum': 0.0, 'wait_count': 0,
+            })
+            for field, value in values.items():
+                current[field] += value
+
+        for row in queues.values(
+            'queue_type__organization_id', 'queue_type__branch_id'
+        ).annotate(
+            total=Count('id'),
+            active=Count('id', filter=Q(status=Queue.Status.ACTIVE))
+        ).order_by():
+            values = {'total_queues': row['total'], 'active_queues': row['active']}
+            add(('org', row['queue_type__organization_id']), values)
+            add(('branch', row['queue_type__branch_id']), values)
+
+        for row in tickets.values(
+            'queue__queue_type__organization_id', 'queue__queue_type__branch_id'
+        ).annotate(
+            total=Count('id'),
+            wait_count=Count('called_time'),
+            wait_sum=Sum(
+                F('called_time') - F('check_in_time'),
+                output_field=DurationField()
+            )
+        ).order_by():
+            values = {
+                'total_tickets': row['total'],
+                'wait_count': row['wait_count'],
+                'wait_sum': row['wait_sum'].total_seconds() / 60 if row['wait_sum'] else 0.0,
+            }
+            add(('org', row['queue__queue_type__organization_id']), values)
+            add(('branch', row['queue__queue_type__branch_id']), values)
+
+        return snapshots
+
+    def reconcile(self, organization_ids: Optional[Iterable] = None) -> int:
+        """Remplace les instantanés Redis du jour par les valeurs calculées en base"""
+        conn = self.connection
+        if conn is None:
+            return 0
+        day = timezone.localdate()
+        snapshots = self.compute(organization_ids, day)
+        pipe = conn.pipeline(transaction=True)
+        for (kind, scope_id), values in snapshots.items():
+            key = self.organization_key(scope_id, day) if kind == 'org' else self.branch_key(scope_id, day)
+            pipe.delete(key)
+            pipe.hset(key, mapping=values)
+            pipe.expire(key, KEY_TTL)
+        pipe.execute()
+        return len(snapshots)
+
+    def read(self, organization_id, branch_id=None) -> Dict:
+        """Statistiques du tableau de bord au format attendu par le frontend"""
+        # Les instantanés calculés sont indexés par identifiants entiers
+        branch_id = int(branch_id) if branch_id else None
+        day = timezone.localdate()
+        values = None
+        conn = self.connection
+        if conn is not None:
+            key = self.branch_key(branch_id, day) if branch_id else self.organization_key(organization_id, day)
+            try:
+                raw = conn.hgetall(key)
+                if raw:
+                    values = {field.decode(): float(value) for field, value in raw.items()}
+            except RedisError as e:
+                logger.warning(f"Lecture de l'instantané impossible : {e}")
+
+        if values is None:
+            # Instantané absent (Redis indisponible ou pas encore réconcilié)
+            snapshots = self.compute([organization_id], day)
+            values = snapshots.get(('branch', branch_id) if branch_id else ('org', organization_id), {})
+            if conn is not None and snapshots:
+                self.reconcile([organization_id])
+
+        wait_count = values.get('wait_count', 0)
+        return {
+            'totalQueues': int(values.get('total_queues', 0)),
+            'activeQueues': int(values.get('active_queues', 0)),
+            'totalTickets': int(values.get('total_tickets', 0)),
+            'averageWaitTime': round(values.get('wait_sum', 0) / wait_count, 1) if wait_count else 0,
+        }
+
+
+dashboard_snapshot = DashboardSnapshot()
@@ -0,0 +1,30 @@
+"""
+Accès partagé à Redis pour les services de file d'attente
+"""
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'smartqueue'
+
+
+def get_redis():
+    """
+    Retourne la connexion Redis brute du cache configuré dans CACHES,
+    ou None si les structures Redis sont désactivées ou indisponibles.
+    """
+    if not getattr(settings, 'QUEUE_REDIS_ENABLED', True):
+        return None
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection(getattr(settings, 'QUEUE_REDIS_CACHE_ALIAS', 'default'))
+    except Exception as e:
+        logger.warning(f"Connexion Redis indisponible : {e}")
+        return None
+
+
+def make_key(*parts):
+    """Construit une clé Redis préfixée"""
+    return ':'.join([KEY_PREFIX, *[str(part) for part in parts]])
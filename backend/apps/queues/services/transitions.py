@@ -0,0 +1,244 @@
+"""
+Moteur de transitions des tickets et des points de service
+
+Chaque transition est un UPDATE conditionnel (WHERE status=... AND
+version=...) qui n'écrit que les colonnes modifiées et incrémente la
+version : deux agents agissant en même temps sur la même ligne ne
+s'écrasent plus, le second reçoit StaleTransition. Les transitions
+autorisées sont déclarées dans TICKET_TRANSITIONS et
+SERVICE_POINT_TRANSITIONS ; les transitions de masse (tickets appelés
+non présentés) verrouillent leur lot puis le modifient en une seule
+instruction.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+from functools import partial
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from ..models import ServicePoint, Ticket
+
+logger = logging.getLogger(__name__)
+
+TicketStatus = Ticket.Status
+PointStatus = ServicePoint.Status
+
+TICKET_TRANSITIONS = {
+    TicketStatus.WAITING: {
+        TicketStatus.CALLED, TicketStatus.SERVING,
+        TicketStatus.CANCELLED, TicketStatus.TRANSFERRED,
+    },
+    TicketStatus.CALLED: {
+        TicketStatus.SERVING, TicketStatus.NO_SHOW, TicketStatus.CANCELLED,
+        TicketStatus.WAITING, TicketStatus.TRANSFERRED,
+    },
+    TicketStatus.SERVING: {
+        TicketStatus.COMPLETED, TicketStatus.CANCELLED, TicketStatus.TRANSFERRED,
+    },
+    TicketStatus.TRANSFERRED: {TicketStatus.WAITING},
+    TicketStatus.COMPLETED: set(),
+    TicketStatus.CANCELLED: set(),
+    TicketStatus.NO_SHOW: set(),
+}
+
+SERVICE_POINT_TRANSITIONS = {
+    PointStatus.AVAILABLE: {PointStatus.BUSY, PointStatus.BREAK, PointStatus.OFFLINE},
+    PointStatus.BUSY: {PointStatus.AVAILABLE, PointStatus.BREAK, PointStatus.OFFLINE},
+    PointStatus.BREAK: {PointStatus.AVAILABLE, PointStatus.OFFLINE},
+    PointStatus.OFFLINE: {PointStatus.AVAILABLE, PointStatus.BREAK},
+}
+
+# Statuts qui libèrent le point de service du ticket
+TERMINAL_STATUSES = (TicketStatus.COMPLETED, TicketStatus.CANCELLED, TicketStatus.NO_SHOW)
+
+
+class TransitionError(Exception):
+    """Erreur de base du moteur de transitions"""
+
+
+class IllegalTransition(TransitionError):
+    """La transition demandée ne figure pas dans la table des transitions"""
+
+    def __init__(self, current, target):
+        self.current = current
+        self.target = target
+        super().__init__(f"Transition {current} -> {target} non autorisée")
+
+
+class StaleTransition(TransitionError):
+    """La ligne a été modifiée entre sa lecture et la transition"""
+
+
+def _ticket_timestamps(new_status, now):
+    if new_status == TicketStatus.CALLED:
+        return {'called_time': now}
+    if new_status == TicketStatus.SERVING:
+        return {'service_start_time': now}
+    if new_status in TERMINAL_STATUSES:
+        return {'service_end_time': now}
+    return {}
+
+
+def sources_for(new_status, transitions=TICKET_TRANSITIONS):
+    """Statuts à partir desquels new_status est atteignable"""
+    return [source for source, targets in transitions.items() if new_status in targets]
+
+
+class TransitionEngine:
+    """Transitions conditionnelles versionnées"""
+
+    def _check(self, transitions, current, target):
+        if target != current and target not in transitions.get(current, ()):
+            raise IllegalTransition(current, target)
+
+    def _apply(self, model, instance, expected_version, changes):
+        """UPDATE conditionnel ; met à jour l'instance ou lève StaleTransition"""
+        version = instance.version if expected_version is None else expected_version
+        updated = model.objects.filter(
+            pk=instance.pk,
+            status=instance.status,
+            version=version
+        ).update(version=F('version') + 1, **changes)
+        if not updated:
+            raise StaleTransition(
+                f"{model._meta.verbose_name} {instance.pk} modifié par une autre opération"
+            )
+        for field, value in changes.items():
+            setattr(instance, field, value)
+        instance.version = version + 1
+        return instance
+
+    # ------------------------------------------------------------------
+    # Tickets
+    # ------------------------------------------------------------------
+
+    def transition_ticket(self, ticket: Ticket, new_status, expected_version=None, **fields) -> Ticket:
+        """
+        Fait passer un ticket à new_status en n'écrivant que les champs
+        modifiés. Un statut inchangé n'écrit que les champs fournis.
+        Libère le point de service lorsque le ticket est clos.
+        """
+        old_status = ticket.status
+        self._check(TICKET_TRANSITIONS, old_status, new_status)
+        changes = dict(fields)
+        if new_status != old_status:
+            changes['status'] = new_status
+            changes.update(_ticket_timestamps(new_status, timezone.now()))
+
+        with transaction.atomic():
+            self._apply(Ticket, ticket, expected_version, changes)
+            if new_status != old_status and new_status in TERMINAL_STATUSES:
+                self.release_service_points(ticket_ids=[ticket.pk])
+
+        if new_status != old_status:
+            from ..signals import notify_status_change
+            notify_status_change(ticket, old_status)
+        return ticket
+
+    def bulk_transition_tickets(self, queryset, new_status) -> int:
+        """
+        Applique new_status à tous les tickets du queryset dont le statut
+        le permet : le lot est verrouillé, puis modifié en une seule
+        instruction. Retourne le nombre de tickets.
+        """
+        sources = sources_for(new_status)
+        touches_waiting = TicketStatus.WAITING in sources or new_status == TicketStatus.WAITING
+        changes = _ticket_timestamps(new_status, timezone.now())
+
+        with transaction.atomic():
+            # Le lot est verrouillé puis mis à jour par identifiants : seuls ses
+            # tickets sont modifiés et leurs points de service libérés
+            batch = list(
+                queryset.filter(status__in=sources).select_for_update(of=('self',))
+                .values_list('pk', 'queue_id', 'status')
+            )
+            if not batch:
+                return 0
+            ticket_ids = [pk for pk, _, _ in batch]
+            count = Ticket.objects.filter(pk__in=ticket_ids).update(
+                status=new_status,
+                version=F('version') + 1,
+                **changes
+            )
+            if new_status in TERMINAL_STATUSES:
+                self.release_service_points(ticket_ids=ticket_ids)
+
+        # Répartition par file, pour les abonnés aux transitions de masse
+        queue_counts = dict(Counter(queue_id for _, queue_id, _ in batch))
+        waiting_counts = dict(Counter(
+            queue_id for _, queue_id, status in batch
+            if status == TicketStatus.WAITING and new_status != TicketStatus.WAITING
+        ))
+        queue_ids = list(queue_counts) if touches_waiting else []
+
+        if count and queue_ids:
+            # L'index de dispatch et les positions sont recalculés par file
+            transaction.on_commit(partial(self._refresh_queues, queue_ids))
+        if count:
+            from ..signals import tickets_bulk_status_changed
+            transaction.on_commit(partial(
+                tickets_bulk_status_changed.send,
+                sender=Ticket,
+                queue_counts=queue_counts,
+                waiting_counts=waiting_counts,
+                new_status=new_status
+            ))
+        return count
+
+    def expire_called_tickets(self, older_than: Optional[timedelta] = None) -> int:
+        """Passe en NO_SHOW les tickets appelés depuis plus de older_than"""
+        if older_than is None:
+            older_than = timedelta(minutes=settings.TICKET_NO_SHOW_AFTER_MINUTES)
+        return self.bulk_transition_tickets(
+            Ticket.objects.filter(
+                status=TicketStatus.CALLED,
+                called_time__lt=timezone.now() - older_than
+            ),
+            TicketStatus.NO_SHOW
+        )
+
+    @staticmethod
+    def _refresh_queues(queue_ids):
+        from ..realtime import schedule_queue_state
+        from .dispatch import dispatch_engine
+        dispatch_engine.rebuild(queue_ids)
+        for queue_id in queue_ids:
+            schedule_queue_state(queue_id)
+
+    # ------------------------------------------------------------------
+    # Points de service
+    # ------------------------------------------------------------------
+
+    def transition_service_point(
+        self, service_point: ServicePoint, new_status, expected_version=None, **fields
+    ) -> ServicePoint:
+        """Change le statut d'un point de service (UPDATE conditionnel versionné)"""
+        self._check(SERVICE_POINT_TRANSITIONS, service_point.status, new_status)
+        changes = dict(fields, updated_at=timezone.now())
+        if new_status != service_point.status:
+            changes['status'] = new_status
+        return self._apply(ServicePoint, service_point, expected_version, changes)
+
+    def release_service_points(self, ticket_ids: Iterable) -> int:
+        """
+        Détache les tickets clos de leurs points de service ; un point
+        occupé redevient disponible. Une seule instruction.
+        """
+        points = ServicePoint.objects.filter(current_ticket_id__in=list(ticket_ids))
+        return points.update(
+            current_ticket=None,
+            status=Case(
+                When(status=PointStatus.BUSY, then=Value(PointStatus.AVAILABLE)),
+                default=F('status')
+            ),
+            version=F('version') + 1,
+            updated_at=timezone.now()
+        )
+
+
+transition_engine = TransitionEngine()
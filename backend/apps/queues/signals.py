@@ -0,0 +1,70 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .models import Queue, ServicePoint, Ticket
+from .realtime import publish_ticket_called, schedule_queue_state
+from .services.dispatch import dispatch_engine
+from .services.snapshot import dashboard_snapshot
+
+# Émis après validation de la transaction à chaque changement de statut d'un ticket.
+# Arguments : ticket, old_status (None à la création), new_status
+ticket_status_changed = Signal()
+
+# Émis après validation d'une transition de masse (voir services.transitions).
+# Arguments : queue_counts ({queue_id: nombre de tickets}), waiting_counts
+# ({queue_id: tickets sortis de l'attente}), new_status
+tickets_bulk_status_changed = Signal()
+
+
+def notify_status_change(ticket, old_status, new_status=None):
+    """Planifie l'émission de ticket_status_changed après le commit"""
+    new_status = new_status or ticket.status
+    transaction.on_commit(
+        lambda: ticket_status_changed.send(
+            sender=Ticket,
+            ticket=ticket,
+            old_status=old_status,
+            new_status=new_status
+        )
+    )
+
+
+@receiver(ticket_status_changed, sender=Ticket)
+def update_dispatch_index(sender, ticket, old_status, new_status, **kwargs):
+    """Maintient l'index de dispatch Redis à jour"""
+    if new_status == Ticket.Status.WAITING:
+        dispatch_engine.enqueue(ticket)
+    elif old_status == Ticket.Status.WAITING:
+        dispatch_engine.discard(ticket)
+
+
+@receiver(ticket_status_changed, sender=Ticket)
+def push_realtime_updates(sender, ticket, old_status, new_status, **kwargs):
+    """Diffuse les transitions aux clients WebSocket"""
+    if new_status == Ticket.Status.CALLED:
+        publish_ticket_called(
+            ticket,
+            ServicePoint.objects.filter(current_ticket=ticket).first()
+        )
+    if Ticket.Status.WAITING in (old_status, new_status):
+        schedule_queue_state(ticket.queue_id)
+
+
+@receiver(ticket_status_changed, sender=Ticket)
+def update_dashboard_snapshot(sender, ticket, old_status, new_status, **kwargs):
+    """Met à jour les compteurs du tableau de bord"""
+    dashboard_snapshot.record_transition(ticket, old_status, new_status)
+
+
+@receiver(post_save, sender=Queue)
+@receiver(post_delete, sender=Queue)
+def refresh_dashboard_queue_counts(sender, instance, **kwargs):
+    """Recalcule le nombre de files de l'organisation et de la succursale"""
+    queue_type = instance.queue_type
+    transaction.on_commit(
+        lambda: dashboard_snapshot.refresh_queue_counts(
+            queue_type.organization_id,
+            queue_type.branch_id
+        )
+    )
@@ -0,0 +1,68 @@
+from celery import shared_task
+
+from .models import Ticket, QueueNotification
+
+FANOUT_CHUNK_SIZE = 500
+
+
+@shared_task(bind=True)
+def fan_out_queue_status_change(self, queue_id, message, chunk_size=FANOUT_CHUNK_SIZE):
+    """
+    Notifie tous les tickets actifs d'une file d'un changement de statut.
+    Les notifications sont insérées par lots et la progression est publiée
+    dans le backend de résultats Celery (état PROGRESS).
+    """
+    ticket_ids = list(
+        Ticket.objects.filter(
+            queue_id=queue_id,
+            status__in=[Ticket.Status.WAITING, Ticket.Status.CALLED]
+        ).values_list('pk', flat=True)
+    )
+    total = len(ticket_ids)
+    done = 0
+
+    for start in range(0, total, chunk_size):
+        chunk = ticket_ids[start:start + chunk_size]
+        QueueNotification.objects.bulk_create([
+            QueueNotification(
+                ticket_id=ticket_id,
+                notification_type=QueueNotification.NotificationType.STATUS_CHANGE,
+                message=message,
+                sent_via='push'
+            )
+            for ticket_id in chunk
+        ])
+        done += len(chunk)
+        if not self.request.is_eager:
+            self.update_state(state='PROGRESS', meta={'total': total, 'done': done})
+
+    return {'queue_id': queue_id, 'total': total, 'done': done}
+
+
+@shared_task
+def publish_queue_state_task(queue_id):
+    """Publication regroupée de l'état d'une file (voir realtime.schedule_queue_state)"""
+    from .realtime import publish_queue_state
+    publish_queue_state(queue_id)
+
+
+@shared_task
+def reconcile_dashboard_snapshots():
+    """Réaligne périodiquement les instantanés du tableau de bord sur Postgres"""
+    from .services.snapshot import dashboard_snapshot
+    return dashboard_snapshot.reconcile()
+
+
+@shared_task
+def archive_old_tickets():
+    """Archivage nocturne des tickets clos (voir services.archive)"""
+    from .services.archive import archive_tickets
+    result = archive_tickets()
+    return {'archived': result.archived, 'batches': result.batches}
+
+
+@shared_task
+def expire_called_tickets():
+    """Passe en NO_SHOW, en une instruction, les tickets appelés non présentés"""
+    from .services.transitions import transition_engine
+    return transition_engine.expire_called_tickets()
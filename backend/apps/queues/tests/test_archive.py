@@ -0,0 +1,133 @@
+import importlib
+import unittest
+from datetime import timedelta
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from apps.analytics.models import CustomerFeedback
+from apps.core.models import Organization, OrganizationBranch
+from ..models import (
+    QueueType, Queue, QueueNotification, QueueNotificationArchive, ServicePoint,
+    Ticket, TicketArchive, TicketHistory
+)
+from ..services.archive import ArchiveUnsupported, archive_tickets
+
+User = get_user_model()
+
+# Les migrations étant désactivées en test, la table partitionnée et la vue
+# sont créées à partir du SQL de la migration
+archive_migration = importlib.import_module('apps.queues.migrations.0004_ticket_archive')
+notification_archive_migration = importlib.import_module('apps.queues.migrations.0006_queuenotification_archive')
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Archive partitioning requires PostgreSQL")
+class TicketArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            cursor.execute(archive_migration.CREATE_ARCHIVE_SQL)
+            cursor.execute(notification_archive_migration.CREATE_NOTIFICATION_ARCHIVE_SQL)
+
+        organization = Organization.objects.create(name="Archive Org")
+        branch = OrganizationBranch.objects.create(
+            name="Archive Branch",
+            code="ARCHIVE",
+            organization=organization
+        )
+        cls.user = User.objects.create_user(
+            email='archive@example.com',
+            password='archivepass123'
+        )
+        queue_type = QueueType.objects.create(
+            name="Archive Type",
+            organization=organization,
+            branch=branch
+        )
+        cls.queue = Queue.objects.create(queue_type=queue_type, name="Archive Queue")
+        cls.branch = branch
+
+    def _ticket(self, number, status, days_ago):
+        ticket = Ticket.objects.create(
+            queue=self.queue,
+            user=self.user,
+            number=number,
+            status=status
+        )
+        Ticket.objects.filter(pk=ticket.pk).update(
+            check_in_time=timezone.now() - timedelta(days=days_ago)
+        )
+        return ticket
+
+    def test_moves_only_old_closed_tickets(self):
+        old_completed = self._ticket('A0001', Ticket.Status.COMPLETED, 90)
+        old_no_show = self._ticket('A0002', Ticket.Status.NO_SHOW, 45)
+        old_waiting = self._ticket('A0003', Ticket.Status.WAITING, 90)
+        recent = self._ticket('A0004', Ticket.Status.COMPLETED, 1)
+
+        result = archive_tickets(older_than_days=30, batch_size=1)
+
+        self.assertEqual(result.archived, 2)
+        self.assertEqual(
+            set(TicketArchive.objects.values_list('id', flat=True)),
+            {old_completed.pk, old_no_show.pk}
+        )
+        self.assertEqual(
+            set(Ticket.objects.values_list('id', flat=True)),
+            {old_waiting.pk, recent.pk}
+        )
+        self.assertEqual(TicketHistory.objects.count(), 4)
+
+    def test_keeps_tickets_with_feedback_and_releases_service_points(self):
+        rated = self._ticket('A0010', Ticket.Status.COMPLETED, 90)
+        CustomerFeedback.objects.create(
+            ticket=rated,
+            rating=5,
+            wait_time_satisfaction=5,
+            service_satisfaction=5
+        )
+        served = self._ticket('A0011', Ticket.Status.COMPLETED, 90)
+        service_point = ServicePoint.objects.create(
+            name="Counter",
+            branch=self.branch,
+            current_ticket=served
+        )
+
+        result = archive_tickets(older_than_days=30)
+
+        self.assertEqual(result.archived, 1)
+        self.assertTrue(Ticket.objects.filter(pk=rated.pk).exists())
+        service_point.refresh_from_db()
+        self.assertIsNone(service_point.current_ticket_id)
+
+    def test_moves_notifications_with_their_tickets(self):
+        archived = self._ticket('A0020', Ticket.Status.COMPLETED, 90)
+        kept = self._ticket('A0021', Ticket.Status.WAITING, 90)
+        for ticket in (archived, kept):
+            QueueNotification.objects.create(
+                ticket=ticket,
+                notification_type=QueueNotification.NotificationType.CALLED,
+                message=f"Ticket {ticket.number}",
+                sent_via='sms'
+            )
+        notification = QueueNotification.objects.get(ticket=archived)
+
+        archive_tickets(older_than_days=30)
+
+        self.assertEqual(
+            list(QueueNotification.objects.values_list('ticket_id', flat=True)),
+            [kept.pk]
+        )
+        moved = QueueNotificationArchive.objects.get()
+        self.assertEqual(
+            (moved.id, moved.ticket_id, moved.message, moved.sent_at),
+            (notification.id, archived.pk, "Ticket A0020", notification.sent_at)
+        )
+
+    def test_unsupported_backend_is_reported(self):
+        with mock.patch.object(connection, 'vendor', 'sqlite'):
+            with self.assertRaises(ArchiveUnsupported):
+                archive_tickets()
+            with self.assertRaises(CommandError):
+                call_command('archive_tickets')
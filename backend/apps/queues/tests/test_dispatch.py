@@ -0,0 +1,189 @@
+import unittest
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from apps.core.models import Organization, OrganizationBranch
+from apps.core.permissions import IsOrganizationMember
+from ..models import QueueType, Queue, QueueNotification, ServicePoint, Ticket
+from ..services.dispatch import DispatchEngine, SWAP_SCRIPT, ticket_score
+from ..services.positions import PositionIndex
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401 (scripts Lua de fakeredis)
+except ImportError:
+    fakeredis = None
+
+User = get_user_model()
+
+class DispatchEngineTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.branch = OrganizationBranch.objects.create(
+            name="Test Branch",
+            organization=self.organization
+        )
+        self.user = User.objects.create_user(
+            email='client@example.com',
+            password='clientpass123'
+        )
+        self.queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            organization=self.organization,
+            branch=self.branch
+        )
+        self.queue = Queue.objects.create(queue_type=self.queue_type, name="Test Queue")
+        self.service_point = ServicePoint.objects.create(
+            name="Test Service Point",
+            branch=self.branch
+        )
+        self.service_point.assigned_queues.add(self.queue)
+        # Moteur sans Redis : chemin de repli SELECT ... FOR UPDATE SKIP LOCKED
+        self.engine = DispatchEngine()
+        self.engine._connection = None
+
+    def _ticket(self, number, priority_level=0):
+        return Ticket.objects.create(
+            queue=self.queue,
+            user=self.user,
+            number=number,
+            priority_level=priority_level
+        )
+
+    def test_score_orders_priority_before_check_in_time(self):
+        now = timezone.now()
+        early_normal = ticket_score(0, now - timedelta(hours=3))
+        late_priority = ticket_score(1, now)
+        later_normal = ticket_score(0, now - timedelta(hours=1))
+        self.assertLess(late_priority, early_normal)
+        self.assertLess(early_normal, later_normal)
+
+    def test_pop_next_respects_priority_then_arrival(self):
+        first = self._ticket('A001')
+        second = self._ticket('A002')
+        urgent = self._ticket('A003', priority_level=2)
+
+        called = [self.engine.pop_next(self.service_point) for _ in range(3)]
+
+        self.assertEqual([t.pk for t in called], [urgent.pk, first.pk, second.pk])
+        self.assertTrue(all(t.status == Ticket.Status.CALLED for t in called))
+        self.assertTrue(all(t.called_time is not None for t in called))
+        self.assertIsNone(self.engine.pop_next(self.service_point))
+
+    def test_positions_are_read_in_bulk(self):
+        first = self._ticket('A001')
+        second = self._ticket('A002')
+        urgent = self._ticket('A003', priority_level=2)
+        called = self._ticket('A004')
+        Ticket.objects.filter(pk=called.pk).update(status=Ticket.Status.CALLED)
+        called.refresh_from_db()
+        index = PositionIndex(self.engine)
+
+        with self.assertNumQueries(1):
+            positions = index.positions([first, second, urgent, called])
+
+        self.assertEqual(positions, {urgent.pk: 1, first.pk: 2, second.pk: 3, called.pk: None})
+
+
+if fakeredis is not None:
+    class SwapHookRedis(fakeredis.FakeStrictRedis):
+        """Exécute before_swap juste avant la bascule de l'index rechargé"""
+        before_swap = None
+
+        def eval(self, script, *args):
+            if script == SWAP_SCRIPT and self.before_swap:
+                hook, self.before_swap = self.before_swap, None
+                hook()
+            return super().eval(script, *args)
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis[lua] requis pour le chemin Redis")
+class DispatchEngineRedisTests(DispatchEngineTests):
+    def setUp(self):
+        super().setUp()
+        self.redis = SwapHookRedis()
+        self.redis.flushall()
+        self.engine._connection = self.redis
+
+    def _indexed(self):
+        return [int(m) for m in self.redis.zrange(self.engine.queue_key(self.queue.pk), 0, -1)]
+
+    def test_enqueue_during_rebuild_is_kept(self):
+        first = self._ticket('A001')
+        late = {}
+
+        def enqueue_late():
+            late['ticket'] = self._ticket('A002', priority_level=1)
+            self.engine.enqueue(late['ticket'])
+
+        self.redis.before_swap = enqueue_late
+        self.engine.rebuild([self.queue.pk])
+
+        self.assertEqual(self._indexed(), [late['ticket'].pk, first.pk])
+
+    def test_enqueue_during_first_load_is_kept(self):
+        first = self._ticket('A001')
+        late = {}
+
+        def enqueue_late():
+            late['ticket'] = self._ticket('A002')
+            self.engine.enqueue(late['ticket'])
+
+        self.redis.before_swap = enqueue_late
+        called = self.engine.pop_next(self.service_point)
+
+        self.assertEqual(called.pk, first.pk)
+        self.assertEqual(self._indexed(), [late['ticket'].pk])
+
+    def test_discard_during_rebuild_is_applied(self):
+        first = self._ticket('A001')
+        second = self._ticket('A002')
+
+        def call_first():
+            Ticket.objects.filter(pk=first.pk).update(status=Ticket.Status.CALLED)
+            self.engine.discard(first)
+
+        self.redis.before_swap = call_first
+        self.engine.rebuild([self.queue.pk])
+
+        self.assertEqual(self._indexed(), [second.pk])
+
+    def test_pop_next_falls_back_to_database_when_index_is_empty(self):
+        self.engine.rebuild([self.queue.pk])
+        # Ticket validé sans passer par l'index (signal perdu, Redis redémarré...)
+        stranded = self._ticket('A001')
+
+        called = self.engine.pop_next(self.service_point)
+
+        self.assertEqual(called.pk, stranded.pk)
+        self.assertEqual(called.status, Ticket.Status.CALLED)
+        # L'index sera rechargé au prochain accès
+        self.assertFalse(self.redis.exists(self.engine.loaded_key(self.queue.pk)))
+
+    def test_call_next_rollback_restores_ticket_in_index(self):
+        ticket = self._ticket('A001')
+        self.engine.rebuild([self.queue.pk])
+        agent = User.objects.create_user(
+            email='agent@example.com',
+            password='agentpass123',
+            organization=self.organization
+        )
+        client = APIClient()
+        client.force_authenticate(user=agent)
+        client.raise_request_exception = False
+        url = reverse('queues:service-point-call-next', args=[self.service_point.pk])
+
+        # ServicePoint n'expose pas d'organisation : la permission objet est neutralisée
+        with mock.patch.object(IsOrganizationMember, 'has_object_permission', return_value=True), \
+                mock.patch('apps.queues.views.dispatch_engine', self.engine), \
+                mock.patch.object(QueueNotification.objects, 'create', side_effect=RuntimeError):
+            response = client.post(url)
+
+        self.assertEqual(response.status_code, 500)
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.status, Ticket.Status.WAITING)
+        self.assertEqual(self._indexed(), [ticket.pk])
@@ -0,0 +1,142 @@
+import os
+import unittest
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from apps.core.models import Organization, OrganizationBranch
+from ..models import QueueType, Queue, Ticket
+
+User = get_user_model()
+
+# Volume de tickets générés. Les plans sont vérifiés avec enable_seqscan=off,
+# un petit volume suffit ; EXPLAIN_SEED_TICKETS=5000000 pour un banc réaliste
+SEED_TICKETS = int(os.getenv('EXPLAIN_SEED_TICKETS', '20000'))
+SEED_QUEUES = 500
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "EXPLAIN checks require PostgreSQL")
+class TicketHotPathPlanTests(TestCase):
+    """
+    Vérifie avec EXPLAIN que chaque requête critique sur les tickets utilise
+    l'index composite ou partiel prévu pour elle, et non le seul index de la
+    clé étrangère queue_id. Les parcours séquentiels sont pénalisés
+    (enable_seqscan=off) : le plan ne dépend pas du volume de données.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name="Explain Org")
+        branch = OrganizationBranch.objects.create(
+            name="Explain Branch",
+            code="EXPLAIN",
+            organization=organization
+        )
+        cls.user = User.objects.create_user(
+            email='explain@example.com',
+            password='explainpass123'
+        )
+        queue_type = QueueType.objects.create(
+            name="Explain Type",
+            organization=organization,
+            branch=branch
+        )
+        Queue.objects.bulk_create([
+            Queue(queue_type=queue_type, name=f"Queue {i}")
+            for i in range(SEED_QUEUES)
+        ])
+        queue_ids = list(Queue.objects.order_by('id').values_list('id', flat=True))
+        cls.queue_id = queue_ids[0]
+
+        # Historique majoritairement terminé, une petite fraction en cours
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO queues_ticket (
+                    queue_id, number, user_id, status, priority_level,
+                    estimated_wait_time, check_in_time, called_time,
+                    service_start_time, service_end_time, notes, version
+                )
+                SELECT
+                    %(first_queue)s + (n %% %(queues)s),
+                    'T' || n,
+                    %(user)s,
+                    CASE
+                        WHEN n %% 1000 = 0 THEN 'WA'
+                        WHEN n %% 1000 = 1 THEN 'CA'
+                        WHEN n %% 20 = 2 THEN 'CN'
+                        WHEN n %% 20 = 3 THEN 'NS'
+                        ELSE 'CO'
+                    END,
+                    n %% 3,
+                    0,
+                    now() - (n || ' seconds')::interval,
+                    now() - (n || ' seconds')::interval + interval '10 minutes',
+                    now() - (n || ' seconds')::interval + interval '11 minutes',
+                    now() - (n || ' seconds')::interval + interval '20 minutes',
+                    '',
+                    1
+                FROM generate_series(1, %(count)s) AS n
+                """,
+                {
+                    'first_queue': cls.queue_id,
+                    'queues': SEED_QUEUES,
+                    'user': cls.user.id,
+                    'count': SEED_TICKETS,
+                }
+            )
+            cursor.execute('ANALYZE queues_ticket')
+
+    def assertUsesIndex(self, queryset, index):
+        with connection.cursor() as cursor:
+            # Limité à la transaction du test
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan on queues_ticket', plan, msg=plan)
+        self.assertIn(index, plan, msg=plan)
+
+    def test_dispatch_next_waiting_ticket(self):
+        self.assertUsesIndex(
+            Ticket.objects.filter(
+                queue_id__in=[self.queue_id],
+                status=Ticket.Status.WAITING
+            ).order_by('-priority_level', 'check_in_time')[:1],
+            'ticket_waiting_dispatch_idx'
+        )
+
+    def test_waiting_positions(self):
+        self.assertUsesIndex(
+            Ticket.objects.filter(
+                queue_id=self.queue_id,
+                status=Ticket.Status.WAITING
+            ).values_list('pk', 'priority_level', 'check_in_time'),
+            'ticket_waiting_dispatch_idx'
+        )
+
+    def test_active_tickets_count(self):
+        self.assertUsesIndex(
+            Ticket.objects.filter(
+                queue_id=self.queue_id,
+                status__in=[Ticket.Status.WAITING, Ticket.Status.CALLED]
+            ).values('queue'),
+            'ticket_queue_status_idx'
+        )
+
+    def test_completed_tickets_window(self):
+        self.assertUsesIndex(
+            Ticket.objects.filter(
+                queue_id=self.queue_id,
+                status=Ticket.Status.COMPLETED,
+                service_end_time__gte=timezone.now() - timedelta(hours=1)
+            ).values_list('service_start_time', 'service_end_time'),
+            'ticket_completed_end_idx'
+        )
+
+    def test_arrivals_window(self):
+        self.assertUsesIndex(
+            Ticket.objects.filter(
+                queue_id=self.queue_id,
+                check_in_time__gte=timezone.now() - timedelta(hours=1)
+            ).values('status'),
+            'ticket_queue_check_in_idx'
+        )
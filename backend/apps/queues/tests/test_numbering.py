@@ -0,0 +1,99 @@
+import unittest
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase
+from redis.exceptions import RedisError
+from apps.core.models import Organization, OrganizationBranch
+from ..models import QueueType, Queue
+from ..services.numbering import (
+    CHECKPOINT_WINDOW, TicketNumberAllocator, queue_local_date
+)
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401 (scripts Lua de fakeredis)
+except ImportError:
+    fakeredis = None
+
+class TicketNumberAllocatorTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.branch = OrganizationBranch.objects.create(
+            name="Test Branch",
+            organization=self.organization
+        )
+        self.queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            prefix='A',
+            organization=self.organization,
+            branch=self.branch
+        )
+        self.queue = Queue.objects.create(queue_type=self.queue_type, name="Test Queue")
+        # Allocateur sans Redis : compteur en base uniquement
+        self.allocator = TicketNumberAllocator()
+        self.allocator._connection = None
+
+    def test_numbers_are_sequential_and_prefixed(self):
+        self.assertEqual(self.allocator.next_number(self.queue), 'A0001')
+        self.assertEqual(self.allocator.next_number(self.queue), 'A0002')
+
+    def test_blocks_are_contiguous_and_disjoint(self):
+        first = self.allocator.allocate(self.queue, 10)
+        second = self.allocator.allocate(self.queue, 5)
+        self.assertEqual((first.start, first.end), (1, 10))
+        self.assertEqual((second.start, second.end), (11, 15))
+        self.assertEqual(len(second.labels()), 5)
+
+    def test_counter_resets_daily(self):
+        Queue.objects.filter(pk=self.queue.pk).update(
+            current_number=42,
+            current_number_date=queue_local_date(self.queue) - timedelta(days=1)
+        )
+        self.assertEqual(self.allocator.next_number(self.queue), 'A0001')
+
+    def test_invalid_block_size(self):
+        with self.assertRaises(ValueError):
+            self.allocator.allocate(self.queue, 0)
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis[lua] requis pour le chemin Redis")
+class TicketNumberAllocatorRedisTests(TicketNumberAllocatorTests):
+    def setUp(self):
+        super().setUp()
+        self.redis = fakeredis.FakeStrictRedis()
+        self.redis.flushall()
+        self.allocator._connection = self.redis
+
+    def _checkpoint(self):
+        return Queue.objects.values_list('current_number', flat=True).get(pk=self.queue.pk)
+
+    def test_database_is_only_touched_to_seed_and_per_window(self):
+        # Amorçage : lecture du point de reprise puis avance d'une fenêtre
+        with self.assertNumQueries(2):
+            self.allocator.allocate(self.queue, 1)
+        with self.assertNumQueries(0):
+            for _ in range(CHECKPOINT_WINDOW - 2):
+                self.allocator.allocate(self.queue, 1)
+        # Franchissement de fenêtre : un seul UPDATE
+        with self.assertNumQueries(1):
+            block = self.allocator.allocate(self.queue, 2)
+        self.assertEqual((block.start, block.end), (CHECKPOINT_WINDOW, CHECKPOINT_WINDOW + 1))
+        self.assertGreater(self._checkpoint(), block.end)
+
+    def test_reseeding_after_key_loss_never_reuses_numbers(self):
+        issued = {number for _ in range(5) for number in self.allocator.allocate(self.queue, 7)}
+        self.redis.flushall()
+
+        block = self.allocator.allocate(self.queue, 3)
+
+        self.assertGreater(block.start, max(issued))
+
+    def test_database_fallback_does_not_collide_with_redis_numbers(self):
+        issued = set(self.allocator.allocate(self.queue, 10))
+        with mock.patch.object(self.redis, 'eval', side_effect=RedisError("indisponible")):
+            issued_db = set(self.allocator.allocate(self.queue, 10))
+        self.assertFalse(issued & issued_db)
+
+        # Retour de Redis : la clé est réamorcée depuis la base
+        block = self.allocator.allocate(self.queue, 5)
+        self.assertFalse(set(block) & (issued | issued_db))
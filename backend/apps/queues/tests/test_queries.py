@@ -0,0 +1,60 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from apps.core.models import Organization, OrganizationBranch
+from ..models import QueueType, Queue, ServicePoint, Ticket
+
+User = get_user_model()
+
+class QueueListingQueryCountTests(APITestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.branch = OrganizationBranch.objects.create(
+            name="Test Branch",
+            organization=self.organization
+        )
+        self.admin_user = User.objects.create_user(
+            email='admin@example.com',
+            password='adminpass123',
+            organization=self.organization,
+            user_type=User.UserType.ADMIN
+        )
+        self.queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            organization=self.organization,
+            branch=self.branch
+        )
+        self.client.force_authenticate(user=self.admin_user)
+
+    def _create_queues(self, count):
+        for i in range(count):
+            queue = Queue.objects.create(queue_type=self.queue_type, name=f"Queue {i}")
+            service_point = ServicePoint.objects.create(
+                name=f"Counter {i}",
+                branch=self.branch,
+                assigned_agent=self.admin_user
+            )
+            service_point.assigned_queues.add(queue)
+            for j in range(3):
+                Ticket.objects.create(queue=queue, user=self.admin_user, number=f"A{j:04d}")
+
+    def _count_list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('queues:queue-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    def test_queue_listing_query_count_is_constant(self):
+        self._create_queues(2)
+        baseline, _ = self._count_list_queries()
+
+        self._create_queues(20)
+        queries, response = self._count_list_queries()
+
+        self.assertEqual(queries, baseline)
+        self.assertEqual(len(response.data), 22)
+        self.assertEqual(response.data[0]['active_tickets_count'], 3)
+        self.assertEqual(response.data[0]['estimated_wait_time'], 3 * 15)
@@ -0,0 +1,118 @@
+from unittest import mock
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django.contrib.auth import get_user_model
+from apps.core.models import Organization, OrganizationBranch
+from ..models import QueueType, Queue, Ticket
+from ..realtime import publish_queue_state, schedule_queue_state
+from ..routing import websocket_urlpatterns
+
+User = get_user_model()
+
+# Les consumers accèdent à la base depuis un autre contexte : pas de TestCase transactionnel
+class QueueRealtimeTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.organization = Organization.objects.create(name="Test Org")
+        self.branch = OrganizationBranch.objects.create(
+            name="Test Branch",
+            organization=self.organization
+        )
+        self.staff = User.objects.create_user(
+            email='agent@example.com',
+            password='agentpass123',
+            organization=self.organization
+        )
+        self.customer = User.objects.create_user(
+            email='client@example.com',
+            password='clientpass123'
+        )
+        self.other_customer = User.objects.create_user(
+            email='other@example.com',
+            password='otherpass123'
+        )
+        self.queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            organization=self.organization,
+            branch=self.branch
+        )
+        self.queue = Queue.objects.create(queue_type=self.queue_type, name="Test Queue")
+        self.ticket = Ticket.objects.create(queue=self.queue, user=self.customer, number='A0001')
+        self.other_ticket = Ticket.objects.create(
+            queue=self.queue, user=self.other_customer, number='A0002'
+        )
+
+    async def _connect(self, user):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns),
+            f'/ws/queues/{self.queue.pk}/'
+        )
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def _events(self, communicator):
+        events = {}
+        while not await communicator.receive_nothing(timeout=0.2):
+            message = await communicator.receive_json_from()
+            events[message['event']] = message['data']
+        return events
+
+    async def test_customer_receives_only_own_position(self):
+        communicator, connected = await self._connect(self.customer)
+        self.assertTrue(connected)
+
+        await database_sync_to_async(publish_queue_state)(self.queue.pk)
+        events = await self._events(communicator)
+        await communicator.disconnect()
+
+        self.assertEqual(
+            events['positions_changed'],
+            {'positions': {str(self.ticket.pk): 1}, 'removed': []}
+        )
+        self.assertEqual(events['wait_time_updated']['active_tickets_count'], 2)
+
+    async def test_staff_receives_every_position(self):
+        communicator, connected = await self._connect(self.staff)
+        self.assertTrue(connected)
+
+        await database_sync_to_async(publish_queue_state)(self.queue.pk)
+        events = await self._events(communicator)
+        await communicator.disconnect()
+
+        self.assertEqual(events['positions_changed']['positions'], {
+            str(self.ticket.pk): 1,
+            str(self.other_ticket.pk): 2,
+        })
+
+    async def test_customer_is_not_sent_unrelated_changes(self):
+        await database_sync_to_async(publish_queue_state)(self.queue.pk)
+        communicator, _ = await self._connect(self.customer)
+
+        # Seul l'autre client quitte la file : rien à transmettre au premier
+        await database_sync_to_async(
+            Ticket.objects.filter(pk=self.other_ticket.pk).update
+        )(status=Ticket.Status.CANCELLED)
+        await database_sync_to_async(publish_queue_state)(self.queue.pk)
+        events = await self._events(communicator)
+        await communicator.disconnect()
+
+        self.assertNotIn('positions_changed', events)
+        self.assertIn('wait_time_updated', events)
+
+    async def test_user_without_ticket_is_rejected(self):
+        outsider = await database_sync_to_async(User.objects.create_user)(
+            email='outsider@example.com',
+            password='outsiderpass123'
+        )
+        communicator, connected = await self._connect(outsider)
+        self.assertFalse(connected)
+
+    def test_state_publications_are_coalesced_without_redis(self):
+        with mock.patch('apps.queues.tasks.publish_queue_state_task.apply_async') as publish:
+            for _ in range(3):
+                schedule_queue_state(self.queue.pk)
+        publish.assert_called_once_with(args=(self.queue.pk,), countdown=mock.ANY)
@@ -0,0 +1,75 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from apps.core.models import Organization, OrganizationBranch
+from ..models import QueueType, Queue, Ticket
+from ..services.snapshot import DashboardSnapshot
+
+User = get_user_model()
+
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.branch = OrganizationBranch.objects.create(
+            name="Test Branch",
+            code="TB1",
+            organization=self.organization
+        )
+        self.user = User.objects.create_user(
+            email='client@example.com',
+            password='clientpass123'
+        )
+        self.queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            organization=self.organization,
+            branch=self.branch
+        )
+        self.queue = Queue.objects.create(queue_type=self.queue_type, name="Open")
+        Queue.objects.create(queue_type=self.queue_type, name="Paused", status=Queue.Status.PAUSED)
+        # Sans Redis, la lecture calcule l'instantané en base
+        self.snapshot = DashboardSnapshot()
+        self.snapshot._connection = None
+
+    def test_read_computes_snapshot_from_database(self):
+        Ticket.objects.create(queue=self.queue, user=self.user, number='A0001')
+        called = Ticket.objects.create(queue=self.queue, user=self.user, number='A0002')
+        Ticket.objects.filter(pk=called.pk).update(
+            status=Ticket.Status.CALLED,
+            called_time=called.check_in_time + timedelta(minutes=12)
+        )
+
+        with self.assertNumQueries(2):
+            stats = self.snapshot.read(self.organization.id)
+
+        self.assertEqual(stats, {
+            'totalQueues': 2,
+            'activeQueues': 1,
+            'totalTickets': 2,
+            'averageWaitTime': 12.0,
+        })
+        self.assertEqual(
+            self.snapshot.read(self.organization.id, branch_id=self.branch.id)['totalTickets'],
+            2
+        )
+
+    def test_branch_stats_through_view(self):
+        Ticket.objects.create(queue=self.queue, user=self.user, number='A0001')
+        agent = User.objects.create_user(
+            email='agent@example.com',
+            password='agentpass123',
+            organization=self.organization
+        )
+        client = APIClient()
+        client.force_authenticate(user=agent)
+        url = reverse('core:dashboard-stats')
+
+        # La succursale arrive en chaîne depuis la query string
+        response = client.get(url, {'branch': str(self.branch.id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['totalQueues'], 2)
+        self.assertEqual(response.data['totalTickets'], 1)
+
+        self.assertEqual(client.get(url, {'branch': 'abc'}).status_code, 400)
+        self.assertEqual(client.get(url, {'branch': self.branch.id + 1000}).status_code, 404)
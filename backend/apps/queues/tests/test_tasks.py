@@ -0,0 +1,50 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from apps.core.models import Organization, OrganizationBranch
+from ..models import QueueType, Queue, Ticket, QueueNotification
+from ..tasks import fan_out_queue_status_change
+
+User = get_user_model()
+
+class QueueStatusFanOutTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.branch = OrganizationBranch.objects.create(
+            name="Test Branch",
+            organization=self.organization
+        )
+        self.user = User.objects.create_user(
+            email='client@example.com',
+            password='clientpass123'
+        )
+        self.queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            organization=self.organization,
+            branch=self.branch
+        )
+        self.queue = Queue.objects.create(queue_type=self.queue_type, name="Test Queue")
+
+    def test_notifies_active_tickets_in_chunks(self):
+        for i in range(5):
+            Ticket.objects.create(queue=self.queue, user=self.user, number=f"A{i:04d}")
+        Ticket.objects.create(
+            queue=self.queue,
+            user=self.user,
+            number='A0099',
+            status=Ticket.Status.COMPLETED
+        )
+
+        with self.assertNumQueries(4):
+            result = fan_out_queue_status_change.apply(
+                args=(self.queue.id, "Queue status changed to Paused"),
+                kwargs={'chunk_size': 2}
+            ).get()
+
+        self.assertEqual(result['total'], 5)
+        self.assertEqual(result['done'], 5)
+        self.assertEqual(
+            QueueNotification.objects.filter(
+                notification_type=QueueNotification.NotificationType.STATUS_CHANGE
+            ).count(),
+            5
+        )
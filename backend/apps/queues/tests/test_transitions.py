@@ -0,0 +1,143 @@
+from datetime import timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from apps.core.models import Organization, OrganizationBranch
+from ..models import QueueType, Queue, ServicePoint, Ticket
+from ..services.transitions import (
+    IllegalTransition, StaleTransition, TransitionEngine
+)
+
+User = get_user_model()
+
+class TransitionEngineTests(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.branch = OrganizationBranch.objects.create(
+            name="Test Branch",
+            organization=self.organization
+        )
+        self.user = User.objects.create_user(
+            email='client@example.com',
+            password='clientpass123'
+        )
+        self.queue_type = QueueType.objects.create(
+            name="Test Queue Type",
+            organization=self.organization,
+            branch=self.branch
+        )
+        self.queue = Queue.objects.create(queue_type=self.queue_type, name="Test Queue")
+        self.engine = TransitionEngine()
+
+    def _ticket(self, number, status=Ticket.Status.WAITING, **fields):
+        return Ticket.objects.create(
+            queue=self.queue,
+            user=self.user,
+            number=number,
+            status=status,
+            **fields
+        )
+
+    def test_transition_writes_status_timestamp_and_version(self):
+        ticket = self._ticket('A001')
+
+        self.engine.transition_ticket(ticket, Ticket.Status.SERVING, notes='Au guichet')
+
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.status, Ticket.Status.SERVING)
+        self.assertIsNotNone(ticket.service_start_time)
+        self.assertEqual(ticket.notes, 'Au guichet')
+        self.assertEqual(ticket.version, 1)
+
+    def test_illegal_transition_is_rejected(self):
+        ticket = self._ticket('A001', status=Ticket.Status.COMPLETED)
+
+        with self.assertRaises(IllegalTransition):
+            self.engine.transition_ticket(ticket, Ticket.Status.SERVING)
+
+    def test_concurrent_transition_is_stale(self):
+        ticket = self._ticket('A001')
+        other_agent_copy = Ticket.objects.get(pk=ticket.pk)
+
+        self.engine.transition_ticket(ticket, Ticket.Status.CALLED)
+
+        with self.assertRaises(StaleTransition):
+            self.engine.transition_ticket(other_agent_copy, Ticket.Status.CANCELLED)
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.status, Ticket.Status.CALLED)
+
+    def test_closing_ticket_releases_service_point(self):
+        ticket = self._ticket('A001', status=Ticket.Status.SERVING)
+        service_point = ServicePoint.objects.create(
+            name="Counter",
+            branch=self.branch,
+            status=ServicePoint.Status.BUSY,
+            current_ticket=ticket
+        )
+
+        self.engine.transition_ticket(ticket, Ticket.Status.COMPLETED)
+
+        service_point.refresh_from_db()
+        self.assertEqual(service_point.status, ServicePoint.Status.AVAILABLE)
+        self.assertIsNone(service_point.current_ticket)
+
+    def test_expire_called_tickets_in_one_statement(self):
+        stale = self._ticket('A001', status=Ticket.Status.CALLED)
+        Ticket.objects.filter(pk=stale.pk).update(called_time=timezone.now() - timedelta(minutes=10))
+        recent = self._ticket('A002', status=Ticket.Status.CALLED, called_time=timezone.now())
+        waiting = self._ticket('A003')
+        service_point = ServicePoint.objects.create(
+            name="Counter",
+            branch=self.branch,
+            status=ServicePoint.Status.BUSY,
+            current_ticket=stale
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            count = self.engine.expire_called_tickets(timedelta(minutes=5))
+
+        self.assertEqual(count, 1)
+        ticket_updates = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "queues_ticket"')
+        ]
+        self.assertEqual(len(ticket_updates), 1)
+        self.assertEqual(
+            dict(Ticket.objects.values_list('pk', 'status')),
+            {
+                stale.pk: Ticket.Status.NO_SHOW,
+                recent.pk: Ticket.Status.CALLED,
+                waiting.pk: Ticket.Status.WAITING,
+            }
+        )
+        service_point.refresh_from_db()
+        self.assertEqual(service_point.status, ServicePoint.Status.AVAILABLE)
+        self.assertIsNone(service_point.current_ticket)
+
+    def test_bulk_transition_releases_only_its_batch(self):
+        stale = self._ticket('A001', status=Ticket.Status.CALLED)
+        Ticket.objects.filter(pk=stale.pk).update(called_time=timezone.now() - timedelta(minutes=10))
+        # Ticket déjà non présenté, resté attaché à son guichet hors de ce lot
+        earlier = self._ticket('A002', status=Ticket.Status.NO_SHOW)
+        batch_point = ServicePoint.objects.create(
+            name="Counter 1",
+            branch=self.branch,
+            status=ServicePoint.Status.BUSY,
+            current_ticket=stale
+        )
+        other_point = ServicePoint.objects.create(
+            name="Counter 2",
+            branch=self.branch,
+            status=ServicePoint.Status.BUSY,
+            current_ticket=earlier
+        )
+
+        self.assertEqual(self.engine.expire_called_tickets(timedelta(minutes=5)), 1)
+
+        batch_point.refresh_from_db()
+        other_point.refresh_from_db()
+        self.assertIsNone(batch_point.current_ticket)
+        self.assertEqual(other_point.current_ticket, earlier)
+        self.assertEqual(other_point.status, ServicePoint.Status.BUSY)
@@ -1,5 +1,8 @@
+from functools import partial
+
+from celery.result import AsyncResult
+from django.db import transaction
 from django.shortcuts import render
-from django.utils import timezone
 from django.db.models import F, Q
 from django.utils.translation import gettext_lazy as _
 from rest_framework import viewsets, status, mixins
@@ -15,11 +18,33 @@ from .serializers import (
     QueueTypeSerializer, QueueSerializer, ServicePointSerializer,
     TicketSerializer, VehicleCategorySerializer, QueueAnalyticsSerializer,
     QueueNotificationSerializer, QueueStatusUpdateSerializer,
-    TicketStatusUpdateSerializer, ServicePointStatusUpdateSerializer
+    TicketStatusUpdateSerializer, ServicePointStatusUpdateSerializer,
+    TicketNumberBlockSerializer, TicketPositionsQuerySerializer
 )
+from .services.dispatch import dispatch_engine
+from .services.numbering import ticket_number_allocator
+from .services.positions import position_index
+from .services.transitions import IllegalTransition, StaleTransition, transition_engine
+from .realtime import schedule_queue_state
+from .signals import notify_status_change
+from .tasks import fan_out_queue_status_change
 
 # Create your views here.
 
+def transition_error_response(error):
+    """Réponse HTTP d'une transition refusée"""
+    if isinstance(error, StaleTransition):
+        return Response(
+            {'error': _('This resource was modified by another operation. Reload and retry.')},
+            status=status.HTTP_409_CONFLICT
+        )
+    return Response(
+        {'error': _('Transition from %(current)s to %(target)s is not allowed.') % {
+            'current': error.current, 'target': error.target
+        }},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
 class QueueTypeViewSet(viewsets.ModelViewSet):
     serializer_class = QueueTypeSerializer
     permission_classes = [IsAuthenticated, IsOrganizationAdmin]
@@ -39,7 +64,7 @@ class QueueViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Queue.objects.filter(
             queue_type__organization=self.request.user.organization
-        )
+        ).with_listing_stats()
 
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
@@ -50,19 +75,40 @@ class QueueViewSet(viewsets.ModelViewSet):
             queue.status = serializer.validated_data['status']
             queue.save()
             
-            # Notifier les utilisateurs du changement de statut
-            active_tickets = queue.tickets.filter(
-                status__in=[Ticket.Status.WAITING, Ticket.Status.CALLED]
-            )
-            for ticket in active_tickets:
-                QueueNotification.objects.create(
-                    ticket=ticket,
-                    notification_type=QueueNotification.NotificationType.STATUS_CHANGE,
-                    message=f"Queue status changed to {queue.get_status_display()}",
-                    sent_via='push'
-                )
+            # Notifier les utilisateurs du changement de statut (tâche de fond)
+            message = f"Queue status changed to {queue.get_status_display()}"
+            job = fan_out_queue_status_change.delay(queue.id, message)
             
-            return Response(QueueSerializer(queue).data)
+            data = QueueSerializer(queue).data
+            data['notification_job'] = job.id
+            return Response(data)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['get'], url_path='notification-jobs/(?P<job_id>[^/.]+)')
+    def notification_job(self, request, pk=None, job_id=None):
+        """Suit la progression de l'envoi des notifications de statut"""
+        self.get_object()
+        result = AsyncResult(job_id)
+        info = result.info if isinstance(result.info, dict) else {}
+        return Response({
+            'job_id': job_id,
+            'state': result.state,
+            'total': info.get('total'),
+            'done': info.get('done'),
+        })
+
+    @action(detail=True, methods=['post'])
+    def allocate_numbers(self, request, pk=None):
+        """Réserve un bloc contigu de numéros pour une borne"""
+        queue = self.get_object()
+        serializer = TicketNumberBlockSerializer(data=request.data)
+        
+        if serializer.is_valid():
+            block = ticket_number_allocator.allocate(
+                queue,
+                serializer.validated_data['count']
+            )
+            return Response(block.as_dict(), status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class ServicePointViewSet(viewsets.ModelViewSet):
@@ -80,10 +126,22 @@ class ServicePointViewSet(viewsets.ModelViewSet):
         serializer = ServicePointStatusUpdateSerializer(data=request.data)
         
         if serializer.is_valid():
-            service_point.status = serializer.validated_data['status']
+            fields = {}
             if 'assigned_agent' in serializer.validated_data:
-                service_point.assigned_agent = serializer.validated_data['assigned_agent']
-            service_point.save()
+                fields['assigned_agent'] = serializer.validated_data['assigned_agent']
+            try:
+                transition_engine.transition_service_point(
+                    service_point,
+                    serializer.validated_data['status'],
+                    expected_version=serializer.validated_data.get('version'),
+                    **fields
+                )
+            except (IllegalTransition, StaleTransition) as e:
+                return transition_error_response(e)
+            
+            # Le nombre de guichets disponibles modifie le temps d'attente estimé
+            for queue_id in service_point.assigned_queues.values_list('id', flat=True):
+                transaction.on_commit(partial(schedule_queue_state, queue_id))
             return Response(ServicePointSerializer(service_point).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -97,35 +155,41 @@ class ServicePointViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        # Trouver le prochain ticket
-        next_ticket = Ticket.objects.filter(
-            queue__in=service_point.assigned_queues.all(),
-            status=Ticket.Status.WAITING
-        ).order_by('-priority_level', 'check_in_time').first()
+        next_ticket = None
+        try:
+            with transaction.atomic():
+                # Réserver le point de service (AVAILABLE -> BUSY) avant de retirer un ticket
+                transition_engine.transition_service_point(service_point, ServicePoint.Status.BUSY)
+                
+                # Retirer atomiquement le prochain ticket et le passer à CALLED
+                next_ticket = dispatch_engine.pop_next(service_point)
+                if not next_ticket:
+                    transaction.set_rollback(True)
+                else:
+                    notify_status_change(next_ticket, Ticket.Status.WAITING)
+                    ServicePoint.objects.filter(pk=service_point.pk).update(current_ticket=next_ticket)
+                    service_point.current_ticket = next_ticket
+                    
+                    # Créer une notification
+                    QueueNotification.objects.create(
+                        ticket=next_ticket,
+                        notification_type=QueueNotification.NotificationType.CALLED,
+                        message=f"Please proceed to {service_point.name}",
+                        sent_via='push'
+                    )
+        except StaleTransition as e:
+            return transition_error_response(e)
+        except Exception:
+            if next_ticket is not None:
+                # Transaction annulée : le ticket, toujours en attente, reprend sa place dans l'index
+                dispatch_engine.enqueue(next_ticket)
+            raise
         
         if not next_ticket:
             return Response(
                 {'message': _('No waiting tickets.')},
                 status=status.HTTP_404_NOT_FOUND
             )
-            
-        # Mettre à jour le ticket
-        next_ticket.status = Ticket.Status.CALLED
-        next_ticket.called_time = timezone.now()
-        next_ticket.save()
-        
-        # Mettre à jour le point de service
-        service_point.status = ServicePoint.Status.BUSY
-        service_point.current_ticket = next_ticket
-        service_point.save()
-        
-        # Créer une notification
-        QueueNotification.objects.create(
-            ticket=next_ticket,
-            notification_type=QueueNotification.NotificationType.CALLED,
-            message=f"Please proceed to {service_point.name}",
-            sent_via='push'
-        )
         
         return Response(TicketSerializer(next_ticket).data)
 
@@ -135,22 +199,21 @@ class TicketViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        queryset = Ticket.objects.select_related('queue', 'user')
         if user.is_staff or user.user_type in ['ADMIN', 'OWNER']:
-            return Ticket.objects.filter(
+            return queryset.filter(
                 queue__queue_type__organization=user.organization
             )
-        return Ticket.objects.filter(user=user)
+        return queryset.filter(user=user)
 
     def perform_create(self, serializer):
         queue = serializer.validated_data['queue']
-        # Générer le numéro de ticket
-        last_ticket = queue.tickets.order_by('-created_at').first()
-        next_number = int(last_ticket.number) + 1 if last_ticket else 1
-        
-        serializer.save(
+        # Générer le numéro de ticket (compteur atomique journalier)
+        ticket = serializer.save(
             user=self.request.user,
-            number=f"{queue.queue_type.prefix}{next_number:04d}"
+            number=ticket_number_allocator.next_number(queue)
         )
+        notify_status_change(ticket, None)
 
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
@@ -158,26 +221,16 @@ class TicketViewSet(viewsets.ModelViewSet):
         serializer = TicketStatusUpdateSerializer(data=request.data)
         
         if serializer.is_valid():
-            new_status = serializer.validated_data['status']
-            notes = serializer.validated_data.get('notes', '')
-            
-            # Mettre à jour les horodatages en fonction du statut
-            if new_status == Ticket.Status.SERVING:
-                ticket.service_start_time = timezone.now()
-            elif new_status in [Ticket.Status.COMPLETED, Ticket.Status.CANCELLED, Ticket.Status.NO_SHOW]:
-                ticket.service_end_time = timezone.now()
-            
-            ticket.status = new_status
-            ticket.notes = notes
-            ticket.save()
-            
-            # Mettre à jour le point de service si nécessaire
-            if ticket.current_service_point:
-                if new_status in [Ticket.Status.COMPLETED, Ticket.Status.CANCELLED, Ticket.Status.NO_SHOW]:
-                    service_point = ticket.current_service_point
-                    service_point.status = ServicePoint.Status.AVAILABLE
-                    service_point.current_ticket = None
-                    service_point.save()
+            # Horodatages, libération du point de service et signal : voir le moteur de transitions
+            try:
+                transition_engine.transition_ticket(
+                    ticket,
+                    serializer.validated_data['status'],
+                    expected_version=serializer.validated_data.get('version'),
+                    notes=serializer.validated_data.get('notes', '')
+                )
+            except (IllegalTransition, StaleTransition) as e:
+                return transition_error_response(e)
             
             # Créer une notification
             QueueNotification.objects.create(
@@ -190,6 +243,23 @@ class TicketViewSet(viewsets.ModelViewSet):
             return Response(TicketSerializer(ticket).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'])
+    def positions(self, request):
+        """Positions de plusieurs tickets en un seul appel (?ids=1,2,3)"""
+        raw_ids = [
+            value for param in request.query_params.getlist('ids')
+            for value in param.split(',') if value
+        ]
+        serializer = TicketPositionsQuerySerializer(data={'ids': raw_ids})
+        
+        if serializer.is_valid():
+            tickets = self.get_queryset().select_related(None).filter(
+                pk__in=serializer.validated_data['ids']
+            ).only('id', 'queue_id', 'status')
+            positions = position_index.positions(tickets)
+            return Response({str(pk): position for pk, position in positions.items()})
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 class VehicleCategoryViewSet(viewsets.ModelViewSet):
     serializer_class = VehicleCategorySerializer
     permission_classes = [IsAuthenticated, IsOrganizationAdmin]
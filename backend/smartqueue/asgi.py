@@ -13,4 +13,20 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smartqueue.settings')
 
-application = get_asgi_application()
+# Initialiser Django avant d'importer les consumers (modèles)
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+from apps.ai.ml.registry import model_registry  # noqa: E402
+from apps.core.authentication import JWTAuthMiddleware  # noqa: E402
+from apps.queues.routing import websocket_urlpatterns  # noqa: E402
+
+# Modèles ML actifs chargés avant la première requête
+model_registry.warm()
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    # L'authentification JWT fait office de contrôle d'accès (clients mobiles sans Origin)
+    'websocket': JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
+})
@@ -0,0 +1,16 @@
+"""
+Celery config for smartqueue project.
+
+La configuration est lue depuis les settings Django (préfixe CELERY_) et les
+tâches sont découvertes dans le module tasks.py de chaque application.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smartqueue.settings')
+
+app = Celery('smartqueue')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -15,6 +15,7 @@ from pathlib import Path
 from django.utils.translation import gettext_lazy as _
 from dotenv import load_dotenv
 from datetime import timedelta
+from celery.schedules import crontab
 load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -64,6 +65,7 @@ INSTALLED_APPS = [
     'apps.analytics.apps.AnalyticsConfig',
     'apps.ar.apps.ArConfig',
     'apps.queues.apps.QueuesConfig',
+    'apps.ai.apps.AIConfig',
     'apps.billing.apps.BillingConfig',
     'apps.iot.apps.IotConfig',
     'apps.geolocation.apps.GeolocationConfig',
@@ -126,12 +128,64 @@ CACHES = {
     }
 }
 
+# Structures Redis des files d'attente (index de dispatch, compteurs...)
+QUEUE_REDIS_ENABLED = os.getenv('QUEUE_REDIS_ENABLED', 'True') == 'True'
+QUEUE_REDIS_CACHE_ALIAS = 'default'
+
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-dashboard-snapshots': {
+        'task': 'apps.queues.tasks.reconcile_dashboard_snapshots',
+        'schedule': timedelta(minutes=5),
+    },
+    'expire-called-tickets': {
+        'task': 'apps.queues.tasks.expire_called_tickets',
+        'schedule': timedelta(minutes=1),
+    },
+    'archive-old-tickets': {
+        'task': 'apps.queues.tasks.archive_old_tickets',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'rollup-queue-metrics': {
+        'task': 'apps.analytics.tasks.rollup_queue_metrics',
+        'schedule': timedelta(minutes=5),
+    },
+    'export-analytics-snapshots': {
+        'task': 'apps.analytics.tasks.export_analytics_snapshots',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'train-wait-time-models': {
+        'task': 'apps.ai.tasks.train_wait_time_models',
+        'schedule': crontab(hour=0, minute=0),
+    },
+    'compute-seasonal-baselines': {
+        'task': 'apps.ai.tasks.compute_seasonal_baselines',
+        'schedule': crontab(hour=1, minute=0),
+    },
+    'fit-arrival-forecasts': {
+        'task': 'apps.ai.tasks.fit_arrival_forecasts',
+        'schedule': crontab(hour=1, minute=30),
+    },
+    'check-for-anomalies': {
+        'task': 'apps.ai.tasks.check_for_anomalies',
+        'schedule': timedelta(minutes=5),
+    },
+}
+
+# Délai après l'appel au-delà duquel un ticket non présenté passe en NO_SHOW
+TICKET_NO_SHOW_AFTER_MINUTES = int(os.getenv('TICKET_NO_SHOW_AFTER_MINUTES', '5'))
+
+# Tickets clos déplacés vers l'archive partitionnée après ce délai
+TICKET_ARCHIVE_AFTER_DAYS = int(os.getenv('TICKET_ARCHIVE_AFTER_DAYS', '30'))
+
+# Instantanés Parquet des données analytiques, requêtés via DuckDB (pyarrow, duckdb)
+ANALYTICS_SNAPSHOTS_ENABLED = os.getenv('ANALYTICS_SNAPSHOTS_ENABLED', 'False') == 'True'
+ANALYTICS_SNAPSHOT_DIR = os.getenv('ANALYTICS_SNAPSHOT_DIR', str(BASE_DIR / 'var' / 'analytics'))
 
 # REST Framework
 REST_FRAMEWORK = {
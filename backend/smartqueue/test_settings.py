@@ -17,6 +17,7 @@ INSTALLED_APPS = [
     'apps.support.apps.SupportConfig',  # Add support app
     'apps.analytics.apps.AnalyticsConfig',  # Add analytics app
     'apps.queues.apps.QueuesConfig',  # Add queues app
+    'apps.ai.apps.AIConfig',  # Add AI app
     'apps.geolocation.apps.GeolocationConfig',  # Add geolocation app
     'apps.billing.apps.BillingConfig',  # Add billing app
     'apps.notifications.apps.NotificationsConfig',  # Add notifications app
@@ -45,6 +46,24 @@ INSTALLED_APPS = [
 # Auth settings
 AUTH_USER_MODEL = 'core.User'
 
+# Cache et couche Channels en mémoire
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    }
+}
+
+# Les tâches Celery s'exécutent de façon synchrone
+CELERY_TASK_ALWAYS_EAGER = True
+
+# Les tests utilisent les chemins de repli en base, sans Redis
+QUEUE_REDIS_ENABLED = False
+
 # Test settings
 TEST_RUNNER = 'django.test.runner.DiscoverRunner'
 
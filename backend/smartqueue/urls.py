@@ -37,6 +37,7 @@ urlpatterns = [
     path('api/support/', include('apps.support.urls')),
     path('api/analytics/', include('apps.analytics.urls')),
     path('api/queues/', include('apps.queues.urls')),
+    path('api/', include('apps.ai.api.urls')),
     path('api/billing/', include('apps.billing.urls')),
     path('api/notifications/', include('apps.notifications.urls')),
     path('api/geolocation/', include('apps.geolocation.urls')),
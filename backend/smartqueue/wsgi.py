@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smartqueue.settings')
 
 application = get_wsgi_application()
+
+# Modèles ML actifs chargés avant la première requête
+from apps.ai.ml.registry import model_registry  # noqa: E402
+
+model_registry.warm()